@@ -3,17 +3,28 @@ Backend FastAPI para Sacola de Ideias
 Conecta com PostgreSQL usando pgvector
 """
 
-from fastapi import FastAPI, HTTPException, Depends, Header, Request, Query
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, Response, Query, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Optional, List
-from datetime import datetime, timedelta, timezone
+from typing import Optional, List, Tuple
+from datetime import date, datetime, timedelta, timezone
 from uuid import uuid4
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
+import asyncio
+import base64
+import contextlib
+import csv
+import hashlib
+import io
+import json
+import numpy as np
 import os
 import re
+import tempfile
+import zipfile
 from dotenv import load_dotenv
 import stripe
 import traceback
@@ -21,7 +32,7 @@ try:
     import stripe.checkout as stripe_checkout
 except Exception:
     stripe_checkout = None
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from langchain_openai import ChatOpenAI
 from auth import (
     criar_token_jwt, 
     verificar_token_jwt, 
@@ -31,6 +42,26 @@ from auth import (
     GOOGLE_CLIENT_ID
 )
 from db_config import build_db_config, sanitize_db_config
+import kanban_analytics
+import embedding_storage
+import idea_clusters
+import related_ideas
+import tag_suggestions
+import embedding_providers
+from embedding_providers import DIMENSOES_PADRAO, criar_provedor, modelo_do_provedor
+import embedding_versions
+from embedding_versions import ProntidaoUsuarios, VersaoEmbedding
+from kanban_rank import rank_between, ranks_espacados
+from response_cache import CoalescingTTLCache
+from outbound_calls import ChamadaIndisponivel, LimiteConcorrencia, PoliticaChamada, ProvedorProtegido
+from query_metrics import (
+    ConexaoMedida, EstatisticasSql, MedicaoSqlMiddleware, definir_observador, orcamento_sql, trecho_sql,
+)
+from slow_queries import CapturaConsultasLentas
+from search_cache import QueryEmbeddingCache, SearchResultCache, normalizar_termo
+from embedding_storage import DIMENSOES_COMPLETAS, ArmazenamentoEmbedding
+from tag_suggestions import TagCentroidIndex
+from vector_index import UserVectorIndex
 
 load_dotenv()
 
@@ -70,34 +101,492 @@ FREE_LIMITE_EMBEDDINGS = int(os.getenv("FREE_LIMITE_EMBEDDINGS", "10"))
 TRIAL_DIAS = int(os.getenv("TRIAL_DIAS", "3"))
 KANBAN_STATUS_ORDER = ["novo", "verificando", "em_producao", "teste", "fechado"]
 KANBAN_STATUS_SET = set(KANBAN_STATUS_ORDER)
+# Codigos compactos do log kanban_events (SMALLINT); nunca renumerar valores existentes.
+KANBAN_STATUS_CODIGOS = {status: codigo for codigo, status in enumerate(KANBAN_STATUS_ORDER, start=1)}
+KANBAN_EVENTO_ITEM_TIPOS = {"ideia": 1, "card": 2}
+KANBAN_EVENTO_TIPOS = {"criado": 1, "movido": 2, "checklist": 3, "excluido": 4}
+KANBAN_EVENTOS_LIMITE_PADRAO = 200
+KANBAN_EVENTOS_LIMITE_MAXIMO = 1000
 DEFAULT_KANBAN_NAME = "Kanban principal"
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(200 * 1024 * 1024)))
+IMPORT_COPY_CHUNK = int(os.getenv("IMPORT_COPY_CHUNK", "5000"))
+IMPORT_EMBEDDING_BATCH = int(os.getenv("IMPORT_EMBEDDING_BATCH", "100"))
+IMPORT_MAX_ERROS_REPORTADOS = 100
+KANBAN_BATCH_MAX_OPERACOES = int(os.getenv("KANBAN_BATCH_MAX_OPERACOES", "500"))
+KANBAN_BOARD_LIMITE_PADRAO = 50
+KANBAN_BOARD_LIMITE_MAXIMO = 200
+KANBAN_RANK_MAX_LEN = int(os.getenv("KANBAN_RANK_MAX_LEN", "24"))
+KANBAN_FLUXO_DIAS_PADRAO = 30
+KANBAN_FLUXO_DIAS_MAXIMO = 366
+KANBAN_HISTORICO_LIMITE_PADRAO = 50
+KANBAN_HISTORICO_LIMITE_MAXIMO = 500
+KANBAN_HISTORICO_MESES_ADIANTE = int(os.getenv("KANBAN_HISTORICO_MESES_ADIANTE", "3"))
+# 0 mantem todo o historico; acima disso, particoes mais antigas que N meses saem da tabela.
+KANBAN_HISTORICO_RETENCAO_MESES = int(os.getenv("KANBAN_HISTORICO_RETENCAO_MESES", "0"))
+# "arquivar" move a particao para o schema de arquivo; "excluir" apaga a particao.
+KANBAN_HISTORICO_RETENCAO_ACAO = os.getenv("KANBAN_HISTORICO_RETENCAO_ACAO", "arquivar")
+KANBAN_HISTORICO_SCHEMA_ARQUIVO = "kanban_arquivo"
+KANBAN_HISTORICO_MANUTENCAO_SEGUNDOS = 6 * 60 * 60
+KANBAN_BATCH_TIPOS = ("mover_ideia", "vincular_ideia", "excluir_ideia", "atualizar_card", "excluir_card")
+EXPORT_ITERSIZE = int(os.getenv("EXPORT_ITERSIZE", "1000"))
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+# Provedor de embeddings (ver embedding_providers.py): openai | local | fake
+EMBEDDING_PROVEDOR = os.getenv("EMBEDDING_PROVEDOR", "openai").strip().lower()
+EMBEDDING_PROVEDOR_DIMENSOES = int(os.getenv("EMBEDDING_PROVEDOR_DIMENSOES", str(DIMENSOES_PADRAO)))
+# Identidade gravada em ideias.embedding_modelo; so vetores do mesmo modelo sao comparados
+EMBEDDING_MODELO_ATUAL = modelo_do_provedor(EMBEDDING_PROVEDOR, OPENAI_EMBEDDING_MODEL, EMBEDDING_PROVEDOR_DIMENSOES)
+# Desligado no startup se a dimensao do provedor nao cabe em ideias.embedding (busca textual)
+EMBEDDING_PROVEDOR_RECUSADO = False
+# Troca de modelo em curso (ver embedding_versions.py): dual-write em embedding_proximo
+EMBEDDING_PROVEDOR_PROXIMO = os.getenv("EMBEDDING_PROVEDOR_PROXIMO", "").strip().lower()
+EMBEDDING_PROXIMO_MODELO_OPENAI = os.getenv("EMBEDDING_PROXIMO_MODELO_OPENAI", OPENAI_EMBEDDING_MODEL)
+EMBEDDING_PROXIMO_DIMENSOES = int(os.getenv("EMBEDDING_PROXIMO_DIMENSOES", str(DIMENSOES_PADRAO)))
+EMBEDDING_MODELO_PROXIMO = (
+    modelo_do_provedor(EMBEDDING_PROVEDOR_PROXIMO, EMBEDDING_PROXIMO_MODELO_OPENAI, EMBEDDING_PROXIMO_DIMENSOES)
+    if EMBEDDING_PROVEDOR_PROXIMO else None
+)
+if EMBEDDING_MODELO_PROXIMO == EMBEDDING_MODELO_ATUAL:
+    EMBEDDING_MODELO_PROXIMO = None
+# Chamadas ao OpenAI (ver outbound_calls.py): prazo total por chamada, tentativas, disjuntor
+# e limite de chamadas simultaneas no processo (embeddings e chat somados)
+OPENAI_MAX_CHAMADAS_SIMULTANEAS = int(os.getenv("OPENAI_MAX_CHAMADAS_SIMULTANEAS", "16"))
+OPENAI_ESPERA_VAGA_SEGUNDOS = float(os.getenv("OPENAI_ESPERA_VAGA_SEGUNDOS", "2"))
+OPENAI_EMBEDDING_PRAZO_SEGUNDOS = float(os.getenv("OPENAI_EMBEDDING_PRAZO_SEGUNDOS", "10"))
+OPENAI_CHAT_PRAZO_SEGUNDOS = float(os.getenv("OPENAI_CHAT_PRAZO_SEGUNDOS", "30"))
+OPENAI_TENTATIVAS = int(os.getenv("OPENAI_TENTATIVAS", "3"))
+OPENAI_DISJUNTOR_FALHAS = int(os.getenv("OPENAI_DISJUNTOR_FALHAS", "5"))
+OPENAI_DISJUNTOR_ESPERA_SEGUNDOS = float(os.getenv("OPENAI_DISJUNTOR_ESPERA_SEGUNDOS", "30"))
+# Consultas SQL por requisicao (ver query_metrics.py): Server-Timing, orcamentos por endpoint
+# (estourar vira 500 com SQL_ORCAMENTO_ESTRITO=1, para testes/CI) e alerta de N+1
+SQL_SERVER_TIMING = os.getenv("SQL_SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+SQL_ORCAMENTO_ESTRITO = os.getenv("SQL_ORCAMENTO_ESTRITO", "false").lower() in ("1", "true", "yes")
+SQL_N_MAIS_UM_LIMITE = int(os.getenv("SQL_N_MAIS_UM_LIMITE", "10"))
+# Consultas lentas (ver slow_queries.py): instrucoes acima do limite vao para um buffer em
+# memoria; uma amostra ganha EXPLAIN (ANALYZE, BUFFERS) numa conexao lateral. 0 desliga.
+SQL_LENTA_LIMITE_MS = float(os.getenv("SQL_LENTA_LIMITE_MS", "200"))
+SQL_LENTA_MAX = int(os.getenv("SQL_LENTA_MAX", "200"))
+SQL_LENTA_EXPLAIN_AMOSTRA = float(os.getenv("SQL_LENTA_EXPLAIN_AMOSTRA", "0.1"))
+SQL_LENTA_EXPLAIN_INTERVALO_SEGUNDOS = float(os.getenv("SQL_LENTA_EXPLAIN_INTERVALO_SEGUNDOS", "300"))
+SQL_LENTA_EXPLAIN_TIMEOUT_MS = int(os.getenv("SQL_LENTA_EXPLAIN_TIMEOUT_MS", "5000"))
+# Quanto tempo a busca confia em "usuario ja completo no proximo modelo" sem reconsultar
+EMBEDDING_PROXIMO_CACHE_MAX = int(os.getenv("EMBEDDING_PROXIMO_CACHE_MAX", "10000"))
+EMBEDDING_PROXIMO_CACHE_TTL_SECONDS = float(os.getenv("EMBEDDING_PROXIMO_CACHE_TTL_SECONDS", "60"))
+QUERY_EMBEDDING_CACHE_MAX = int(os.getenv("QUERY_EMBEDDING_CACHE_MAX", "2000"))
+# Segundo nivel do cache de embeddings de consulta, compartilhado entre workers.
+QUERY_EMBEDDING_CACHE_POSTGRES = os.getenv("QUERY_EMBEDDING_CACHE_POSTGRES", "false").lower() in ("1", "true", "yes")
+QUERY_EMBEDDING_CACHE_POSTGRES_MAX = int(os.getenv("QUERY_EMBEDDING_CACHE_POSTGRES_MAX", "50000"))
+SEARCH_RESULT_CACHE_MAX = int(os.getenv("SEARCH_RESULT_CACHE_MAX", "5000"))
+SEARCH_RESULT_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_RESULT_CACHE_TTL_SECONDS", "30"))
+# Sugestoes de lembranca (IA): cache por texto normalizado
+LEMBRANCAS_CACHE_MAX = int(os.getenv("LEMBRANCAS_CACHE_MAX", "1000"))
+LEMBRANCAS_CACHE_TTL_SECONDS = float(os.getenv("LEMBRANCAS_CACHE_TTL_SECONDS", "600"))
+# Busca exata em memoria (NumPy) para contas com ate VECTOR_INDEX_MAX_IDEAS ideias com embedding.
+VECTOR_INDEX_ENABLED = os.getenv("VECTOR_INDEX_ENABLED", "false").lower() in ("1", "true", "yes")
+VECTOR_INDEX_MAX_IDEAS = int(os.getenv("VECTOR_INDEX_MAX_IDEAS", "2000"))
+VECTOR_INDEX_MAX_MB = int(os.getenv("VECTOR_INDEX_MAX_MB", "256"))
+# Busca filtrada sem iterative scan: quantas vezes `limite` buscar no ivfflat antes de filtrar.
+BUSCA_FILTRO_OVERFETCH = int(os.getenv("BUSCA_FILTRO_OVERFETCH", "10"))
+# Primeira passada da busca semantica: distancia de cosseno <= 0.7 (similarity >= 0.3)
+BUSCA_DISTANCIA_MAXIMA = 0.7
+PGVECTOR_ITERATIVE_SCAN: Optional[bool] = None
+# Verificacao opcional de duplicatas na criacao (?verificar_duplicatas=true)
+DUPLICATA_SIMILARIDADE_MINIMA = float(os.getenv("DUPLICATA_SIMILARIDADE_MINIMA", "0.92"))
+DUPLICATA_LIMITE = 5
+# Vizinhos pre-calculados do painel "ideias relacionadas"
+RELACIONADAS_K = int(os.getenv("RELACIONADAS_K", "10"))
+RELACIONADAS_LOTE = int(os.getenv("RELACIONADAS_LOTE", "200"))
+RELACIONADAS_INTERVALO_SEGUNDOS = float(os.getenv("RELACIONADAS_INTERVALO_SEGUNDOS", "5"))
+# Armazenamento compacto dos embeddings (ver embedding_storage.py): vector | halfvec | binario
+EMBEDDING_ARMAZENAMENTO = os.getenv("EMBEDDING_ARMAZENAMENTO", "vector").strip().lower()
+EMBEDDING_DIMENSOES = int(os.getenv("EMBEDDING_DIMENSOES", str(DIMENSOES_COMPLETAS)))
+EMBEDDING_RERANK_FATOR = int(os.getenv("EMBEDDING_RERANK_FATOR", "0")) or None
+# So usa a coluna compacta depois que a migracao e o indice terminaram (verificado no startup)
+EMBEDDING_COMPACTO_PRONTO = False
+# Sugestao de tags por centroides (usuarios com centroides em memoria)
+TAG_CENTROIDES_MAX_USUARIOS = int(os.getenv("TAG_CENTROIDES_MAX_USUARIOS", "1000"))
+TAG_SUGESTAO_SIMILARIDADE_MINIMA = float(os.getenv("TAG_SUGESTAO_SIMILARIDADE_MINIMA", "0.3"))
+# Agrupamento de ideias (sugestao de projetos): ideias mais recentes consideradas por job
+AGRUPAMENTO_MAX_IDEIAS = int(os.getenv("AGRUPAMENTO_MAX_IDEIAS", "20000"))
+# Job pendente mais antigo que isso e considerado perdido (ex.: reinicio) e nao e reaproveitado
+AGRUPAMENTO_JOB_VALIDADE_MINUTOS = 10
 
 if STRIPE_SECRET_KEY:
     stripe.api_key = STRIPE_SECRET_KEY
+limite_chamadas_openai = LimiteConcorrencia(OPENAI_MAX_CHAMADAS_SIMULTANEAS)
+
+
+def _politica_openai(nome: str, prazo_segundos: float) -> PoliticaChamada:
+    return PoliticaChamada(
+        nome,
+        limite_chamadas_openai,
+        prazo_segundos,
+        tentativas=OPENAI_TENTATIVAS,
+        espera_vaga=OPENAI_ESPERA_VAGA_SEGUNDOS,
+        limite_falhas=OPENAI_DISJUNTOR_FALHAS,
+        espera_disjuntor=OPENAI_DISJUNTOR_ESPERA_SEGUNDOS,
+    )
+
+
+politica_embeddings = _politica_openai("embeddings", OPENAI_EMBEDDING_PRAZO_SEGUNDOS)
+politica_chat = _politica_openai("chat", OPENAI_CHAT_PRAZO_SEGUNDOS)
+
 embeddings_model = None
+embeddings_model_proximo = None
 
 def get_embeddings_model():
-    """Obter modelo de embeddings (singleton)"""
+    """Obter provedor de embeddings configurado (singleton); None se o OpenAI nao tem chave"""
     global embeddings_model
-    if embeddings_model is None and OPENAI_API_KEY:
-        embeddings_model = OpenAIEmbeddings(
-            openai_api_key=OPENAI_API_KEY,
-            model="text-embedding-3-small"
+    if embeddings_model is None and not EMBEDDING_PROVEDOR_RECUSADO:
+        embeddings_model = _criar_provedor_embeddings(
+            EMBEDDING_PROVEDOR, OPENAI_EMBEDDING_MODEL, EMBEDDING_PROVEDOR_DIMENSOES
         )
     return embeddings_model
 
-def gerar_embedding(texto: str):
-    """Gerar embedding para um texto"""
-    model = get_embeddings_model()
+
+def _criar_provedor_embeddings(nome: str, modelo_openai: str, dimensoes: int):
+    """Provedor configurado; o do OpenAI passa por politica_embeddings e o cliente HTTP nao tenta de novo sozinho.
+
+    Os locais (local, fake) rodam no processo: fora do limite de chamadas ao OpenAI, do
+    disjuntor e das metricas de chamadas_openai.
+    """
+    if nome != "openai":
+        return criar_provedor(nome, OPENAI_API_KEY, modelo_openai, dimensoes)
+    provedor = criar_provedor(
+        nome, OPENAI_API_KEY, modelo_openai, dimensoes,
+        timeout=politica_embeddings.timeout_tentativa, max_retries=0,
+    )
+    return ProvedorProtegido(provedor, politica_embeddings) if provedor is not None else None
+
+
+def get_embeddings_model_proximo():
+    """Provedor do proximo modelo durante a troca (singleton); None fora dela"""
+    global embeddings_model_proximo
+    if embeddings_model_proximo is None and EMBEDDING_MODELO_PROXIMO is not None:
+        embeddings_model_proximo = _criar_provedor_embeddings(
+            EMBEDDING_PROVEDOR_PROXIMO, EMBEDDING_PROXIMO_MODELO_OPENAI, EMBEDDING_PROXIMO_DIMENSOES
+        )
+    return embeddings_model_proximo
+
+
+def _modelo_embedding_cliente(embedding: List[float]) -> str:
+    """Identidade de um vetor enviado pelo cliente: o modelo atual se a dimensao bate."""
+    if len(embedding) == EMBEDDING_PROVEDOR_DIMENSOES:
+        return EMBEDDING_MODELO_ATUAL
+    return f"externo@{len(embedding)}"
+
+def gerar_embedding(texto: str, provedor=None):
+    """Gerar embedding para um texto (com o provedor atual, se nenhum for informado)"""
+    model = provedor or get_embeddings_model()
     if not model:
         return None
     try:
         return model.embed_query(texto)
+    except ChamadaIndisponivel as e:
+        print(f"Embedding indisponivel: {e}")
+        return None
     except Exception as e:
         print(f"Erro ao gerar embedding: {e}")
         return None
 
 
+query_embedding_cache = QueryEmbeddingCache(
+    QUERY_EMBEDDING_CACHE_MAX,
+    conexao=(lambda: get_db_connection()) if QUERY_EMBEDDING_CACHE_POSTGRES else None,
+    max_itens_postgres=QUERY_EMBEDDING_CACHE_POSTGRES_MAX,
+)
+
+
+search_result_cache = SearchResultCache(SEARCH_RESULT_CACHE_MAX, SEARCH_RESULT_CACHE_TTL_SECONDS)
+vector_index = UserVectorIndex(VECTOR_INDEX_MAX_MB * 1024 * 1024, VECTOR_INDEX_MAX_IDEAS) if VECTOR_INDEX_ENABLED else None
+tag_centroid_index = TagCentroidIndex(TAG_CENTROIDES_MAX_USUARIOS)
+prontidao_embedding_proximo = ProntidaoUsuarios(EMBEDDING_PROXIMO_CACHE_MAX, EMBEDDING_PROXIMO_CACHE_TTL_SECONDS)
+armazenamento_embedding = ArmazenamentoEmbedding(EMBEDDING_ARMAZENAMENTO, EMBEDDING_DIMENSOES, EMBEDDING_RERANK_FATOR)
+
+
+def invalidar_busca_usuario(usuario_id: int, vetores: bool = False):
+    """Descarta as buscas em cache do usuario; chamar depois do commit de escritas em ideias.
+
+    `vetores=True` quando a escrita cria, apaga ou altera embeddings ou tags, o que
+    tambem descarta o indice e os centroides de tags em memoria do usuario.
+    """
+    search_result_cache.invalidar(usuario_id)
+    if vetores:
+        prontidao_embedding_proximo.invalidar(usuario_id)
+        tag_centroid_index.invalidar(usuario_id)
+        if vector_index is not None:
+            vector_index.invalidar(usuario_id)
+
+
+def gerar_embedding_consulta(
+    termo: str,
+    versao: Optional[VersaoEmbedding] = None,
+) -> Tuple[Optional[str], Optional[np.ndarray]]:
+    """Embedding do termo de busca via cache; so chama a OpenAI em termos ainda nao vistos.
+
+    Retorna (id do embedding de consulta, vetor float32), no modelo da `versao` (atual por padrao).
+    """
+    versao = versao or versao_embedding_atual()
+    chave = query_embedding_cache.chave(versao.modelo, termo)
+    vetor = query_embedding_cache.obter(chave)
+    if vetor is not None:
+        return chave, vetor
+    if versao.provedor is None:
+        return None, None
+    embedding = gerar_embedding(normalizar_termo(termo), versao.provedor)
+    if not embedding:
+        return None, None
+    return chave, query_embedding_cache.guardar(chave, versao.modelo, embedding)
+
+
+def versao_embedding_atual() -> VersaoEmbedding:
+    return VersaoEmbedding("embedding", "embedding_modelo", EMBEDDING_MODELO_ATUAL, get_embeddings_model())
+
+
+def versao_embedding_busca(usuario_id: int) -> VersaoEmbedding:
+    """Durante a troca de modelo, a busca usa o vetor novo so quando o usuario ja esta completo nele."""
+    if EMBEDDING_MODELO_PROXIMO is None:
+        return versao_embedding_atual()
+    pronto = prontidao_embedding_proximo.obter(usuario_id)
+    if pronto is None:
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                pronto = embedding_versions.usuario_pronto(cur, usuario_id, EMBEDDING_MODELO_PROXIMO)
+        finally:
+            conn.close()
+        prontidao_embedding_proximo.guardar(usuario_id, pronto)
+    if not pronto:
+        return versao_embedding_atual()
+    return VersaoEmbedding(
+        "embedding_proximo", "embedding_proximo_modelo", EMBEDDING_MODELO_PROXIMO, get_embeddings_model_proximo()
+    )
+
+
+def gerar_embeddings_proximos(textos: List[str]):
+    """Vetores do proximo modelo durante a troca; None fora dela ou se o provedor falhar.
+
+    Chamada de rede (prazo e tentativas da politica_embeddings): gerar antes de travar
+    linhas ou de escrever, nunca com a transacao de escrita aberta.
+    """
+    if EMBEDDING_MODELO_PROXIMO is None or not textos:
+        return None
+    provedor = get_embeddings_model_proximo()
+    if provedor is None:
+        return None
+    return embedding_versions.gerar_proximos(provedor, textos)
+
+
+def gravar_embeddings_proximos(cur, ideia_ids: List[int], vetores):
+    """Dual-write dos vetores de gerar_embeddings_proximos, se houver troca em curso.
+
+    `vetores` None (falha do provedor, texto alterado no meio) apaga o vetor proximo.
+    """
+    if EMBEDDING_MODELO_PROXIMO is None or not ideia_ids or get_embeddings_model_proximo() is None:
+        return
+    embedding_versions.gravar_proximos(cur, EMBEDDING_MODELO_PROXIMO, ideia_ids, vetores)
+
+
+def gerar_embeddings_em_lote(textos: List[str]):
+    """Gerar embeddings para varios textos em uma unica chamada ao modelo"""
+    model = get_embeddings_model()
+    if not model or not textos:
+        return None
+    try:
+        return model.embed_documents(textos)
+    except ChamadaIndisponivel as e:
+        print(f"Embeddings em lote indisponiveis: {e}")
+        return None
+    except Exception as e:
+        print(f"Erro ao gerar embeddings em lote: {e}")
+        return None
+
+
+def _idea_embedding_text(titulo: str, tag: Optional[str], ideia: str) -> str:
+    return f"{titulo} {tag or ''} {ideia}".strip()
+
+
+def _vector_literal(embedding) -> str:
+    return "[" + ",".join(map(str, embedding)) + "]"
+
+
+def _backfill_kanban_posicoes(cur):
+    """Atribui ranks aos itens de Kanban que ainda nao tem kanban_posicao.
+
+    Mantem a ordem antiga do quadro (mais recentes no topo) usando ranks de largura
+    fixa; o rebalanceamento posterior encurta esses valores quando necessario.
+    """
+    cur.execute("SELECT to_regclass('public.kanban_cards')")
+    if not cur.fetchone()[0]:
+        return
+    cur.execute(
+        """
+        WITH itens AS (
+            SELECT
+                'ideia' AS item_tipo,
+                i.id,
+                i.kanban_id,
+                CASE WHEN i.kanban_status = ANY(%s) THEN i.kanban_status ELSE 'novo' END AS status,
+                COALESCE(i.kanban_updated_at, i.updated_at) AS ordem_em
+            FROM ideias i
+            WHERE i.kanban_ativo IS TRUE
+              AND i.kanban_id IS NOT NULL
+              AND i.kanban_posicao IS NULL
+            UNION ALL
+            SELECT 'card', kc.id, kc.kanban_id, kc.kanban_status, kc.updated_at
+            FROM kanban_cards kc
+            WHERE kc.kanban_posicao IS NULL
+        ),
+        numerados AS (
+            SELECT
+                item_tipo,
+                id,
+                'U' || lpad(to_hex(row_number() OVER (
+                    PARTITION BY kanban_id, status
+                    ORDER BY ordem_em DESC, item_tipo, id
+                )), 8, '0') || 'V' AS posicao
+            FROM itens
+        ),
+        ideias_atualizadas AS (
+            UPDATE ideias i
+            SET kanban_posicao = n.posicao
+            FROM numerados n
+            WHERE n.item_tipo = 'ideia' AND i.id = n.id
+            RETURNING i.id
+        )
+        UPDATE kanban_cards kc
+        SET kanban_posicao = n.posicao
+        FROM numerados n
+        WHERE n.item_tipo = 'card' AND kc.id = n.id
+        """,
+        (KANBAN_STATUS_ORDER,),
+    )
+
+
+def _kanban_history_is_partitioned(cur) -> bool:
+    cur.execute(
+        """
+        SELECT c.relkind
+        FROM pg_class c
+        WHERE c.oid = to_regclass('public.ideias_kanban_historico')
+        """
+    )
+    row = cur.fetchone()
+    relkind = (row["relkind"] if isinstance(row, dict) else row[0]) if row else None
+    return relkind == "p"
+
+
+def _month_start(ano: int, mes: int) -> date:
+    ano += (mes - 1) // 12
+    mes = (mes - 1) % 12 + 1
+    return date(ano, mes, 1)
+
+
+def _ensure_kanban_history_partitions(cur, meses_adiante: int = KANBAN_HISTORICO_MESES_ADIANTE) -> List[str]:
+    """Cria as particoes mensais do mes atual ate `meses_adiante` meses a frente (UTC)."""
+    if not _kanban_history_is_partitioned(cur):
+        print(
+            "⚠️  ideias_kanban_historico nao e particionada; "
+            "aplique sql/2026-10-19_kanban_historico_particionado.sql."
+        )
+        return []
+
+    hoje = datetime.now(timezone.utc).date()
+    criadas = []
+    for deslocamento in range(meses_adiante + 1):
+        inicio = _month_start(hoje.year, hoje.month + deslocamento)
+        fim = _month_start(inicio.year, inicio.month + 1)
+        nome = f"ideias_kanban_historico_{inicio:%Y_%m}"
+        cur.execute("SELECT to_regclass(%s)", (f"public.{nome}",))
+        row = cur.fetchone()
+        if (row["to_regclass"] if isinstance(row, dict) else row[0]):
+            continue
+        cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {nome}
+            PARTITION OF ideias_kanban_historico
+            FOR VALUES FROM (%s) TO (%s)
+            """,
+            (f"{inicio.isoformat()} 00:00:00+00", f"{fim.isoformat()} 00:00:00+00"),
+        )
+        criadas.append(nome)
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ideias_kanban_historico_padrao
+        PARTITION OF ideias_kanban_historico DEFAULT
+        """
+    )
+    return criadas
+
+
+def _apply_kanban_history_retention(
+    cur,
+    retencao_meses: int = KANBAN_HISTORICO_RETENCAO_MESES,
+    acao: str = KANBAN_HISTORICO_RETENCAO_ACAO,
+) -> List[str]:
+    """Desanexa as particoes mais antigas que a retencao e as arquiva (ou exclui)."""
+    if retencao_meses <= 0 or not _kanban_history_is_partitioned(cur):
+        return []
+
+    hoje = datetime.now(timezone.utc).date()
+    limite = _month_start(hoje.year, hoje.month - retencao_meses)
+    cur.execute(
+        """
+        SELECT c.relname
+        FROM pg_inherits inh
+        JOIN pg_class c ON c.oid = inh.inhrelid
+        WHERE inh.inhparent = 'public.ideias_kanban_historico'::regclass
+        """
+    )
+    removidas = []
+    for row in cur.fetchall():
+        nome = row["relname"] if isinstance(row, dict) else row[0]
+        match = re.fullmatch(r"ideias_kanban_historico_(\d{4})_(\d{2})", nome)
+        if not match:
+            continue
+        fim_particao = _month_start(int(match.group(1)), int(match.group(2)) + 1)
+        if fim_particao > limite:
+            continue
+
+        cur.execute(f"ALTER TABLE ideias_kanban_historico DETACH PARTITION {nome}")
+        if acao == "excluir":
+            cur.execute(f"DROP TABLE {nome}")
+        else:
+            cur.execute(f"CREATE SCHEMA IF NOT EXISTS {KANBAN_HISTORICO_SCHEMA_ARQUIVO}")
+            cur.execute(f"ALTER TABLE {nome} SET SCHEMA {KANBAN_HISTORICO_SCHEMA_ARQUIVO}")
+        removidas.append(nome)
+    return removidas
+
+
+def manter_particoes_historico_kanban():
+    """Cria particoes futuras e aplica a retencao; seguro para varios workers."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_xact_lock(hashtextextended('kanban_historico_particoes', 0))")
+            if not cur.fetchone()[0]:
+                return
+            criadas = _ensure_kanban_history_partitions(cur)
+            removidas = _apply_kanban_history_retention(cur)
+        conn.commit()
+        if criadas or removidas:
+            print(f"🗂️  Historico do Kanban: particoes criadas={criadas} removidas={removidas}")
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"⚠️  Erro na manutencao das particoes do historico do Kanban: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+
+async def _loop_manutencao_historico_kanban():
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(KANBAN_HISTORICO_MANUTENCAO_SEGUNDOS)
+        await loop.run_in_executor(None, manter_particoes_historico_kanban)
+
+
 def ensure_ideias_kanban_columns():
     """Garante as colunas mínimas do Kanban sem exigir migração manual."""
     conn = None
@@ -139,23 +628,53 @@ def ensure_ideias_kanban_columns():
                 ADD COLUMN IF NOT EXISTS agenda_observacao TEXT
                 """
             )
+            cur.execute(
+                """
+                ALTER TABLE ideias
+                ADD COLUMN IF NOT EXISTS kanban_posicao TEXT COLLATE "C"
+                """
+            )
             cur.execute(
                 """
                 CREATE TABLE IF NOT EXISTS ideias_kanban_historico (
-                    id BIGSERIAL PRIMARY KEY,
+                    id BIGSERIAL,
                     ideia_id BIGINT NOT NULL REFERENCES ideias(id) ON DELETE CASCADE,
                     usuario_id BIGINT NOT NULL,
+                    kanban_id BIGINT,
                     de_status VARCHAR(30),
                     para_status VARCHAR(30) NOT NULL,
                     observacao TEXT,
-                    moved_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
-                )
+                    moved_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    PRIMARY KEY (id, moved_at)
+                ) PARTITION BY RANGE (moved_at)
+                """
+            )
+            _ensure_kanban_history_partitions(cur)
+            cur.execute(
+                """
+                ALTER TABLE ideias_kanban_historico
+                ADD COLUMN IF NOT EXISTS kanban_id BIGINT
+                """
+            )
+            cur.execute("DROP INDEX IF EXISTS idx_ideias_kanban_historico_ideia_data")
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_ideias_kanban_historico_ideia_keyset
+                ON ideias_kanban_historico (ideia_id, moved_at DESC, id DESC)
                 """
             )
             cur.execute(
                 """
-                CREATE INDEX IF NOT EXISTS idx_ideias_kanban_historico_ideia_data
-                ON ideias_kanban_historico (ideia_id, moved_at DESC)
+                CREATE INDEX IF NOT EXISTS idx_ideias_kanban_historico_usuario_data
+                ON ideias_kanban_historico (usuario_id, moved_at, id)
+                """
+            )
+            cur.execute("DROP INDEX IF EXISTS idx_ideias_kanban_board")
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_ideias_kanban_posicao
+                ON ideias (kanban_id, kanban_status, (COALESCE(kanban_posicao, '~')), id)
+                WHERE kanban_ativo IS TRUE
                 """
             )
             cur.execute(
@@ -165,6 +684,7 @@ def ensure_ideias_kanban_columns():
                 WHERE kanban_ativo IS NULL
                 """
             )
+            _backfill_kanban_posicoes(cur)
             conn.commit()
             print("✅ Colunas do Kanban verificadas em ideias.")
     except Exception as e:
@@ -176,367 +696,511 @@ def ensure_ideias_kanban_columns():
             conn.close()
 
 
-def _serialize_datetime_fields(record: dict, fields: List[str]) -> dict:
-    serialized = dict(record)
-    for field in fields:
-        value = serialized.get(field)
-        if value and hasattr(value, "isoformat"):
-            serialized[field] = value.isoformat()
-    return serialized
-
-
-def _validate_kanban_status(status: str) -> str:
-    normalized = (status or "").strip().lower()
-    if normalized not in KANBAN_STATUS_SET:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Status inválido para o Kanban. Use: {', '.join(KANBAN_STATUS_ORDER)}",
-        )
-    return normalized
-
-
-def _insert_kanban_history(cur, ideia_id: int, usuario_id: int, para_status: str, de_status: Optional[str] = None, observacao: Optional[str] = None):
-    cur.execute(
-        """
-        INSERT INTO ideias_kanban_historico (ideia_id, usuario_id, de_status, para_status, observacao)
-        VALUES (%s, %s, %s, %s, %s)
-        """,
-        (ideia_id, usuario_id, de_status, para_status, observacao),
-    )
-
-
-def _constraint_exists(cur, table_name: str, constraint_name: str) -> bool:
-    cur.execute(
-        """
-        SELECT 1
-        FROM information_schema.table_constraints
-        WHERE table_schema = 'public'
-          AND table_name = %s
-          AND constraint_name = %s
-        """,
-        (table_name, constraint_name),
-    )
-    return cur.fetchone() is not None
-
-
-def ensure_workspace_schema():
-    """Garante as tabelas de espaços/projetos e o vínculo de ideias a projetos."""
+def ensure_background_jobs_schema():
+    """Garante a tabela de jobs em background (importacoes e processamentos longos)."""
     conn = None
     try:
         conn = get_db_connection()
         with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT
-                    to_regclass('public.usuarios'),
-                    to_regclass('public.ideias')
-                """
-            )
-            usuarios_table, ideias_table = cur.fetchone()
-            if not usuarios_table or not ideias_table:
-                print("⚠️  Tabelas public.usuarios/public.ideias ausentes; workspace não foi inicializado.")
+            cur.execute("SELECT to_regclass('public.usuarios')")
+            if not cur.fetchone()[0]:
+                print("Tabela public.usuarios ausente; jobs em background nao foram inicializados.")
                 return
 
             cur.execute(
                 """
-                CREATE TABLE IF NOT EXISTS espacos (
-                    id BIGSERIAL PRIMARY KEY,
-                    usuario_id BIGINT NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
-                    nome VARCHAR(160) NOT NULL,
-                    descricao TEXT,
-                    cor VARCHAR(20),
-                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
-                )
-                """
-            )
-            cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS projetos (
-                    id BIGSERIAL PRIMARY KEY,
-                    espaco_id BIGINT NOT NULL REFERENCES espacos(id) ON DELETE CASCADE,
-                    usuario_id BIGINT NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
-                    nome VARCHAR(160) NOT NULL,
-                    descricao TEXT,
+                CREATE TABLE IF NOT EXISTS background_jobs (
+                    id UUID PRIMARY KEY,
+                    usuario_id BIGINT REFERENCES usuarios(id) ON DELETE CASCADE,
+                    tipo VARCHAR(60) NOT NULL,
+                    status VARCHAR(20) NOT NULL DEFAULT 'pendente',
+                    progresso JSONB NOT NULL DEFAULT '{}'::jsonb,
+                    resultado JSONB,
+                    erro TEXT,
                     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    finished_at TIMESTAMPTZ
                 )
                 """
             )
             cur.execute(
                 """
-                CREATE UNIQUE INDEX IF NOT EXISTS idx_espacos_usuario_nome
-                ON espacos (usuario_id, lower(nome))
-                """
-            )
-            cur.execute(
-                """
-                CREATE UNIQUE INDEX IF NOT EXISTS idx_projetos_espaco_nome
-                ON projetos (espaco_id, lower(nome))
-                """
-            )
-            cur.execute(
-                """
-                CREATE INDEX IF NOT EXISTS idx_projetos_usuario_espaco
-                ON projetos (usuario_id, espaco_id)
-                """
-            )
-            cur.execute(
-                """
-                ALTER TABLE ideias
-                ADD COLUMN IF NOT EXISTS projeto_id BIGINT
-                """
-            )
-            if not _constraint_exists(cur, "ideias", "ideias_projeto_id_fkey"):
-                cur.execute(
-                    """
-                    ALTER TABLE ideias
-                    ADD CONSTRAINT ideias_projeto_id_fkey
-                    FOREIGN KEY (projeto_id) REFERENCES projetos(id) ON DELETE SET NULL
-                    """
-                )
-            cur.execute(
-                """
-                CREATE INDEX IF NOT EXISTS idx_ideias_usuario_projeto
-                ON ideias (usuario_id, projeto_id)
+                CREATE INDEX IF NOT EXISTS idx_background_jobs_usuario_tipo
+                ON background_jobs (usuario_id, tipo, created_at DESC)
                 """
             )
             conn.commit()
-            print("✅ Estrutura de espaços e projetos verificada.")
+            print("Tabela de jobs em background verificada.")
     except Exception as e:
         if conn:
             conn.rollback()
-        print(f"⚠️  Não foi possível preparar espaços e projetos: {e}")
+        print(f"Nao foi possivel preparar jobs em background: {e}")
     finally:
         if conn:
             conn.close()
 
 
-IDEIA_SELECT_FIELDS = """
-    i.id,
-    i.titulo,
-    i.tag,
-    i.ideia,
-    i.data,
-    i.created_at,
-    i.updated_at,
-    i.kanban_ativo,
-    i.kanban_status,
-    i.kanban_updated_at,
-    i.agenda_data,
-    i.agenda_observacao,
-    i.projeto_id,
-    p.nome AS projeto_nome,
-    e.id AS espaco_id,
-    e.nome AS espaco_nome
-"""
-
-
-def _fetch_workspace_tree(cur, usuario_id: int) -> List[dict]:
-    cur.execute(
-        """
-        SELECT
-            e.id,
-            e.nome,
-            e.descricao,
-            e.cor,
-            e.created_at,
-            e.updated_at
-        FROM espacos e
-        WHERE e.usuario_id = %s
-        ORDER BY lower(e.nome), e.id
-        """,
-        (usuario_id,),
-    )
-    espacos = {
-        row["id"]: {
-            **_serialize_datetime_fields(dict(row), ["created_at", "updated_at"]),
-            "projetos": [],
-        }
-        for row in cur.fetchall()
-    }
+def ensure_query_embedding_cache_schema():
+    """Garante a tabela do segundo nivel do cache de embeddings de consulta, se habilitado."""
+    if not QUERY_EMBEDDING_CACHE_POSTGRES:
+        return
+    conn = None
+    try:
+        conn = get_db_connection()
+        with conn.cursor() as cur:
+            query_embedding_cache.ensure_schema(cur)
+            conn.commit()
+            print("✅ Cache de embeddings de consulta (Postgres) verificado.")
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"⚠️  Não foi possível preparar o cache de embeddings de consulta: {e}")
+    finally:
+        if conn:
+            conn.close()
 
-    cur.execute(
-        """
-        SELECT
-            p.id,
-            p.espaco_id,
-            p.nome,
-            p.descricao,
-            p.created_at,
-            p.updated_at,
-            COUNT(i.id) AS ideias_count,
-            COUNT(CASE WHEN i.kanban_ativo IS TRUE THEN 1 END) AS kanban_count
-        FROM projetos p
-        LEFT JOIN ideias i
-            ON i.projeto_id = p.id
-           AND i.usuario_id = p.usuario_id
-        WHERE p.usuario_id = %s
-        GROUP BY p.id, p.espaco_id, p.nome, p.descricao, p.created_at, p.updated_at
-        ORDER BY lower(p.nome), p.id
-        """,
-        (usuario_id,),
-    )
-    for projeto in cur.fetchall():
-        espaco = espacos.get(projeto["espaco_id"])
-        if not espaco:
-            continue
-        espaco["projetos"].append(
-            {
-                **_serialize_datetime_fields(dict(projeto), ["created_at", "updated_at"]),
-                "ideias_count": int(projeto.get("ideias_count") or 0),
-                "kanban_count": int(projeto.get("kanban_count") or 0),
-            }
-        )
 
-    return list(espacos.values())
+def ensure_kanban_analytics_schema():
+    """Garante a tabela de rollups diarios do fluxo do Kanban."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('public.kanbans')")
+            if not cur.fetchone()[0]:
+                print("⚠️  Tabela public.kanbans ausente; metricas de fluxo nao foram inicializadas.")
+                return
+            kanban_analytics.ensure_schema(cur)
+            conn.commit()
+            print("✅ Rollups de fluxo do Kanban verificados.")
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"⚠️  Não foi possível preparar metricas de fluxo do Kanban: {e}")
+    finally:
+        if conn:
+            conn.close()
 
 
-def _fetch_idea_record(cur, ideia_id: int, usuario_id: int) -> Optional[dict]:
-    cur.execute(
-        f"""
-        SELECT
-            {IDEIA_SELECT_FIELDS}
-        FROM ideias i
-        LEFT JOIN projetos p
-            ON p.id = i.projeto_id
-           AND p.usuario_id = i.usuario_id
-        LEFT JOIN espacos e
-            ON e.id = p.espaco_id
-        WHERE i.id = %s AND i.usuario_id = %s
-        """,
-        (ideia_id, usuario_id),
-    )
-    ideia = cur.fetchone()
-    if not ideia:
-        return None
-    return _serialize_datetime_fields(
-        dict(ideia),
-        ["data", "created_at", "updated_at", "kanban_updated_at", "agenda_data"],
-    )
+def ensure_related_ideas_schema():
+    """Garante as tabelas de vizinhos pre-calculados das ideias."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('public.ideias')")
+            if not cur.fetchone()[0]:
+                print("⚠️  Tabela public.ideias ausente; ideias relacionadas nao foram inicializadas.")
+                return
+            related_ideas.ensure_schema(cur)
+            conn.commit()
+            print("✅ Ideias relacionadas verificadas.")
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"⚠️  Não foi possível preparar ideias relacionadas: {e}")
+    finally:
+        if conn:
+            conn.close()
 
 
-def _fetch_ideas_for_user(cur, usuario_id: int) -> List[dict]:
-    cur.execute(
-        f"""
-        SELECT
-            {IDEIA_SELECT_FIELDS}
-        FROM ideias i
-        LEFT JOIN projetos p
-            ON p.id = i.projeto_id
-           AND p.usuario_id = i.usuario_id
-        LEFT JOIN espacos e
-            ON e.id = p.espaco_id
-        WHERE i.usuario_id = %s
-        ORDER BY i.kanban_updated_at DESC NULLS LAST, i.data DESC
-        """,
-        (usuario_id,),
-    )
-    return [
-        _serialize_datetime_fields(
-            dict(ideia),
-            ["data", "created_at", "updated_at", "kanban_updated_at", "agenda_data"],
-        )
-        for ideia in cur.fetchall()
-    ]
+def ensure_embedding_identity_schema():
+    """Colunas de modelo/dimensoes do embedding; vetores anteriores a elas sao do OpenAI padrao.
 
+    Recusa o provedor cuja dimensao difere de ideias.embedding: toda escrita de vetor falharia.
+    """
+    global EMBEDDING_PROVEDOR_RECUSADO, embeddings_model
+    conn = None
+    try:
+        conn = get_db_connection()
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('public.ideias')")
+            if not cur.fetchone()[0]:
+                print("⚠️  Tabela public.ideias ausente; identidade dos embeddings nao foi inicializada.")
+                return
+            embedding_providers.ensure_schema(cur)
+            try:
+                embedding_versions.verificar_dimensoes(cur, EMBEDDING_MODELO_ATUAL, EMBEDDING_PROVEDOR_DIMENSOES)
+            except ValueError as e:
+                print(f"❌ Provedor de embeddings desativado (busca textual): {e}")
+                EMBEDDING_PROVEDOR_RECUSADO = True
+                embeddings_model = None
+        conn.commit()
+        legado = embedding_providers.preencher_modelo_legado(conn, f"openai:{OPENAI_EMBEDDING_MODEL}")
+        if legado:
+            print(f"✅ {legado} embedding(s) antigo(s) marcado(s) como openai:{OPENAI_EMBEDDING_MODEL}.")
+        if EMBEDDING_PROVEDOR_RECUSADO:
+            return
+        if get_embeddings_model() is None:
+            print("⚠️  Provedor de embeddings indisponivel (OPENAI_API_KEY nao configurada); busca textual.")
+        else:
+            print(f"✅ Embeddings via {EMBEDDING_MODELO_ATUAL}.")
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"⚠️  Não foi possível preparar a identidade dos embeddings: {e}")
+    finally:
+        if conn:
+            conn.close()
 
-def _validate_project_access(cur, projeto_id: Optional[int], usuario_id: int) -> Optional[int]:
-    if projeto_id in (None, ""):
-        return None
 
+def ensure_embedding_versions_schema():
+    """Coluna do proximo modelo; promove para `embedding` os vetores ja gerados no modelo atual."""
+    global EMBEDDING_MODELO_PROXIMO
+    conn = None
     try:
-        projeto_id = int(projeto_id)
-    except (TypeError, ValueError):
-        raise HTTPException(status_code=400, detail="Projeto inválido")
-
-    cur.execute(
-        """
-        SELECT p.id
-        FROM projetos p
-        WHERE p.id = %s AND p.usuario_id = %s
-        """,
-        (projeto_id, usuario_id),
-    )
-    if not cur.fetchone():
-        raise HTTPException(status_code=404, detail="Projeto não encontrado para este usuário")
-    return projeto_id
+        conn = get_db_connection()
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('public.ideias')")
+            if not cur.fetchone()[0]:
+                print("⚠️  Tabela public.ideias ausente; versoes de embedding nao foram inicializadas.")
+                return
+            embedding_versions.ensure_schema(cur)
+            if EMBEDDING_MODELO_PROXIMO is not None:
+                try:
+                    embedding_versions.verificar_dimensoes(cur, EMBEDDING_MODELO_PROXIMO, EMBEDDING_PROXIMO_DIMENSOES)
+                except ValueError as e:
+                    # Recusada ja no inicio: sem dual-write de vetores que nunca poderiam ser promovidos
+                    print(f"❌ Troca de modelo de embedding ignorada: {e}")
+                    EMBEDDING_MODELO_PROXIMO = None
+        conn.commit()
+        # Fim de uma troca: EMBEDDING_PROVEDOR ja aponta para o modelo que estava em embedding_proximo
+        promovidas = embedding_versions.promover(conn, EMBEDDING_MODELO_ATUAL)
+        if promovidas:
+            related_ideas.backfill(conn)
+            print(f"✅ {promovidas} embedding(s) promovido(s) para {EMBEDDING_MODELO_ATUAL}.")
+        if EMBEDDING_MODELO_PROXIMO is not None:
+            print(
+                f"🔁 Troca de modelo em curso: gravando tambem {EMBEDDING_MODELO_PROXIMO}; "
+                "rode `python embedding_versions.py reembedar` para as ideias existentes."
+            )
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"⚠️  Não foi possível preparar as versoes de embedding: {e}")
+    finally:
+        if conn:
+            conn.close()
 
 
-def _normalize_workspace_name(value: str, entity_label: str) -> str:
-    normalized = (value or "").strip()
-    if not normalized:
-        raise HTTPException(status_code=400, detail=f"Nome de {entity_label} é obrigatório")
-    if len(normalized) > 160:
-        raise HTTPException(status_code=400, detail=f"Nome de {entity_label} deve ter no máximo 160 caracteres")
-    return normalized
-
-
-def _normalize_optional_text(value: Optional[str], max_length: int = 4000) -> Optional[str]:
-    if value is None:
-        return None
-
-    normalized = value.strip()
-    if not normalized:
-        return None
-    if len(normalized) > max_length:
-        raise HTTPException(status_code=400, detail=f"Texto deve ter no máximo {max_length} caracteres")
-    return normalized
-
-
-def _normalize_hex_color(value: Optional[str]) -> Optional[str]:
-    if value is None:
-        return None
-
-    normalized = value.strip().upper()
-    if not normalized:
-        return None
-
-    if not re.fullmatch(r"#[0-9A-F]{6}", normalized):
-        raise HTTPException(status_code=400, detail="Cor inválida. Use o formato hexadecimal, por exemplo: #6366F1")
-    return normalized
-
-
-def _normalize_kanban_checklist(items: Optional[List["KanbanChecklistItem"]]) -> List[dict]:
-    if not items:
-        return []
-
-    normalized_items = []
-    for item in items:
-        titulo = _normalize_optional_text(item.titulo, 200)
-        if not titulo:
-            raise HTTPException(status_code=400, detail="Cada item do checklist precisa ter um título")
-
-        normalized_items.append(
-            {
-                "id": (item.id or f"check-{uuid4().hex[:12]}").strip(),
-                "titulo": titulo,
-                "concluido": bool(item.concluido),
-            }
-        )
-
-    return normalized_items
-
-def ensure_workspace_schema():
-    """Garante as tabelas de espacos, projetos, kanbans e os vinculos das ideias."""
+def ensure_embedding_storage_schema():
+    """Prepara a coluna compacta do modo configurado e decide se a busca ja pode usa-la."""
+    global EMBEDDING_COMPACTO_PRONTO
+    if not armazenamento_embedding.compacto:
+        return
     conn = None
     try:
         conn = get_db_connection()
         with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT
-                    to_regclass('public.usuarios'),
-                    to_regclass('public.ideias')
-                """
-            )
-            usuarios_table, ideias_table = cur.fetchone()
-            if not usuarios_table or not ideias_table:
-                print("Tabelas public.usuarios/public.ideias ausentes; workspace nao foi inicializado.")
+            cur.execute("SELECT to_regclass('public.ideias')")
+            if not cur.fetchone()[0]:
+                print("⚠️  Tabela public.ideias ausente; armazenamento compacto nao foi inicializado.")
                 return
-
-            cur.execute(
-                """
+            if embedding_storage.versao_pgvector(cur) < (0, 7):
+                print("⚠️  EMBEDDING_ARMAZENAMENTO exige pgvector >= 0.7; usando o vetor completo.")
+                return
+            embedding_storage.ensure_schema(cur, armazenamento_embedding)
+            EMBEDDING_COMPACTO_PRONTO = embedding_storage.esta_pronto(cur, armazenamento_embedding)
+            conn.commit()
+        if EMBEDDING_COMPACTO_PRONTO:
+            print(f"✅ Busca vetorial usando {armazenamento_embedding.coluna} com reordenacao exata.")
+        else:
+            print(
+                f"⚠️  {armazenamento_embedding.coluna} ainda nao migrada; rode "
+                f"`python embedding_storage.py migrar --modo {armazenamento_embedding.modo} "
+                f"--dimensoes {armazenamento_embedding.dimensoes}`. Usando o vetor completo."
+            )
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"⚠️  Não foi possível preparar o armazenamento compacto de embeddings: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+
+def ensure_tag_centroids_schema():
+    """Garante a tabela de centroides de tags; na criacao, calcula a partir das ideias."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('public.ideias'), to_regclass('public.tag_centroides')")
+            ideias, centroides = cur.fetchone()
+            if not ideias:
+                print("⚠️  Tabela public.ideias ausente; centroides de tags nao foram inicializados.")
+                return
+            tag_suggestions.ensure_schema(cur)
+            desatualizados = False
+            if centroides:
+                # Centroides de outro modelo (troca de provedor) sao recalculados com o atual
+                cur.execute(
+                    "SELECT EXISTS (SELECT 1 FROM tag_centroides WHERE modelo IS DISTINCT FROM %s)",
+                    (EMBEDDING_MODELO_ATUAL,),
+                )
+                desatualizados = cur.fetchone()[0]
+            if not centroides or desatualizados:
+                total = tag_suggestions.recalcular(cur, EMBEDDING_MODELO_ATUAL)
+                print(f"✅ {total} centroide(s) de tag calculado(s).")
+            conn.commit()
+            print("✅ Centroides de tags verificados.")
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"⚠️  Não foi possível preparar centroides de tags: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+
+def processar_ideias_relacionadas() -> int:
+    """Drena a fila de ideias com embedding alterado, um lote por transacao."""
+    conn = None
+    processadas = 0
+    try:
+        conn = get_db_connection()
+        while True:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                lote = related_ideas.processar_pendentes(cur, RELACIONADAS_K, RELACIONADAS_LOTE)
+            conn.commit()
+            processadas += lote
+            if lote < RELACIONADAS_LOTE:
+                return processadas
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"⚠️  Erro ao atualizar ideias relacionadas: {e}")
+        return processadas
+    finally:
+        if conn:
+            conn.close()
+
+
+async def _loop_ideias_relacionadas():
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(RELACIONADAS_INTERVALO_SEGUNDOS)
+        await loop.run_in_executor(None, processar_ideias_relacionadas)
+
+
+def _explicar_consultas_lentas():
+    # Conexao sem ConexaoMedida: o proprio EXPLAIN nao entra na captura
+    captura_consultas_lentas.explicar_pendentes(
+        lambda: psycopg2.connect(**DB_CONFIG), SQL_LENTA_EXPLAIN_TIMEOUT_MS
+    )
+
+
+async def _loop_explain_consultas_lentas():
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(2)
+        if captura_consultas_lentas.ha_pendentes():
+            await loop.run_in_executor(None, _explicar_consultas_lentas)
+
+
+def _serialize_datetime_fields(record: dict, fields: List[str]) -> dict:
+    serialized = dict(record)
+    for field in fields:
+        value = serialized.get(field)
+        if value and hasattr(value, "isoformat"):
+            serialized[field] = value.isoformat()
+    return serialized
+
+
+def _encode_cursor(payload: dict) -> str:
+    raw = json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor invalido")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Cursor invalido")
+    return payload
+
+
+def _validate_kanban_status(status: str) -> str:
+    normalized = (status or "").strip().lower()
+    if normalized not in KANBAN_STATUS_SET:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Status inválido para o Kanban. Use: {', '.join(KANBAN_STATUS_ORDER)}",
+        )
+    return normalized
+
+
+def _insert_kanban_history(cur, ideia_id: int, usuario_id: int, para_status: str, de_status: Optional[str] = None, observacao: Optional[str] = None):
+    _insert_kanban_history_bulk(
+        cur,
+        [
+            {
+                "ideia_id": ideia_id,
+                "usuario_id": usuario_id,
+                "de_status": de_status,
+                "para_status": para_status,
+                "observacao": observacao,
+            }
+        ],
+    )
+
+
+def _insert_kanban_history_bulk(cur, entries: List[dict]):
+    """Grava o historico (com o kanban atual da ideia) e atualiza os rollups de fluxo."""
+    if not entries:
+        return
+    inseridos = execute_values(
+        cur,
+        """
+        INSERT INTO ideias_kanban_historico (ideia_id, usuario_id, kanban_id, de_status, para_status, observacao)
+        VALUES %s
+        RETURNING id, ideia_id, usuario_id, kanban_id, de_status, para_status
+        """,
+        [
+            (
+                entry["ideia_id"],
+                entry["usuario_id"],
+                entry["ideia_id"],
+                entry.get("de_status"),
+                entry["para_status"],
+                entry.get("observacao"),
+            )
+            for entry in entries
+        ],
+        template="(%s, %s, (SELECT kanban_id FROM ideias WHERE id = %s), %s, %s, %s)",
+        fetch=True,
+    )
+    colunas = ("id", "ideia_id", "usuario_id", "kanban_id", "de_status", "para_status")
+    registros = [row if isinstance(row, dict) else dict(zip(colunas, row)) for row in inseridos]
+    kanban_analytics.registrar_historico(cur, [registro["id"] for registro in registros])
+    _registrar_eventos_kanban(
+        cur,
+        [
+            {
+                "kanban_id": registro["kanban_id"],
+                "usuario_id": registro["usuario_id"],
+                "item_tipo": "ideia",
+                "item_id": registro["ideia_id"],
+                "evento": "criado" if registro["de_status"] is None else "movido",
+                "de_status": registro["de_status"],
+                "para_status": registro["para_status"],
+            }
+            for registro in registros
+        ],
+    )
+
+
+def _registrar_eventos_kanban(cur, eventos: List[dict]):
+    """Acrescenta eventos de ideias e cards ao log append-only kanban_events.
+
+    Roda na transacao do chamador, junto com a alteracao que gerou o evento.
+    """
+    eventos = [evento for evento in eventos if evento.get("kanban_id") is not None]
+    if not eventos:
+        return
+    execute_values(
+        cur,
+        """
+        INSERT INTO kanban_events (kanban_id, usuario_id, item_tipo, item_id, evento, de_status, para_status, dados)
+        VALUES %s
+        """,
+        [
+            (
+                evento["kanban_id"],
+                evento["usuario_id"],
+                KANBAN_EVENTO_ITEM_TIPOS[evento["item_tipo"]],
+                evento["item_id"],
+                KANBAN_EVENTO_TIPOS[evento["evento"]],
+                KANBAN_STATUS_CODIGOS.get(evento.get("de_status")),
+                KANBAN_STATUS_CODIGOS.get(evento.get("para_status")),
+                psycopg2.extras.Json(evento["dados"]) if evento.get("dados") is not None else None,
+            )
+            for evento in eventos
+        ],
+        template="(%s, %s, %s, %s, %s, %s, %s, %s::jsonb)",
+    )
+
+
+def _checklist_resumo(checklist: Optional[List[dict]]) -> dict:
+    itens = checklist or []
+    return {"total": len(itens), "concluidos": sum(1 for item in itens if item.get("concluido"))}
+
+
+def _card_update_events(card_atual: dict, usuario_id: int, status_final: str, checklist: List[dict]) -> List[dict]:
+    """Eventos de mudanca de coluna e de checklist de um card, comparando com o estado anterior."""
+    base = {"kanban_id": card_atual["kanban_id"], "usuario_id": usuario_id, "item_tipo": "card", "item_id": card_atual["id"]}
+    eventos = []
+    if status_final != card_atual["kanban_status"]:
+        eventos.append({**base, "evento": "movido", "de_status": card_atual["kanban_status"], "para_status": status_final})
+    if list(checklist or []) != list(card_atual.get("checklist") or []):
+        eventos.append({**base, "evento": "checklist", "para_status": status_final, "dados": _checklist_resumo(checklist)})
+    return eventos
+
+
+def _registrar_saida_kanban(cur, usuario_id: int, saidas: List[tuple]):
+    """Saidas de ideias que deixam o quadro sem movimentacao no historico.
+
+    Recebe tuplas (ideia_id, kanban_id, kanban_ativo, kanban_status) do estado anterior.
+    """
+    saidas = [
+        (ideia_id, kanban_id, _normalize_stored_kanban_status(status) or KANBAN_STATUS_ORDER[0])
+        for ideia_id, kanban_id, ativo, status in saidas
+        if ativo and kanban_id is not None
+    ]
+    kanban_analytics.registrar_saidas(cur, [(kanban_id, status) for _, kanban_id, status in saidas])
+    _registrar_eventos_kanban(
+        cur,
+        [
+            {
+                "kanban_id": kanban_id,
+                "usuario_id": usuario_id,
+                "item_tipo": "ideia",
+                "item_id": ideia_id,
+                "evento": "excluido",
+                "de_status": status,
+            }
+            for ideia_id, kanban_id, status in saidas
+        ],
+    )
+
+
+def _constraint_exists(cur, table_name: str, constraint_name: str) -> bool:
+    cur.execute(
+        """
+        SELECT 1
+        FROM information_schema.table_constraints
+        WHERE table_schema = 'public'
+          AND table_name = %s
+          AND constraint_name = %s
+        """,
+        (table_name, constraint_name),
+    )
+    return cur.fetchone() is not None
+
+
+def ensure_workspace_schema():
+    """Garante as tabelas de espaços/projetos e o vínculo de ideias a projetos."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT
+                    to_regclass('public.usuarios'),
+                    to_regclass('public.ideias')
+                """
+            )
+            usuarios_table, ideias_table = cur.fetchone()
+            if not usuarios_table or not ideias_table:
+                print("⚠️  Tabelas public.usuarios/public.ideias ausentes; workspace não foi inicializado.")
+                return
+
+            cur.execute(
+                """
                 CREATE TABLE IF NOT EXISTS espacos (
                     id BIGSERIAL PRIMARY KEY,
                     usuario_id BIGINT NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
@@ -561,66 +1225,10 @@ def ensure_workspace_schema():
                 )
                 """
             )
-            cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS kanbans (
-                    id BIGSERIAL PRIMARY KEY,
-                    projeto_id BIGINT NOT NULL REFERENCES projetos(id) ON DELETE CASCADE,
-                    usuario_id BIGINT NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
-                    nome VARCHAR(160) NOT NULL,
-                    descricao TEXT,
-                    cor VARCHAR(20),
-                    checklist JSONB NOT NULL DEFAULT '[]'::jsonb,
-                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
-                )
-                """
-            )
-            cur.execute(
-                """
-                ALTER TABLE kanbans
-                ADD COLUMN IF NOT EXISTS cor VARCHAR(20)
-                """
-            )
-            cur.execute(
-                """
-                ALTER TABLE kanbans
-                ADD COLUMN IF NOT EXISTS checklist JSONB NOT NULL DEFAULT '[]'::jsonb
-                """
-            )
-            cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS kanban_cards (
-                    id BIGSERIAL PRIMARY KEY,
-                    kanban_id BIGINT NOT NULL REFERENCES kanbans(id) ON DELETE CASCADE,
-                    projeto_id BIGINT NOT NULL REFERENCES projetos(id) ON DELETE CASCADE,
-                    usuario_id BIGINT NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
-                    titulo VARCHAR(200) NOT NULL,
-                    descricao TEXT,
-                    checklist JSONB NOT NULL DEFAULT '[]'::jsonb,
-                    prazo_entrega TIMESTAMPTZ,
-                    kanban_status VARCHAR(30) NOT NULL DEFAULT 'novo',
-                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
-                )
-                """
-            )
-            cur.execute(
-                """
-                ALTER TABLE kanban_cards
-                ADD COLUMN IF NOT EXISTS checklist JSONB NOT NULL DEFAULT '[]'::jsonb
-                """
-            )
-            cur.execute(
-                """
-                ALTER TABLE kanban_cards
-                ADD COLUMN IF NOT EXISTS prazo_entrega TIMESTAMPTZ
-                """
-            )
-            cur.execute(
-                """
-                CREATE UNIQUE INDEX IF NOT EXISTS idx_espacos_usuario_nome
-                ON espacos (usuario_id, lower(nome))
+            cur.execute(
+                """
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_espacos_usuario_nome
+                ON espacos (usuario_id, lower(nome))
                 """
             )
             cur.execute(
@@ -635,40 +1243,10 @@ def ensure_workspace_schema():
                 ON projetos (usuario_id, espaco_id)
                 """
             )
-            cur.execute(
-                """
-                CREATE UNIQUE INDEX IF NOT EXISTS idx_kanbans_projeto_nome
-                ON kanbans (projeto_id, lower(nome))
-                """
-            )
-            cur.execute(
-                """
-                CREATE INDEX IF NOT EXISTS idx_kanbans_usuario_projeto
-                ON kanbans (usuario_id, projeto_id)
-                """
-            )
-            cur.execute(
-                """
-                CREATE INDEX IF NOT EXISTS idx_kanban_cards_usuario_kanban
-                ON kanban_cards (usuario_id, kanban_id)
-                """
-            )
-            cur.execute(
-                """
-                CREATE INDEX IF NOT EXISTS idx_kanban_cards_usuario_projeto
-                ON kanban_cards (usuario_id, projeto_id)
-                """
-            )
-            cur.execute(
-                """
-                ALTER TABLE ideias
-                ADD COLUMN IF NOT EXISTS projeto_id BIGINT
-                """
-            )
             cur.execute(
                 """
                 ALTER TABLE ideias
-                ADD COLUMN IF NOT EXISTS kanban_id BIGINT
+                ADD COLUMN IF NOT EXISTS projeto_id BIGINT
                 """
             )
             if not _constraint_exists(cur, "ideias", "ideias_projeto_id_fkey"):
@@ -679,66 +1257,18 @@ def ensure_workspace_schema():
                     FOREIGN KEY (projeto_id) REFERENCES projetos(id) ON DELETE SET NULL
                     """
                 )
-            if not _constraint_exists(cur, "ideias", "ideias_kanban_id_fkey"):
-                cur.execute(
-                    """
-                    ALTER TABLE ideias
-                    ADD CONSTRAINT ideias_kanban_id_fkey
-                    FOREIGN KEY (kanban_id) REFERENCES kanbans(id) ON DELETE SET NULL
-                    """
-                )
             cur.execute(
                 """
                 CREATE INDEX IF NOT EXISTS idx_ideias_usuario_projeto
                 ON ideias (usuario_id, projeto_id)
                 """
             )
-            cur.execute(
-                """
-                CREATE INDEX IF NOT EXISTS idx_ideias_usuario_kanban
-                ON ideias (usuario_id, kanban_id)
-                """
-            )
-            cur.execute(
-                """
-                INSERT INTO kanbans (projeto_id, usuario_id, nome, descricao)
-                SELECT
-                    p.id,
-                    p.usuario_id,
-                    %s,
-                    'Quadro inicial criado automaticamente'
-                FROM projetos p
-                WHERE NOT EXISTS (
-                    SELECT 1
-                    FROM kanbans k
-                    WHERE k.projeto_id = p.id
-                )
-                """,
-                (DEFAULT_KANBAN_NAME,),
-            )
-            cur.execute(
-                """
-                WITH primeiro_kanban AS (
-                    SELECT DISTINCT ON (k.projeto_id)
-                        k.projeto_id,
-                        k.id
-                    FROM kanbans k
-                    ORDER BY k.projeto_id, lower(k.nome), k.id
-                )
-                UPDATE ideias i
-                SET kanban_id = pk.id
-                FROM primeiro_kanban pk
-                WHERE i.projeto_id = pk.projeto_id
-                  AND i.kanban_ativo IS TRUE
-                  AND i.kanban_id IS NULL
-                """
-            )
             conn.commit()
-            print("Estrutura de espacos, projetos e kanbans verificada.")
+            print("✅ Estrutura de espaços e projetos verificada.")
     except Exception as e:
         if conn:
             conn.rollback()
-        print(f"Nao foi possivel preparar espacos, projetos e kanbans: {e}")
+        print(f"⚠️  Não foi possível preparar espaços e projetos: {e}")
     finally:
         if conn:
             conn.close()
@@ -752,11 +1282,10 @@ IDEIA_SELECT_FIELDS = """
     i.data,
     i.created_at,
     i.updated_at,
-    i.kanban_id,
-    k.nome AS kanban_nome,
     i.kanban_ativo,
     i.kanban_status,
     i.kanban_updated_at,
+    i.kanban_posicao,
     i.agenda_data,
     i.agenda_observacao,
     i.projeto_id,
@@ -766,125 +1295,7 @@ IDEIA_SELECT_FIELDS = """
 """
 
 
-def _serialize_kanban_record(record: dict) -> dict:
-    serialized = _serialize_datetime_fields(dict(record), ["created_at", "updated_at"])
-    serialized["cards_count"] = int(record.get("cards_count") or 0)
-    serialized["cor"] = record.get("cor") or None
-    serialized["checklist"] = record.get("checklist") or []
-    return serialized
-
-
-def _serialize_kanban_card_record(record: dict) -> dict:
-    serialized = _serialize_datetime_fields(dict(record), ["created_at", "updated_at", "prazo_entrega"])
-    serialized["checklist"] = record.get("checklist") or []
-    return serialized
-
-
-def _fetch_workspace_projects(cur, usuario_id: int, espaco_id: Optional[int] = None) -> List[dict]:
-    filters = ["p.usuario_id = %s"]
-    params: List[object] = [usuario_id, usuario_id, usuario_id]
-
-    if espaco_id is not None:
-        filters.append("p.espaco_id = %s")
-        params.append(espaco_id)
-
-    cur.execute(
-        f"""
-        WITH ideias_stats AS (
-            SELECT
-                projeto_id,
-                COUNT(*) AS ideias_count,
-                COUNT(CASE WHEN kanban_ativo IS TRUE THEN 1 END) AS ideias_no_kanban
-            FROM ideias
-            WHERE usuario_id = %s
-            GROUP BY projeto_id
-        ),
-        cards_stats AS (
-            SELECT
-                projeto_id,
-                COUNT(*) AS cards_count
-            FROM kanban_cards
-            WHERE usuario_id = %s
-            GROUP BY projeto_id
-        )
-        SELECT
-            p.id,
-            p.espaco_id,
-            p.nome,
-            p.descricao,
-            p.created_at,
-            p.updated_at,
-            COALESCE(ideias_stats.ideias_count, 0) AS ideias_count,
-            COALESCE(ideias_stats.ideias_no_kanban, 0) + COALESCE(cards_stats.cards_count, 0) AS kanban_count
-        FROM projetos p
-        LEFT JOIN ideias_stats
-            ON ideias_stats.projeto_id = p.id
-        LEFT JOIN cards_stats
-            ON cards_stats.projeto_id = p.id
-        WHERE {' AND '.join(filters)}
-        ORDER BY lower(p.nome), p.id
-        """,
-        tuple(params),
-    )
-    return cur.fetchall()
-
-
-def _fetch_project_kanbans(cur, usuario_id: int) -> dict:
-    cur.execute(
-        """
-        WITH ideias_stats AS (
-            SELECT
-                kanban_id,
-                COUNT(*) AS cards_count
-            FROM ideias
-            WHERE usuario_id = %s
-              AND kanban_ativo IS TRUE
-            GROUP BY kanban_id
-        ),
-        cards_stats AS (
-            SELECT
-                kanban_id,
-                COUNT(*) AS cards_count
-            FROM kanban_cards
-            WHERE usuario_id = %s
-            GROUP BY kanban_id
-        )
-        SELECT
-            k.id,
-            k.projeto_id,
-            k.nome,
-            k.descricao,
-            k.cor,
-            k.checklist,
-            k.created_at,
-            k.updated_at,
-            COALESCE(ideias_stats.cards_count, 0) + COALESCE(cards_stats.cards_count, 0) AS cards_count
-        FROM kanbans k
-        LEFT JOIN ideias_stats
-            ON ideias_stats.kanban_id = k.id
-        LEFT JOIN cards_stats
-            ON cards_stats.kanban_id = k.id
-        WHERE k.usuario_id = %s
-        ORDER BY lower(k.nome), k.id
-        """,
-        (usuario_id, usuario_id, usuario_id),
-    )
-    kanbans_by_project = {}
-    for row in cur.fetchall():
-        kanbans_by_project.setdefault(row["projeto_id"], []).append(_serialize_kanban_record(row))
-    return kanbans_by_project
-
-
-def _build_project_workspace_response(projeto: dict, kanbans_by_project: dict) -> dict:
-    return {
-        **_serialize_datetime_fields(dict(projeto), ["created_at", "updated_at"]),
-        "ideias_count": int(projeto.get("ideias_count") or 0),
-        "kanban_count": int(projeto.get("kanban_count") or 0),
-        "kanbans": kanbans_by_project.get(projeto["id"], []),
-    }
-
-
-def _fetch_workspace_tree(cur, usuario_id: int) -> List[dict]:
+def _fetch_workspace_tree(cur, usuario_id: int) -> List[dict]:
     cur.execute(
         """
         SELECT
@@ -907,16 +1318,41 @@ def _fetch_workspace_tree(cur, usuario_id: int) -> List[dict]:
         }
         for row in cur.fetchall()
     }
-
-    kanbans_by_project = _fetch_project_kanbans(cur, usuario_id)
-
-    for projeto in _fetch_workspace_projects(cur, usuario_id):
-        espaco = espacos.get(projeto["espaco_id"])
-        if not espaco:
-            continue
-        espaco["projetos"].append(_build_project_workspace_response(projeto, kanbans_by_project))
-
-    return list(espacos.values())
+
+    cur.execute(
+        """
+        SELECT
+            p.id,
+            p.espaco_id,
+            p.nome,
+            p.descricao,
+            p.created_at,
+            p.updated_at,
+            COUNT(i.id) AS ideias_count,
+            COUNT(CASE WHEN i.kanban_ativo IS TRUE THEN 1 END) AS kanban_count
+        FROM projetos p
+        LEFT JOIN ideias i
+            ON i.projeto_id = p.id
+           AND i.usuario_id = p.usuario_id
+        WHERE p.usuario_id = %s
+        GROUP BY p.id, p.espaco_id, p.nome, p.descricao, p.created_at, p.updated_at
+        ORDER BY lower(p.nome), p.id
+        """,
+        (usuario_id,),
+    )
+    for projeto in cur.fetchall():
+        espaco = espacos.get(projeto["espaco_id"])
+        if not espaco:
+            continue
+        espaco["projetos"].append(
+            {
+                **_serialize_datetime_fields(dict(projeto), ["created_at", "updated_at"]),
+                "ideias_count": int(projeto.get("ideias_count") or 0),
+                "kanban_count": int(projeto.get("kanban_count") or 0),
+            }
+        )
+
+    return list(espacos.values())
 
 
 def _fetch_idea_record(cur, ideia_id: int, usuario_id: int) -> Optional[dict]:
@@ -925,9 +1361,6 @@ def _fetch_idea_record(cur, ideia_id: int, usuario_id: int) -> Optional[dict]:
         SELECT
             {IDEIA_SELECT_FIELDS}
         FROM ideias i
-        LEFT JOIN kanbans k
-            ON k.id = i.kanban_id
-           AND k.usuario_id = i.usuario_id
         LEFT JOIN projetos p
             ON p.id = i.projeto_id
            AND p.usuario_id = i.usuario_id
@@ -946,15 +1379,12 @@ def _fetch_idea_record(cur, ideia_id: int, usuario_id: int) -> Optional[dict]:
     )
 
 
-def _fetch_ideas_for_user(cur, usuario_id: int) -> List[dict]:
+def _fetch_ideas_for_user(cur, usuario_id: int) -> List[dict]:
     cur.execute(
         f"""
         SELECT
             {IDEIA_SELECT_FIELDS}
         FROM ideias i
-        LEFT JOIN kanbans k
-            ON k.id = i.kanban_id
-           AND k.usuario_id = i.usuario_id
         LEFT JOIN projetos p
             ON p.id = i.projeto_id
            AND p.usuario_id = i.usuario_id
@@ -965,234 +1395,956 @@ def _fetch_ideas_for_user(cur, usuario_id: int) -> List[dict]:
         """,
         (usuario_id,),
     )
-    return [
-        _serialize_datetime_fields(
-            dict(ideia),
-            ["data", "created_at", "updated_at", "kanban_updated_at", "agenda_data"],
-        )
-        for ideia in cur.fetchall()
-    ]
+    return [
+        _serialize_datetime_fields(
+            dict(ideia),
+            ["data", "created_at", "updated_at", "kanban_updated_at", "agenda_data"],
+        )
+        for ideia in cur.fetchall()
+    ]
+
+
+def _validate_project_access(cur, projeto_id: Optional[int], usuario_id: int) -> Optional[int]:
+    if projeto_id in (None, ""):
+        return None
+
+    try:
+        projeto_id = int(projeto_id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Projeto inválido")
+
+    cur.execute(
+        """
+        SELECT p.id
+        FROM projetos p
+        WHERE p.id = %s AND p.usuario_id = %s
+        """,
+        (projeto_id, usuario_id),
+    )
+    if not cur.fetchone():
+        raise HTTPException(status_code=404, detail="Projeto não encontrado para este usuário")
+    return projeto_id
+
+
+def _normalize_workspace_name(value: str, entity_label: str) -> str:
+    normalized = (value or "").strip()
+    if not normalized:
+        raise HTTPException(status_code=400, detail=f"Nome de {entity_label} é obrigatório")
+    if len(normalized) > 160:
+        raise HTTPException(status_code=400, detail=f"Nome de {entity_label} deve ter no máximo 160 caracteres")
+    return normalized
 
 
-def _fetch_kanban_card_record(cur, card_id: int, usuario_id: int) -> Optional[dict]:
-    cur.execute(
-        """
-        SELECT
-            kc.id,
-            kc.kanban_id,
-            kc.projeto_id,
-            kc.titulo,
-            kc.descricao,
-            kc.checklist,
-            kc.prazo_entrega,
-            kc.kanban_status,
-            kc.created_at,
-            kc.updated_at
-        FROM kanban_cards kc
-        WHERE kc.id = %s AND kc.usuario_id = %s
-        """,
-        (card_id, usuario_id),
-    )
-    card = cur.fetchone()
-    return _serialize_kanban_card_record(card) if card else None
+def _normalize_optional_text(value: Optional[str], max_length: int = 4000) -> Optional[str]:
+    if value is None:
+        return None
 
+    normalized = value.strip()
+    if not normalized:
+        return None
+    if len(normalized) > max_length:
+        raise HTTPException(status_code=400, detail=f"Texto deve ter no máximo {max_length} caracteres")
+    return normalized
 
-def _fetch_kanban_cards_for_kanban(cur, kanban_id: int, usuario_id: int) -> List[dict]:
-    cur.execute(
-        """
-        SELECT
-            kc.id,
-            kc.kanban_id,
-            kc.projeto_id,
-            kc.titulo,
-            kc.descricao,
-            kc.checklist,
-            kc.prazo_entrega,
-            kc.kanban_status,
-            kc.created_at,
-            kc.updated_at
-        FROM kanban_cards kc
-        WHERE kc.kanban_id = %s
-          AND kc.usuario_id = %s
-        ORDER BY kc.updated_at DESC, kc.id DESC
-        """,
-        (kanban_id, usuario_id),
-    )
-    return [_serialize_kanban_card_record(card) for card in cur.fetchall()]
-
-
-def _validate_kanban_access(cur, kanban_id: Optional[int], usuario_id: int, projeto_id: Optional[int] = None) -> Optional[dict]:
-    if kanban_id in (None, ""):
-        return None
-
-    try:
-        kanban_id = int(kanban_id)
-    except (TypeError, ValueError):
-        raise HTTPException(status_code=400, detail="Kanban invalido")
-
-    cur.execute(
-        """
-        SELECT k.id, k.projeto_id, k.nome
-        FROM kanbans k
-        WHERE k.id = %s AND k.usuario_id = %s
-        """,
-        (kanban_id, usuario_id),
-    )
-    kanban = cur.fetchone()
-    if not kanban:
-        raise HTTPException(status_code=404, detail="Kanban nao encontrado para este usuario")
-
-    if projeto_id is not None and kanban["projeto_id"] != projeto_id:
-        raise HTTPException(status_code=400, detail="Kanban nao pertence ao projeto informado")
-
-    return dict(kanban)
-
-
-app = FastAPI(title="Sacola de Ideias API")
-
-# Evento de startup para verificar endpoints registrados e testar conexão
-@app.on_event("startup")
-async def startup_event():
-    print("=" * 80)
-    ensure_workspace_schema()
-    ensure_ideias_kanban_columns()
-    print("=" * 80)
-    # Diagnóstico rápido do Stripe (não expõe segredos)
-    try:
-        from stripe import _version as _stripe_version
-        print(f"💳 Stripe SDK: {_stripe_version.VERSION}")
-        print(f"   stripe module: {getattr(stripe, '__file__', 'n/a')}")
-        print(f"   checkout module: {getattr(stripe_checkout, '__file__', 'n/a')}")
-        print(f"   has stripe.apps.Secret: {hasattr(getattr(stripe, 'apps', None), 'Secret')}")
-    except Exception as e:
-        print(f"⚠️  Falha ao inspecionar Stripe SDK: {e}")
-    print("📋 TODOS OS ENDPOINTS REGISTRADOS:")
-    total_routes = 0
-    lembrancas_routes = []
-    for route in app.routes:
-        if hasattr(route, 'path'):
-            total_routes += 1
-            methods = getattr(route, 'methods', set())
-            if 'lembrancas' in route.path:
-                lembrancas_routes.append(f"{list(methods)} {route.path}")
-                print(f"   ✅ {list(methods)} {route.path}")
-    print(f"📊 Total de rotas: {total_routes}")
-    if lembrancas_routes:
-        print("✅ Endpoints de lembranças encontrados!")
-    else:
-        print("❌ NENHUM endpoint de lembranças encontrado!")
-    print("=" * 80)
-    
-    # Testar conexão com o banco
-    print("=" * 80)
-    print("🔌 TESTANDO CONEXÃO COM O BANCO DE DADOS:")
-    safe_db_config = sanitize_db_config(DB_CONFIG)
-    print(f"   Source: {DB_CONFIG_SOURCE}")
-    print(f"   Host: {safe_db_config['host']}")
-    print(f"   Port: {safe_db_config['port']}")
-    print(f"   Database: {safe_db_config['database']}")
-    print(f"   User: {safe_db_config['user']}")
-    print(f"   Password: {safe_db_config['password']}")
-    print("=" * 80)
-    
+
+def _normalize_hex_color(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+
+    normalized = value.strip().upper()
+    if not normalized:
+        return None
+
+    if not re.fullmatch(r"#[0-9A-F]{6}", normalized):
+        raise HTTPException(status_code=400, detail="Cor inválida. Use o formato hexadecimal, por exemplo: #6366F1")
+    return normalized
+
+
+def _normalize_kanban_checklist(items: Optional[List["KanbanChecklistItem"]]) -> List[dict]:
+    if not items:
+        return []
+
+    normalized_items = []
+    for item in items:
+        titulo = _normalize_optional_text(item.titulo, 200)
+        if not titulo:
+            raise HTTPException(status_code=400, detail="Cada item do checklist precisa ter um título")
+
+        normalized_items.append(
+            {
+                "id": (item.id or f"check-{uuid4().hex[:12]}").strip(),
+                "titulo": titulo,
+                "concluido": bool(item.concluido),
+            }
+        )
+
+    return normalized_items
+
+def ensure_workspace_schema():
+    """Garante as tabelas de espacos, projetos, kanbans e os vinculos das ideias."""
+    conn = None
     try:
         conn = get_db_connection()
         with conn.cursor() as cur:
-            cur.execute("SELECT version();")
-            version = cur.fetchone()[0]
             cur.execute(
                 """
                 SELECT
-                    current_database(),
-                    current_schema(),
                     to_regclass('public.usuarios'),
-                    to_regclass('public.assinaturas')
+                    to_regclass('public.ideias')
                 """
             )
-            current_database, current_schema, usuarios_table, assinaturas_table = cur.fetchone()
-            print(f"✅ Conexão com o banco estabelecida com sucesso!")
-            print(f"   PostgreSQL version: {version[:50]}...")
-            print(f"   current_database(): {current_database}")
-            print(f"   current_schema(): {current_schema}")
-            print(f"   public.usuarios: {usuarios_table or 'AUSENTE'}")
-            print(f"   public.assinaturas: {assinaturas_table or 'AUSENTE'}")
-            if not usuarios_table or not assinaturas_table:
-                print("⚠️  O backend conectou, mas o schema esperado não está nesse banco/schema.")
-        conn.close()
-    except Exception as e:
-        print(f"❌ ERRO ao conectar com o banco: {e}")
-        print(f"   Verifique as credenciais no arquivo .env")
-    print("=" * 80)
-    print(f"🌐 CORS_ORIGINS: {CORS_ORIGINS}")
-    print("=" * 80)
-
-# Configurar CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=CORS_ORIGINS,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Configuração do banco de dados (Supabase Postgres ou PostgreSQL direto)
-# Aceita DATABASE_URL/SUPABASE_DB_URL para evitar divergência entre ambientes.
-DB_CONFIG, DB_CONFIG_SOURCE = build_db_config(default_database="postgres")
-
-
-def _extract_missing_relation_name(error: Exception) -> Optional[str]:
-    match = re.search(r'relation "([^"]+)" does not exist', str(error), re.IGNORECASE)
-    return match.group(1) if match else None
-
-
-def _missing_relation_detail(table_name: Optional[str] = None) -> str:
-    alvo = f'Tabela "{table_name}"' if table_name else "Uma tabela obrigatória"
-    return (
-        f"{alvo} não existe no banco configurado. "
-        "Verifique DATABASE_URL/SUPABASE_DB_URL ou DB_HOST/DB_NAME/DB_USER/DB_PASSWORD "
-        "no backend; a API provavelmente está conectada em outro banco ou schema."
-    )
-
-def get_db_connection():
-    """Criar conexão com o banco de dados"""
-    try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        return conn
-    except psycopg2.OperationalError as e:
-        safe_db_config = sanitize_db_config(DB_CONFIG)
-        print(f"❌ Erro de conexão com o banco: {e}")
-        print(f"   Source: {DB_CONFIG_SOURCE}")
-        print(f"   Host: {safe_db_config.get('host', 'N/A')}")
-        print(f"   Port: {safe_db_config.get('port', 'N/A')}")
-        print(f"   Database: {safe_db_config.get('database', 'N/A')}")
-        print(f"   User: {safe_db_config.get('user', 'N/A')}")
-        print(f"   Password configurada: {'Sim' if DB_CONFIG.get('password') else 'NÃO'}")
-        print(f"   SSL Mode: {safe_db_config.get('sslmode', 'não especificado')}")
-        raise HTTPException(
-            status_code=503, 
-            detail=f"Erro ao conectar ao banco de dados. Verifique as credenciais no .env. Detalhes: {str(e)}"
-        )
-    except Exception as e:
-        print(f"❌ Erro inesperado ao conectar: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(
-            status_code=500,
-            detail=f"Erro inesperado ao conectar ao banco: {str(e)}"
-        )
-
-# Modelos Pydantic
-class IdeiaBase(BaseModel):
-    titulo: str
-    tag: Optional[str] = None
-    ideia: str
-    projeto_id: Optional[int] = None
-
-class IdeiaCreate(IdeiaBase):
-    pass
+            usuarios_table, ideias_table = cur.fetchone()
+            if not usuarios_table or not ideias_table:
+                print("Tabelas public.usuarios/public.ideias ausentes; workspace nao foi inicializado.")
+                return
 
-class IdeiaUpdate(IdeiaBase):
-    pass
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS espacos (
+                    id BIGSERIAL PRIMARY KEY,
+                    usuario_id BIGINT NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+                    nome VARCHAR(160) NOT NULL,
+                    descricao TEXT,
+                    cor VARCHAR(20),
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS projetos (
+                    id BIGSERIAL PRIMARY KEY,
+                    espaco_id BIGINT NOT NULL REFERENCES espacos(id) ON DELETE CASCADE,
+                    usuario_id BIGINT NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+                    nome VARCHAR(160) NOT NULL,
+                    descricao TEXT,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS kanbans (
+                    id BIGSERIAL PRIMARY KEY,
+                    projeto_id BIGINT NOT NULL REFERENCES projetos(id) ON DELETE CASCADE,
+                    usuario_id BIGINT NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+                    nome VARCHAR(160) NOT NULL,
+                    descricao TEXT,
+                    cor VARCHAR(20),
+                    checklist JSONB NOT NULL DEFAULT '[]'::jsonb,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+            cur.execute(
+                """
+                ALTER TABLE kanbans
+                ADD COLUMN IF NOT EXISTS cor VARCHAR(20)
+                """
+            )
+            cur.execute(
+                """
+                ALTER TABLE kanbans
+                ADD COLUMN IF NOT EXISTS checklist JSONB NOT NULL DEFAULT '[]'::jsonb
+                """
+            )
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS kanban_cards (
+                    id BIGSERIAL PRIMARY KEY,
+                    kanban_id BIGINT NOT NULL REFERENCES kanbans(id) ON DELETE CASCADE,
+                    projeto_id BIGINT NOT NULL REFERENCES projetos(id) ON DELETE CASCADE,
+                    usuario_id BIGINT NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+                    titulo VARCHAR(200) NOT NULL,
+                    descricao TEXT,
+                    checklist JSONB NOT NULL DEFAULT '[]'::jsonb,
+                    prazo_entrega TIMESTAMPTZ,
+                    kanban_status VARCHAR(30) NOT NULL DEFAULT 'novo',
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+            cur.execute(
+                """
+                ALTER TABLE kanban_cards
+                ADD COLUMN IF NOT EXISTS checklist JSONB NOT NULL DEFAULT '[]'::jsonb
+                """
+            )
+            cur.execute(
+                """
+                ALTER TABLE kanban_cards
+                ADD COLUMN IF NOT EXISTS kanban_posicao TEXT COLLATE "C"
+                """
+            )
+            cur.execute(
+                """
+                ALTER TABLE kanban_cards
+                ADD COLUMN IF NOT EXISTS prazo_entrega TIMESTAMPTZ
+                """
+            )
+            cur.execute(
+                """
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_espacos_usuario_nome
+                ON espacos (usuario_id, lower(nome))
+                """
+            )
+            cur.execute(
+                """
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_projetos_espaco_nome
+                ON projetos (espaco_id, lower(nome))
+                """
+            )
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_projetos_usuario_espaco
+                ON projetos (usuario_id, espaco_id)
+                """
+            )
+            cur.execute(
+                """
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_kanbans_projeto_nome
+                ON kanbans (projeto_id, lower(nome))
+                """
+            )
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_kanbans_usuario_projeto
+                ON kanbans (usuario_id, projeto_id)
+                """
+            )
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_kanban_cards_usuario_kanban
+                ON kanban_cards (usuario_id, kanban_id)
+                """
+            )
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_kanban_cards_usuario_projeto
+                ON kanban_cards (usuario_id, projeto_id)
+                """
+            )
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS kanban_events (
+                    id BIGSERIAL PRIMARY KEY,
+                    kanban_id BIGINT NOT NULL,
+                    usuario_id BIGINT NOT NULL,
+                    item_tipo SMALLINT NOT NULL,
+                    item_id BIGINT NOT NULL,
+                    evento SMALLINT NOT NULL,
+                    de_status SMALLINT,
+                    para_status SMALLINT,
+                    dados JSONB,
+                    ocorrido_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_kanban_events_kanban_tempo
+                ON kanban_events (kanban_id, ocorrido_em, id)
+                """
+            )
+            cur.execute("DROP INDEX IF EXISTS idx_kanban_cards_board")
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_kanban_cards_posicao
+                ON kanban_cards (kanban_id, kanban_status, (COALESCE(kanban_posicao, '~')), id)
+                """
+            )
+            cur.execute(
+                """
+                ALTER TABLE ideias
+                ADD COLUMN IF NOT EXISTS projeto_id BIGINT
+                """
+            )
+            cur.execute(
+                """
+                ALTER TABLE ideias
+                ADD COLUMN IF NOT EXISTS kanban_id BIGINT
+                """
+            )
+            if not _constraint_exists(cur, "ideias", "ideias_projeto_id_fkey"):
+                cur.execute(
+                    """
+                    ALTER TABLE ideias
+                    ADD CONSTRAINT ideias_projeto_id_fkey
+                    FOREIGN KEY (projeto_id) REFERENCES projetos(id) ON DELETE SET NULL
+                    """
+                )
+            if not _constraint_exists(cur, "ideias", "ideias_kanban_id_fkey"):
+                cur.execute(
+                    """
+                    ALTER TABLE ideias
+                    ADD CONSTRAINT ideias_kanban_id_fkey
+                    FOREIGN KEY (kanban_id) REFERENCES kanbans(id) ON DELETE SET NULL
+                    """
+                )
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_ideias_usuario_projeto
+                ON ideias (usuario_id, projeto_id)
+                """
+            )
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_ideias_usuario_kanban
+                ON ideias (usuario_id, kanban_id)
+                """
+            )
+            # Indices dos filtros da busca semantica (espaco usa idx_projetos_usuario_espaco)
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_ideias_usuario_kanban_status
+                ON ideias (usuario_id, kanban_status)
+                WHERE kanban_ativo IS TRUE
+                """
+            )
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_ideias_usuario_tag
+                ON ideias (usuario_id, LOWER(tag))
+                """
+            )
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_ideias_usuario_data
+                ON ideias (usuario_id, data)
+                """
+            )
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_ideias_usuario_agenda
+                ON ideias (usuario_id, agenda_data)
+                WHERE agenda_data IS NOT NULL
+                """
+            )
+            cur.execute(
+                """
+                INSERT INTO kanbans (projeto_id, usuario_id, nome, descricao)
+                SELECT
+                    p.id,
+                    p.usuario_id,
+                    %s,
+                    'Quadro inicial criado automaticamente'
+                FROM projetos p
+                WHERE NOT EXISTS (
+                    SELECT 1
+                    FROM kanbans k
+                    WHERE k.projeto_id = p.id
+                )
+                """,
+                (DEFAULT_KANBAN_NAME,),
+            )
+            cur.execute(
+                """
+                WITH primeiro_kanban AS (
+                    SELECT DISTINCT ON (k.projeto_id)
+                        k.projeto_id,
+                        k.id
+                    FROM kanbans k
+                    ORDER BY k.projeto_id, lower(k.nome), k.id
+                )
+                UPDATE ideias i
+                SET kanban_id = pk.id
+                FROM primeiro_kanban pk
+                WHERE i.projeto_id = pk.projeto_id
+                  AND i.kanban_ativo IS TRUE
+                  AND i.kanban_id IS NULL
+                """
+            )
+            conn.commit()
+            print("Estrutura de espacos, projetos e kanbans verificada.")
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Nao foi possivel preparar espacos, projetos e kanbans: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+
+IDEIA_SELECT_FIELDS = """
+    i.id,
+    i.titulo,
+    i.tag,
+    i.ideia,
+    i.data,
+    i.created_at,
+    i.updated_at,
+    i.kanban_id,
+    k.nome AS kanban_nome,
+    i.kanban_ativo,
+    i.kanban_status,
+    i.kanban_updated_at,
+    i.kanban_posicao,
+    i.agenda_data,
+    i.agenda_observacao,
+    i.projeto_id,
+    p.nome AS projeto_nome,
+    e.id AS espaco_id,
+    e.nome AS espaco_nome
+"""
+
+
+def _serialize_kanban_record(record: dict) -> dict:
+    serialized = _serialize_datetime_fields(dict(record), ["created_at", "updated_at"])
+    serialized["cards_count"] = int(record.get("cards_count") or 0)
+    serialized["cor"] = record.get("cor") or None
+    serialized["checklist"] = record.get("checklist") or []
+    return serialized
+
+
+def _serialize_kanban_card_record(record: dict) -> dict:
+    serialized = _serialize_datetime_fields(dict(record), ["created_at", "updated_at", "prazo_entrega"])
+    serialized["checklist"] = record.get("checklist") or []
+    return serialized
+
+
+def _fetch_workspace_projects(cur, usuario_id: int, espaco_id: Optional[int] = None) -> List[dict]:
+    filters = ["p.usuario_id = %s"]
+    params: List[object] = [usuario_id, usuario_id, usuario_id]
+
+    if espaco_id is not None:
+        filters.append("p.espaco_id = %s")
+        params.append(espaco_id)
+
+    cur.execute(
+        f"""
+        WITH ideias_stats AS (
+            SELECT
+                projeto_id,
+                COUNT(*) AS ideias_count,
+                COUNT(CASE WHEN kanban_ativo IS TRUE THEN 1 END) AS ideias_no_kanban
+            FROM ideias
+            WHERE usuario_id = %s
+            GROUP BY projeto_id
+        ),
+        cards_stats AS (
+            SELECT
+                projeto_id,
+                COUNT(*) AS cards_count
+            FROM kanban_cards
+            WHERE usuario_id = %s
+            GROUP BY projeto_id
+        )
+        SELECT
+            p.id,
+            p.espaco_id,
+            p.nome,
+            p.descricao,
+            p.created_at,
+            p.updated_at,
+            COALESCE(ideias_stats.ideias_count, 0) AS ideias_count,
+            COALESCE(ideias_stats.ideias_no_kanban, 0) + COALESCE(cards_stats.cards_count, 0) AS kanban_count
+        FROM projetos p
+        LEFT JOIN ideias_stats
+            ON ideias_stats.projeto_id = p.id
+        LEFT JOIN cards_stats
+            ON cards_stats.projeto_id = p.id
+        WHERE {' AND '.join(filters)}
+        ORDER BY lower(p.nome), p.id
+        """,
+        tuple(params),
+    )
+    return cur.fetchall()
+
+
+def _fetch_project_kanbans(cur, usuario_id: int) -> dict:
+    cur.execute(
+        """
+        WITH ideias_stats AS (
+            SELECT
+                kanban_id,
+                COUNT(*) AS cards_count
+            FROM ideias
+            WHERE usuario_id = %s
+              AND kanban_ativo IS TRUE
+            GROUP BY kanban_id
+        ),
+        cards_stats AS (
+            SELECT
+                kanban_id,
+                COUNT(*) AS cards_count
+            FROM kanban_cards
+            WHERE usuario_id = %s
+            GROUP BY kanban_id
+        )
+        SELECT
+            k.id,
+            k.projeto_id,
+            k.nome,
+            k.descricao,
+            k.cor,
+            k.checklist,
+            k.created_at,
+            k.updated_at,
+            COALESCE(ideias_stats.cards_count, 0) + COALESCE(cards_stats.cards_count, 0) AS cards_count
+        FROM kanbans k
+        LEFT JOIN ideias_stats
+            ON ideias_stats.kanban_id = k.id
+        LEFT JOIN cards_stats
+            ON cards_stats.kanban_id = k.id
+        WHERE k.usuario_id = %s
+        ORDER BY lower(k.nome), k.id
+        """,
+        (usuario_id, usuario_id, usuario_id),
+    )
+    kanbans_by_project = {}
+    for row in cur.fetchall():
+        kanbans_by_project.setdefault(row["projeto_id"], []).append(_serialize_kanban_record(row))
+    return kanbans_by_project
+
+
+def _build_project_workspace_response(projeto: dict, kanbans_by_project: dict) -> dict:
+    return {
+        **_serialize_datetime_fields(dict(projeto), ["created_at", "updated_at"]),
+        "ideias_count": int(projeto.get("ideias_count") or 0),
+        "kanban_count": int(projeto.get("kanban_count") or 0),
+        "kanbans": kanbans_by_project.get(projeto["id"], []),
+    }
+
+
+def _fetch_workspace_tree(cur, usuario_id: int) -> List[dict]:
+    cur.execute(
+        """
+        SELECT
+            e.id,
+            e.nome,
+            e.descricao,
+            e.cor,
+            e.created_at,
+            e.updated_at
+        FROM espacos e
+        WHERE e.usuario_id = %s
+        ORDER BY lower(e.nome), e.id
+        """,
+        (usuario_id,),
+    )
+    espacos = {
+        row["id"]: {
+            **_serialize_datetime_fields(dict(row), ["created_at", "updated_at"]),
+            "projetos": [],
+        }
+        for row in cur.fetchall()
+    }
+
+    kanbans_by_project = _fetch_project_kanbans(cur, usuario_id)
+
+    for projeto in _fetch_workspace_projects(cur, usuario_id):
+        espaco = espacos.get(projeto["espaco_id"])
+        if not espaco:
+            continue
+        espaco["projetos"].append(_build_project_workspace_response(projeto, kanbans_by_project))
+
+    return list(espacos.values())
+
+
+def _fetch_idea_record(cur, ideia_id: int, usuario_id: int) -> Optional[dict]:
+    cur.execute(
+        f"""
+        SELECT
+            {IDEIA_SELECT_FIELDS}
+        FROM ideias i
+        LEFT JOIN kanbans k
+            ON k.id = i.kanban_id
+           AND k.usuario_id = i.usuario_id
+        LEFT JOIN projetos p
+            ON p.id = i.projeto_id
+           AND p.usuario_id = i.usuario_id
+        LEFT JOIN espacos e
+            ON e.id = p.espaco_id
+        WHERE i.id = %s AND i.usuario_id = %s
+        """,
+        (ideia_id, usuario_id),
+    )
+    ideia = cur.fetchone()
+    if not ideia:
+        return None
+    return _serialize_datetime_fields(
+        dict(ideia),
+        ["data", "created_at", "updated_at", "kanban_updated_at", "agenda_data"],
+    )
+
+
+def _fetch_ideas_for_user(cur, usuario_id: int) -> List[dict]:
+    cur.execute(
+        f"""
+        SELECT
+            {IDEIA_SELECT_FIELDS}
+        FROM ideias i
+        LEFT JOIN kanbans k
+            ON k.id = i.kanban_id
+           AND k.usuario_id = i.usuario_id
+        LEFT JOIN projetos p
+            ON p.id = i.projeto_id
+           AND p.usuario_id = i.usuario_id
+        LEFT JOIN espacos e
+            ON e.id = p.espaco_id
+        WHERE i.usuario_id = %s
+        ORDER BY i.kanban_updated_at DESC NULLS LAST, i.data DESC
+        """,
+        (usuario_id,),
+    )
+    return [
+        _serialize_datetime_fields(
+            dict(ideia),
+            ["data", "created_at", "updated_at", "kanban_updated_at", "agenda_data"],
+        )
+        for ideia in cur.fetchall()
+    ]
+
+
+def _fetch_kanban_card_record(cur, card_id: int, usuario_id: int) -> Optional[dict]:
+    cur.execute(
+        """
+        SELECT
+            kc.id,
+            kc.kanban_id,
+            kc.projeto_id,
+            kc.titulo,
+            kc.descricao,
+            kc.checklist,
+            kc.prazo_entrega,
+            kc.kanban_status,
+            kc.kanban_posicao,
+            kc.created_at,
+            kc.updated_at
+        FROM kanban_cards kc
+        WHERE kc.id = %s AND kc.usuario_id = %s
+        """,
+        (card_id, usuario_id),
+    )
+    card = cur.fetchone()
+    return _serialize_kanban_card_record(card) if card else None
+
+
+def _fetch_ideas_by_ids(cur, ideia_ids: List[int], usuario_id: int) -> List[dict]:
+    if not ideia_ids:
+        return []
+    cur.execute(
+        f"""
+        SELECT
+            {IDEIA_SELECT_FIELDS}
+        FROM ideias i
+        LEFT JOIN kanbans k
+            ON k.id = i.kanban_id
+           AND k.usuario_id = i.usuario_id
+        LEFT JOIN projetos p
+            ON p.id = i.projeto_id
+           AND p.usuario_id = i.usuario_id
+        LEFT JOIN espacos e
+            ON e.id = p.espaco_id
+        WHERE i.id = ANY(%s) AND i.usuario_id = %s
+        ORDER BY i.id
+        """,
+        (list(ideia_ids), usuario_id),
+    )
+    return [
+        _serialize_datetime_fields(
+            dict(ideia),
+            ["data", "created_at", "updated_at", "kanban_updated_at", "agenda_data"],
+        )
+        for ideia in cur.fetchall()
+    ]
+
+
+def _fetch_kanban_cards_by_ids(cur, card_ids: List[int], usuario_id: int) -> List[dict]:
+    if not card_ids:
+        return []
+    cur.execute(
+        """
+        SELECT
+            kc.id,
+            kc.kanban_id,
+            kc.projeto_id,
+            kc.titulo,
+            kc.descricao,
+            kc.checklist,
+            kc.prazo_entrega,
+            kc.kanban_status,
+            kc.kanban_posicao,
+            kc.created_at,
+            kc.updated_at
+        FROM kanban_cards kc
+        WHERE kc.id = ANY(%s) AND kc.usuario_id = %s
+        ORDER BY kc.id
+        """,
+        (list(card_ids), usuario_id),
+    )
+    return [_serialize_kanban_card_record(card) for card in cur.fetchall()]
+
+
+def _fetch_kanban_cards_for_kanban(cur, kanban_id: int, usuario_id: int) -> List[dict]:
+    cur.execute(
+        """
+        SELECT
+            kc.id,
+            kc.kanban_id,
+            kc.projeto_id,
+            kc.titulo,
+            kc.descricao,
+            kc.checklist,
+            kc.prazo_entrega,
+            kc.kanban_status,
+            kc.kanban_posicao,
+            kc.created_at,
+            kc.updated_at
+        FROM kanban_cards kc
+        WHERE kc.kanban_id = %s
+          AND kc.usuario_id = %s
+        ORDER BY kc.kanban_status, COALESCE(kc.kanban_posicao, '~'), kc.id
+        """,
+        (kanban_id, usuario_id),
+    )
+    return [_serialize_kanban_card_record(card) for card in cur.fetchall()]
+
+
+def _validate_kanban_access(cur, kanban_id: Optional[int], usuario_id: int, projeto_id: Optional[int] = None) -> Optional[dict]:
+    if kanban_id in (None, ""):
+        return None
+
+    try:
+        kanban_id = int(kanban_id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Kanban invalido")
+
+    cur.execute(
+        """
+        SELECT k.id, k.projeto_id, k.nome
+        FROM kanbans k
+        WHERE k.id = %s AND k.usuario_id = %s
+        """,
+        (kanban_id, usuario_id),
+    )
+    kanban = cur.fetchone()
+    if not kanban:
+        raise HTTPException(status_code=404, detail="Kanban nao encontrado para este usuario")
+
+    if projeto_id is not None and kanban["projeto_id"] != projeto_id:
+        raise HTTPException(status_code=400, detail="Kanban nao pertence ao projeto informado")
+
+    return dict(kanban)
+
+
+app = FastAPI(title="Sacola de Ideias API")
+
+# Evento de startup para verificar endpoints registrados e testar conexão
+@app.on_event("startup")
+async def startup_event():
+    print("=" * 80)
+    ensure_workspace_schema()
+    ensure_ideias_kanban_columns()
+    ensure_kanban_analytics_schema()
+    ensure_background_jobs_schema()
+    ensure_query_embedding_cache_schema()
+    ensure_embedding_identity_schema()
+    ensure_related_ideas_schema()
+    ensure_embedding_versions_schema()
+    ensure_tag_centroids_schema()
+    ensure_embedding_storage_schema()
+    manter_particoes_historico_kanban()
+    # Referencia guardada em app.state: task sem referencia pode ser coletada pelo GC
+    app.state.tarefas_fundo = [
+        asyncio.create_task(_loop_manutencao_historico_kanban()),
+        asyncio.create_task(_loop_ideias_relacionadas()),
+    ]
+    if captura_consultas_lentas.habilitada and SQL_LENTA_EXPLAIN_AMOSTRA > 0:
+        app.state.tarefas_fundo.append(asyncio.create_task(_loop_explain_consultas_lentas()))
+    print("=" * 80)
+    # Diagnóstico rápido do Stripe (não expõe segredos)
+    try:
+        from stripe import _version as _stripe_version
+        print(f"💳 Stripe SDK: {_stripe_version.VERSION}")
+        print(f"   stripe module: {getattr(stripe, '__file__', 'n/a')}")
+        print(f"   checkout module: {getattr(stripe_checkout, '__file__', 'n/a')}")
+        print(f"   has stripe.apps.Secret: {hasattr(getattr(stripe, 'apps', None), 'Secret')}")
+    except Exception as e:
+        print(f"⚠️  Falha ao inspecionar Stripe SDK: {e}")
+    print("📋 TODOS OS ENDPOINTS REGISTRADOS:")
+    total_routes = 0
+    lembrancas_routes = []
+    for route in app.routes:
+        if hasattr(route, 'path'):
+            total_routes += 1
+            methods = getattr(route, 'methods', set())
+            if 'lembrancas' in route.path:
+                lembrancas_routes.append(f"{list(methods)} {route.path}")
+                print(f"   ✅ {list(methods)} {route.path}")
+    print(f"📊 Total de rotas: {total_routes}")
+    if lembrancas_routes:
+        print("✅ Endpoints de lembranças encontrados!")
+    else:
+        print("❌ NENHUM endpoint de lembranças encontrado!")
+    print("=" * 80)
+    
+    # Testar conexão com o banco
+    print("=" * 80)
+    print("🔌 TESTANDO CONEXÃO COM O BANCO DE DADOS:")
+    safe_db_config = sanitize_db_config(DB_CONFIG)
+    print(f"   Source: {DB_CONFIG_SOURCE}")
+    print(f"   Host: {safe_db_config['host']}")
+    print(f"   Port: {safe_db_config['port']}")
+    print(f"   Database: {safe_db_config['database']}")
+    print(f"   User: {safe_db_config['user']}")
+    print(f"   Password: {safe_db_config['password']}")
+    print("=" * 80)
+    
+    try:
+        conn = get_db_connection()
+        with conn.cursor() as cur:
+            cur.execute("SELECT version();")
+            version = cur.fetchone()[0]
+            cur.execute(
+                """
+                SELECT
+                    current_database(),
+                    current_schema(),
+                    to_regclass('public.usuarios'),
+                    to_regclass('public.assinaturas')
+                """
+            )
+            current_database, current_schema, usuarios_table, assinaturas_table = cur.fetchone()
+            print(f"✅ Conexão com o banco estabelecida com sucesso!")
+            print(f"   PostgreSQL version: {version[:50]}...")
+            print(f"   current_database(): {current_database}")
+            print(f"   current_schema(): {current_schema}")
+            print(f"   public.usuarios: {usuarios_table or 'AUSENTE'}")
+            print(f"   public.assinaturas: {assinaturas_table or 'AUSENTE'}")
+            if not usuarios_table or not assinaturas_table:
+                print("⚠️  O backend conectou, mas o schema esperado não está nesse banco/schema.")
+        conn.close()
+    except Exception as e:
+        print(f"❌ ERRO ao conectar com o banco: {e}")
+        print(f"   Verifique as credenciais no arquivo .env")
+    print("=" * 80)
+    print(f"🌐 CORS_ORIGINS: {CORS_ORIGINS}")
+    print("=" * 80)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    tarefas = getattr(app.state, "tarefas_fundo", [])
+    for tarefa in tarefas:
+        tarefa.cancel()
+    await asyncio.gather(*tarefas, return_exceptions=True)
+
+
+# Configurar CORS
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=CORS_ORIGINS,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["X-Proximo-Cursor", "Server-Timing"],
+)
+estatisticas_sql = EstatisticasSql()
+app.add_middleware(
+    MedicaoSqlMiddleware,
+    estatisticas=estatisticas_sql,
+    server_timing=SQL_SERVER_TIMING,
+    estrito=SQL_ORCAMENTO_ESTRITO,
+    limite_repeticoes=SQL_N_MAIS_UM_LIMITE,
+)
+captura_consultas_lentas = CapturaConsultasLentas(
+    SQL_LENTA_LIMITE_MS,
+    capacidade=SQL_LENTA_MAX,
+    amostra_explain=SQL_LENTA_EXPLAIN_AMOSTRA,
+    intervalo_explain_segundos=SQL_LENTA_EXPLAIN_INTERVALO_SEGUNDOS,
+)
+if captura_consultas_lentas.habilitada:
+    definir_observador(captura_consultas_lentas.observar)
+
+# Configuração do banco de dados (Supabase Postgres ou PostgreSQL direto)
+# Aceita DATABASE_URL/SUPABASE_DB_URL para evitar divergência entre ambientes.
+DB_CONFIG, DB_CONFIG_SOURCE = build_db_config(default_database="postgres")
+
+
+def _extract_missing_relation_name(error: Exception) -> Optional[str]:
+    match = re.search(r'relation "([^"]+)" does not exist', str(error), re.IGNORECASE)
+    return match.group(1) if match else None
+
+
+def _missing_relation_detail(table_name: Optional[str] = None) -> str:
+    alvo = f'Tabela "{table_name}"' if table_name else "Uma tabela obrigatória"
+    return (
+        f"{alvo} não existe no banco configurado. "
+        "Verifique DATABASE_URL/SUPABASE_DB_URL ou DB_HOST/DB_NAME/DB_USER/DB_PASSWORD "
+        "no backend; a API provavelmente está conectada em outro banco ou schema."
+    )
+
+def get_db_connection():
+    """Criar conexão com o banco de dados"""
+    try:
+        conn = psycopg2.connect(**DB_CONFIG, connection_factory=ConexaoMedida)
+        return conn
+    except psycopg2.OperationalError as e:
+        safe_db_config = sanitize_db_config(DB_CONFIG)
+        print(f"❌ Erro de conexão com o banco: {e}")
+        print(f"   Source: {DB_CONFIG_SOURCE}")
+        print(f"   Host: {safe_db_config.get('host', 'N/A')}")
+        print(f"   Port: {safe_db_config.get('port', 'N/A')}")
+        print(f"   Database: {safe_db_config.get('database', 'N/A')}")
+        print(f"   User: {safe_db_config.get('user', 'N/A')}")
+        print(f"   Password configurada: {'Sim' if DB_CONFIG.get('password') else 'NÃO'}")
+        print(f"   SSL Mode: {safe_db_config.get('sslmode', 'não especificado')}")
+        raise HTTPException(
+            status_code=503, 
+            detail=f"Erro ao conectar ao banco de dados. Verifique as credenciais no .env. Detalhes: {str(e)}"
+        )
+    except Exception as e:
+        print(f"❌ Erro inesperado ao conectar: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro inesperado ao conectar ao banco: {str(e)}"
+        )
+
+# Modelos Pydantic
+class IdeiaBase(BaseModel):
+    titulo: str
+    tag: Optional[str] = None
+    ideia: str
+    projeto_id: Optional[int] = None
+
+class IdeiaCreate(IdeiaBase):
+    pass
+
+class IdeiaDuplicata(BaseModel):
+    id: int
+    titulo: str
+    tag: Optional[str] = None
+    similarity: float
+
+class MesclarIdeiaRequest(BaseModel):
+    duplicata_id: int
+
+class IdeiaRelacionada(BaseModel):
+    id: int
+    titulo: str
+    tag: Optional[str] = None
+    data: datetime
+    similarity: float
+
+class SugestaoTagsRequest(BaseModel):
+    titulo: str = ""
+    ideia: str = ""
+    limite: int = Field(5, ge=1, le=20)
+
+class TagSugerida(BaseModel):
+    tag: str
+    similarity: float
+    ideias: int
+
+class IdeiaUpdate(IdeiaBase):
+    pass
 
 class IdeiaResponse(IdeiaBase):
     id: int
@@ -1204,11 +2356,13 @@ class IdeiaResponse(IdeiaBase):
     kanban_ativo: Optional[bool] = False
     kanban_status: Optional[str] = None
     kanban_updated_at: Optional[datetime] = None
+    kanban_posicao: Optional[str] = None
     agenda_data: Optional[datetime] = None
     agenda_observacao: Optional[str] = None
     projeto_nome: Optional[str] = None
     espaco_id: Optional[int] = None
     espaco_nome: Optional[str] = None
+    duplicatas_provaveis: Optional[List[IdeiaDuplicata]] = None
     
     class Config:
         from_attributes = True
@@ -1221,6 +2375,16 @@ class BuscaRequest(BaseModel):
     termo: str
     limite: Optional[int] = 10
     probes: Optional[int] = 15
+    espaco_id: Optional[int] = None
+    projeto_id: Optional[int] = None
+    kanban_id: Optional[int] = None
+    kanban_status: Optional[str] = None
+    tag: Optional[str] = None
+    data_inicio: Optional[datetime] = None
+    data_fim: Optional[datetime] = None
+    agenda_inicio: Optional[datetime] = None
+    agenda_fim: Optional[datetime] = None
+    cursor: Optional[str] = None
 
 class BuscaResponse(BaseModel):
     id: int
@@ -1357,14 +2521,142 @@ class KanbanCardResponse(BaseModel):
     checklist: List[KanbanChecklistItem] = Field(default_factory=list)
     prazo_entrega: Optional[datetime] = None
     kanban_status: str
+    kanban_posicao: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+class KanbanBatchOperation(BaseModel):
+    tipo: str
+    ideia_id: Optional[int] = None
+    card_id: Optional[int] = None
+    kanban_status: Optional[str] = None
+    projeto_id: Optional[int] = None
+    kanban_id: Optional[int] = None
+    card: Optional[KanbanCardUpdate] = None
+
+
+class KanbanBatchRequest(BaseModel):
+    operacoes: List[KanbanBatchOperation] = Field(default_factory=list)
+
+
+class KanbanBatchResponse(BaseModel):
+    ideias: List[IdeiaResponse] = Field(default_factory=list)
+    cards: List[KanbanCardResponse] = Field(default_factory=list)
+    ideias_excluidas: List[int] = Field(default_factory=list)
+    cards_excluidos: List[int] = Field(default_factory=list)
+    historico_registrado: int = 0
+
+class KanbanBoardItem(BaseModel):
+    item_tipo: str
+    id: int
+    kanban_id: int
+    projeto_id: Optional[int] = None
+    titulo: str
+    conteudo: Optional[str] = None
+    tag: Optional[str] = None
+    checklist: List[KanbanChecklistItem] = Field(default_factory=list)
+    prazo_entrega: Optional[datetime] = None
+    agenda_data: Optional[datetime] = None
+    agenda_observacao: Optional[str] = None
+    kanban_status: str
+    data: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
+    kanban_posicao: Optional[str] = None
+
+
+class KanbanBoardColumn(BaseModel):
+    kanban_status: str
+    itens: List[KanbanBoardItem] = Field(default_factory=list)
+    tem_mais: bool = False
+    proximo_cursor: Optional[str] = None
+
+
+class KanbanBoardResponse(BaseModel):
+    kanban_id: int
+    projeto_id: int
+    nome: str
+    colunas: List[KanbanBoardColumn] = Field(default_factory=list)
+
+
+class KanbanItemRef(BaseModel):
+    item_tipo: str
+    id: int
+
+
+class KanbanMoveRequest(BaseModel):
+    item_tipo: str
+    id: int
+    kanban_status: str
+    anterior: Optional[KanbanItemRef] = None
+    proximo: Optional[KanbanItemRef] = None
+
+
+class KanbanMoveResponse(BaseModel):
+    item_tipo: str
+    id: int
+    kanban_status: str
+    kanban_posicao: str
+    rebalanceamento_agendado: bool = False
+
+
+class KanbanFluxoDia(BaseModel):
+    dia: date
+    quantidade_por_status: dict = Field(default_factory=dict)
+    entradas_por_status: dict = Field(default_factory=dict)
+    concluidos: int = 0
+
+
+class KanbanEvento(BaseModel):
+    id: int
+    item_tipo: str
+    item_id: int
+    evento: str
+    de_status: Optional[str] = None
+    para_status: Optional[str] = None
+    dados: Optional[dict] = None
+    ocorrido_em: datetime
+
+
+class KanbanEventosResponse(BaseModel):
+    kanban_id: int
+    eventos: List[KanbanEvento] = Field(default_factory=list)
+    proximo_cursor: Optional[str] = None
+
+
+class KanbanFluxoResponse(BaseModel):
+    kanban_id: int
+    inicio: date
+    fim: date
+    dias: List[KanbanFluxoDia] = Field(default_factory=list)
+    throughput_total: int = 0
+    lead_time_medio_horas: Optional[float] = None
+    cycle_time_medio_horas: Optional[float] = None
+
 
 class BackfillEmbeddingsRequest(BaseModel):
     limite: Optional[int] = 50
     forcar: Optional[bool] = False
 
 
+class AgrupamentoIdeiasRequest(BaseModel):
+    k: Optional[int] = Field(None, ge=2, le=30)
+    espaco_id: Optional[int] = None
+    forcar: bool = False
+
+
+class BackgroundJobResponse(BaseModel):
+    id: str
+    tipo: str
+    status: str
+    progresso: dict = Field(default_factory=dict)
+    resultado: Optional[dict] = None
+    erro: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+
 class AcessoCreate(BaseModel):
     usuario_id: Optional[int] = None
     ip_address: Optional[str] = None
@@ -1569,7 +2861,8 @@ async def obter_usuario_assinante(user: dict = Depends(obter_usuario_atual)) ->
     if not usuario_id:
         raise HTTPException(status_code=401, detail="Token inválido")
 
-    assinatura = _get_assinatura_row(usuario_id)
+    with trecho_sql("dependencia de assinatura", 1):
+        assinatura = _get_assinatura_row(usuario_id)
     if _assinatura_ativa(assinatura):
         return user
 
@@ -1578,13 +2871,68 @@ async def obter_usuario_assinante(user: dict = Depends(obter_usuario_atual)) ->
         detail="Trial expirado. Ative o plano Pro para continuar.",
     )
 
+
+async def obter_usuario_admin(user: dict = Depends(obter_usuario_atual)) -> dict:
+    """Permite acesso somente a administradores."""
+    if not user:
+        raise HTTPException(status_code=401, detail="Não autenticado")
+    if (user.get("role") or "").lower() not in ("admin", "superadmin"):
+        raise HTTPException(status_code=403, detail="Acesso restrito a administradores")
+    return user
+
+
 # Rotas
 @app.get("/")
 def root():
     return {"message": "Sacola de Ideias API", "status": "online"}
 
 
+@app.get("/api/admin/metricas")
+def buscar_metricas_admin(user: dict = Depends(obter_usuario_admin)):
+    """Metricas internas do processo (caches da busca semantica)."""
+    return {
+        "cache_embeddings_consulta": query_embedding_cache.estatisticas(),
+        "cache_resultados_busca": search_result_cache.estatisticas(),
+        "indice_vetorial_memoria": vector_index.estatisticas() if vector_index is not None else None,
+        "centroides_tags": tag_centroid_index.estatisticas(),
+        "provedor_embedding": {
+            "provedor": EMBEDDING_PROVEDOR,
+            "modelo": EMBEDDING_MODELO_ATUAL,
+            "dimensoes": EMBEDDING_PROVEDOR_DIMENSOES,
+            "disponivel": get_embeddings_model() is not None,
+        },
+        "chamadas_openai": {
+            "em_andamento": limite_chamadas_openai.em_andamento,
+            "maximo": limite_chamadas_openai.maximo,
+            "pico": limite_chamadas_openai.pico,
+            "embeddings": politica_embeddings.estatisticas(),
+            "chat": politica_chat.estatisticas(),
+        },
+        "troca_modelo_embedding": (
+            {
+                "modelo_proximo": EMBEDDING_MODELO_PROXIMO,
+                "disponivel": get_embeddings_model_proximo() is not None,
+                **prontidao_embedding_proximo.estatisticas(),
+            }
+            if EMBEDDING_MODELO_PROXIMO is not None else None
+        ),
+        "armazenamento_embedding": {**armazenamento_embedding.descricao(), "pronto": EMBEDDING_COMPACTO_PRONTO},
+        "cache_sugestoes_lembranca": sugestoes_lembranca_cache.estatisticas(),
+        "sql_por_requisicao": estatisticas_sql.estatisticas(),
+    }
+
+
+@app.get("/api/admin/consultas-lentas")
+def buscar_consultas_lentas_admin(
+    limite: int = Query(50, ge=1, le=500),
+    user: dict = Depends(obter_usuario_admin),
+):
+    """Instrucoes SQL acima de SQL_LENTA_LIMITE_MS (mais recentes primeiro) e agregado por instrucao."""
+    return captura_consultas_lentas.relatorio(limite)
+
+
 @app.get("/api/workspace", response_model=List[EspacoWorkspaceResponse])
+@orcamento_sql(3)
 def buscar_workspace(user: dict = Depends(obter_usuario_atual)):
     """Retorna a árvore de espaços e projetos do usuário autenticado."""
     usuario_id = user["user_id"]
@@ -1705,6 +3053,7 @@ def excluir_espaco(espaco_id: int, user: dict = Depends(obter_usuario_atual)):
             if not espaco:
                 raise HTTPException(status_code=404, detail="Espaço não encontrado")
             conn.commit()
+            invalidar_busca_usuario(usuario_id)
             return {"detail": "Espaço excluído com sucesso"}
     except HTTPException:
         raise
@@ -1899,97 +3248,711 @@ def atualizar_kanban(
             kanban = cur.fetchone()
             if not kanban:
                 raise HTTPException(status_code=404, detail="Kanban nao encontrado")
-
-            conn.commit()
-            return _serialize_kanban_record(kanban)
-    except psycopg2.errors.UniqueViolation:
-        conn.rollback()
-        raise HTTPException(status_code=409, detail="Ja existe um kanban com esse nome neste projeto")
+
+            conn.commit()
+            return _serialize_kanban_record(kanban)
+    except psycopg2.errors.UniqueViolation:
+        conn.rollback()
+        raise HTTPException(status_code=409, detail="Ja existe um kanban com esse nome neste projeto")
+    except HTTPException:
+        raise
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Erro ao atualizar kanban: {str(e)}")
+    finally:
+        conn.close()
+
+
+@app.delete("/api/kanbans/{kanban_id}")
+def excluir_kanban(kanban_id: int, user: dict = Depends(obter_usuario_atual)):
+    usuario_id = user["user_id"]
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            kanban = _validate_kanban_access(cur, kanban_id, usuario_id)
+            if not kanban:
+                raise HTTPException(status_code=404, detail="Kanban nao encontrado")
+
+            # O log de eventos nao tem FK: registra a saida de tudo que estava no quadro.
+            cur.execute(
+                """
+                INSERT INTO kanban_events (kanban_id, usuario_id, item_tipo, item_id, evento, de_status)
+                SELECT kc.kanban_id, kc.usuario_id, %s, kc.id, %s, array_position(%s::text[], kc.kanban_status::text)
+                FROM kanban_cards kc
+                WHERE kc.kanban_id = %s AND kc.usuario_id = %s
+                UNION ALL
+                SELECT i.kanban_id, i.usuario_id, %s, i.id, %s, array_position(%s::text[], i.kanban_status::text)
+                FROM ideias i
+                WHERE i.kanban_id = %s AND i.usuario_id = %s AND i.kanban_ativo IS TRUE
+                """,
+                (
+                    KANBAN_EVENTO_ITEM_TIPOS["card"],
+                    KANBAN_EVENTO_TIPOS["excluido"],
+                    KANBAN_STATUS_ORDER,
+                    kanban_id,
+                    usuario_id,
+                    KANBAN_EVENTO_ITEM_TIPOS["ideia"],
+                    KANBAN_EVENTO_TIPOS["excluido"],
+                    KANBAN_STATUS_ORDER,
+                    kanban_id,
+                    usuario_id,
+                ),
+            )
+
+            # Remove cards nativos explicitamente para funcionar mesmo em bancos
+            # que ainda nao estejam com a FK em cascade atualizada.
+            cur.execute(
+                """
+                DELETE FROM kanban_cards
+                WHERE kanban_id = %s AND usuario_id = %s
+                """,
+                (kanban_id, usuario_id),
+            )
+
+            # Remove o quadro das ideias vinculadas para manter contagens e estado consistentes.
+            cur.execute(
+                """
+                UPDATE ideias
+                SET kanban_id = NULL,
+                    kanban_ativo = FALSE,
+                    kanban_status = NULL,
+                    kanban_posicao = NULL,
+                    kanban_updated_at = NOW()
+                WHERE kanban_id = %s AND usuario_id = %s
+                """,
+                (kanban_id, usuario_id),
+            )
+
+            cur.execute(
+                """
+                DELETE FROM kanbans
+                WHERE id = %s AND usuario_id = %s
+                RETURNING id
+                """,
+                (kanban_id, usuario_id),
+            )
+            kanban_excluido = cur.fetchone()
+            if not kanban_excluido:
+                raise HTTPException(status_code=404, detail="Kanban nao encontrado")
+
+            conn.commit()
+            invalidar_busca_usuario(usuario_id)
+            return {"detail": "Kanban excluido com sucesso"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Erro ao excluir kanban: {str(e)}")
+    finally:
+        conn.close()
+
+
+@app.get("/api/kanbans/{kanban_id}/cards", response_model=List[KanbanCardResponse])
+@orcamento_sql(2)
+def listar_cards_kanban(kanban_id: int, user: dict = Depends(obter_usuario_atual)):
+    usuario_id = user["user_id"]
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            _validate_kanban_access(cur, kanban_id, usuario_id)
+            return _fetch_kanban_cards_for_kanban(cur, kanban_id, usuario_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar cards do kanban: {str(e)}")
+    finally:
+        conn.close()
+
+
+def _board_status_condition(alias: str, status: str) -> tuple:
+    # Status fora da lista aparecem em "novo", igual ao quadro no frontend.
+    if status == KANBAN_STATUS_ORDER[0]:
+        return (
+            f"({alias}.kanban_status = %s OR {alias}.kanban_status IS NULL OR NOT ({alias}.kanban_status = ANY(%s)))",
+            [status, KANBAN_STATUS_ORDER],
+        )
+    return f"{alias}.kanban_status = %s", [status]
+
+
+def _board_keyset_condition(posicao_expr: str, id_expr: str, item_tipo: str, cursor: Optional[dict]) -> tuple:
+    """Continua depois de (kanban_posicao, item_tipo, id) do cursor na ordenacao do quadro."""
+    if not cursor:
+        return "", []
+    posicao_cursor, tipo_cursor, id_cursor = cursor["p"], cursor["k"], cursor["i"]
+    if item_tipo > tipo_cursor:
+        return f"AND {posicao_expr} >= %s", [posicao_cursor]
+    if item_tipo < tipo_cursor:
+        return f"AND {posicao_expr} > %s", [posicao_cursor]
+    return (
+        f"AND ({posicao_expr} > %s OR ({posicao_expr} = %s AND {id_expr} > %s))",
+        [posicao_cursor, posicao_cursor, id_cursor],
+    )
+
+
+def _lock_kanban_ranks(cur, kanban_id: int):
+    # Serializa movimentos e rebalanceamentos do mesmo quadro ate o fim da transacao.
+    cur.execute("SELECT pg_advisory_xact_lock(hashtextextended(%s, 0))", (f"kanban_rank:{kanban_id}",))
+
+
+def _kanban_rank_vizinho(
+    cur,
+    kanban_id: int,
+    status: str,
+    referencia: Optional[str] = None,
+    acima: bool = False,
+    ignorar: Optional[tuple] = None,
+) -> Optional[str]:
+    """Rank imediatamente abaixo (ou acima) de `referencia` na coluna, entre ideias e cards.
+
+    Sem `referencia`, retorna o primeiro (ou ultimo) rank da coluna. `ignorar` recebe
+    (item_tipo, id) do item que esta sendo movido.
+    """
+    operador, agregado, ordem = ("<", "MAX", "DESC") if acima else (">", "MIN", "ASC")
+    partes = []
+    params: List[object] = []
+    for item_tipo, tabela, alias, filtro_extra in (
+        ("ideia", "ideias", "i", "AND i.kanban_ativo IS TRUE"),
+        ("card", "kanban_cards", "kc", ""),
+    ):
+        posicao_expr = f"COALESCE({alias}.kanban_posicao, '~')"
+        status_sql, status_params = _board_status_condition(alias, status)
+        condicoes = f"AND {posicao_expr} < '~'"
+        condicoes_params: List[object] = []
+        if referencia is not None:
+            condicoes += f" AND {posicao_expr} {operador} %s"
+            condicoes_params.append(referencia)
+        if ignorar and ignorar[0] == item_tipo:
+            condicoes += f" AND {alias}.id <> %s"
+            condicoes_params.append(ignorar[1])
+        partes.append(
+            f"""
+            (
+                SELECT {alias}.kanban_posicao AS posicao
+                FROM {tabela} {alias}
+                WHERE {alias}.kanban_id = %s
+                  {filtro_extra}
+                  AND {status_sql}
+                  {condicoes}
+                ORDER BY {posicao_expr} {ordem}
+                LIMIT 1
+            )
+            """
+        )
+        params.extend([kanban_id, *status_params, *condicoes_params])
+
+    cur.execute(
+        f"SELECT {agregado}(posicao) AS posicao FROM ({' UNION ALL '.join(partes)}) vizinhos",
+        tuple(params),
+    )
+    row = cur.fetchone()
+    return row["posicao"] if row else None
+
+
+def _kanban_rank_topo(cur, kanban_id: Optional[int], status: str, ignorar: Optional[tuple] = None) -> Optional[str]:
+    """Rank para colocar um item no topo da coluna (itens novos ou que mudaram de coluna)."""
+    if kanban_id is None:
+        return None
+    _lock_kanban_ranks(cur, kanban_id)
+    return rank_between(None, _kanban_rank_vizinho(cur, kanban_id, status, ignorar=ignorar))
+
+
+def _rebalance_kanban_column(kanban_id: int, status: str):
+    """Reescreve os ranks de uma coluna com valores curtos e igualmente espacados."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            _lock_kanban_ranks(cur, kanban_id)
+            ideia_status_sql, ideia_status_params = _board_status_condition("i", status)
+            card_status_sql, card_status_params = _board_status_condition("kc", status)
+            cur.execute(
+                f"""
+                SELECT item_tipo, id
+                FROM (
+                    SELECT 'ideia' AS item_tipo, i.id, COALESCE(i.kanban_posicao, '~') AS posicao
+                    FROM ideias i
+                    WHERE i.kanban_id = %s AND i.kanban_ativo IS TRUE AND {ideia_status_sql}
+                    UNION ALL
+                    SELECT 'card', kc.id, COALESCE(kc.kanban_posicao, '~')
+                    FROM kanban_cards kc
+                    WHERE kc.kanban_id = %s AND {card_status_sql}
+                ) itens
+                ORDER BY posicao, item_tipo, id
+                """,
+                (kanban_id, *ideia_status_params, kanban_id, *card_status_params),
+            )
+            itens = cur.fetchall()
+            novos = list(zip(itens, ranks_espacados(len(itens))))
+            ideias = [(item["id"], posicao) for item, posicao in novos if item["item_tipo"] == "ideia"]
+            cards = [(item["id"], posicao) for item, posicao in novos if item["item_tipo"] == "card"]
+            if ideias:
+                execute_values(
+                    cur,
+                    """
+                    UPDATE ideias i
+                    SET kanban_posicao = v.posicao
+                    FROM (VALUES %s) AS v(id, posicao)
+                    WHERE i.id = v.id
+                    """,
+                    ideias,
+                    template="(%s::bigint, %s::text)",
+                )
+            if cards:
+                execute_values(
+                    cur,
+                    """
+                    UPDATE kanban_cards kc
+                    SET kanban_posicao = v.posicao
+                    FROM (VALUES %s) AS v(id, posicao)
+                    WHERE kc.id = v.id
+                    """,
+                    cards,
+                    template="(%s::bigint, %s::text)",
+                )
+        conn.commit()
+        print(f"✅ Coluna {status} do kanban {kanban_id} rebalanceada ({len(novos)} itens).")
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"⚠️  Erro ao rebalancear coluna {status} do kanban {kanban_id}: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+
+def _agendar_rebalanceamento(background_tasks: Optional[BackgroundTasks], kanban_id: Optional[int], status: str, posicao: Optional[str]) -> bool:
+    if background_tasks is None or kanban_id is None or not posicao or len(posicao) <= KANBAN_RANK_MAX_LEN:
+        return False
+    background_tasks.add_task(_rebalance_kanban_column, kanban_id, status)
+    return True
+
+
+def _conflito_rebalanceamento(background_tasks: BackgroundTasks, kanban_id: int, status: str) -> JSONResponse:
+    """409 para o cliente tentar de novo; a coluna e reescrita depois da resposta, fora da requisicao."""
+    background_tasks.add_task(_rebalance_kanban_column, kanban_id, status)
+    # Resposta devolvida (e nao HTTPException) para o FastAPI anexar as background tasks
+    return JSONResponse(status_code=409, content={"detail": "Coluna reordenada; tente novamente"})
+
+
+def _fetch_kanban_board_columns(
+    cur,
+    kanban_id: int,
+    usuario_id: int,
+    statuses: List[str],
+    limite: int,
+    cursor: Optional[dict] = None,
+) -> List[dict]:
+    """Busca ideias e cards nativos de cada coluna em uma consulta, limitada por coluna."""
+    ideia_ordem = "COALESCE(i.kanban_posicao, '~')"
+    card_ordem = "COALESCE(kc.kanban_posicao, '~')"
+    partes = []
+    params: List[object] = []
+    for status in statuses:
+        ideia_status_sql, ideia_status_params = _board_status_condition("i", status)
+        card_status_sql, card_status_params = _board_status_condition("kc", status)
+        ideia_keyset_sql, ideia_keyset_params = _board_keyset_condition(ideia_ordem, "i.id", "ideia", cursor)
+        card_keyset_sql, card_keyset_params = _board_keyset_condition(card_ordem, "kc.id", "card", cursor)
+        partes.append(
+            f"""
+            (
+                SELECT *
+                FROM (
+                    (
+                        SELECT
+                            %s AS coluna,
+                            'ideia' AS item_tipo,
+                            i.id,
+                            i.kanban_id,
+                            i.projeto_id,
+                            i.titulo,
+                            i.ideia AS conteudo,
+                            i.tag,
+                            '[]'::jsonb AS checklist,
+                            NULL::timestamptz AS prazo_entrega,
+                            i.agenda_data,
+                            i.agenda_observacao,
+                            i.data,
+                            i.created_at,
+                            i.updated_at,
+                            i.kanban_posicao,
+                            {ideia_ordem} AS ordem_posicao
+                        FROM ideias i
+                        WHERE i.kanban_id = %s
+                          AND i.usuario_id = %s
+                          AND i.kanban_ativo IS TRUE
+                          AND {ideia_status_sql}
+                          {ideia_keyset_sql}
+                        ORDER BY {ideia_ordem}, i.id
+                        LIMIT %s
+                    )
+                    UNION ALL
+                    (
+                        SELECT
+                            %s AS coluna,
+                            'card' AS item_tipo,
+                            kc.id,
+                            kc.kanban_id,
+                            kc.projeto_id,
+                            kc.titulo,
+                            kc.descricao AS conteudo,
+                            NULL::varchar AS tag,
+                            kc.checklist,
+                            kc.prazo_entrega,
+                            NULL::timestamptz AS agenda_data,
+                            NULL::text AS agenda_observacao,
+                            NULL::timestamptz AS data,
+                            kc.created_at,
+                            kc.updated_at,
+                            kc.kanban_posicao,
+                            {card_ordem} AS ordem_posicao
+                        FROM kanban_cards kc
+                        WHERE kc.kanban_id = %s
+                          AND kc.usuario_id = %s
+                          AND {card_status_sql}
+                          {card_keyset_sql}
+                        ORDER BY {card_ordem}, kc.id
+                        LIMIT %s
+                    )
+                ) itens_coluna
+                ORDER BY ordem_posicao, item_tipo, id
+                LIMIT %s
+            )
+            """
+        )
+        params.extend(
+            [status, kanban_id, usuario_id, *ideia_status_params, *ideia_keyset_params, limite + 1]
+            + [status, kanban_id, usuario_id, *card_status_params, *card_keyset_params, limite + 1]
+            + [limite + 1]
+        )
+
+    cur.execute(" UNION ALL ".join(partes), tuple(params))
+    itens_por_coluna = {status: [] for status in statuses}
+    for row in cur.fetchall():
+        item = dict(row)
+        item["kanban_status"] = item.pop("coluna")
+        item.pop("ordem_posicao", None)
+        item["checklist"] = item.get("checklist") or []
+        itens_por_coluna[item["kanban_status"]].append(item)
+
+    colunas = []
+    for status in statuses:
+        itens = itens_por_coluna[status]
+        tem_mais = len(itens) > limite
+        itens = itens[:limite]
+        proximo_cursor = None
+        if tem_mais and itens:
+            ultimo = itens[-1]
+            proximo_cursor = _encode_cursor(
+                {"s": status, "p": ultimo["kanban_posicao"] or "~", "k": ultimo["item_tipo"], "i": ultimo["id"]}
+            )
+        colunas.append(
+            {
+                "kanban_status": status,
+                "itens": itens,
+                "tem_mais": tem_mais,
+                "proximo_cursor": proximo_cursor,
+            }
+        )
+    return colunas
+
+
+@app.get("/api/kanbans/{kanban_id}/board", response_model=KanbanBoardResponse)
+@orcamento_sql(3)
+def buscar_quadro_kanban(
+    kanban_id: int,
+    limite_por_coluna: int = Query(KANBAN_BOARD_LIMITE_PADRAO),
+    cursor: Optional[str] = Query(None),
+    user: dict = Depends(obter_usuario_assinante),
+):
+    """Retorna ideias e cards nativos do kanban ja agrupados por coluna, com "carregar mais" por cursor."""
+    usuario_id = user["user_id"]
+    limite = min(max(limite_por_coluna or KANBAN_BOARD_LIMITE_PADRAO, 1), KANBAN_BOARD_LIMITE_MAXIMO)
+    cursor_payload = None
+    statuses = list(KANBAN_STATUS_ORDER)
+    if cursor:
+        cursor_payload = _decode_cursor(cursor)
+        if cursor_payload.get("s") not in KANBAN_STATUS_SET or not all(k in cursor_payload for k in ("p", "k", "i")):
+            raise HTTPException(status_code=400, detail="Cursor invalido")
+        statuses = [cursor_payload["s"]]
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            kanban = _validate_kanban_access(cur, kanban_id, usuario_id)
+            if not kanban:
+                raise HTTPException(status_code=404, detail="Kanban nao encontrado")
+            return {
+                "kanban_id": kanban["id"],
+                "projeto_id": kanban["projeto_id"],
+                "nome": kanban["nome"],
+                "colunas": _fetch_kanban_board_columns(
+                    cur,
+                    kanban["id"],
+                    usuario_id,
+                    statuses,
+                    limite,
+                    cursor_payload,
+                ),
+            }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar quadro do kanban: {str(e)}")
+    finally:
+        conn.close()
+
+
+@app.get("/api/kanbans/{kanban_id}/fluxo", response_model=KanbanFluxoResponse)
+def buscar_fluxo_kanban(
+    kanban_id: int,
+    inicio: Optional[date] = Query(None),
+    fim: Optional[date] = Query(None),
+    user: dict = Depends(obter_usuario_assinante),
+):
+    """Diagrama de fluxo cumulativo, throughput e lead/cycle time a partir dos rollups diarios."""
+    usuario_id = user["user_id"]
+    fim = fim or datetime.now(timezone.utc).date()
+    inicio = inicio or fim - timedelta(days=KANBAN_FLUXO_DIAS_PADRAO - 1)
+    if inicio > fim:
+        raise HTTPException(status_code=400, detail="inicio deve ser anterior a fim")
+    if (fim - inicio).days >= KANBAN_FLUXO_DIAS_MAXIMO:
+        raise HTTPException(status_code=400, detail=f"Periodo maximo de {KANBAN_FLUXO_DIAS_MAXIMO} dias")
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            kanban = _validate_kanban_access(cur, kanban_id, usuario_id)
+            if not kanban:
+                raise HTTPException(status_code=404, detail="Kanban nao encontrado")
+            fluxo = kanban_analytics.consultar_fluxo(cur, kanban["id"], KANBAN_STATUS_ORDER, inicio, fim)
+            return {"kanban_id": kanban["id"], "inicio": inicio, "fim": fim, **fluxo}
     except HTTPException:
         raise
     except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=500, detail=f"Erro ao atualizar kanban: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar fluxo do kanban: {str(e)}")
     finally:
         conn.close()
 
 
-@app.delete("/api/kanbans/{kanban_id}")
-def excluir_kanban(kanban_id: int, user: dict = Depends(obter_usuario_atual)):
+@app.get("/api/kanbans/{kanban_id}/eventos", response_model=KanbanEventosResponse)
+def buscar_eventos_kanban(
+    kanban_id: int,
+    inicio: Optional[datetime] = Query(None),
+    fim: Optional[datetime] = Query(None),
+    limite: int = Query(KANBAN_EVENTOS_LIMITE_PADRAO),
+    cursor: Optional[str] = Query(None),
+    user: dict = Depends(obter_usuario_assinante),
+):
+    """Eventos de ideias e cards do quadro em ordem cronologica, paginados por (ocorrido_em, id)."""
     usuario_id = user["user_id"]
+    limite = min(max(limite or KANBAN_EVENTOS_LIMITE_PADRAO, 1), KANBAN_EVENTOS_LIMITE_MAXIMO)
+    filtros = ["e.kanban_id = %s"]
+    params: List[object] = []
+    if inicio:
+        filtros.append("e.ocorrido_em >= %s")
+        params.append(inicio)
+    if fim:
+        filtros.append("e.ocorrido_em < %s")
+        params.append(fim)
+    if cursor:
+        cursor_payload = _decode_cursor(cursor)
+        if not all(k in cursor_payload for k in ("o", "i")):
+            raise HTTPException(status_code=400, detail="Cursor invalido")
+        filtros.append("(e.ocorrido_em, e.id) > (%s::timestamptz, %s)")
+        params.extend([cursor_payload["o"], cursor_payload["i"]])
+
+    status_por_codigo = {codigo: status for status, codigo in KANBAN_STATUS_CODIGOS.items()}
+    item_por_codigo = {codigo: nome for nome, codigo in KANBAN_EVENTO_ITEM_TIPOS.items()}
+    evento_por_codigo = {codigo: nome for nome, codigo in KANBAN_EVENTO_TIPOS.items()}
+
     conn = get_db_connection()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             kanban = _validate_kanban_access(cur, kanban_id, usuario_id)
             if not kanban:
                 raise HTTPException(status_code=404, detail="Kanban nao encontrado")
-
-            # Remove cards nativos explicitamente para funcionar mesmo em bancos
-            # que ainda nao estejam com a FK em cascade atualizada.
-            cur.execute(
-                """
-                DELETE FROM kanban_cards
-                WHERE kanban_id = %s AND usuario_id = %s
-                """,
-                (kanban_id, usuario_id),
-            )
-
-            # Remove o quadro das ideias vinculadas para manter contagens e estado consistentes.
-            cur.execute(
-                """
-                UPDATE ideias
-                SET kanban_id = NULL,
-                    kanban_ativo = FALSE,
-                    kanban_status = NULL,
-                    kanban_updated_at = NOW()
-                WHERE kanban_id = %s AND usuario_id = %s
-                """,
-                (kanban_id, usuario_id),
-            )
-
             cur.execute(
-                """
-                DELETE FROM kanbans
-                WHERE id = %s AND usuario_id = %s
-                RETURNING id
+                f"""
+                SELECT e.id, e.item_tipo, e.item_id, e.evento, e.de_status, e.para_status, e.dados, e.ocorrido_em
+                FROM kanban_events e
+                WHERE {" AND ".join(filtros)}
+                ORDER BY e.ocorrido_em, e.id
+                LIMIT %s
                 """,
-                (kanban_id, usuario_id),
+                (kanban["id"], *params, limite + 1),
             )
-            kanban_excluido = cur.fetchone()
-            if not kanban_excluido:
-                raise HTTPException(status_code=404, detail="Kanban nao encontrado")
-
-            conn.commit()
-            return {"detail": "Kanban excluido com sucesso"}
+            rows = cur.fetchall()
+            proximo_cursor = None
+            if len(rows) > limite:
+                rows = rows[:limite]
+                proximo_cursor = _encode_cursor({"o": rows[-1]["ocorrido_em"].isoformat(), "i": rows[-1]["id"]})
+            eventos = [
+                {
+                    "id": row["id"],
+                    "item_tipo": item_por_codigo.get(row["item_tipo"], str(row["item_tipo"])),
+                    "item_id": row["item_id"],
+                    "evento": evento_por_codigo.get(row["evento"], str(row["evento"])),
+                    "de_status": status_por_codigo.get(row["de_status"]),
+                    "para_status": status_por_codigo.get(row["para_status"]),
+                    "dados": row["dados"],
+                    "ocorrido_em": row["ocorrido_em"],
+                }
+                for row in rows
+            ]
+            return {"kanban_id": kanban["id"], "eventos": eventos, "proximo_cursor": proximo_cursor}
     except HTTPException:
         raise
     except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=500, detail=f"Erro ao excluir kanban: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar eventos do kanban: {str(e)}")
     finally:
         conn.close()
 
 
-@app.get("/api/kanbans/{kanban_id}/cards", response_model=List[KanbanCardResponse])
-def listar_cards_kanban(kanban_id: int, user: dict = Depends(obter_usuario_atual)):
+def _fetch_board_item_for_move(cur, kanban_id: int, usuario_id: int, item_tipo: str, item_id: int, for_update: bool = False) -> Optional[dict]:
+    if item_tipo == "ideia":
+        sql = """
+            SELECT id, kanban_status, kanban_posicao
+            FROM ideias
+            WHERE id = %s AND usuario_id = %s AND kanban_id = %s AND kanban_ativo IS TRUE
+        """
+    elif item_tipo == "card":
+        sql = """
+            SELECT id, kanban_status, kanban_posicao
+            FROM kanban_cards
+            WHERE id = %s AND usuario_id = %s AND kanban_id = %s
+        """
+    else:
+        raise HTTPException(status_code=400, detail="item_tipo deve ser 'ideia' ou 'card'")
+    cur.execute(sql + (" FOR UPDATE" if for_update else ""), (item_id, usuario_id, kanban_id))
+    return cur.fetchone()
+
+
+@app.post("/api/kanbans/{kanban_id}/mover", response_model=KanbanMoveResponse)
+@orcamento_sql(10)
+def mover_item_kanban(
+    kanban_id: int,
+    payload: KanbanMoveRequest,
+    background_tasks: BackgroundTasks,
+    user: dict = Depends(obter_usuario_assinante),
+):
+    """Move uma ideia ou card para entre dois vizinhos da coluna, gravando apenas a linha movida."""
     usuario_id = user["user_id"]
+    status_final = _validate_kanban_status(payload.kanban_status)
     conn = get_db_connection()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            _validate_kanban_access(cur, kanban_id, usuario_id)
-            return _fetch_kanban_cards_for_kanban(cur, kanban_id, usuario_id)
+            kanban = _validate_kanban_access(cur, kanban_id, usuario_id)
+            if not kanban:
+                raise HTTPException(status_code=404, detail="Kanban nao encontrado")
+
+            _lock_kanban_ranks(cur, kanban["id"])
+            item = _fetch_board_item_for_move(cur, kanban["id"], usuario_id, payload.item_tipo, payload.id, for_update=True)
+            if not item:
+                raise HTTPException(status_code=404, detail="Item nao encontrado neste kanban")
+            movido = (payload.item_tipo, payload.id)
+
+            vizinhos = {}
+            for campo in ("anterior", "proximo"):
+                ref = getattr(payload, campo)
+                if ref is None:
+                    continue
+                if (ref.item_tipo, ref.id) == movido:
+                    raise HTTPException(status_code=400, detail=f"{campo} nao pode ser o proprio item")
+                vizinho = _fetch_board_item_for_move(cur, kanban["id"], usuario_id, ref.item_tipo, ref.id)
+                if not vizinho:
+                    raise HTTPException(status_code=404, detail=f"Item {campo} nao encontrado neste kanban")
+                if (_normalize_stored_kanban_status(vizinho["kanban_status"]) or KANBAN_STATUS_ORDER[0]) != status_final:
+                    raise HTTPException(status_code=409, detail=f"Item {campo} nao esta na coluna {status_final}")
+                if not vizinho["kanban_posicao"]:
+                    conn.rollback()
+                    return _conflito_rebalanceamento(background_tasks, kanban["id"], status_final)
+                vizinhos[campo] = vizinho["kanban_posicao"]
+
+            # O vizinho de cima define a posicao; o de baixo e recalculado no banco para
+            # nao depender de uma visao desatualizada do quadro no cliente.
+            if "anterior" in vizinhos:
+                rank_anterior = vizinhos["anterior"]
+                rank_proximo = _kanban_rank_vizinho(cur, kanban["id"], status_final, rank_anterior, ignorar=movido)
+            elif "proximo" in vizinhos:
+                rank_proximo = vizinhos["proximo"]
+                rank_anterior = _kanban_rank_vizinho(cur, kanban["id"], status_final, rank_proximo, acima=True, ignorar=movido)
+            else:
+                rank_anterior = None
+                rank_proximo = _kanban_rank_vizinho(cur, kanban["id"], status_final, ignorar=movido)
+            try:
+                posicao = rank_between(rank_anterior, rank_proximo)
+            except ValueError:
+                # Ranks duplicados (gravados fora do lock) nao deixam espaco entre vizinhos.
+                conn.rollback()
+                return _conflito_rebalanceamento(background_tasks, kanban["id"], status_final)
+
+            status_anterior = _normalize_stored_kanban_status(item["kanban_status"])
+            mudou_status = status_anterior != status_final
+            if payload.item_tipo == "ideia":
+                cur.execute(
+                    """
+                    UPDATE ideias
+                    SET kanban_status = %s,
+                        kanban_posicao = %s,
+                        kanban_updated_at = CASE WHEN %s THEN NOW() ELSE kanban_updated_at END
+                    WHERE id = %s AND usuario_id = %s
+                    """,
+                    (status_final, posicao, mudou_status, payload.id, usuario_id),
+                )
+                if mudou_status:
+                    _insert_kanban_history(cur, payload.id, usuario_id, status_final, status_anterior)
+            else:
+                cur.execute(
+                    """
+                    UPDATE kanban_cards
+                    SET kanban_status = %s,
+                        kanban_posicao = %s,
+                        updated_at = CASE WHEN %s THEN NOW() ELSE updated_at END
+                    WHERE id = %s AND usuario_id = %s
+                    """,
+                    (status_final, posicao, mudou_status, payload.id, usuario_id),
+                )
+                if mudou_status:
+                    _registrar_eventos_kanban(
+                        cur,
+                        [
+                            {
+                                "kanban_id": kanban["id"],
+                                "usuario_id": usuario_id,
+                                "item_tipo": "card",
+                                "item_id": payload.id,
+                                "evento": "movido",
+                                "de_status": status_anterior,
+                                "para_status": status_final,
+                            }
+                        ],
+                    )
+            conn.commit()
+            invalidar_busca_usuario(usuario_id)
+
+        return {
+            "item_tipo": payload.item_tipo,
+            "id": payload.id,
+            "kanban_status": status_final,
+            "kanban_posicao": posicao,
+            "rebalanceamento_agendado": _agendar_rebalanceamento(background_tasks, kanban["id"], status_final, posicao),
+        }
     except HTTPException:
+        conn.rollback()
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao buscar cards do kanban: {str(e)}")
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Erro ao mover item do kanban: {str(e)}")
     finally:
         conn.close()
 
 
 @app.post("/api/kanbans/{kanban_id}/cards", response_model=KanbanCardResponse)
+@orcamento_sql(6)
 def criar_card_kanban(
     kanban_id: int,
     payload: KanbanCardCreate,
+    background_tasks: BackgroundTasks,
     user: dict = Depends(obter_usuario_atual),
 ):
     usuario_id = user["user_id"]
@@ -2002,6 +3965,7 @@ def criar_card_kanban(
             if not kanban:
                 raise HTTPException(status_code=404, detail="Kanban nao encontrado")
 
+            posicao = _kanban_rank_topo(cur, kanban["id"], status_final)
             cur.execute(
                 """
                 INSERT INTO kanban_cards (
@@ -2012,9 +3976,10 @@ def criar_card_kanban(
                     descricao,
                     checklist,
                     prazo_entrega,
-                    kanban_status
+                    kanban_status,
+                    kanban_posicao
                 )
-                VALUES (%s, %s, %s, %s, %s, %s::jsonb, %s, %s)
+                VALUES (%s, %s, %s, %s, %s, %s::jsonb, %s, %s, %s)
                 RETURNING id
                 """,
                 (
@@ -2026,11 +3991,26 @@ def criar_card_kanban(
                     psycopg2.extras.Json(_normalize_kanban_checklist(payload.checklist)),
                     payload.prazo_entrega,
                     status_final,
+                    posicao,
                 ),
             )
             card = cur.fetchone()
+            _registrar_eventos_kanban(
+                cur,
+                [
+                    {
+                        "kanban_id": kanban["id"],
+                        "usuario_id": usuario_id,
+                        "item_tipo": "card",
+                        "item_id": card["id"],
+                        "evento": "criado",
+                        "para_status": status_final,
+                    }
+                ],
+            )
             card_completo = _fetch_kanban_card_record(cur, card["id"], usuario_id)
             conn.commit()
+            _agendar_rebalanceamento(background_tasks, kanban["id"], status_final, posicao)
             return card_completo
     except HTTPException:
         raise
@@ -2045,6 +4025,7 @@ def criar_card_kanban(
 def atualizar_card_kanban(
     card_id: int,
     payload: KanbanCardUpdate,
+    background_tasks: BackgroundTasks,
     user: dict = Depends(obter_usuario_atual),
 ):
     usuario_id = user["user_id"]
@@ -2081,6 +4062,12 @@ def atualizar_card_kanban(
                 if "kanban_status" in payload_fields
                 else card_atual["kanban_status"]
             )
+            # Ao trocar de coluna o card entra no topo; caso contrario mantem a posicao.
+            posicao = (
+                _kanban_rank_topo(cur, card_atual["kanban_id"], status_final)
+                if status_final != card_atual["kanban_status"]
+                else card_atual.get("kanban_posicao")
+            )
 
             cur.execute(
                 """
@@ -2090,6 +4077,7 @@ def atualizar_card_kanban(
                     checklist = %s::jsonb,
                     prazo_entrega = %s,
                     kanban_status = %s,
+                    kanban_posicao = %s,
                     updated_at = NOW()
                 WHERE id = %s AND usuario_id = %s
                 RETURNING id
@@ -2100,6 +4088,7 @@ def atualizar_card_kanban(
                     psycopg2.extras.Json(checklist),
                     prazo_entrega,
                     status_final,
+                    posicao,
                     card_id,
                     usuario_id,
                 ),
@@ -2108,8 +4097,13 @@ def atualizar_card_kanban(
             if not card:
                 raise HTTPException(status_code=404, detail="Card do kanban nao encontrado")
 
+            _registrar_eventos_kanban(
+                cur,
+                _card_update_events(card_atual, usuario_id, status_final, checklist),
+            )
             card_completo = _fetch_kanban_card_record(cur, card["id"], usuario_id)
             conn.commit()
+            _agendar_rebalanceamento(background_tasks, card_atual["kanban_id"], status_final, posicao)
             return card_completo
     except HTTPException:
         raise
@@ -2133,13 +4127,26 @@ def excluir_card_kanban(
                 """
                 DELETE FROM kanban_cards
                 WHERE id = %s AND usuario_id = %s
-                RETURNING id
+                RETURNING id, kanban_id, kanban_status
                 """,
                 (card_id, usuario_id),
             )
             card = cur.fetchone()
             if not card:
                 raise HTTPException(status_code=404, detail="Card do kanban nao encontrado")
+            _registrar_eventos_kanban(
+                cur,
+                [
+                    {
+                        "kanban_id": card["kanban_id"],
+                        "usuario_id": usuario_id,
+                        "item_tipo": "card",
+                        "item_id": card["id"],
+                        "evento": "excluido",
+                        "de_status": card["kanban_status"],
+                    }
+                ],
+            )
 
             conn.commit()
             return {"detail": "Card do kanban excluido com sucesso"}
@@ -2156,6 +4163,7 @@ def excluir_card_kanban(
 def vincular_ideia_a_projeto(
     ideia_id: int,
     payload: ProjetoVinculoUpdate,
+    background_tasks: BackgroundTasks,
     user: dict = Depends(obter_usuario_atual),
 ):
     """Vincula ou remove o vínculo de uma ideia a um projeto do usuário."""
@@ -2163,998 +4171,2866 @@ def vincular_ideia_a_projeto(
     conn = get_db_connection()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(
-                """
-                SELECT id, projeto_id, kanban_id, kanban_status, kanban_ativo
-                FROM ideias
-                WHERE id = %s AND usuario_id = %s
-                """,
-                (ideia_id, usuario_id),
-            )
-            ideia_existente = cur.fetchone()
-            if not ideia_existente:
+            cur.execute(
+                """
+                SELECT id, projeto_id, kanban_id, kanban_status, kanban_ativo, kanban_posicao
+                FROM ideias
+                WHERE id = %s AND usuario_id = %s
+                """,
+                (ideia_id, usuario_id),
+            )
+            ideia_existente = cur.fetchone()
+            if not ideia_existente:
+                raise HTTPException(status_code=404, detail="Ideia não encontrada")
+
+            projeto_id = _validate_project_access(cur, payload.projeto_id, usuario_id)
+            kanban = _validate_kanban_access(cur, payload.kanban_id, usuario_id, projeto_id) if projeto_id else None
+            projeto_anterior = ideia_existente.get("projeto_id")
+            kanban_anterior = ideia_existente.get("kanban_id")
+            status_anterior = (ideia_existente.get("kanban_status") or "").strip().lower() or None
+            if status_anterior and status_anterior not in KANBAN_STATUS_SET:
+                status_anterior = None
+
+            possui_kanban = kanban is not None
+            mudou_kanban = (
+                projeto_id != projeto_anterior
+                or kanban_anterior != (kanban["id"] if kanban else None)
+            )
+
+            if possui_kanban:
+                kanban_status = (
+                    "novo"
+                    if mudou_kanban or not ideia_existente.get("kanban_ativo")
+                    else (status_anterior or "novo")
+                )
+                kanban_ativo = True
+                kanban_id_final = kanban["id"]
+                entrou_na_coluna = (
+                    mudou_kanban
+                    or not ideia_existente.get("kanban_ativo")
+                    or status_anterior != kanban_status
+                )
+                kanban_posicao = (
+                    _kanban_rank_topo(cur, kanban_id_final, kanban_status)
+                    if entrou_na_coluna or not ideia_existente.get("kanban_posicao")
+                    else ideia_existente.get("kanban_posicao")
+                )
+            else:
+                kanban_status = None
+                kanban_ativo = False
+                kanban_id_final = None
+                kanban_posicao = None
+
+            cur.execute(
+                """
+                UPDATE ideias
+                SET projeto_id = %s,
+                    kanban_id = %s,
+                    kanban_ativo = %s,
+                    kanban_status = %s,
+                    kanban_posicao = %s,
+                    kanban_updated_at = CASE
+                        WHEN %s OR %s OR %s THEN NOW()
+                        ELSE kanban_updated_at
+                    END,
+                    updated_at = NOW()
+                WHERE id = %s AND usuario_id = %s
+                """,
+                (
+                    projeto_id,
+                    kanban_id_final,
+                    kanban_ativo,
+                    kanban_status,
+                    kanban_posicao,
+                    possui_kanban,
+                    mudou_kanban,
+                    ideia_existente.get("kanban_ativo") != kanban_ativo,
+                    ideia_id,
+                    usuario_id,
+                ),
+            )
+
+            if not possui_kanban:
+                _registrar_saida_kanban(
+                    cur,
+                    usuario_id,
+                    [(ideia_id, kanban_anterior, ideia_existente.get("kanban_ativo"), ideia_existente.get("kanban_status"))],
+                )
+            elif (
+                mudou_kanban
+                or not ideia_existente.get("kanban_ativo")
+                or status_anterior != kanban_status
+            ):
+                _insert_kanban_history(
+                    cur,
+                    ideia_id=ideia_id,
+                    usuario_id=usuario_id,
+                    de_status=status_anterior if ideia_existente.get("kanban_ativo") else None,
+                    para_status=kanban_status,
+                    observacao=f"Card vinculado ao kanban {kanban['nome']}",
+                )
+
+            ideia_atualizada = _fetch_idea_record(cur, ideia_id, usuario_id)
+            conn.commit()
+            invalidar_busca_usuario(usuario_id)
+            if not ideia_atualizada:
+                raise HTTPException(status_code=404, detail="Ideia não encontrada")
+            _agendar_rebalanceamento(background_tasks, kanban_id_final, kanban_status, kanban_posicao)
+            return ideia_atualizada
+    except HTTPException:
+        raise
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Erro ao vincular ideia ao projeto: {str(e)}")
+    finally:
+        conn.close()
+
+def _normalize_stored_kanban_status(status: Optional[str]) -> Optional[str]:
+    normalized = (status or "").strip().lower() or None
+    if normalized and normalized not in KANBAN_STATUS_SET:
+        return None
+    return normalized
+
+
+def _fetch_rows_by_ids(cur, sql: str, ids: set, usuario_id: int) -> dict:
+    if not ids:
+        return {}
+    cur.execute(sql, (usuario_id, list(ids)))
+    return {row["id"]: dict(row) for row in cur.fetchall()}
+
+
+@app.post("/api/kanban/batch", response_model=KanbanBatchResponse)
+def aplicar_lote_kanban(
+    payload: KanbanBatchRequest,
+    background_tasks: BackgroundTasks,
+    user: dict = Depends(obter_usuario_assinante),
+):
+    """Aplica movimentacoes, vinculos e exclusoes de ideias e cards em uma unica transacao."""
+    usuario_id = user["user_id"]
+    operacoes = payload.operacoes or []
+    if not operacoes:
+        raise HTTPException(status_code=400, detail="Informe ao menos uma operacao")
+    if len(operacoes) > KANBAN_BATCH_MAX_OPERACOES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Limite de {KANBAN_BATCH_MAX_OPERACOES} operacoes por lote",
+        )
+
+    for indice, op in enumerate(operacoes):
+        op.tipo = (op.tipo or "").strip().lower()
+        if op.tipo not in KANBAN_BATCH_TIPOS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Operacao {indice}: tipo invalido. Use: {', '.join(KANBAN_BATCH_TIPOS)}",
+            )
+        if op.tipo.endswith("_ideia") and op.ideia_id is None:
+            raise HTTPException(status_code=400, detail=f"Operacao {indice}: ideia_id e obrigatorio")
+        if op.tipo.endswith("_card") and op.card_id is None:
+            raise HTTPException(status_code=400, detail=f"Operacao {indice}: card_id e obrigatorio")
+
+    ideia_ids = {op.ideia_id for op in operacoes if op.tipo.endswith("_ideia")}
+    card_ids = {op.card_id for op in operacoes if op.tipo.endswith("_card")}
+    projeto_ids = {op.projeto_id for op in operacoes if op.tipo == "vincular_ideia" and op.projeto_id is not None}
+    kanban_ids = {
+        op.kanban_id
+        for op in operacoes
+        if op.tipo == "vincular_ideia" and op.projeto_id is not None and op.kanban_id is not None
+    }
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            # Validacao de acesso em conjunto: uma consulta por tipo de entidade.
+            ideias = _fetch_rows_by_ids(
+                cur,
+                """
+                SELECT id, projeto_id, kanban_id, kanban_status, kanban_ativo, kanban_posicao
+                FROM ideias
+                WHERE usuario_id = %s AND id = ANY(%s)
+                FOR UPDATE
+                """,
+                ideia_ids,
+                usuario_id,
+            )
+            cards = _fetch_rows_by_ids(
+                cur,
+                """
+                SELECT id, kanban_id, titulo, descricao, checklist, prazo_entrega, kanban_status, kanban_posicao
+                FROM kanban_cards
+                WHERE usuario_id = %s AND id = ANY(%s)
+                FOR UPDATE
+                """,
+                card_ids,
+                usuario_id,
+            )
+            projetos = _fetch_rows_by_ids(
+                cur,
+                "SELECT id FROM projetos WHERE usuario_id = %s AND id = ANY(%s)",
+                projeto_ids,
+                usuario_id,
+            )
+            kanbans = _fetch_rows_by_ids(
+                cur,
+                "SELECT id, projeto_id, nome FROM kanbans WHERE usuario_id = %s AND id = ANY(%s)",
+                kanban_ids,
+                usuario_id,
+            )
+
+            for label, esperados, encontrados in (
+                ("Ideias", ideia_ids, ideias),
+                ("Cards do kanban", card_ids, cards),
+                ("Projetos", projeto_ids, projetos),
+                ("Kanbans", kanban_ids, kanbans),
+            ):
+                faltando = sorted(esperados - set(encontrados))
+                if faltando:
+                    raise HTTPException(
+                        status_code=404,
+                        detail=f"{label} nao encontrados para este usuario: {', '.join(map(str, faltando))}",
+                    )
+
+            historico: List[dict] = []
+            ideias_alteradas = set()
+            ideias_excluidas: List[int] = []
+            cards_alterados = set()
+            cards_excluidos: List[int] = []
+            # Topo atual de cada coluna tocada: itens que entram numa coluna vao para
+            # cima do anterior, na mesma ordem em que as operacoes foram enviadas.
+            topos_colunas: dict = {}
+            # Saidas sem historico por ideia; exclusoes usam o estado original, ja que o
+            # historico das operacoes anteriores da ideia no lote nao e gravado.
+            estado_original_cards = {card_id: card["kanban_status"] for card_id, card in cards.items()}
+            estado_original = {
+                ideia_id: (ideia_id, ideia.get("kanban_id"), ideia.get("kanban_ativo"), ideia.get("kanban_status"))
+                for ideia_id, ideia in ideias.items()
+            }
+            saidas_fluxo: dict = {}
+            eventos_cards: dict = {}
+
+            def _proximo_topo(kanban_id: Optional[int], status: str) -> Optional[str]:
+                if kanban_id is None:
+                    return None
+                chave = (kanban_id, status)
+                if chave not in topos_colunas:
+                    _lock_kanban_ranks(cur, kanban_id)
+                    topos_colunas[chave] = _kanban_rank_vizinho(cur, kanban_id, status)
+                topos_colunas[chave] = rank_between(None, topos_colunas[chave])
+                return topos_colunas[chave]
+
+            for indice, op in enumerate(operacoes):
+                if op.tipo.endswith("_ideia"):
+                    ideia = ideias[op.ideia_id]
+                    if ideia.get("excluida"):
+                        raise HTTPException(status_code=400, detail=f"Operacao {indice}: ideia {op.ideia_id} ja foi excluida neste lote")
+                else:
+                    card = cards[op.card_id]
+                    if card.get("excluido"):
+                        raise HTTPException(status_code=400, detail=f"Operacao {indice}: card {op.card_id} ja foi excluido neste lote")
+
+                if op.tipo == "mover_ideia":
+                    status_final = _validate_kanban_status(op.kanban_status)
+                    status_atual = _normalize_stored_kanban_status(ideia.get("kanban_status"))
+                    if status_atual != status_final or not ideia.get("kanban_ativo") or not ideia.get("kanban_posicao"):
+                        ideia["kanban_posicao"] = _proximo_topo(ideia.get("kanban_id"), status_final)
+                    if status_atual != status_final or not ideia.get("kanban_ativo"):
+                        historico.append(
+                            {
+                                "ideia_id": op.ideia_id,
+                                "usuario_id": usuario_id,
+                                "de_status": status_atual,
+                                "para_status": status_final,
+                                "observacao": (
+                                    "Entrada inicial no Kanban"
+                                    if not ideia.get("kanban_ativo") and not status_atual
+                                    else None
+                                ),
+                            }
+                        )
+                    ideia.update(kanban_ativo=True, kanban_status=status_final, kanban_tocado=True)
+                    ideias_alteradas.add(op.ideia_id)
+
+                elif op.tipo == "vincular_ideia":
+                    projeto_id = op.projeto_id
+                    kanban = kanbans.get(op.kanban_id) if projeto_id is not None and op.kanban_id is not None else None
+                    if kanban and kanban["projeto_id"] != projeto_id:
+                        raise HTTPException(
+                            status_code=400,
+                            detail=f"Operacao {indice}: kanban nao pertence ao projeto informado",
+                        )
+                    status_anterior = _normalize_stored_kanban_status(ideia.get("kanban_status"))
+                    possui_kanban = kanban is not None
+                    mudou_kanban = (
+                        projeto_id != ideia.get("projeto_id")
+                        or ideia.get("kanban_id") != (kanban["id"] if kanban else None)
+                    )
+                    if possui_kanban:
+                        kanban_status = (
+                            "novo"
+                            if mudou_kanban or not ideia.get("kanban_ativo")
+                            else (status_anterior or "novo")
+                        )
+                        if mudou_kanban or not ideia.get("kanban_ativo") or status_anterior != kanban_status:
+                            historico.append(
+                                {
+                                    "ideia_id": op.ideia_id,
+                                    "usuario_id": usuario_id,
+                                    "de_status": status_anterior if ideia.get("kanban_ativo") else None,
+                                    "para_status": kanban_status,
+                                    "observacao": f"Card vinculado ao kanban {kanban['nome']}",
+                                }
+                            )
+                        if mudou_kanban or not ideia.get("kanban_ativo") or status_anterior != kanban_status or not ideia.get("kanban_posicao"):
+                            ideia["kanban_posicao"] = _proximo_topo(kanban["id"], kanban_status)
+                    else:
+                        kanban_status = None
+                        ideia["kanban_posicao"] = None
+                        saidas_fluxo.setdefault(op.ideia_id, []).append(
+                            (op.ideia_id, ideia.get("kanban_id"), ideia.get("kanban_ativo"), ideia.get("kanban_status"))
+                        )
+                    kanban_tocado = possui_kanban or mudou_kanban or bool(ideia.get("kanban_ativo")) != possui_kanban
+                    ideia.update(
+                        projeto_id=projeto_id,
+                        kanban_id=kanban["id"] if kanban else None,
+                        kanban_ativo=possui_kanban,
+                        kanban_status=kanban_status,
+                        kanban_tocado=ideia.get("kanban_tocado") or kanban_tocado,
+                    )
+                    ideias_alteradas.add(op.ideia_id)
+
+                elif op.tipo == "excluir_ideia":
+                    ideia["excluida"] = True
+                    saidas_fluxo[op.ideia_id] = [estado_original[op.ideia_id]]
+                    ideias_excluidas.append(op.ideia_id)
+
+                elif op.tipo == "atualizar_card":
+                    dados = op.card or KanbanCardUpdate()
+                    campos = getattr(dados, "model_fields_set", None) or getattr(dados, "__fields_set__", set())
+                    # Retrato antes de aplicar `dados`: os eventos comparam com o estado anterior
+                    estado_anterior = dict(card)
+                    if "titulo" in campos:
+                        card["titulo"] = _normalize_workspace_name(dados.titulo, "card")
+                    if "descricao" in campos:
+                        card["descricao"] = _normalize_optional_text(dados.descricao)
+                    if "checklist" in campos:
+                        card["checklist"] = _normalize_kanban_checklist(dados.checklist)
+                    if "prazo_entrega" in campos:
+                        card["prazo_entrega"] = dados.prazo_entrega
+                    status_anterior = card["kanban_status"]
+                    if "kanban_status" in campos:
+                        card["kanban_status"] = _validate_kanban_status(dados.kanban_status)
+                    elif op.kanban_status is not None:
+                        card["kanban_status"] = _validate_kanban_status(op.kanban_status)
+                    if card["kanban_status"] != status_anterior:
+                        card["kanban_posicao"] = _proximo_topo(card["kanban_id"], card["kanban_status"])
+                    eventos_cards.setdefault(op.card_id, []).extend(
+                        _card_update_events(estado_anterior, usuario_id, card["kanban_status"], card.get("checklist") or [])
+                    )
+                    cards_alterados.add(op.card_id)
+
+                elif op.tipo == "excluir_card":
+                    card["excluido"] = True
+                    # As alteracoes anteriores do card neste lote nao sao gravadas.
+                    eventos_cards[op.card_id] = [
+                        {
+                            "kanban_id": card["kanban_id"],
+                            "usuario_id": usuario_id,
+                            "item_tipo": "card",
+                            "item_id": op.card_id,
+                            "evento": "excluido",
+                            "de_status": estado_original_cards[op.card_id],
+                        }
+                    ]
+                    cards_excluidos.append(op.card_id)
+
+            ideias_para_atualizar = [ideia_id for ideia_id in sorted(ideias_alteradas) if not ideias[ideia_id].get("excluida")]
+            if ideias_para_atualizar:
+                execute_values(
+                    cur,
+                    """
+                    UPDATE ideias AS i
+                    SET projeto_id = v.projeto_id,
+                        kanban_id = v.kanban_id,
+                        kanban_ativo = v.kanban_ativo,
+                        kanban_status = v.kanban_status,
+                        kanban_posicao = v.kanban_posicao,
+                        kanban_updated_at = CASE WHEN v.kanban_tocado THEN NOW() ELSE i.kanban_updated_at END,
+                        updated_at = NOW()
+                    FROM (VALUES %s) AS v (id, usuario_id, projeto_id, kanban_id, kanban_ativo, kanban_status, kanban_posicao, kanban_tocado)
+                    WHERE i.id = v.id AND i.usuario_id = v.usuario_id
+                    """,
+                    [
+                        (
+                            ideia_id,
+                            usuario_id,
+                            ideias[ideia_id].get("projeto_id"),
+                            ideias[ideia_id].get("kanban_id"),
+                            bool(ideias[ideia_id].get("kanban_ativo")),
+                            ideias[ideia_id].get("kanban_status"),
+                            ideias[ideia_id].get("kanban_posicao"),
+                            bool(ideias[ideia_id].get("kanban_tocado")),
+                        )
+                        for ideia_id in ideias_para_atualizar
+                    ],
+                    template="(%s, %s::bigint, %s::bigint, %s::bigint, %s::boolean, %s::varchar, %s::text, %s::boolean)",
+                )
+
+            historico = [entry for entry in historico if not ideias[entry["ideia_id"]].get("excluida")]
+            _insert_kanban_history_bulk(cur, historico)
+            _registrar_saida_kanban(cur, usuario_id, [saida for saidas in saidas_fluxo.values() for saida in saidas])
+
+            if ideias_excluidas:
+                tag_suggestions.remover(cur, usuario_id, ideias_excluidas)
+                cur.execute(
+                    "DELETE FROM ideias WHERE usuario_id = %s AND id = ANY(%s)",
+                    (usuario_id, ideias_excluidas),
+                )
+                related_ideas.marcar(cur, usuario_id, ideias_excluidas)
+
+            cards_para_atualizar = [card_id for card_id in sorted(cards_alterados) if not cards[card_id].get("excluido")]
+            if cards_para_atualizar:
+                execute_values(
+                    cur,
+                    """
+                    UPDATE kanban_cards AS kc
+                    SET titulo = v.titulo,
+                        descricao = v.descricao,
+                        checklist = v.checklist,
+                        prazo_entrega = v.prazo_entrega,
+                        kanban_status = v.kanban_status,
+                        kanban_posicao = v.kanban_posicao,
+                        updated_at = NOW()
+                    FROM (VALUES %s) AS v (id, usuario_id, titulo, descricao, checklist, prazo_entrega, kanban_status, kanban_posicao)
+                    WHERE kc.id = v.id AND kc.usuario_id = v.usuario_id
+                    """,
+                    [
+                        (
+                            card_id,
+                            usuario_id,
+                            cards[card_id]["titulo"],
+                            cards[card_id].get("descricao"),
+                            psycopg2.extras.Json(cards[card_id].get("checklist") or []),
+                            cards[card_id].get("prazo_entrega"),
+                            cards[card_id]["kanban_status"],
+                            cards[card_id].get("kanban_posicao"),
+                        )
+                        for card_id in cards_para_atualizar
+                    ],
+                    template="(%s, %s::bigint, %s::varchar, %s::text, %s::jsonb, %s::timestamptz, %s::varchar, %s::text)",
+                )
+
+            if cards_excluidos:
+                cur.execute(
+                    "DELETE FROM kanban_cards WHERE usuario_id = %s AND id = ANY(%s)",
+                    (usuario_id, cards_excluidos),
+                )
+            _registrar_eventos_kanban(cur, [evento for eventos in eventos_cards.values() for evento in eventos])
+
+            resposta = {
+                "ideias": _fetch_ideas_by_ids(cur, ideias_para_atualizar, usuario_id),
+                "cards": _fetch_kanban_cards_by_ids(cur, cards_para_atualizar, usuario_id),
+                "ideias_excluidas": ideias_excluidas,
+                "cards_excluidos": cards_excluidos,
+                "historico_registrado": len(historico),
+            }
+            conn.commit()
+            invalidar_busca_usuario(usuario_id, vetores=True)
+            for (kanban_id, status), posicao in topos_colunas.items():
+                _agendar_rebalanceamento(background_tasks, kanban_id, status, posicao)
+            return resposta
+    except HTTPException:
+        raise
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Erro ao aplicar lote no kanban: {str(e)}")
+    finally:
+        conn.close()
+
+@app.get("/api/ideias", response_model=List[IdeiaResponse])
+@orcamento_sql(4)
+def buscar_todas_ideias(user: dict = Depends(obter_usuario_assinante)):
+    """Buscar todas as ideias do usuário autenticado"""
+    if not user:
+        print("❌ ERRO: Tentativa de buscar ideias sem autenticação!")
+        raise HTTPException(status_code=401, detail="Não autenticado")
+    
+    usuario_id = user.get("user_id")
+    usuario_email = user.get("email", "N/A")
+    
+    if not usuario_id:
+        print(f"❌ ERRO: Token não contém 'user_id'! Payload: {user}")
+        raise HTTPException(status_code=401, detail="Token inválido: user_id não encontrado")
+    
+    print(f"🔍 Buscando ideias para usuario_id: {usuario_id} (email: {usuario_email})")
+    
+    conn = None
+    try:
+        conn = get_db_connection()
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            # Primeiro, verificar se existem ideias sem dono (para debug)
+            cur.execute("SELECT COUNT(*) as total FROM ideias WHERE usuario_id IS NULL")
+            sem_dono = cur.fetchone()["total"]
+            if sem_dono > 0:
+                print(f"⚠️  AVISO: Existem {sem_dono} ideia(s) sem dono (usuario_id IS NULL) no banco!")
+            
+            # Verificar total de ideias no banco (para debug)
+            cur.execute("SELECT COUNT(*) as total FROM ideias")
+            total_geral = cur.fetchone()["total"]
+            print(f"📊 Total de ideias no banco: {total_geral}")
+
+            ideias = _fetch_ideas_for_user(cur, usuario_id)
+            print(f"✅ Encontradas {len(ideias)} ideia(s) para usuario_id: {usuario_id} (email: {usuario_email})")
+
+            for ideia in ideias:
+                print(f"   • ID {ideia['id']}: '{ideia['titulo']}' | Tag: '{ideia.get('tag', 'N/A')}'")
+
+            print(f"✅ Retornando {len(ideias)} ideia(s) para o frontend")
+            return ideias
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Erro ao buscar ideias: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar ideias: {str(e)}")
+    finally:
+        if conn:
+            conn.close()
+
+@app.get("/api/ideias/{ideia_id}", response_model=IdeiaResponse)
+def buscar_ideia_por_id(ideia_id: int, user: dict = Depends(obter_usuario_assinante)):
+    """Buscar ideia por ID (apenas do usuário autenticado)"""
+    if not user:
+        raise HTTPException(status_code=401, detail="Não autenticado")
+    
+    usuario_id = user["user_id"]
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            ideia = _fetch_idea_record(cur, ideia_id, usuario_id)
+            if not ideia:
                 raise HTTPException(status_code=404, detail="Ideia não encontrada")
-
-            projeto_id = _validate_project_access(cur, payload.projeto_id, usuario_id)
-            kanban = _validate_kanban_access(cur, payload.kanban_id, usuario_id, projeto_id) if projeto_id else None
-            projeto_anterior = ideia_existente.get("projeto_id")
-            kanban_anterior = ideia_existente.get("kanban_id")
-            status_anterior = (ideia_existente.get("kanban_status") or "").strip().lower() or None
-            if status_anterior and status_anterior not in KANBAN_STATUS_SET:
-                status_anterior = None
-
-            possui_kanban = kanban is not None
-            mudou_kanban = (
-                projeto_id != projeto_anterior
-                or kanban_anterior != (kanban["id"] if kanban else None)
-            )
-
-            if possui_kanban:
-                kanban_status = (
-                    "novo"
-                    if mudou_kanban or not ideia_existente.get("kanban_ativo")
-                    else (status_anterior or "novo")
-                )
-                kanban_ativo = True
-                kanban_id_final = kanban["id"]
-            else:
-                kanban_status = None
-                kanban_ativo = False
-                kanban_id_final = None
-
-            cur.execute(
-                """
-                UPDATE ideias
-                SET projeto_id = %s,
-                    kanban_id = %s,
-                    kanban_ativo = %s,
-                    kanban_status = %s,
-                    kanban_updated_at = CASE
-                        WHEN %s OR %s OR %s THEN NOW()
-                        ELSE kanban_updated_at
-                    END,
-                    updated_at = NOW()
-                WHERE id = %s AND usuario_id = %s
-                """,
-                (
-                    projeto_id,
-                    kanban_id_final,
-                    kanban_ativo,
-                    kanban_status,
-                    possui_kanban,
-                    mudou_kanban,
-                    ideia_existente.get("kanban_ativo") != kanban_ativo,
-                    ideia_id,
-                    usuario_id,
-                ),
-            )
-
-            if possui_kanban and (
-                mudou_kanban
-                or not ideia_existente.get("kanban_ativo")
-                or status_anterior != kanban_status
-            ):
-                _insert_kanban_history(
-                    cur,
-                    ideia_id=ideia_id,
-                    usuario_id=usuario_id,
-                    de_status=status_anterior if ideia_existente.get("kanban_ativo") else None,
-                    para_status=kanban_status,
-                    observacao=f"Card vinculado ao kanban {kanban['nome']}",
-                )
-
-            ideia_atualizada = _fetch_idea_record(cur, ideia_id, usuario_id)
+            return ideia
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar ideia: {str(e)}")
+    finally:
+        conn.close()
+
+def _buscar_duplicatas(
+    cur,
+    usuario_id: int,
+    embedding_str: str,
+    ignorar_id: Optional[int] = None,
+    modelo: str = EMBEDDING_MODELO_ATUAL,
+) -> List[dict]:
+    """Ideias do usuario quase identicas ao embedding (uma unica consulta ao indice vetorial)."""
+    cur.execute("SET LOCAL ivfflat.probes = %s", (10,))
+    cur.execute(
+        """
+        SELECT id, titulo, tag, 1 - (embedding <=> %s::vector) AS similarity
+        FROM ideias
+        WHERE usuario_id = %s AND embedding_modelo = %s AND embedding IS NOT NULL AND id IS DISTINCT FROM %s
+        ORDER BY embedding <=> %s::vector
+        LIMIT %s
+        """,
+        (embedding_str, usuario_id, modelo, ignorar_id, embedding_str, DUPLICATA_LIMITE),
+    )
+    return [dict(row) for row in cur.fetchall() if row["similarity"] >= DUPLICATA_SIMILARIDADE_MINIMA]
+
+
+@app.post("/api/ideias", response_model=IdeiaResponse)
+@orcamento_sql(10)
+def criar_ideia(
+    ideia: IdeiaCreate,
+    request: Request,
+    verificar_duplicatas: bool = Query(False),
+    user: dict = Depends(obter_usuario_assinante),
+):
+    """Criar nova ideia com embedding automático (associada ao usuário)
+
+    Com `verificar_duplicatas=true`, a resposta traz em `duplicatas_provaveis` as
+    ideias existentes quase identicas (para oferecer a mescla).
+    """
+    import sys
+    sys.stdout.flush()  # Forçar saída imediata
+    print("=" * 80, flush=True)
+    print("📝 NOVA REQUISIÇÃO: Criar Ideia", flush=True)
+    print(f"   Payload recebido: titulo='{ideia.titulo}', tag='{ideia.tag}', ideia='{ideia.ideia[:50] if ideia.ideia else ''}...'")
+    
+    # Verificar headers diretamente
+    auth_header = request.headers.get("Authorization") or request.headers.get("authorization")
+    print(f"   Authorization header direto: {'Presente' if auth_header else 'AUSENTE!'}")
+    
+    print(f"   User object recebido: {user}")
+    print(f"   Tipo do user: {type(user)}")
+    print("=" * 80)
+    
+    if not user:
+        print("❌ ERRO CRÍTICO: Tentativa de criar ideia sem autenticação!")
+        print("   O header Authorization não foi enviado ou o token é inválido")
+        print(f"   Headers recebidos: {list(request.headers.keys())}")
+        raise HTTPException(status_code=401, detail="Não autenticado")
+    
+    usuario_id = user.get("user_id") if isinstance(user, dict) else None
+    usuario_email = user.get("email", "N/A") if isinstance(user, dict) else "N/A"
+    
+    if not usuario_id:
+        print(f"❌ ERRO CRÍTICO: Token não contém 'user_id'!")
+        print(f"   Payload completo do token: {user}")
+        print(f"   Tipo do user: {type(user)}")
+        if isinstance(user, dict):
+            print(f"   Chaves disponíveis no user: {list(user.keys())}")
+        raise HTTPException(status_code=401, detail="Token inválido: user_id não encontrado")
+    
+    print(f"✅ Autenticação OK: usuario_id={usuario_id}, email={usuario_email}")
+    print(f"📝 Criando ideia para usuario_id: {usuario_id}, titulo: '{ideia.titulo}'")
+    
+    conn = get_db_connection()
+    try:
+        # Gerar embedding automaticamente se API Key estiver configurada
+        embedding_str = None
+        embedding_proximo = None
+        modelo = get_embeddings_model()
+        if modelo:
+            try:
+                texto_completo = f"{ideia.titulo} {ideia.tag or ''} {ideia.ideia}".strip()
+                embedding = gerar_embedding(texto_completo)
+                if embedding:
+                    embedding_str = "[" + ",".join(map(str, embedding)) + "]"
+                    print(f"   ✅ Embedding gerado: {len(embedding)} dimensões")
+                    embedding_proximo = gerar_embeddings_proximos([texto_completo])
+            except Exception as e:
+                print(f"⚠️  Erro ao gerar embedding (salvando sem embedding): {e}")
+        
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            projeto_id = _validate_project_access(cur, ideia.projeto_id, usuario_id)
+
+            # VALIDAÇÃO FINAL CRÍTICA: Garantir que usuario_id não é None antes do INSERT
+            if usuario_id is None or usuario_id == "":
+                error_msg = f"ERRO CRÍTICO: usuario_id é None ou vazio antes do INSERT! user={user}"
+                print(f"   ❌ {error_msg}")
+                conn.rollback()
+                raise ValueError(error_msg)
+            
+            # Garantir que é um número inteiro
+            try:
+                usuario_id = int(usuario_id)
+            except (ValueError, TypeError):
+                error_msg = f"ERRO CRÍTICO: usuario_id não é um número válido! usuario_id={usuario_id}, tipo={type(usuario_id)}"
+                print(f"   ❌ {error_msg}")
+                conn.rollback()
+                raise ValueError(error_msg)
+            
+            print(f"   💾 Executando INSERT com usuario_id={usuario_id} (tipo: {type(usuario_id)})", flush=True)
+            print(f"   📋 Valores a inserir: titulo='{ideia.titulo}', tag='{ideia.tag}', usuario_id={usuario_id}", flush=True)
+            
+            # ÚLTIMA VERIFICAÇÃO ANTES DO INSERT - NUNCA PERMITIR NULL
+            if usuario_id is None:
+                import sys
+                sys.stderr.write(f"❌ ERRO CRÍTICO: Tentativa de INSERT com usuario_id=None bloqueada!\n")
+                sys.stderr.flush()
+                conn.rollback()
+                raise ValueError("usuario_id NÃO PODE SER None - operação bloqueada por segurança")
+            
+            # Garantir que é int
+            usuario_id = int(usuario_id)
+
+            # Antes do INSERT, para a nova ideia nao aparecer como duplicata de si mesma
+            duplicatas = None
+            if verificar_duplicatas:
+                duplicatas = _buscar_duplicatas(cur, usuario_id, embedding_str) if embedding_str else []
+            
+            if embedding_str:
+                cur.execute(
+                    """
+                    INSERT INTO ideias (
+                        titulo, tag, ideia, embedding, embedding_modelo, embedding_dimensoes, usuario_id, projeto_id
+                    )
+                    VALUES (%s, %s, %s, %s::vector, %s, %s, %s, %s)
+                    RETURNING id
+                    """,
+                    (
+                        ideia.titulo, ideia.tag, ideia.ideia, embedding_str,
+                        EMBEDDING_MODELO_ATUAL, len(embedding), usuario_id, projeto_id,
+                    )
+                )
+            else:
+                cur.execute(
+                    """
+                    INSERT INTO ideias (titulo, tag, ideia, usuario_id, projeto_id)
+                    VALUES (%s, %s, %s, %s, %s)
+                    RETURNING id
+                    """,
+                    (ideia.titulo, ideia.tag, ideia.ideia, usuario_id, projeto_id)
+                )
+            
+            nova_ideia = cur.fetchone()
+            
+            if not nova_ideia:
+                error_msg = "ERRO: INSERT não retornou nenhum resultado!"
+                print(f"   ❌ {error_msg}")
+                conn.rollback()
+                raise ValueError(error_msg)
+            
+            # Verificar o que foi realmente salvo
+            ideia_id = nova_ideia["id"]
+            ideia_completa = _fetch_idea_record(cur, ideia_id, usuario_id)
+            ideia_completa["duplicatas_provaveis"] = duplicatas
+            if embedding_str:
+                related_ideas.marcar(cur, usuario_id, [ideia_id])
+                tag_suggestions.adicionar(cur, usuario_id, [ideia_id], EMBEDDING_MODELO_ATUAL)
+                gravar_embeddings_proximos(cur, [ideia_id], embedding_proximo)
+            usuario_id_salvo = usuario_id
+            print(f"   📊 Resultado do INSERT:")
+            print(f"      • ID: {ideia_id}")
+            print(f"      • Título: '{ideia.titulo}'")
+            print(f"      • usuario_id SALVO: {usuario_id_salvo} (tipo: {type(usuario_id_salvo)})")
+            
+            if usuario_id_salvo is None:
+                error_msg = "ERRO CRÍTICO: usuario_id foi salvo como NULL no banco apesar de validações!"
+                print(f"   ❌ {error_msg}")
+                conn.rollback()
+                raise ValueError(error_msg)
+            
+            if int(usuario_id_salvo) != int(usuario_id):
+                print(f"   ⚠️  ATENÇÃO: usuario_id esperado ({usuario_id}) diferente do salvo ({usuario_id_salvo})")
+            
             conn.commit()
-            if not ideia_atualizada:
-                raise HTTPException(status_code=404, detail="Ideia não encontrada")
-            return ideia_atualizada
+            invalidar_busca_usuario(usuario_id, vetores=True)
+            print(f"✅ Ideia criada com sucesso: ID {ideia_id}, usuario_id={usuario_id_salvo}")
+            print("=" * 80)
+            return ideia_completa
     except HTTPException:
         raise
     except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=500, detail=f"Erro ao vincular ideia ao projeto: {str(e)}")
+        if conn:
+            conn.rollback()
+        print(f"❌ ERRO ao criar ideia: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Erro ao criar ideia: {str(e)}")
     finally:
-        conn.close()
+        if conn:
+            conn.close()
 
-@app.get("/api/ideias", response_model=List[IdeiaResponse])
-def buscar_todas_ideias(user: dict = Depends(obter_usuario_assinante)):
-    """Buscar todas as ideias do usuário autenticado"""
+@app.post("/api/ideias/com-embedding", response_model=IdeiaResponse)
+def criar_ideia_com_embedding(
+    dados: IdeiaComEmbedding,
+    verificar_duplicatas: bool = Query(False),
+    user: dict = Depends(obter_usuario_assinante),
+):
+    """Criar ideia com embedding (associada ao usuário)"""
+    print("=" * 80)
+    print("📝 NOVA REQUISIÇÃO: Criar Ideia COM Embedding")
+    print(f"   Payload recebido: titulo='{dados.ideia.titulo}', tag='{dados.ideia.tag}'")
+    print(f"   User object recebido: {user}")
+    print("=" * 80)
+    
     if not user:
-        print("❌ ERRO: Tentativa de buscar ideias sem autenticação!")
+        print("❌ ERRO CRÍTICO: Tentativa de criar ideia com embedding sem autenticação!")
+        print("   O header Authorization não foi enviado ou o token é inválido")
         raise HTTPException(status_code=401, detail="Não autenticado")
     
     usuario_id = user.get("user_id")
     usuario_email = user.get("email", "N/A")
     
     if not usuario_id:
-        print(f"❌ ERRO: Token não contém 'user_id'! Payload: {user}")
+        print(f"❌ ERRO CRÍTICO: Token não contém 'user_id'!")
+        print(f"   Payload completo do token: {user}")
         raise HTTPException(status_code=401, detail="Token inválido: user_id não encontrado")
     
-    print(f"🔍 Buscando ideias para usuario_id: {usuario_id} (email: {usuario_email})")
+    print(f"✅ Autenticação OK: usuario_id={usuario_id}, email={usuario_email}")
+    print(f"📝 Criando ideia com embedding para usuario_id: {usuario_id}, titulo: '{dados.ideia.titulo}'")
     
-    conn = None
+    # Vetor do proximo modelo (troca em curso) antes de abrir a transacao
+    embedding_proximo = gerar_embeddings_proximos(
+        [_idea_embedding_text(dados.ideia.titulo, dados.ideia.tag, dados.ideia.ideia)]
+    )
+    conn = get_db_connection()
     try:
-        conn = get_db_connection()
+        embedding_str = "[" + ",".join(map(str, dados.embedding)) + "]"
+        
+        # Garantir que usuario_id não é None antes do INSERT
+        if usuario_id is None:
+            raise ValueError("usuario_id não pode ser None no momento do INSERT")
+        
+        print(f"   💾 Executando INSERT com usuario_id={usuario_id}")
+        
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            # Primeiro, verificar se existem ideias sem dono (para debug)
-            cur.execute("SELECT COUNT(*) as total FROM ideias WHERE usuario_id IS NULL")
-            sem_dono = cur.fetchone()["total"]
-            if sem_dono > 0:
-                print(f"⚠️  AVISO: Existem {sem_dono} ideia(s) sem dono (usuario_id IS NULL) no banco!")
+            projeto_id = _validate_project_access(cur, dados.ideia.projeto_id, usuario_id)
+            modelo_embedding = _modelo_embedding_cliente(dados.embedding)
+            duplicatas = (
+                _buscar_duplicatas(cur, usuario_id, embedding_str, modelo=modelo_embedding)
+                if verificar_duplicatas else None
+            )
+            cur.execute(
+                """
+                INSERT INTO ideias (
+                    titulo, tag, ideia, embedding, embedding_modelo, embedding_dimensoes, usuario_id, projeto_id
+                )
+                VALUES (%s, %s, %s, %s::vector, %s, %s, %s, %s)
+                RETURNING id
+                """,
+                (
+                    dados.ideia.titulo, dados.ideia.tag, dados.ideia.ideia, embedding_str,
+                    modelo_embedding, len(dados.embedding), usuario_id, projeto_id,
+                )
+            )
+            nova_ideia = cur.fetchone()
             
-            # Verificar total de ideias no banco (para debug)
-            cur.execute("SELECT COUNT(*) as total FROM ideias")
-            total_geral = cur.fetchone()["total"]
-            print(f"📊 Total de ideias no banco: {total_geral}")
-
-            ideias = _fetch_ideas_for_user(cur, usuario_id)
-            print(f"✅ Encontradas {len(ideias)} ideia(s) para usuario_id: {usuario_id} (email: {usuario_email})")
-
-            for ideia in ideias:
-                print(f"   • ID {ideia['id']}: '{ideia['titulo']}' | Tag: '{ideia.get('tag', 'N/A')}'")
-
-            print(f"✅ Retornando {len(ideias)} ideia(s) para o frontend")
-            return ideias
+            # Verificar o que foi realmente salvo
+            ideia_id = nova_ideia["id"] if nova_ideia else None
+            usuario_id_salvo = usuario_id
+            print(f"   📊 Resultado do INSERT:")
+            print(f"      • ID: {ideia_id if nova_ideia else 'N/A'}")
+            print(f"      • Título: '{dados.ideia.titulo if nova_ideia else 'N/A'}'")
+            print(f"      • usuario_id SALVO: {usuario_id_salvo}")
+            
+            if usuario_id_salvo is None:
+                print("   ❌ ERRO: usuario_id foi salvo como NULL no banco!")
+                conn.rollback()
+                raise ValueError("usuario_id não pode ser NULL - problema no INSERT")
+            
+            if usuario_id_salvo != usuario_id:
+                print(f"   ⚠️  ATENÇÃO: usuario_id esperado ({usuario_id}) diferente do salvo ({usuario_id_salvo})")
+            
+            ideia_completa = _fetch_idea_record(cur, ideia_id, usuario_id)
+            ideia_completa["duplicatas_provaveis"] = duplicatas
+            related_ideas.marcar(cur, usuario_id, [ideia_id])
+            tag_suggestions.adicionar(cur, usuario_id, [ideia_id], EMBEDDING_MODELO_ATUAL)
+            gravar_embeddings_proximos(cur, [ideia_id], embedding_proximo)
+            conn.commit()
+            invalidar_busca_usuario(usuario_id, vetores=True)
+            print(f"✅ Ideia criada com embedding com sucesso: ID {ideia_id}, usuario_id={usuario_id_salvo}")
+            print("=" * 80)
+            return ideia_completa
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Erro ao buscar ideias: {e}")
+        if conn:
+            conn.rollback()
+        print(f"❌ ERRO ao criar ideia: {e}")
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Erro ao buscar ideias: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao criar ideia: {str(e)}")
     finally:
         if conn:
             conn.close()
 
-@app.get("/api/ideias/{ideia_id}", response_model=IdeiaResponse)
-def buscar_ideia_por_id(ideia_id: int, user: dict = Depends(obter_usuario_assinante)):
-    """Buscar ideia por ID (apenas do usuário autenticado)"""
+@app.put("/api/ideias/{ideia_id}", response_model=IdeiaResponse)
+@orcamento_sql(13)
+def atualizar_ideia(ideia_id: int, ideia: IdeiaUpdate, user: dict = Depends(obter_usuario_assinante)):
+    """Atualizar ideia existente (apenas do usuário autenticado)"""
+    if not user:
+        raise HTTPException(status_code=401, detail="Não autenticado")
+    
+    usuario_id = user["user_id"]
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            # Verificar se a ideia existe e pertence ao usuário
+            cur.execute(
+                """
+                SELECT titulo, tag, ideia, projeto_id, kanban_id, kanban_ativo, kanban_status
+                FROM ideias
+                WHERE id = %s AND usuario_id = %s
+                """,
+                (ideia_id, usuario_id),
+            )
+            ideia_existente = cur.fetchone()
+            if not ideia_existente:
+                raise HTTPException(status_code=404, detail="Ideia não encontrada ou você não tem permissão para editar")
+            
+            # Usar valores atualizados ou manter os existentes
+            titulo_final = ideia.titulo if ideia.titulo is not None else ideia_existente['titulo']
+            tag_final = ideia.tag if ideia.tag is not None else ideia_existente['tag']
+            ideia_final = ideia.ideia if ideia.ideia is not None else ideia_existente['ideia']
+            projeto_final = (
+                _validate_project_access(cur, ideia.projeto_id, usuario_id)
+                if ideia.projeto_id is not None
+                else ideia_existente.get('projeto_id')
+            )
+            clear_kanban = projeto_final != ideia_existente.get("projeto_id")
+            
+            # Regenerar embedding automaticamente se API Key estiver configurada. Os dois
+            # vetores sao gerados antes do UPDATE, sem transacao aberta durante as chamadas.
+            conn.rollback()
+            embedding_str = None
+            texto_completo = f"{titulo_final} {tag_final or ''} {ideia_final}".strip()
+            embedding_proximo = gerar_embeddings_proximos([texto_completo])
+            modelo = get_embeddings_model()
+            if modelo:
+                try:
+                    embedding = gerar_embedding(texto_completo)
+                    if embedding:
+                        embedding_str = "[" + ",".join(map(str, embedding)) + "]"
+                except Exception as e:
+                    print(f"⚠️  Erro ao regenerar embedding (continuando sem atualizar embedding): {e}")
+            
+            # Atualizar ideia (verificar se pertence ao usuário)
+            tag_suggestions.remover(cur, usuario_id, [ideia_id])
+            if embedding_str:
+                cur.execute(
+                    """
+                    UPDATE ideias
+                    SET titulo = %s,
+                        tag = %s,
+                        ideia = %s,
+                        embedding = %s::vector,
+                        embedding_modelo = %s,
+                        embedding_dimensoes = %s,
+                        projeto_id = %s,
+                        kanban_id = CASE WHEN %s THEN NULL ELSE kanban_id END,
+                        kanban_ativo = CASE WHEN %s THEN FALSE ELSE kanban_ativo END,
+                        kanban_status = CASE WHEN %s THEN NULL ELSE kanban_status END,
+                        kanban_updated_at = CASE WHEN %s THEN NOW() ELSE kanban_updated_at END,
+                        updated_at = NOW()
+                    WHERE id = %s AND usuario_id = %s
+                    RETURNING id
+                    """,
+                    (
+                        titulo_final,
+                        tag_final,
+                        ideia_final,
+                        embedding_str,
+                        EMBEDDING_MODELO_ATUAL,
+                        len(embedding),
+                        projeto_final,
+                        clear_kanban,
+                        clear_kanban,
+                        clear_kanban,
+                        clear_kanban,
+                        ideia_id,
+                        usuario_id,
+                    )
+                )
+            else:
+                cur.execute(
+                    """
+                    UPDATE ideias
+                    SET titulo = %s,
+                        tag = %s,
+                        ideia = %s,
+                        projeto_id = %s,
+                        kanban_id = CASE WHEN %s THEN NULL ELSE kanban_id END,
+                        kanban_ativo = CASE WHEN %s THEN FALSE ELSE kanban_ativo END,
+                        kanban_status = CASE WHEN %s THEN NULL ELSE kanban_status END,
+                        kanban_updated_at = CASE WHEN %s THEN NOW() ELSE kanban_updated_at END,
+                        updated_at = NOW()
+                    WHERE id = %s AND usuario_id = %s
+                    RETURNING id
+                    """,
+                    (
+                        titulo_final,
+                        tag_final,
+                        ideia_final,
+                        projeto_final,
+                        clear_kanban,
+                        clear_kanban,
+                        clear_kanban,
+                        clear_kanban,
+                        ideia_id,
+                        usuario_id,
+                    )
+                )
+            
+            ideia_atualizada = cur.fetchone()
+            if clear_kanban:
+                _registrar_saida_kanban(
+                    cur,
+                    usuario_id,
+                    [(ideia_id, ideia_existente.get("kanban_id"), ideia_existente.get("kanban_ativo"), ideia_existente.get("kanban_status"))],
+                )
+            if embedding_str:
+                related_ideas.marcar(cur, usuario_id, [ideia_id])
+            tag_suggestions.adicionar(cur, usuario_id, [ideia_id], EMBEDDING_MODELO_ATUAL)
+            gravar_embeddings_proximos(cur, [ideia_id], embedding_proximo)
+            ideia_completa = _fetch_idea_record(cur, ideia_id, usuario_id)
+            conn.commit()
+            invalidar_busca_usuario(usuario_id, vetores=True)
+            return ideia_completa
+    except HTTPException:
+        raise
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Erro ao atualizar ideia: {str(e)}")
+    finally:
+        conn.close()
+
+
+@app.patch("/api/ideias/{ideia_id}/kanban", response_model=IdeiaResponse)
+def atualizar_kanban_ideia(
+    ideia_id: int,
+    payload: KanbanStatusUpdate,
+    background_tasks: BackgroundTasks,
+    user: dict = Depends(obter_usuario_assinante),
+):
+    """Atualiza a coluna atual do Kanban e registra a data da movimentacao."""
     if not user:
-        raise HTTPException(status_code=401, detail="Não autenticado")
-    
+        raise HTTPException(status_code=401, detail="Nao autenticado")
+
     usuario_id = user["user_id"]
+    status_final = _validate_kanban_status(payload.kanban_status)
     conn = get_db_connection()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            ideia = _fetch_idea_record(cur, ideia_id, usuario_id)
-            if not ideia:
-                raise HTTPException(status_code=404, detail="Ideia não encontrada")
-            return ideia
+            cur.execute(
+                """
+                SELECT id, kanban_id, kanban_status, kanban_ativo, kanban_posicao
+                FROM ideias
+                WHERE id = %s AND usuario_id = %s
+                """,
+                (ideia_id, usuario_id),
+            )
+            ideia_existente = cur.fetchone()
+            if not ideia_existente:
+                raise HTTPException(
+                    status_code=404,
+                    detail="Ideia nao encontrada ou voce nao tem permissao para move-la",
+                )
+
+            status_atual = (ideia_existente.get("kanban_status") or "").strip().lower() or None
+            if status_atual and status_atual not in KANBAN_STATUS_SET:
+                status_atual = None
+            kanban_posicao = (
+                _kanban_rank_topo(cur, ideia_existente.get("kanban_id"), status_final)
+                if status_atual != status_final
+                or not ideia_existente.get("kanban_ativo")
+                or not ideia_existente.get("kanban_posicao")
+                else ideia_existente.get("kanban_posicao")
+            )
+
+            cur.execute(
+                """
+                UPDATE ideias
+                SET kanban_ativo = TRUE,
+                    kanban_status = %s,
+                    kanban_posicao = %s,
+                    kanban_updated_at = NOW(),
+                    updated_at = NOW()
+                WHERE id = %s AND usuario_id = %s
+                RETURNING id
+                """,
+                (status_final, kanban_posicao, ideia_id, usuario_id),
+            )
+            ideia_atualizada = cur.fetchone()
+            if not ideia_atualizada:
+                raise HTTPException(
+                    status_code=404,
+                    detail="Ideia nao encontrada ou voce nao tem permissao para move-la",
+                )
+            if status_atual != status_final or not ideia_existente.get("kanban_ativo"):
+                observacao = None
+                if not ideia_existente.get("kanban_ativo") and not status_atual:
+                    observacao = "Entrada inicial no Kanban"
+                _insert_kanban_history(
+                    cur,
+                    ideia_id=ideia_id,
+                    usuario_id=usuario_id,
+                    de_status=status_atual,
+                    para_status=status_final,
+                    observacao=observacao,
+                )
+
+            ideia_completa = _fetch_idea_record(cur, ideia_id, usuario_id)
+            conn.commit()
+            invalidar_busca_usuario(usuario_id)
+            _agendar_rebalanceamento(background_tasks, ideia_existente.get("kanban_id"), status_final, kanban_posicao)
+            return ideia_completa
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao buscar ideia: {str(e)}")
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Erro ao mover ideia no Kanban: {str(e)}")
     finally:
         conn.close()
 
-@app.post("/api/ideias", response_model=IdeiaResponse)
-async def criar_ideia(ideia: IdeiaCreate, request: Request, user: dict = Depends(obter_usuario_assinante)):
-    """Criar nova ideia com embedding automático (associada ao usuário)"""
-    import sys
-    sys.stdout.flush()  # Forçar saída imediata
-    print("=" * 80, flush=True)
-    print("📝 NOVA REQUISIÇÃO: Criar Ideia", flush=True)
-    print(f"   Payload recebido: titulo='{ideia.titulo}', tag='{ideia.tag}', ideia='{ideia.ideia[:50] if ideia.ideia else ''}...'")
-    
-    # Verificar headers diretamente
-    auth_header = request.headers.get("Authorization") or request.headers.get("authorization")
-    print(f"   Authorization header direto: {'Presente' if auth_header else 'AUSENTE!'}")
-    
-    print(f"   User object recebido: {user}")
-    print(f"   Tipo do user: {type(user)}")
-    print("=" * 80)
-    
+
+@app.post("/api/ideias/{ideia_id}/kanban/start", response_model=IdeiaResponse)
+def iniciar_ideia_no_kanban(
+    ideia_id: int,
+    payload: KanbanStartRequest,
+    background_tasks: BackgroundTasks,
+    user: dict = Depends(obter_usuario_assinante),
+):
+    """Ativa a ideia no Kanban a partir da coluna Novo."""
     if not user:
-        print("❌ ERRO CRÍTICO: Tentativa de criar ideia sem autenticação!")
-        print("   O header Authorization não foi enviado ou o token é inválido")
-        print(f"   Headers recebidos: {list(request.headers.keys())}")
-        raise HTTPException(status_code=401, detail="Não autenticado")
-    
-    usuario_id = user.get("user_id") if isinstance(user, dict) else None
-    usuario_email = user.get("email", "N/A") if isinstance(user, dict) else "N/A"
-    
-    if not usuario_id:
-        print(f"❌ ERRO CRÍTICO: Token não contém 'user_id'!")
-        print(f"   Payload completo do token: {user}")
-        print(f"   Tipo do user: {type(user)}")
-        if isinstance(user, dict):
-            print(f"   Chaves disponíveis no user: {list(user.keys())}")
-        raise HTTPException(status_code=401, detail="Token inválido: user_id não encontrado")
-    
-    print(f"✅ Autenticação OK: usuario_id={usuario_id}, email={usuario_email}")
-    print(f"📝 Criando ideia para usuario_id: {usuario_id}, titulo: '{ideia.titulo}'")
-    
+        raise HTTPException(status_code=401, detail="Nao autenticado")
+
+    usuario_id = user["user_id"]
     conn = get_db_connection()
     try:
-        # Gerar embedding automaticamente se API Key estiver configurada
-        embedding_str = None
-        modelo = get_embeddings_model()
-        if modelo:
-            try:
-                texto_completo = f"{ideia.titulo} {ideia.tag or ''} {ideia.ideia}".strip()
-                embedding = gerar_embedding(texto_completo)
-                if embedding:
-                    embedding_str = "[" + ",".join(map(str, embedding)) + "]"
-                    print(f"   ✅ Embedding gerado: {len(embedding)} dimensões")
-            except Exception as e:
-                print(f"⚠️  Erro ao gerar embedding (salvando sem embedding): {e}")
-        
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            projeto_id = _validate_project_access(cur, ideia.projeto_id, usuario_id)
+            cur.execute(
+                """
+                SELECT id, projeto_id, kanban_id, kanban_status, kanban_ativo, kanban_posicao
+                FROM ideias
+                WHERE id = %s AND usuario_id = %s
+                """,
+                (ideia_id, usuario_id),
+            )
+            ideia_existente = cur.fetchone()
+            if not ideia_existente:
+                raise HTTPException(
+                    status_code=404,
+                    detail="Ideia nao encontrada ou voce nao tem permissao para iniciar o Kanban",
+                )
 
-            # VALIDAÇÃO FINAL CRÍTICA: Garantir que usuario_id não é None antes do INSERT
-            if usuario_id is None or usuario_id == "":
-                error_msg = f"ERRO CRÍTICO: usuario_id é None ou vazio antes do INSERT! user={user}"
-                print(f"   ❌ {error_msg}")
-                conn.rollback()
-                raise ValueError(error_msg)
-            
-            # Garantir que é um número inteiro
-            try:
-                usuario_id = int(usuario_id)
-            except (ValueError, TypeError):
-                error_msg = f"ERRO CRÍTICO: usuario_id não é um número válido! usuario_id={usuario_id}, tipo={type(usuario_id)}"
-                print(f"   ❌ {error_msg}")
-                conn.rollback()
-                raise ValueError(error_msg)
-            
-            print(f"   💾 Executando INSERT com usuario_id={usuario_id} (tipo: {type(usuario_id)})", flush=True)
-            print(f"   📋 Valores a inserir: titulo='{ideia.titulo}', tag='{ideia.tag}', usuario_id={usuario_id}", flush=True)
-            
-            # ÚLTIMA VERIFICAÇÃO ANTES DO INSERT - NUNCA PERMITIR NULL
-            if usuario_id is None:
-                import sys
-                sys.stderr.write(f"❌ ERRO CRÍTICO: Tentativa de INSERT com usuario_id=None bloqueada!\n")
-                sys.stderr.flush()
-                conn.rollback()
-                raise ValueError("usuario_id NÃO PODE SER None - operação bloqueada por segurança")
-            
-            # Garantir que é int
-            usuario_id = int(usuario_id)
-            
-            if embedding_str:
-                cur.execute(
-                    """
-                    INSERT INTO ideias (titulo, tag, ideia, embedding, usuario_id, projeto_id)
-                    VALUES (%s, %s, %s, %s::vector, %s, %s)
-                    RETURNING id
-                    """,
-                    (ideia.titulo, ideia.tag, ideia.ideia, embedding_str, usuario_id, projeto_id)
+            projeto_id = ideia_existente.get("projeto_id")
+            if not projeto_id:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Vincule a ideia a um projeto antes de iniciar no Kanban",
                 )
-            else:
-                cur.execute(
-                    """
-                    INSERT INTO ideias (titulo, tag, ideia, usuario_id, projeto_id)
-                    VALUES (%s, %s, %s, %s, %s)
-                    RETURNING id
-                    """,
-                    (ideia.titulo, ideia.tag, ideia.ideia, usuario_id, projeto_id)
+
+            kanban = _validate_kanban_access(cur, payload.kanban_id, usuario_id, projeto_id)
+            if not kanban:
+                raise HTTPException(status_code=400, detail="Kanban invalido")
+
+            status_atual = (ideia_existente.get("kanban_status") or "").strip().lower() or None
+            if status_atual and status_atual not in KANBAN_STATUS_SET:
+                status_atual = None
+            status_inicial = _validate_kanban_status(payload.kanban_status or status_atual or "novo")
+            entrou_na_coluna = (
+                not ideia_existente.get("kanban_ativo")
+                or status_atual != status_inicial
+                or ideia_existente.get("kanban_id") != kanban["id"]
+            )
+            kanban_posicao = (
+                _kanban_rank_topo(cur, kanban["id"], status_inicial)
+                if entrou_na_coluna or not ideia_existente.get("kanban_posicao")
+                else ideia_existente.get("kanban_posicao")
+            )
+
+            cur.execute(
+                """
+                UPDATE ideias
+                SET kanban_id = %s,
+                    kanban_ativo = TRUE,
+                    kanban_status = %s,
+                    kanban_posicao = %s,
+                    kanban_updated_at = NOW(),
+                    updated_at = NOW()
+                WHERE id = %s AND usuario_id = %s
+                RETURNING id
+                """,
+                (kanban["id"], status_inicial, kanban_posicao, ideia_id, usuario_id),
+            )
+            ideia_atualizada = cur.fetchone()
+            if not ideia_atualizada:
+                raise HTTPException(
+                    status_code=404,
+                    detail="Ideia nao encontrada ou voce nao tem permissao para iniciar o Kanban",
                 )
-            
-            nova_ideia = cur.fetchone()
-            
-            if not nova_ideia:
-                error_msg = "ERRO: INSERT não retornou nenhum resultado!"
-                print(f"   ❌ {error_msg}")
-                conn.rollback()
-                raise ValueError(error_msg)
-            
-            # Verificar o que foi realmente salvo
-            ideia_id = nova_ideia["id"]
-            ideia_completa = _fetch_idea_record(cur, ideia_id, usuario_id)
-            usuario_id_salvo = usuario_id
-            print(f"   📊 Resultado do INSERT:")
-            print(f"      • ID: {ideia_id}")
-            print(f"      • Título: '{ideia.titulo}'")
-            print(f"      • usuario_id SALVO: {usuario_id_salvo} (tipo: {type(usuario_id_salvo)})")
-            
-            if usuario_id_salvo is None:
-                error_msg = "ERRO CRÍTICO: usuario_id foi salvo como NULL no banco apesar de validações!"
-                print(f"   ❌ {error_msg}")
-                conn.rollback()
-                raise ValueError(error_msg)
-            
-            if int(usuario_id_salvo) != int(usuario_id):
-                print(f"   ⚠️  ATENÇÃO: usuario_id esperado ({usuario_id}) diferente do salvo ({usuario_id_salvo})")
-            
+            if entrou_na_coluna:
+                _insert_kanban_history(
+                    cur,
+                    ideia_id=ideia_id,
+                    usuario_id=usuario_id,
+                    de_status=None if not ideia_existente.get("kanban_ativo") else status_atual,
+                    para_status=status_inicial,
+                    observacao=f"Entrada inicial no Kanban {kanban['nome']}",
+                )
+
+            ideia_completa = _fetch_idea_record(cur, ideia_id, usuario_id)
             conn.commit()
-            print(f"✅ Ideia criada com sucesso: ID {ideia_id}, usuario_id={usuario_id_salvo}")
-            print("=" * 80)
+            invalidar_busca_usuario(usuario_id)
+            _agendar_rebalanceamento(background_tasks, kanban["id"], status_inicial, kanban_posicao)
             return ideia_completa
     except HTTPException:
         raise
     except Exception as e:
-        if conn:
-            conn.rollback()
-        print(f"❌ ERRO ao criar ideia: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Erro ao criar ideia: {str(e)}")
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Erro ao iniciar ideia no Kanban: {str(e)}")
     finally:
-        if conn:
-            conn.close()
+        conn.close()
 
-@app.post("/api/ideias/com-embedding", response_model=IdeiaResponse)
-def criar_ideia_com_embedding(dados: IdeiaComEmbedding, user: dict = Depends(obter_usuario_assinante)):
-    """Criar ideia com embedding (associada ao usuário)"""
-    print("=" * 80)
-    print("📝 NOVA REQUISIÇÃO: Criar Ideia COM Embedding")
-    print(f"   Payload recebido: titulo='{dados.ideia.titulo}', tag='{dados.ideia.tag}'")
-    print(f"   User object recebido: {user}")
-    print("=" * 80)
-    
+
+@app.get("/api/ideias/{ideia_id}/kanban/history", response_model=List[KanbanHistoryEntry])
+def buscar_historico_kanban_ideia(
+    ideia_id: int,
+    response: Response,
+    limite: int = Query(KANBAN_HISTORICO_LIMITE_PADRAO),
+    cursor: Optional[str] = Query(None),
+    user: dict = Depends(obter_usuario_assinante),
+):
+    """Retorna o histÃ³rico de movimentaÃ§Ãµes do Kanban da ideia, paginado por (moved_at, id).
+
+    Quando ha mais paginas, o cursor da proxima vem no header X-Proximo-Cursor.
+    """
     if not user:
-        print("❌ ERRO CRÍTICO: Tentativa de criar ideia com embedding sem autenticação!")
-        print("   O header Authorization não foi enviado ou o token é inválido")
-        raise HTTPException(status_code=401, detail="Não autenticado")
-    
-    usuario_id = user.get("user_id")
-    usuario_email = user.get("email", "N/A")
-    
-    if not usuario_id:
-        print(f"❌ ERRO CRÍTICO: Token não contém 'user_id'!")
-        print(f"   Payload completo do token: {user}")
-        raise HTTPException(status_code=401, detail="Token inválido: user_id não encontrado")
-    
-    print(f"✅ Autenticação OK: usuario_id={usuario_id}, email={usuario_email}")
-    print(f"📝 Criando ideia com embedding para usuario_id: {usuario_id}, titulo: '{dados.ideia.titulo}'")
-    
+        raise HTTPException(status_code=401, detail="NÃ£o autenticado")
+
+    usuario_id = user["user_id"]
+    limite = min(max(limite or KANBAN_HISTORICO_LIMITE_PADRAO, 1), KANBAN_HISTORICO_LIMITE_MAXIMO)
+    keyset_sql = ""
+    keyset_params: List[object] = []
+    if cursor:
+        cursor_payload = _decode_cursor(cursor)
+        if not all(k in cursor_payload for k in ("m", "i")):
+            raise HTTPException(status_code=400, detail="Cursor invalido")
+        keyset_sql = "AND (moved_at, id) < (%s::timestamptz, %s)"
+        keyset_params = [cursor_payload["m"], cursor_payload["i"]]
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT id
+                FROM ideias
+                WHERE id = %s AND usuario_id = %s
+                """,
+                (ideia_id, usuario_id),
+            )
+            if not cur.fetchone():
+                raise HTTPException(
+                    status_code=404,
+                    detail="Ideia nÃ£o encontrada ou vocÃª nÃ£o tem permissÃ£o para ver o histÃ³rico",
+                )
+
+            cur.execute(
+                f"""
+                SELECT id, ideia_id, usuario_id, de_status, para_status, observacao, moved_at
+                FROM ideias_kanban_historico
+                WHERE ideia_id = %s
+                  {keyset_sql}
+                ORDER BY moved_at DESC, id DESC
+                LIMIT %s
+                """,
+                (ideia_id, *keyset_params, limite + 1),
+            )
+            historico = cur.fetchall()
+            if len(historico) > limite:
+                historico = historico[:limite]
+                ultimo = historico[-1]
+                response.headers["X-Proximo-Cursor"] = _encode_cursor(
+                    {"m": ultimo["moved_at"].isoformat(), "i": ultimo["id"]}
+                )
+            return [dict(item) for item in historico]
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar histÃ³rico do Kanban: {str(e)}")
+    finally:
+        conn.close()
+
+
+@app.patch("/api/ideias/{ideia_id}/agenda", response_model=IdeiaResponse)
+def atualizar_agenda_ideia(
+    ideia_id: int,
+    payload: AgendaUpdate,
+    user: dict = Depends(obter_usuario_assinante),
+):
+    """Define ou remove a data planejada da ideia na agenda."""
+    if not user:
+        raise HTTPException(status_code=401, detail="NÃ£o autenticado")
+
+    usuario_id = user["user_id"]
     conn = get_db_connection()
     try:
-        embedding_str = "[" + ",".join(map(str, dados.embedding)) + "]"
-        
-        # Garantir que usuario_id não é None antes do INSERT
-        if usuario_id is None:
-            raise ValueError("usuario_id não pode ser None no momento do INSERT")
-        
-        print(f"   💾 Executando INSERT com usuario_id={usuario_id}")
-        
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            projeto_id = _validate_project_access(cur, dados.ideia.projeto_id, usuario_id)
             cur.execute(
                 """
-                INSERT INTO ideias (titulo, tag, ideia, embedding, usuario_id, projeto_id)
-                VALUES (%s, %s, %s, %s::vector, %s, %s)
+                UPDATE ideias
+                SET agenda_data = %s,
+                    agenda_observacao = %s,
+                    updated_at = NOW()
+                WHERE id = %s AND usuario_id = %s
                 RETURNING id
                 """,
-                (dados.ideia.titulo, dados.ideia.tag, dados.ideia.ideia, embedding_str, usuario_id, projeto_id)
+                (
+                    payload.agenda_data,
+                    payload.agenda_observacao.strip() if payload.agenda_observacao else None,
+                    ideia_id,
+                    usuario_id,
+                ),
             )
-            nova_ideia = cur.fetchone()
-            
-            # Verificar o que foi realmente salvo
-            ideia_id = nova_ideia["id"] if nova_ideia else None
-            usuario_id_salvo = usuario_id
-            print(f"   📊 Resultado do INSERT:")
-            print(f"      • ID: {ideia_id if nova_ideia else 'N/A'}")
-            print(f"      • Título: '{dados.ideia.titulo if nova_ideia else 'N/A'}'")
-            print(f"      • usuario_id SALVO: {usuario_id_salvo}")
-            
-            if usuario_id_salvo is None:
-                print("   ❌ ERRO: usuario_id foi salvo como NULL no banco!")
-                conn.rollback()
-                raise ValueError("usuario_id não pode ser NULL - problema no INSERT")
-            
-            if usuario_id_salvo != usuario_id:
-                print(f"   ⚠️  ATENÇÃO: usuario_id esperado ({usuario_id}) diferente do salvo ({usuario_id_salvo})")
-            
+            ideia_atualizada = cur.fetchone()
+            if not ideia_atualizada:
+                raise HTTPException(
+                    status_code=404,
+                    detail="Ideia nÃ£o encontrada ou vocÃª nÃ£o tem permissÃ£o para alterar a agenda",
+                )
             ideia_completa = _fetch_idea_record(cur, ideia_id, usuario_id)
             conn.commit()
-            print(f"✅ Ideia criada com embedding com sucesso: ID {ideia_id}, usuario_id={usuario_id_salvo}")
-            print("=" * 80)
+            invalidar_busca_usuario(usuario_id)
             return ideia_completa
     except HTTPException:
         raise
     except Exception as e:
-        if conn:
-            conn.rollback()
-        print(f"❌ ERRO ao criar ideia: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Erro ao criar ideia: {str(e)}")
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Erro ao atualizar agenda da ideia: {str(e)}")
     finally:
-        if conn:
-            conn.close()
+        conn.close()
 
-@app.put("/api/ideias/{ideia_id}", response_model=IdeiaResponse)
-def atualizar_ideia(ideia_id: int, ideia: IdeiaUpdate, user: dict = Depends(obter_usuario_assinante)):
-    """Atualizar ideia existente (apenas do usuário autenticado)"""
+@app.put("/api/ideias/{ideia_id}/embedding")
+def atualizar_embedding(ideia_id: int, embedding: List[float], user: dict = Depends(obter_usuario_assinante)):
+    """Atualizar embedding de uma ideia (apenas do usuário autenticado)"""
+    usuario_id = user["user_id"]
+    conn = get_db_connection()
+    try:
+        embedding_str = "[" + ",".join(map(str, embedding)) + "]"
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            tag_suggestions.remover(cur, usuario_id, [ideia_id])
+            cur.execute(
+                """
+                UPDATE ideias
+                SET embedding = %s::vector,
+                    embedding_modelo = %s,
+                    embedding_dimensoes = %s,
+                    updated_at = NOW()
+                WHERE id = %s AND usuario_id = %s
+                RETURNING id
+                """,
+                (embedding_str, _modelo_embedding_cliente(embedding), len(embedding), ideia_id, usuario_id)
+            )
+            if not cur.fetchone():
+                raise HTTPException(status_code=404, detail="Ideia não encontrada")
+            related_ideas.marcar(cur, usuario_id, [ideia_id])
+            tag_suggestions.adicionar(cur, usuario_id, [ideia_id], EMBEDDING_MODELO_ATUAL)
+            ideia = _fetch_idea_record(cur, ideia_id, usuario_id)
+            conn.commit()
+            invalidar_busca_usuario(usuario_id, vetores=True)
+            return {"message": "Embedding atualizado com sucesso", "ideia": ideia}
+    except HTTPException:
+        raise
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Erro ao atualizar embedding: {str(e)}")
+    finally:
+        conn.close()
+
+@app.delete("/api/ideias/{ideia_id}")
+def deletar_ideia(ideia_id: int, user: dict = Depends(obter_usuario_assinante)):
+    """Deletar ideia (apenas do usuário autenticado)"""
     if not user:
         raise HTTPException(status_code=401, detail="Não autenticado")
     
     usuario_id = user["user_id"]
     conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            # Verificar se a ideia existe e pertence ao usuário
-            cur.execute("SELECT * FROM ideias WHERE id = %s AND usuario_id = %s", (ideia_id, usuario_id))
-            ideia_existente = cur.fetchone()
-            if not ideia_existente:
-                raise HTTPException(status_code=404, detail="Ideia não encontrada ou você não tem permissão para editar")
-            
-            # Usar valores atualizados ou manter os existentes
-            titulo_final = ideia.titulo if ideia.titulo is not None else ideia_existente['titulo']
-            tag_final = ideia.tag if ideia.tag is not None else ideia_existente['tag']
-            ideia_final = ideia.ideia if ideia.ideia is not None else ideia_existente['ideia']
-            projeto_final = (
-                _validate_project_access(cur, ideia.projeto_id, usuario_id)
-                if ideia.projeto_id is not None
-                else ideia_existente.get('projeto_id')
+        with conn.cursor() as cur:
+            tag_suggestions.remover(cur, usuario_id, [ideia_id])
+            cur.execute(
+                "DELETE FROM ideias WHERE id = %s AND usuario_id = %s RETURNING id, kanban_id, kanban_ativo, kanban_status",
+                (ideia_id, usuario_id),
             )
-            clear_kanban = projeto_final != ideia_existente.get("projeto_id")
-            
-            # Regenerar embedding automaticamente se API Key estiver configurada
-            embedding_str = None
-            modelo = get_embeddings_model()
-            if modelo:
-                try:
-                    texto_completo = f"{titulo_final} {tag_final or ''} {ideia_final}".strip()
-                    embedding = gerar_embedding(texto_completo)
-                    if embedding:
-                        embedding_str = "[" + ",".join(map(str, embedding)) + "]"
-                except Exception as e:
-                    print(f"⚠️  Erro ao regenerar embedding (continuando sem atualizar embedding): {e}")
-            
-            # Atualizar ideia (verificar se pertence ao usuário)
-            if embedding_str:
+            excluida = cur.fetchone()
+            if not excluida:
+                raise HTTPException(status_code=404, detail="Ideia não encontrada ou você não tem permissão para deletar")
+            _registrar_saida_kanban(cur, usuario_id, [excluida])
+            related_ideas.marcar(cur, usuario_id, [ideia_id])
+            conn.commit()
+            invalidar_busca_usuario(usuario_id, vetores=True)
+            return {"message": "Ideia deletada com sucesso", "success": True}
+    except HTTPException:
+        raise
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Erro ao deletar ideia: {str(e)}")
+    finally:
+        conn.close()
+
+def _ler_ideias_mescla(cur, usuario_id: int, ideia_id: int, duplicata_id: int, travar: bool = False):
+    cur.execute(
+        f"""
+        SELECT id, titulo, tag, ideia, projeto_id, agenda_data, agenda_observacao,
+               kanban_id, kanban_ativo, kanban_status, kanban_updated_at, kanban_posicao
+        FROM ideias
+        WHERE usuario_id = %s AND id = ANY(%s)
+        ORDER BY id
+        {"FOR UPDATE" if travar else ""}
+        """,
+        (usuario_id, [ideia_id, duplicata_id]),
+    )
+    linhas = {row["id"]: row for row in cur.fetchall()}
+    principal = linhas.get(ideia_id)
+    duplicata = linhas.get(duplicata_id)
+    if not principal or not duplicata:
+        raise HTTPException(status_code=404, detail="Ideia não encontrada")
+    return principal, duplicata
+
+
+def _conteudo_mesclado(principal: dict, duplicata: dict) -> Tuple[str, Optional[str]]:
+    texto = principal["ideia"]
+    if normalizar_termo(duplicata["ideia"]) not in normalizar_termo(texto):
+        texto = f"{texto}\n\n{duplicata['ideia']}"
+    return texto, principal["tag"] or duplicata["tag"]
+
+
+@app.post("/api/ideias/{ideia_id}/mesclar", response_model=IdeiaResponse)
+def mesclar_ideias(ideia_id: int, payload: MesclarIdeiaRequest, user: dict = Depends(obter_usuario_assinante)):
+    """Mescla uma ideia duplicada nesta e exclui a duplicata.
+
+    O texto da duplicata e anexado (se diferente), campos vazios sao completados com os
+    dela e, se esta ideia nao estiver em um kanban, assume o lugar da duplicata no quadro.
+    """
+    usuario_id = user["user_id"]
+    if payload.duplicata_id == ideia_id:
+        raise HTTPException(status_code=400, detail="Uma ideia nao pode ser mesclada com ela mesma")
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            # O embedding do texto mesclado e gerado antes de travar as linhas: a chamada ao
+            # provedor pode levar o prazo inteiro e as duas ideias ficariam presas no FOR UPDATE
+            principal, duplicata = _ler_ideias_mescla(cur, usuario_id, ideia_id, payload.duplicata_id)
+            conn.rollback()  # sem transacao aberta durante a chamada
+            texto, tag = _conteudo_mesclado(principal, duplicata)
+            texto_embedding = None
+            embedding = None
+            embedding_proximo = None
+            if texto != principal["ideia"] or tag != principal["tag"]:
+                texto_embedding = _idea_embedding_text(principal["titulo"], tag, texto)
+                embedding = gerar_embedding(texto_embedding)
+                embedding_proximo = gerar_embeddings_proximos([texto_embedding])
+
+            principal, duplicata = _ler_ideias_mescla(cur, usuario_id, ideia_id, payload.duplicata_id, travar=True)
+            texto, tag = _conteudo_mesclado(principal, duplicata)
+            conteudo_mudou = texto != principal["ideia"] or tag != principal["tag"]
+            if conteudo_mudou and _idea_embedding_text(principal["titulo"], tag, texto) != texto_embedding:
+                # Editada durante a chamada ao provedor: os vetores gerados ja nao correspondem
+                embedding = None
+                embedding_proximo = None
+
+            assume_kanban = principal["kanban_id"] is None and duplicata["kanban_id"] is not None
+            origem_kanban = duplicata if assume_kanban else principal
+
+            tag_suggestions.remover(cur, usuario_id, [ideia_id, payload.duplicata_id])
+
+            cur.execute(
+                """
+                UPDATE ideias
+                SET ideia = %s,
+                    tag = %s,
+                    projeto_id = COALESCE(projeto_id, %s),
+                    agenda_data = COALESCE(agenda_data, %s),
+                    agenda_observacao = COALESCE(agenda_observacao, %s),
+                    kanban_id = %s,
+                    kanban_ativo = %s,
+                    kanban_status = %s,
+                    kanban_updated_at = %s,
+                    kanban_posicao = %s,
+                    embedding = CASE WHEN %s THEN %s::vector ELSE embedding END,
+                    embedding_modelo = CASE WHEN %s THEN %s ELSE embedding_modelo END,
+                    embedding_dimensoes = CASE WHEN %s THEN %s ELSE embedding_dimensoes END,
+                    updated_at = NOW()
+                WHERE id = %s AND usuario_id = %s
+                """,
+                (
+                    texto,
+                    tag,
+                    duplicata["projeto_id"],
+                    duplicata["agenda_data"],
+                    duplicata["agenda_observacao"],
+                    origem_kanban["kanban_id"],
+                    origem_kanban["kanban_ativo"],
+                    origem_kanban["kanban_status"],
+                    origem_kanban["kanban_updated_at"],
+                    origem_kanban["kanban_posicao"],
+                    # Texto mudou e o embedding falhou: NULL, para o backfill gerar de novo
+                    conteudo_mudou,
+                    _vector_literal(embedding) if embedding else None,
+                    conteudo_mudou,
+                    EMBEDDING_MODELO_ATUAL if embedding else None,
+                    conteudo_mudou,
+                    len(embedding) if embedding else None,
+                    ideia_id,
+                    usuario_id,
+                ),
+            )
+
+            if assume_kanban:
+                # A ideia principal herda o historico do quadro; o fluxo nao registra saida
                 cur.execute(
-                    """
-                    UPDATE ideias
-                    SET titulo = %s,
-                        tag = %s,
-                        ideia = %s,
-                        embedding = %s::vector,
-                        projeto_id = %s,
-                        kanban_id = CASE WHEN %s THEN NULL ELSE kanban_id END,
-                        kanban_ativo = CASE WHEN %s THEN FALSE ELSE kanban_ativo END,
-                        kanban_status = CASE WHEN %s THEN NULL ELSE kanban_status END,
-                        kanban_updated_at = CASE WHEN %s THEN NOW() ELSE kanban_updated_at END,
-                        updated_at = NOW()
-                    WHERE id = %s AND usuario_id = %s
-                    RETURNING id
-                    """,
-                    (
-                        titulo_final,
-                        tag_final,
-                        ideia_final,
-                        embedding_str,
-                        projeto_final,
-                        clear_kanban,
-                        clear_kanban,
-                        clear_kanban,
-                        clear_kanban,
-                        ideia_id,
-                        usuario_id,
-                    )
+                    "UPDATE ideias_kanban_historico SET ideia_id = %s WHERE ideia_id = %s",
+                    (ideia_id, payload.duplicata_id),
                 )
-            else:
-                cur.execute(
-                    """
-                    UPDATE ideias
-                    SET titulo = %s,
-                        tag = %s,
-                        ideia = %s,
-                        projeto_id = %s,
-                        kanban_id = CASE WHEN %s THEN NULL ELSE kanban_id END,
-                        kanban_ativo = CASE WHEN %s THEN FALSE ELSE kanban_ativo END,
-                        kanban_status = CASE WHEN %s THEN NULL ELSE kanban_status END,
-                        kanban_updated_at = CASE WHEN %s THEN NOW() ELSE kanban_updated_at END,
-                        updated_at = NOW()
-                    WHERE id = %s AND usuario_id = %s
-                    RETURNING id
-                    """,
-                    (
-                        titulo_final,
-                        tag_final,
-                        ideia_final,
-                        projeto_final,
-                        clear_kanban,
-                        clear_kanban,
-                        clear_kanban,
-                        clear_kanban,
-                        ideia_id,
-                        usuario_id,
+                if duplicata["kanban_ativo"]:
+                    # kanban_events e append-only: em vez de reescrever item_id, registra a
+                    # saida da duplicata e a entrada da principal na mesma coluna
+                    status = _normalize_stored_kanban_status(duplicata["kanban_status"]) or KANBAN_STATUS_ORDER[0]
+                    base = {"kanban_id": duplicata["kanban_id"], "usuario_id": usuario_id, "item_tipo": "ideia"}
+                    _registrar_eventos_kanban(
+                        cur,
+                        [
+                            {**base, "item_id": duplicata["id"], "evento": "excluido", "de_status": status,
+                             "dados": {"mesclada_em": ideia_id}},
+                            {**base, "item_id": ideia_id, "evento": "criado", "para_status": status,
+                             "dados": {"mesclada_de": duplicata["id"]}},
+                        ],
                     )
+            else:
+                _registrar_saida_kanban(
+                    cur,
+                    usuario_id,
+                    [(duplicata["id"], duplicata["kanban_id"], duplicata["kanban_ativo"], duplicata["kanban_status"])],
                 )
-            
-            ideia_atualizada = cur.fetchone()
+            cur.execute(
+                "DELETE FROM ideias WHERE id = %s AND usuario_id = %s",
+                (payload.duplicata_id, usuario_id),
+            )
+            related_ideas.marcar(cur, usuario_id, [ideia_id, payload.duplicata_id])
+            tag_suggestions.adicionar(cur, usuario_id, [ideia_id], EMBEDDING_MODELO_ATUAL)
+            if conteudo_mudou:
+                gravar_embeddings_proximos(cur, [ideia_id], embedding_proximo)
+
             ideia_completa = _fetch_idea_record(cur, ideia_id, usuario_id)
             conn.commit()
+            invalidar_busca_usuario(usuario_id, vetores=True)
             return ideia_completa
     except HTTPException:
+        conn.rollback()
         raise
     except Exception as e:
         conn.rollback()
-        raise HTTPException(status_code=500, detail=f"Erro ao atualizar ideia: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao mesclar ideias: {str(e)}")
     finally:
         conn.close()
 
 
-@app.patch("/api/ideias/{ideia_id}/kanban", response_model=IdeiaResponse)
-def atualizar_kanban_ideia(
+@app.get("/api/ideias/{ideia_id}/relacionadas", response_model=List[IdeiaRelacionada])
+def buscar_ideias_relacionadas(
     ideia_id: int,
-    payload: KanbanStatusUpdate,
+    limite: int = Query(5),
     user: dict = Depends(obter_usuario_assinante),
 ):
-    """Atualiza a coluna atual do Kanban e registra a data da movimentacao."""
-    if not user:
-        raise HTTPException(status_code=401, detail="Nao autenticado")
-
+    """Ideias mais parecidas, lidas da tabela de vizinhos pre-calculados."""
     usuario_id = user["user_id"]
-    status_final = _validate_kanban_status(payload.kanban_status)
+    limite = min(max(limite or 5, 1), RELACIONADAS_K)
     conn = get_db_connection()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            relacionadas = related_ideas.consultar(cur, ideia_id, usuario_id, limite)
+            if relacionadas:
+                return relacionadas
+
             cur.execute(
-                """
-                SELECT id, kanban_status, kanban_ativo
-                FROM ideias
-                WHERE id = %s AND usuario_id = %s
-                """,
+                "SELECT embedding IS NOT NULL AS tem_embedding FROM ideias WHERE id = %s AND usuario_id = %s",
                 (ideia_id, usuario_id),
             )
-            ideia_existente = cur.fetchone()
-            if not ideia_existente:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Ideia nao encontrada ou voce nao tem permissao para move-la",
-                )
+            ideia = cur.fetchone()
+            if not ideia:
+                raise HTTPException(status_code=404, detail="Ideia não encontrada")
+            cur.execute("SELECT 1 FROM ideias_relacionadas WHERE ideia_id = %s", (ideia_id,))
+            if ideia["tem_embedding"] and not cur.fetchone():
+                # Ideia anterior ao recurso: entra na fila e aparece na proxima abertura
+                related_ideas.marcar(cur, usuario_id, [ideia_id])
+                conn.commit()
+            return []
+    except HTTPException:
+        raise
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar ideias relacionadas: {str(e)}")
+    finally:
+        conn.close()
 
-            status_atual = (ideia_existente.get("kanban_status") or "").strip().lower() or None
-            if status_atual and status_atual not in KANBAN_STATUS_SET:
-                status_atual = None
+@app.post("/api/ideias/tags/sugestoes", response_model=List[TagSugerida])
+def sugerir_tags(payload: SugestaoTagsRequest, user: dict = Depends(obter_usuario_assinante)):
+    """Tags do usuario mais proximas de um rascunho, pelo centroide dos embeddings de cada tag."""
+    usuario_id = user["user_id"]
+    texto = _idea_embedding_text(payload.titulo.strip(), None, payload.ideia.strip())
+    if not texto:
+        return []
+    _, embedding = gerar_embedding_consulta(texto)
+    if embedding is None:
+        return []
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            return tag_centroid_index.sugerir(
+                cur, usuario_id, EMBEDDING_MODELO_ATUAL, embedding, payload.limite, TAG_SUGESTAO_SIMILARIDADE_MINIMA
+            )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao sugerir tags: {str(e)}")
+    finally:
+        conn.close()
 
-            cur.execute(
-                """
-                UPDATE ideias
-                SET kanban_ativo = TRUE,
-                    kanban_status = %s,
-                    kanban_updated_at = NOW(),
-                    updated_at = NOW()
-                WHERE id = %s AND usuario_id = %s
-                RETURNING id
-                """,
-                (status_final, ideia_id, usuario_id),
+@app.post("/api/ideias/buscar", response_model=List[BuscaResponse])
+@orcamento_sql(10)
+def buscar_por_similaridade(
+    busca: BuscaRequest,
+    response: Response,
+    user: dict = Depends(obter_usuario_assinante),
+):
+    """Buscar ideias por similaridade (apenas do usuário autenticado)
+
+    Quando a pagina semantica vem cheia, o cursor da proxima vem no header
+    X-Proximo-Cursor; basta repetir a busca (mesmo termo e filtros) com `cursor`.
+    """
+    if not user:
+        raise HTTPException(status_code=401, detail="Não autenticado")
+    
+    usuario_id = user["user_id"]
+    limite = busca.limite if busca.limite and busca.limite > 0 else 10
+    limite = min(max(limite, 1), 50)  # guarda-chuva para evitar abusos
+    probes = busca.probes if busca.probes and busca.probes > 0 else 10
+    probes = min(max(probes, 1), 200)
+    filtros = _filtros_busca(busca)
+    versao = versao_embedding_busca(usuario_id)
+    chave_embedding = query_embedding_cache.chave(versao.modelo, busca.termo)
+    assinatura_filtros = _assinatura_filtros_busca(filtros)
+
+    apos = None
+    corte = None
+    if busca.cursor:
+        cursor_data = _decode_cursor(busca.cursor)
+        # O cursor so continua a mesma consulta: mesmo embedding de busca e mesmos filtros
+        if cursor_data.get("q") != chave_embedding or cursor_data.get("f") != assinatura_filtros:
+            raise HTTPException(status_code=400, detail="Cursor invalido")
+        try:
+            apos = (float(cursor_data["d"]), int(cursor_data["i"]))
+            # Corte de distancia da primeira pagina (None = segunda passada, sem corte)
+            corte = float(cursor_data["c"]) if cursor_data.get("c") is not None else None
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Cursor invalido")
+
+    # Buscas repetidas dentro do TTL saem do cache, sem tocar no banco
+    modelo = versao.provedor
+    if apos and not modelo:
+        raise HTTPException(status_code=400, detail="Cursor invalido")
+    modo = f"semantica:{probes}:{versao.modelo}" if modelo else "texto"
+    chave_cache = search_result_cache.chave(
+        usuario_id, busca.termo, limite, modo, {**filtros, "cursor": busca.cursor}
+    )
+    resultados = search_result_cache.obter(chave_cache)
+    if resultados is None:
+        resultados = _buscar_ideias_similares(
+            usuario_id, busca.termo, limite, probes, modelo, filtros, apos, versao, corte
+        )
+        search_result_cache.guardar(chave_cache, resultados)
+
+    # Paginas semanticas cheias podem continuar; o fallback textual nao pagina
+    if len(resultados) == limite and resultados[-1].get("distancia") is not None:
+        ultimo = resultados[-1]
+        response.headers["X-Proximo-Cursor"] = _encode_cursor(
+            {
+                "q": chave_embedding,
+                "f": assinatura_filtros,
+                "d": ultimo["distancia"],
+                "i": ultimo["id"],
+                "c": ultimo.get("corte"),
+            }
+        )
+    return resultados
+
+
+def _assinatura_filtros_busca(filtros: dict) -> str:
+    bruto = json.dumps(filtros, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(bruto).hexdigest()[:12]
+
+
+def _filtros_busca(busca: BuscaRequest) -> dict:
+    """Filtros informados na busca, ja validados (somente os preenchidos)."""
+    filtros = {
+        "espaco_id": busca.espaco_id,
+        "projeto_id": busca.projeto_id,
+        "kanban_id": busca.kanban_id,
+        "kanban_status": _validate_kanban_status(busca.kanban_status) if busca.kanban_status else None,
+        "tag": (busca.tag or "").strip() or None,
+        "data_inicio": busca.data_inicio,
+        "data_fim": busca.data_fim,
+        "agenda_inicio": busca.agenda_inicio,
+        "agenda_fim": busca.agenda_fim,
+    }
+    for inicio, fim in (("data_inicio", "data_fim"), ("agenda_inicio", "agenda_fim")):
+        if filtros[inicio] and filtros[fim] and filtros[inicio] > filtros[fim]:
+            raise HTTPException(status_code=400, detail=f"{inicio} deve ser anterior a {fim}")
+    return {chave: valor for chave, valor in filtros.items() if valor is not None}
+
+
+def _filtros_busca_sql(usuario_id: int, filtros: dict) -> Tuple[str, list]:
+    """Condicoes extras (prefixadas com AND) sobre `ideias i` para os filtros da busca."""
+    condicoes = []
+    params = []
+    if "espaco_id" in filtros:
+        condicoes.append("i.projeto_id IN (SELECT p.id FROM projetos p WHERE p.usuario_id = %s AND p.espaco_id = %s)")
+        params.extend([usuario_id, filtros["espaco_id"]])
+    if "projeto_id" in filtros:
+        condicoes.append("i.projeto_id = %s")
+        params.append(filtros["projeto_id"])
+    if "kanban_id" in filtros:
+        condicoes.append("i.kanban_id = %s")
+        params.append(filtros["kanban_id"])
+    if "kanban_status" in filtros:
+        condicoes.append("i.kanban_ativo IS TRUE AND i.kanban_status = %s")
+        params.append(filtros["kanban_status"])
+    if "tag" in filtros:
+        condicoes.append("LOWER(i.tag) = LOWER(%s)")
+        params.append(filtros["tag"])
+    if "data_inicio" in filtros:
+        condicoes.append("i.data >= %s")
+        params.append(filtros["data_inicio"])
+    if "data_fim" in filtros:
+        condicoes.append("i.data <= %s")
+        params.append(filtros["data_fim"])
+    if "agenda_inicio" in filtros:
+        condicoes.append("i.agenda_data >= %s")
+        params.append(filtros["agenda_inicio"])
+    if "agenda_fim" in filtros:
+        condicoes.append("i.agenda_data <= %s")
+        params.append(filtros["agenda_fim"])
+    return "".join(f" AND {condicao}" for condicao in condicoes), params
+
+
+def _pgvector_iterative_scan(cur) -> bool:
+    """pgvector >= 0.8 continua varrendo o indice ate preencher o LIMIT quando ha filtros."""
+    global PGVECTOR_ITERATIVE_SCAN
+    if PGVECTOR_ITERATIVE_SCAN is None:
+        cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        row = cur.fetchone()
+        versao = tuple(int(parte) for parte in re.findall(r"\d+", row["extversion"])[:2]) if row else (0, 0)
+        PGVECTOR_ITERATIVE_SCAN = versao >= (0, 8)
+    return PGVECTOR_ITERATIVE_SCAN
+
+
+def _consultar_similares_pgvector(
+    cur,
+    usuario_id: int,
+    embedding_str: str,
+    limite: int,
+    filtros_sql: str,
+    filtros_params: list,
+    distancia_maxima: Optional[float] = None,
+    apos: Optional[Tuple[float, int]] = None,
+    versao: Optional[VersaoEmbedding] = None,
+) -> List[dict]:
+    """Top-k por distancia de cosseno no pgvector, aplicando os filtros sem perder resultados.
+
+    Sem filtros e a consulta ivfflat direta. Com filtros, o ivfflat sozinho descartaria
+    os vizinhos que nao passam no filtro e devolveria menos de `limite` linhas; entao
+    usa iterative scan (pgvector >= 0.8) ou busca `BUSCA_FILTRO_OVERFETCH` vezes mais
+    candidatos e, se ainda faltar, ordena exatamente o conjunto filtrado.
+
+    `apos` = (distancia, id) da ultima linha da pagina anterior; a ordem e (distancia, id).
+
+    Com armazenamento compacto pronto, a primeira pagina busca `limite * fator` candidatos
+    no HNSW da coluna compacta e reordena pela distancia exata; paginas seguintes seguem
+    no indice do vetor completo, que continua a ordem exata a partir do cursor.
+
+    `versao` escolhe a coluna do vetor (a atual por padrao, ou embedding_proximo durante
+    a troca de modelo); a coluna compacta so existe para a atual.
+    """
+    versao = versao or versao_embedding_atual()
+    coluna, coluna_modelo = versao.coluna, versao.coluna_modelo
+    iterativo = bool(filtros_sql) and _pgvector_iterative_scan(cur)
+    compacto = EMBEDDING_COMPACTO_PRONTO and versao.principal
+    if compacto and apos is None and (not filtros_sql or iterativo):
+        embedding_storage.configurar_busca(cur, armazenamento_embedding, limite, bool(filtros_sql))
+        corte_sql = " AND distancia <= %s" if distancia_maxima is not None else ""
+        cur.execute(
+            embedding_storage.consulta_candidatos_sql(armazenamento_embedding, filtros_sql, corte_sql),
+            [
+                usuario_id,
+                versao.modelo,
+                *filtros_params,
+                embedding_str,
+                limite * armazenamento_embedding.fator_rerank,
+                embedding_str,
+                *([distancia_maxima] if distancia_maxima is not None else []),
+                limite,
+            ],
+        )
+        return [dict(row) for row in cur.fetchall()]
+
+    corte_sql = ""
+    corte_params = []
+    if distancia_maxima is not None:
+        corte_sql += f" AND (i.{coluna} <=> %s::vector) <= %s"
+        corte_params += [embedding_str, distancia_maxima]
+    if apos is not None:
+        corte_sql += f" AND ((i.{coluna} <=> %s::vector), i.id) > (%s, %s)"
+        corte_params += [embedding_str, apos[0], apos[1]]
+
+    if not filtros_sql or iterativo:
+        if filtros_sql:
+            cur.execute("SET LOCAL ivfflat.iterative_scan = relaxed_order")
+        # relaxed_order pode devolver fora de ordem; a consulta externa reordena
+        cur.execute(
+            f"""
+            WITH candidatos AS MATERIALIZED (
+                SELECT i.id, i.titulo, i.tag, i.ideia, i.data, i.{coluna} <=> %s::vector AS distancia
+                FROM ideias i
+                WHERE i.usuario_id = %s AND i.{coluna_modelo} = %s AND i.{coluna} IS NOT NULL{filtros_sql}{corte_sql}
+                ORDER BY i.{coluna} <=> %s::vector, i.id
+                LIMIT %s
             )
-            ideia_atualizada = cur.fetchone()
-            if not ideia_atualizada:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Ideia nao encontrada ou voce nao tem permissao para move-la",
-                )
-            if status_atual != status_final or not ideia_existente.get("kanban_ativo"):
-                observacao = None
-                if not ideia_existente.get("kanban_ativo") and not status_atual:
-                    observacao = "Entrada inicial no Kanban"
-                _insert_kanban_history(
-                    cur,
-                    ideia_id=ideia_id,
-                    usuario_id=usuario_id,
-                    de_status=status_atual,
-                    para_status=status_final,
-                    observacao=observacao,
+            SELECT id, titulo, tag, ideia, data, 1 - distancia AS similarity, distancia
+            FROM candidatos
+            ORDER BY distancia, id
+            """,
+            [embedding_str, usuario_id, versao.modelo, *filtros_params, *corte_params, embedding_str, limite],
+        )
+        return [dict(row) for row in cur.fetchall()]
+
+    cur.execute(
+        f"""
+        WITH candidatos AS MATERIALIZED (
+            SELECT i.id, i.{coluna} <=> %s::vector AS distancia
+            FROM ideias i
+            WHERE i.usuario_id = %s AND i.{coluna_modelo} = %s AND i.{coluna} IS NOT NULL{corte_sql}
+            ORDER BY i.{coluna} <=> %s::vector, i.id
+            LIMIT %s
+        )
+        SELECT i.id, i.titulo, i.tag, i.ideia, i.data, 1 - c.distancia AS similarity, c.distancia
+        FROM candidatos c
+        JOIN ideias i ON i.id = c.id
+        WHERE TRUE{filtros_sql}
+        ORDER BY c.distancia, c.id
+        LIMIT %s
+        """,
+        [
+            embedding_str, usuario_id, versao.modelo, *corte_params,
+            embedding_str, limite * BUSCA_FILTRO_OVERFETCH, *filtros_params, limite,
+        ],
+    )
+    resultados = [dict(row) for row in cur.fetchall()]
+    if len(resultados) >= limite:
+        return resultados
+
+    # Filtro seletivo demais para o over-fetch: distancia exata sobre as linhas filtradas
+    # (o CTE materializado impede o uso do indice ivfflat e usa os indices dos filtros).
+    cur.execute(
+        f"""
+        WITH filtradas AS MATERIALIZED (
+            SELECT i.id, i.titulo, i.tag, i.ideia, i.data, i.{coluna}
+            FROM ideias i
+            WHERE i.usuario_id = %s AND i.{coluna_modelo} = %s AND i.{coluna} IS NOT NULL{filtros_sql}
+        )
+        SELECT
+            i.id, i.titulo, i.tag, i.ideia, i.data,
+            1 - (i.{coluna} <=> %s::vector) AS similarity,
+            i.{coluna} <=> %s::vector AS distancia
+        FROM filtradas i
+        WHERE TRUE{corte_sql}
+        ORDER BY i.{coluna} <=> %s::vector, i.id
+        LIMIT %s
+        """,
+        [usuario_id, versao.modelo, *filtros_params, embedding_str, embedding_str, *corte_params, embedding_str, limite],
+    )
+    return [dict(row) for row in cur.fetchall()]
+
+
+def _buscar_ideias_similares(
+    usuario_id: int,
+    termo_busca: str,
+    limite: int,
+    probes: int,
+    modelo,
+    filtros: Optional[dict] = None,
+    apos: Optional[Tuple[float, int]] = None,
+    versao: Optional[VersaoEmbedding] = None,
+    corte: Optional[float] = None,
+) -> List[dict]:
+    """Executa a busca semantica (com fallbacks textuais) direto no banco.
+
+    Com `apos` (paginas seguintes) so continua a ordem semantica, sem fallback, com o
+    `corte` de distancia que a primeira pagina usou. Cada resultado semantico leva
+    `distancia` e `corte` (internos, fora do BuscaResponse) para montar o cursor.
+    """
+    versao = versao or versao_embedding_atual()
+    filtros_sql, filtros_params = _filtros_busca_sql(usuario_id, filtros or {})
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            if modelo:
+                # Termos repetidos saem do cache; com o OpenAI fora (disjuntor aberto, prazo
+                # estourado) a primeira pagina cai na busca textual abaixo
+                _, embedding_busca = gerar_embedding_consulta(termo_busca, versao)
+                if embedding_busca is None and apos is not None:
+                    raise HTTPException(status_code=503, detail="Busca semantica indisponivel no momento")
+
+                # Contas pequenas: top-k exato no indice em memoria, sem consulta ivfflat
+                resultados = None
+                if embedding_busca is None:
+                    pass
+                elif vector_index is not None and versao.principal:
+                    resultados = _buscar_similares_em_memoria(
+                        cur, usuario_id, embedding_busca, limite, filtros_sql, filtros_params, apos, corte
+                    )
+
+                if resultados is None and embedding_busca is not None:
+                    embedding_str = _vector_literal(embedding_busca)
+                    # Ajusta probes para balancear precisão x velocidade no ivfflat
+                    cur.execute("SET LOCAL ivfflat.probes = %s", (probes,))
+                    if apos is not None:
+                        # Paginas seguintes: continuacao indexada a partir do cursor, com o mesmo corte
+                        resultados = _consultar_similares_pgvector(
+                            cur, usuario_id, embedding_str, limite, filtros_sql, filtros_params,
+                            distancia_maxima=corte, apos=apos, versao=versao,
+                        )
+                    else:
+                        corte = BUSCA_DISTANCIA_MAXIMA
+                        resultados = _consultar_similares_pgvector(
+                            cur, usuario_id, embedding_str, limite, filtros_sql, filtros_params,
+                            distancia_maxima=corte, versao=versao,
+                        )
+                        if not resultados:
+                            # Segunda passada semantica mais flexivel
+                            corte = None
+                            resultados = _consultar_similares_pgvector(
+                                cur, usuario_id, embedding_str, limite, filtros_sql, filtros_params,
+                                versao=versao,
+                            )
+                    for resultado in resultados:
+                        resultado["corte"] = corte
+                if resultados or apos is not None:
+                    return resultados
+
+            # Sem API Key, ou quando a busca semantica nao retorna nada: busca textual
+            termo = termo_busca.lower()
+            cur.execute(f"""
+                SELECT 
+                    i.id,
+                    i.titulo,
+                    i.tag,
+                    i.ideia,
+                    i.data,
+                    0.0 AS similarity
+                FROM ideias i
+                WHERE i.usuario_id = %s
+                  AND (LOWER(i.titulo) LIKE %s 
+                   OR LOWER(i.tag) LIKE %s 
+                   OR LOWER(i.ideia) LIKE %s){filtros_sql}
+                ORDER BY i.data DESC
+                LIMIT %s
+            """, (usuario_id, f'%{termo}%', f'%{termo}%', f'%{termo}%', *filtros_params, limite))
+            resultados = cur.fetchall()
+            return [dict(resultado) for resultado in resultados]
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro na busca por similaridade: {str(e)}")
+    finally:
+        conn.close()
+
+def _buscar_similares_em_memoria(
+    cur,
+    usuario_id: int,
+    embedding_busca: np.ndarray,
+    limite: int,
+    filtros_sql: str = "",
+    filtros_params: Optional[list] = None,
+    apos: Optional[Tuple[float, int]] = None,
+    corte: Optional[float] = None,
+) -> Optional[List[dict]]:
+    """Mesma semantica das duas passadas do pgvector, usando o indice em memoria.
+
+    Com `apos`, `corte` e o da primeira pagina. Retorna None quando a conta e grande
+    demais e deve usar o pgvector.
+    """
+    def ids_filtrados() -> np.ndarray:
+        # Filtros resolvidos pelos indices btree; o top-k exato roda so sobre esses ids
+        cur.execute(
+            f"SELECT i.id FROM ideias i WHERE i.usuario_id = %s{filtros_sql}",
+            [usuario_id, *(filtros_params or [])],
+        )
+        return np.fromiter((row["id"] for row in cur.fetchall()), dtype=np.int64)
+
+    encontrados = vector_index.buscar(
+        cur, usuario_id, EMBEDDING_MODELO_ATUAL, embedding_busca, limite, ids_filtrados if filtros_sql else None, apos
+    )
+    if encontrados is None:
+        return None
+    ids, similaridades = encontrados
+
+    # Primeira passada: apenas distancia <= BUSCA_DISTANCIA_MAXIMA; se nada passar, o top-k
+    # sem corte. Paginas seguintes repetem o corte que a primeira usou.
+    if apos is None:
+        corte = BUSCA_DISTANCIA_MAXIMA
+    if corte is not None:
+        relevantes = (np.float32(1) - similaridades) <= corte
+        if relevantes.any() or apos is not None:
+            ids, similaridades = ids[relevantes], similaridades[relevantes]
+        else:
+            corte = None
+    if not ids.size:
+        return []
+    similaridade_por_id = {int(ideia_id): float(sim) for ideia_id, sim in zip(ids, similaridades)}
+
+    cur.execute(
+        """
+        SELECT id, titulo, tag, ideia, data
+        FROM ideias
+        WHERE usuario_id = %s AND id = ANY(%s)
+        """,
+        (usuario_id, list(similaridade_por_id)),
+    )
+    linhas = {row["id"]: dict(row) for row in cur.fetchall()}
+    resultados = []
+    for ideia_id, similaridade in similaridade_por_id.items():
+        linha = linhas.get(ideia_id)
+        if linha:
+            linha["similarity"] = similaridade
+            linha["distancia"] = float(np.float32(1) - np.float32(similaridade))
+            linha["corte"] = corte
+            resultados.append(linha)
+    return resultados
+
+@app.post("/api/ideias/embeddings/backfill")
+def backfill_embeddings(payload: BackfillEmbeddingsRequest, user: dict = Depends(obter_usuario_assinante)):
+    """Backfill embeddings das ideias sem vetor (apenas do usuario autenticado)"""
+    if not user:
+        raise HTTPException(status_code=401, detail="Nao autenticado")
+    
+    usuario_id = user["user_id"]
+    limite = payload.limite if payload.limite and payload.limite > 0 else 50
+    limite = min(max(limite, 1), 200)
+    forcar = bool(payload.forcar)
+
+    modelo = get_embeddings_model()
+    if not modelo:
+        raise HTTPException(status_code=400, detail="Modelo de embeddings indisponivel (OPENAI_API_KEY nao configurada)")
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            if forcar:
+                cur.execute("""
+                    SELECT id, titulo, tag, ideia
+                    FROM ideias
+                    WHERE usuario_id = %s
+                    ORDER BY data DESC
+                    LIMIT %s
+                """, (usuario_id, limite))
+            else:
+                cur.execute("""
+                    SELECT id, titulo, tag, ideia
+                    FROM ideias
+                    WHERE usuario_id = %s
+                      AND (embedding IS NULL OR embedding_modelo IS DISTINCT FROM %s)
+                    ORDER BY data DESC
+                    LIMIT %s
+                """, (usuario_id, EMBEDDING_MODELO_ATUAL, limite))
+            ideias = cur.fetchall()
+            if not ideias:
+                return {"total": 0, "updated": 0, "skipped": 0, "ids": []}
+
+            tag_suggestions.remover(cur, usuario_id, [ideia["id"] for ideia in ideias])
+            updated_ids = []
+            skipped = 0
+            for ideia in ideias:
+                texto = f"{ideia['titulo']} {ideia.get('tag') or ''} {ideia['ideia']}".strip()
+                embedding = gerar_embedding(texto)
+                if not embedding:
+                    skipped += 1
+                    continue
+                embedding_str = "[" + ",".join(map(str, embedding)) + "]"
+                cur.execute(
+                    """
+                    UPDATE ideias
+                    SET embedding = %s::vector, embedding_modelo = %s, embedding_dimensoes = %s, updated_at = NOW()
+                    WHERE id = %s AND usuario_id = %s
+                    """,
+                    (embedding_str, EMBEDDING_MODELO_ATUAL, len(embedding), ideia["id"], usuario_id)
                 )
-
-            ideia_completa = _fetch_idea_record(cur, ideia_id, usuario_id)
+                updated_ids.append(ideia["id"])
+            related_ideas.marcar(cur, usuario_id, updated_ids)
+            tag_suggestions.adicionar(cur, usuario_id, [ideia["id"] for ideia in ideias], EMBEDDING_MODELO_ATUAL)
             conn.commit()
-            return ideia_completa
+            invalidar_busca_usuario(usuario_id, vetores=True)
+            return {
+                "total": len(ideias),
+                "updated": len(updated_ids),
+                "skipped": skipped,
+                "ids": updated_ids
+            }
     except HTTPException:
         raise
     except Exception as e:
         conn.rollback()
-        raise HTTPException(status_code=500, detail=f"Erro ao mover ideia no Kanban: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao fazer backfill de embeddings: {str(e)}")
     finally:
         conn.close()
 
 
-@app.post("/api/ideias/{ideia_id}/kanban/start", response_model=IdeiaResponse)
-def iniciar_ideia_no_kanban(
-    ideia_id: int,
-    payload: KanbanStartRequest,
-    user: dict = Depends(obter_usuario_assinante),
-):
-    """Ativa a ideia no Kanban a partir da coluna Novo."""
-    if not user:
-        raise HTTPException(status_code=401, detail="Nao autenticado")
+# =============================
+# Jobs em background
+# =============================
 
-    usuario_id = user["user_id"]
+
+def _create_background_job(usuario_id: Optional[int], tipo: str, progresso: Optional[dict] = None) -> str:
+    job_id = str(uuid4())
     conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with conn.cursor() as cur:
             cur.execute(
                 """
-                SELECT id, projeto_id, kanban_id, kanban_status, kanban_ativo
-                FROM ideias
-                WHERE id = %s AND usuario_id = %s
+                INSERT INTO background_jobs (id, usuario_id, tipo, progresso)
+                VALUES (%s::uuid, %s, %s, %s::jsonb)
                 """,
-                (ideia_id, usuario_id),
+                (job_id, usuario_id, tipo, psycopg2.extras.Json(progresso or {})),
             )
-            ideia_existente = cur.fetchone()
-            if not ideia_existente:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Ideia nao encontrada ou voce nao tem permissao para iniciar o Kanban",
-                )
-
-            projeto_id = ideia_existente.get("projeto_id")
-            if not projeto_id:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Vincule a ideia a um projeto antes de iniciar no Kanban",
-                )
-
-            kanban = _validate_kanban_access(cur, payload.kanban_id, usuario_id, projeto_id)
-            if not kanban:
-                raise HTTPException(status_code=400, detail="Kanban invalido")
+        conn.commit()
+        return job_id
+    finally:
+        conn.close()
 
-            status_atual = (ideia_existente.get("kanban_status") or "").strip().lower() or None
-            if status_atual and status_atual not in KANBAN_STATUS_SET:
-                status_atual = None
-            status_inicial = _validate_kanban_status(payload.kanban_status or status_atual or "novo")
 
+def _update_background_job(
+    job_id: str,
+    status: Optional[str] = None,
+    progresso: Optional[dict] = None,
+    resultado: Optional[dict] = None,
+    erro: Optional[str] = None,
+):
+    """Atualiza o job em conexao propria para o progresso ficar visivel antes do commit principal."""
+    finalizado = status in ("concluido", "erro")
+    conn = None
+    try:
+        conn = get_db_connection()
+        with conn.cursor() as cur:
             cur.execute(
                 """
-                UPDATE ideias
-                SET kanban_id = %s,
-                    kanban_ativo = TRUE,
-                    kanban_status = %s,
-                    kanban_updated_at = NOW(),
-                    updated_at = NOW()
-                WHERE id = %s AND usuario_id = %s
-                RETURNING id
+                UPDATE background_jobs
+                SET status = COALESCE(%s, status),
+                    progresso = progresso || %s::jsonb,
+                    resultado = COALESCE(%s::jsonb, resultado),
+                    erro = COALESCE(%s, erro),
+                    updated_at = NOW(),
+                    finished_at = CASE WHEN %s THEN NOW() ELSE finished_at END
+                WHERE id = %s::uuid
                 """,
-                (kanban["id"], status_inicial, ideia_id, usuario_id),
+                (
+                    status,
+                    psycopg2.extras.Json(progresso or {}),
+                    psycopg2.extras.Json(resultado) if resultado is not None else None,
+                    erro,
+                    finalizado,
+                    job_id,
+                ),
             )
-            ideia_atualizada = cur.fetchone()
-            if not ideia_atualizada:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Ideia nao encontrada ou voce nao tem permissao para iniciar o Kanban",
-                )
-            if (
-                not ideia_existente.get("kanban_ativo")
-                or status_atual != status_inicial
-                or ideia_existente.get("kanban_id") != kanban["id"]
-            ):
-                _insert_kanban_history(
-                    cur,
-                    ideia_id=ideia_id,
-                    usuario_id=usuario_id,
-                    de_status=None if not ideia_existente.get("kanban_ativo") else status_atual,
-                    para_status=status_inicial,
-                    observacao=f"Entrada inicial no Kanban {kanban['nome']}",
-                )
-
-            ideia_completa = _fetch_idea_record(cur, ideia_id, usuario_id)
-            conn.commit()
-            return ideia_completa
-    except HTTPException:
-        raise
+        conn.commit()
     except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=500, detail=f"Erro ao iniciar ideia no Kanban: {str(e)}")
+        if conn:
+            conn.rollback()
+        print(f"Nao foi possivel atualizar job {job_id}: {e}")
     finally:
-        conn.close()
+        if conn:
+            conn.close()
 
 
-@app.get("/api/ideias/{ideia_id}/kanban/history", response_model=List[KanbanHistoryEntry])
-def buscar_historico_kanban_ideia(
-    ideia_id: int,
-    user: dict = Depends(obter_usuario_assinante),
-):
-    """Retorna o histÃ³rico de movimentaÃ§Ãµes do Kanban da ideia."""
-    if not user:
-        raise HTTPException(status_code=401, detail="NÃ£o autenticado")
+def _serialize_background_job(record: dict) -> dict:
+    serialized = _serialize_datetime_fields(dict(record), ["created_at", "updated_at", "finished_at"])
+    serialized["id"] = str(record["id"])
+    serialized["progresso"] = record.get("progresso") or {}
+    return serialized
+
 
+@app.get("/api/jobs/{job_id}", response_model=BackgroundJobResponse)
+def buscar_job(job_id: str, user: dict = Depends(obter_usuario_atual)):
+    """Retorna status e progresso de um job em background do usuario."""
     usuario_id = user["user_id"]
     conn = get_db_connection()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(
                 """
-                SELECT id
-                FROM ideias
-                WHERE id = %s AND usuario_id = %s
-                """,
-                (ideia_id, usuario_id),
-            )
-            if not cur.fetchone():
-                raise HTTPException(
-                    status_code=404,
-                    detail="Ideia nÃ£o encontrada ou vocÃª nÃ£o tem permissÃ£o para ver o histÃ³rico",
-                )
-
-            cur.execute(
-                """
-                SELECT id, ideia_id, usuario_id, de_status, para_status, observacao, moved_at
-                FROM ideias_kanban_historico
-                WHERE ideia_id = %s
-                ORDER BY moved_at DESC, id DESC
+                SELECT id, tipo, status, progresso, resultado, erro, created_at, updated_at, finished_at
+                FROM background_jobs
+                WHERE id::text = %s AND usuario_id = %s
                 """,
-                (ideia_id,),
+                (job_id, usuario_id),
             )
-            historico = cur.fetchall()
-            return [dict(item) for item in historico]
+            job = cur.fetchone()
+            if not job:
+                raise HTTPException(status_code=404, detail="Job nao encontrado")
+            return _serialize_background_job(job)
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao buscar histÃ³rico do Kanban: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar job: {str(e)}")
     finally:
         conn.close()
 
 
-@app.patch("/api/ideias/{ideia_id}/agenda", response_model=IdeiaResponse)
-def atualizar_agenda_ideia(
-    ideia_id: int,
-    payload: AgendaUpdate,
-    user: dict = Depends(obter_usuario_assinante),
-):
-    """Define ou remove a data planejada da ideia na agenda."""
-    if not user:
-        raise HTTPException(status_code=401, detail="NÃ£o autenticado")
+# =============================
+# Importacao em lote de ideias
+# =============================
 
-    usuario_id = user["user_id"]
+
+def _detect_import_format(formato: Optional[str], content_type: Optional[str]) -> str:
+    normalized = (formato or "").strip().lower()
+    if not normalized:
+        content_type = (content_type or "").lower()
+        normalized = "csv" if "csv" in content_type else "jsonl"
+    if normalized in ("ndjson", "json"):
+        normalized = "jsonl"
+    if normalized not in ("jsonl", "csv"):
+        raise HTTPException(status_code=400, detail="Formato invalido. Use: jsonl, csv")
+    return normalized
+
+
+def _iter_import_rows(arquivo, formato: str):
+    """Itera (linha, registro, erro) lendo o upload sob demanda, sem carregar tudo em memoria."""
+    texto = io.TextIOWrapper(arquivo, encoding="utf-8-sig", newline="")
+    if formato == "csv":
+        leitor = csv.DictReader(texto)
+        for registro in leitor:
+            # line_num conta linhas fisicas: campos entre aspas com quebra de linha
+            # ocupam varias; reporta a ultima linha do registro
+            yield leitor.line_num, registro, None
+        return
+
+    for numero, linha in enumerate(texto, start=1):
+        linha = linha.strip()
+        if not linha:
+            continue
+        try:
+            registro = json.loads(linha)
+        except ValueError as e:
+            yield numero, None, f"JSON invalido: {e}"
+            continue
+        if not isinstance(registro, dict):
+            yield numero, None, "Cada linha deve ser um objeto JSON"
+            continue
+        yield numero, registro, None
+
+
+def _validate_import_row(registro: dict):
+    titulo = str(registro.get("titulo") or "").strip()
+    ideia = str(registro.get("ideia") or "").strip()
+    tag = str(registro.get("tag") or "").strip() or None
+    if not titulo:
+        return None, "Campo titulo e obrigatorio"
+    if not ideia:
+        return None, "Campo ideia e obrigatorio"
+
+    projeto_id = registro.get("projeto_id")
+    if projeto_id in (None, ""):
+        projeto_id = None
+    else:
+        try:
+            projeto_id = int(projeto_id)
+        except (TypeError, ValueError):
+            return None, "Campo projeto_id invalido"
+    return (titulo, tag, ideia, projeto_id), None
+
+
+def _copy_import_chunk(cur, linhas: List[tuple]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for linha, titulo, tag, ideia, projeto_id in linhas:
+        writer.writerow([linha, titulo, "" if tag is None else tag, ideia, "" if projeto_id is None else projeto_id])
+    buffer.seek(0)
+    cur.copy_expert(
+        """
+        COPY ideias_import_staging (linha, titulo, tag, ideia, projeto_id)
+        FROM STDIN WITH (FORMAT csv, NULL '')
+        """,
+        buffer,
+    )
+
+
+def _generate_import_embeddings(job_id: str, usuario_id: int, ideia_ids: List[int]) -> dict:
+    gerados = 0
+    falhas = 0
     conn = get_db_connection()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(
-                """
-                UPDATE ideias
-                SET agenda_data = %s,
-                    agenda_observacao = %s,
-                    updated_at = NOW()
-                WHERE id = %s AND usuario_id = %s
-                RETURNING id
-                """,
-                (
-                    payload.agenda_data,
-                    payload.agenda_observacao.strip() if payload.agenda_observacao else None,
-                    ideia_id,
-                    usuario_id,
-                ),
-            )
-            ideia_atualizada = cur.fetchone()
-            if not ideia_atualizada:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Ideia nÃ£o encontrada ou vocÃª nÃ£o tem permissÃ£o para alterar a agenda",
+            for inicio in range(0, len(ideia_ids), IMPORT_EMBEDDING_BATCH):
+                lote_ids = ideia_ids[inicio:inicio + IMPORT_EMBEDDING_BATCH]
+                cur.execute(
+                    """
+                    SELECT id, titulo, tag, ideia
+                    FROM ideias
+                    WHERE usuario_id = %s AND id = ANY(%s)
+                    ORDER BY id
+                    """,
+                    (usuario_id, lote_ids),
+                )
+                ideias = cur.fetchall()
+                conn.rollback()  # sem transacao aberta durante as chamadas ao provedor
+                textos = [_idea_embedding_text(i["titulo"], i.get("tag"), i["ideia"]) for i in ideias]
+                embeddings = gerar_embeddings_em_lote(textos)
+                proximos = gerar_embeddings_proximos(textos) if embeddings else None
+                if not embeddings:
+                    falhas += len(ideias)
+                else:
+                    execute_values(
+                        cur,
+                        """
+                        UPDATE ideias AS i
+                        SET embedding = v.embedding::vector,
+                            embedding_modelo = v.modelo,
+                            embedding_dimensoes = v.dimensoes
+                        FROM (VALUES %s) AS v (id, embedding, modelo, dimensoes)
+                        WHERE i.id = v.id
+                        """,
+                        [
+                            (ideia["id"], _vector_literal(emb), EMBEDDING_MODELO_ATUAL, len(emb))
+                            for ideia, emb in zip(ideias, embeddings)
+                        ],
+                    )
+                    related_ideas.marcar(cur, usuario_id, [ideia["id"] for ideia in ideias])
+                    tag_suggestions.adicionar(cur, usuario_id, [ideia["id"] for ideia in ideias], EMBEDDING_MODELO_ATUAL)
+                    gravar_embeddings_proximos(cur, [ideia["id"] for ideia in ideias], proximos)
+                    gerados += len(ideias)
+                conn.commit()
+                invalidar_busca_usuario(usuario_id, vetores=True)
+                _update_background_job(
+                    job_id,
+                    progresso={"embeddings_gerados": gerados, "embeddings_falhas": falhas},
                 )
-            ideia_completa = _fetch_idea_record(cur, ideia_id, usuario_id)
-            conn.commit()
-            return ideia_completa
-    except HTTPException:
-        raise
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=500, detail=f"Erro ao atualizar agenda da ideia: {str(e)}")
     finally:
         conn.close()
+    return {"embeddings_gerados": gerados, "embeddings_falhas": falhas}
+
+
+def _processar_importacao_ideias(job_id: str, usuario_id: int, arquivo, formato: str):
+    """Valida, copia para staging e mescla em ideias; roda fora do ciclo da requisicao."""
+    conn = None
+    erros: List[dict] = []
+    total_erros = 0
+    lidas = 0
+    validas = 0
+
+    def registrar_erro(linha: int, mensagem: str):
+        nonlocal total_erros
+        total_erros += 1
+        if len(erros) < IMPORT_MAX_ERROS_REPORTADOS:
+            erros.append({"linha": linha, "erro": mensagem})
 
-@app.put("/api/ideias/{ideia_id}/embedding")
-def atualizar_embedding(ideia_id: int, embedding: List[float], user: dict = Depends(obter_usuario_assinante)):
-    """Atualizar embedding de uma ideia"""
-    conn = get_db_connection()
     try:
-        embedding_str = "[" + ",".join(map(str, embedding)) + "]"
+        _update_background_job(job_id, status="processando")
+        conn = get_db_connection()
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(
-                "UPDATE ideias SET embedding = %s::vector WHERE id = %s RETURNING *",
-                (embedding_str, ideia_id)
+                """
+                CREATE TEMP TABLE ideias_import_staging (
+                    linha INTEGER NOT NULL,
+                    titulo TEXT NOT NULL,
+                    tag TEXT,
+                    ideia TEXT NOT NULL,
+                    projeto_id BIGINT
+                ) ON COMMIT DROP
+                """
             )
-            ideia = cur.fetchone()
-            if not ideia:
-                raise HTTPException(status_code=404, detail="Ideia não encontrada")
+
+            pendentes: List[tuple] = []
+            for numero, registro, erro in _iter_import_rows(arquivo, formato):
+                lidas += 1
+                if erro:
+                    registrar_erro(numero, erro)
+                    continue
+                valores, erro = _validate_import_row(registro)
+                if erro:
+                    registrar_erro(numero, erro)
+                    continue
+                pendentes.append((numero, *valores))
+                validas += 1
+                if len(pendentes) >= IMPORT_COPY_CHUNK:
+                    _copy_import_chunk(cur, pendentes)
+                    pendentes = []
+                    _update_background_job(
+                        job_id,
+                        progresso={"linhas_lidas": lidas, "linhas_validas": validas, "linhas_invalidas": total_erros},
+                    )
+            if pendentes:
+                _copy_import_chunk(cur, pendentes)
+
+            cur.execute(
+                """
+                SELECT s.linha, s.projeto_id
+                FROM ideias_import_staging s
+                LEFT JOIN projetos p
+                    ON p.id = s.projeto_id
+                   AND p.usuario_id = %s
+                WHERE s.projeto_id IS NOT NULL
+                  AND p.id IS NULL
+                ORDER BY s.linha
+                """,
+                (usuario_id,),
+            )
+            for row in cur.fetchall():
+                # Ja contada como valida na leitura; passa a ser invalida
+                validas -= 1
+                registrar_erro(row["linha"], f"Projeto {row['projeto_id']} nao encontrado para este usuario")
+
+            cur.execute(
+                """
+                INSERT INTO ideias (titulo, tag, ideia, usuario_id, projeto_id)
+                SELECT s.titulo, s.tag, s.ideia, %s, s.projeto_id
+                FROM ideias_import_staging s
+                LEFT JOIN projetos p
+                    ON p.id = s.projeto_id
+                   AND p.usuario_id = %s
+                WHERE s.projeto_id IS NULL OR p.id IS NOT NULL
+                ORDER BY s.linha
+                RETURNING id
+                """,
+                (usuario_id, usuario_id),
+            )
+            ideia_ids = [row["id"] for row in cur.fetchall()]
             conn.commit()
-            return {"message": "Embedding atualizado com sucesso", "ideia": dict(ideia)}
-    except HTTPException:
-        raise
+            invalidar_busca_usuario(usuario_id)
+
+        progresso = {
+            "linhas_lidas": lidas,
+            "linhas_validas": validas,
+            "linhas_invalidas": total_erros,
+            "inseridas": len(ideia_ids),
+            "embeddings_pendentes": len(ideia_ids) if get_embeddings_model() else 0,
+            "erros": erros,
+        }
+        _update_background_job(job_id, status="gerando_embeddings" if get_embeddings_model() else None, progresso=progresso)
+
+        resultado = dict(progresso)
+        if ideia_ids and get_embeddings_model():
+            resultado.update(_generate_import_embeddings(job_id, usuario_id, ideia_ids))
+        _update_background_job(job_id, status="concluido", resultado=resultado)
     except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=500, detail=f"Erro ao atualizar embedding: {str(e)}")
+        if conn:
+            conn.rollback()
+        print(f"Erro na importacao {job_id}: {e}")
+        traceback.print_exc()
+        _update_background_job(
+            job_id,
+            status="erro",
+            progresso={"linhas_lidas": lidas, "linhas_validas": validas, "linhas_invalidas": total_erros, "erros": erros},
+            erro=str(e),
+        )
     finally:
-        conn.close()
+        if conn:
+            conn.close()
+        arquivo.close()
 
-@app.delete("/api/ideias/{ideia_id}")
-def deletar_ideia(ideia_id: int, user: dict = Depends(obter_usuario_assinante)):
-    """Deletar ideia (apenas do usuário autenticado)"""
-    if not user:
-        raise HTTPException(status_code=401, detail="Não autenticado")
-    
+
+@app.post("/api/ideias/import", status_code=202)
+async def importar_ideias(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    formato: Optional[str] = Query(None),
+    user: dict = Depends(obter_usuario_assinante),
+):
+    """Importa ideias em lote (JSONL ou CSV) e processa em background, retornando o job."""
     usuario_id = user["user_id"]
-    conn = get_db_connection()
+    formato_final = _detect_import_format(formato, request.headers.get("content-type"))
+
+    # O corpo vai para um arquivo temporario em disco para nao segurar o upload
+    # inteiro em memoria. Nao usar SpooledTemporaryFile: no Python 3.10 (producao)
+    # ele nao tem readable() e o TextIOWrapper de _iter_import_rows falha.
+    # Escrita em disco e o INSERT do job rodam no threadpool, fora do event loop.
+    arquivo = await run_in_threadpool(tempfile.TemporaryFile)
+    recebidos = 0
     try:
-        with conn.cursor() as cur:
-            cur.execute("DELETE FROM ideias WHERE id = %s AND usuario_id = %s RETURNING id", (ideia_id, usuario_id))
-            if not cur.fetchone():
-                raise HTTPException(status_code=404, detail="Ideia não encontrada ou você não tem permissão para deletar")
-            conn.commit()
-            return {"message": "Ideia deletada com sucesso", "success": True}
-    except HTTPException:
+        async for chunk in request.stream():
+            recebidos += len(chunk)
+            if recebidos > IMPORT_MAX_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Arquivo excede o limite de {IMPORT_MAX_BYTES} bytes",
+                )
+            await run_in_threadpool(arquivo.write, chunk)
+    except Exception:
+        arquivo.close()
         raise
+
+    if not recebidos:
+        arquivo.close()
+        raise HTTPException(status_code=400, detail="Arquivo de importacao vazio")
+
+    arquivo.seek(0)
+    try:
+        job_id = await run_in_threadpool(
+            _create_background_job,
+            usuario_id,
+            "importacao_ideias",
+            {"formato": formato_final, "bytes": recebidos},
+        )
     except Exception as e:
+        arquivo.close()
+        raise HTTPException(status_code=500, detail=f"Erro ao criar job de importacao: {str(e)}")
+
+    background_tasks.add_task(_processar_importacao_ideias, job_id, usuario_id, arquivo, formato_final)
+    return {"job_id": job_id, "status": "pendente", "status_url": f"/api/jobs/{job_id}"}
+
+
+# =============================
+# Agrupamento de ideias (sugestao de projetos)
+# =============================
+
+
+def _assinatura_embeddings_usuario(cur, usuario_id: int) -> str:
+    """Muda sempre que ideias com embedding sao criadas, apagadas ou editadas."""
+    cur.execute(
+        """
+        SELECT COUNT(*) AS total, MAX(id) AS max_id, MAX(updated_at) AS atualizado
+        FROM ideias
+        WHERE usuario_id = %s AND embedding_modelo = %s AND embedding IS NOT NULL
+        """,
+        (usuario_id, EMBEDDING_MODELO_ATUAL),
+    )
+    row = cur.fetchone()
+    atualizado = row["atualizado"].isoformat() if row["atualizado"] else ""
+    return f"{EMBEDDING_MODELO_ATUAL}:{row['total']}:{row['max_id'] or 0}:{atualizado}"
+
+
+def _ler_embeddings_agrupamento(conn, usuario_id: int):
+    """Uma leitura por cursor nomeado; os vetores sao empilhados a cada EXPORT_ITERSIZE linhas."""
+    ids: List[int] = []
+    tags: List[Optional[str]] = []
+    textos: List[str] = []
+    blocos: List[np.ndarray] = []
+    pendentes: List[np.ndarray] = []
+    dimensoes = None
+    with conn.cursor(name="agrupamento_ideias", cursor_factory=RealDictCursor) as cur:
+        cur.itersize = EXPORT_ITERSIZE
+        cur.execute(
+            """
+            SELECT id, titulo, tag, LEFT(ideia, 500) AS ideia, embedding::text AS embedding
+            FROM ideias
+            WHERE usuario_id = %s AND embedding_modelo = %s AND embedding IS NOT NULL
+            ORDER BY id DESC
+            LIMIT %s
+            """,
+            (usuario_id, EMBEDDING_MODELO_ATUAL, AGRUPAMENTO_MAX_IDEIAS),
+        )
+        for row in cur:
+            vetor = np.fromstring(row["embedding"].strip("[]"), dtype=np.float32, sep=",")
+            # Vetores externos com a mesma identidade mas outra dimensao ficam de fora
+            dimensoes = dimensoes or vetor.shape[0]
+            if vetor.shape[0] != dimensoes:
+                continue
+            ids.append(row["id"])
+            tags.append(row["tag"])
+            textos.append(f"{row['titulo']} {row['ideia'] or ''}")
+            pendentes.append(vetor)
+            if len(pendentes) >= EXPORT_ITERSIZE:
+                blocos.append(np.vstack(pendentes))
+                pendentes = []
+    if pendentes:
+        blocos.append(np.vstack(pendentes))
+    matriz = np.vstack(blocos) if blocos else np.empty((0, 0), dtype=np.float32)
+    return ids, matriz, tags, textos
+
+
+def _processar_agrupamento_ideias(job_id: str, usuario_id: int, k: Optional[int], espaco_id: Optional[int]):
+    conn = None
+    try:
+        _update_background_job(job_id, status="processando")
+        conn = get_db_connection()
+        ids, matriz, tags, textos = _ler_embeddings_agrupamento(conn, usuario_id)
         conn.rollback()
-        raise HTTPException(status_code=500, detail=f"Erro ao deletar ideia: {str(e)}")
+        _update_background_job(job_id, progresso={"ideias_lidas": len(ids)})
+
+        grupos = idea_clusters.agrupar(ids, matriz, tags, textos, k)
+        _update_background_job(
+            job_id,
+            status="concluido",
+            resultado={
+                "espaco_id": espaco_id,
+                "total_ideias": len(ids),
+                "limite_ideias": AGRUPAMENTO_MAX_IDEIAS,
+                "projetos_sugeridos": grupos,
+            },
+        )
+    except Exception as e:
+        print(f"Erro no agrupamento {job_id}: {e}")
+        traceback.print_exc()
+        _update_background_job(job_id, status="erro", erro=str(e))
     finally:
-        conn.close()
+        if conn:
+            conn.close()
 
-@app.post("/api/ideias/buscar", response_model=List[BuscaResponse])
-def buscar_por_similaridade(busca: BuscaRequest, user: dict = Depends(obter_usuario_assinante)):
-    """Buscar ideias por similaridade (apenas do usuário autenticado)"""
-    if not user:
-        raise HTTPException(status_code=401, detail="Não autenticado")
-    
+
+@app.post("/api/ideias/agrupamentos", status_code=202)
+def agrupar_ideias(
+    payload: AgrupamentoIdeiasRequest,
+    background_tasks: BackgroundTasks,
+    user: dict = Depends(obter_usuario_assinante),
+):
+    """Agrupa as ideias por similaridade e sugere projetos, em background.
+
+    Reaproveita o ultimo job com os mesmos parametros enquanto as ideias com
+    embedding do usuario nao mudarem (ou o job ainda estiver em andamento).
+    """
     usuario_id = user["user_id"]
-    limite = busca.limite if busca.limite and busca.limite > 0 else 10
-    limite = min(max(limite, 1), 50)  # guarda-chuva para evitar abusos
-    probes = busca.probes if busca.probes and busca.probes > 0 else 10
-    probes = min(max(probes, 1), 200)
     conn = get_db_connection()
     try:
-        # Gerar embedding do termo de busca automaticamente
-        modelo = get_embeddings_model()
-        if not modelo:
-            # Se não tiver API Key, fazer busca simples (apenas do usuário)
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                termo = busca.termo.lower()
-                cur.execute("""
-                    SELECT 
-                        id,
-                        titulo,
-                        tag,
-                        ideia,
-                        data,
-                        0.0 AS similarity
-                    FROM ideias
-                    WHERE usuario_id = %s
-                      AND (LOWER(titulo) LIKE %s 
-                       OR LOWER(tag) LIKE %s 
-                       OR LOWER(ideia) LIKE %s)
-                    ORDER BY data DESC
-                    LIMIT %s
-                """, (usuario_id, f'%{termo}%', f'%{termo}%', f'%{termo}%', limite))
-                resultados = cur.fetchall()
-                return [dict(resultado) for resultado in resultados]
-        
-        # Gerar embedding da busca
-        embedding_busca = gerar_embedding(busca.termo)
-        if not embedding_busca:
-            raise HTTPException(status_code=500, detail="Erro ao gerar embedding da busca")
-        
-        embedding_str = "[" + ",".join(map(str, embedding_busca)) + "]"
-        
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            # Ajusta probes para balancear precisão x velocidade no ivfflat
-            cur.execute("SET LOCAL ivfflat.probes = %s", (probes,))
-            cur.execute("""
-                SELECT 
-                    id,
-                    titulo,
-                    tag,
-                    ideia,
-                    data,
-                    1 - (embedding <=> %s::vector) AS similarity
-                FROM ideias
-                WHERE usuario_id = %s AND embedding IS NOT NULL
-                  AND (embedding <=> %s::vector) <= 0.7  -- equivalente a similarity >= 0.3
-                ORDER BY embedding <=> %s::vector
-                LIMIT %s
-            """, (embedding_str, usuario_id, embedding_str, embedding_str, limite))
-            resultados = cur.fetchall()
-            if resultados:
-                return [dict(resultado) for resultado in resultados]
-
-            # Segunda passada semantica mais flexivel
-            cur.execute("""
-                SELECT 
-                    id,
-                    titulo,
-                    tag,
-                    ideia,
-                    data,
-                    1 - (embedding <=> %s::vector) AS similarity
-                FROM ideias
-                WHERE usuario_id = %s AND embedding IS NOT NULL
-                ORDER BY embedding <=> %s::vector
-                LIMIT %s
-            """, (embedding_str, usuario_id, embedding_str, limite))
-            resultados = cur.fetchall()
-            if resultados:
-                return [dict(resultado) for resultado in resultados]
+            if payload.espaco_id is not None:
+                cur.execute(
+                    "SELECT id FROM espacos WHERE id = %s AND usuario_id = %s",
+                    (payload.espaco_id, usuario_id),
+                )
+                if not cur.fetchone():
+                    raise HTTPException(status_code=404, detail="Espaço não encontrado para este usuário")
 
-            # Fallback textual quando a busca semantica nao retorna nada
-            termo = busca.termo.lower()
-            cur.execute("""
-                SELECT 
-                    id,
-                    titulo,
-                    tag,
-                    ideia,
-                    data,
-                    0.0 AS similarity
-                FROM ideias
-                WHERE usuario_id = %s
-                  AND (LOWER(titulo) LIKE %s 
-                   OR LOWER(tag) LIKE %s 
-                   OR LOWER(ideia) LIKE %s)
-                ORDER BY data DESC
-                LIMIT %s
-            """, (usuario_id, f'%{termo}%', f'%{termo}%', f'%{termo}%', limite))
-            resultados = cur.fetchall()
-            return [dict(resultado) for resultado in resultados]
+            parametros = {
+                "assinatura": _assinatura_embeddings_usuario(cur, usuario_id),
+                "k": payload.k,
+                "espaco_id": payload.espaco_id,
+            }
+            if not payload.forcar:
+                cur.execute(
+                    """
+                    SELECT id, status
+                    FROM background_jobs
+                    WHERE usuario_id = %s
+                      AND tipo = 'agrupamento_ideias'
+                      AND progresso @> %s::jsonb
+                      AND (
+                          status = 'concluido'
+                          OR (status <> 'erro' AND created_at > NOW() - make_interval(mins => %s))
+                      )
+                    ORDER BY created_at DESC
+                    LIMIT 1
+                    """,
+                    (usuario_id, psycopg2.extras.Json(parametros), AGRUPAMENTO_JOB_VALIDADE_MINUTOS),
+                )
+                existente = cur.fetchone()
+                if existente:
+                    job_id = str(existente["id"])
+                    return {"job_id": job_id, "status": existente["status"], "status_url": f"/api/jobs/{job_id}"}
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro na busca por similaridade: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao preparar agrupamento: {str(e)}")
     finally:
         conn.close()
 
-@app.post("/api/ideias/embeddings/backfill")
-def backfill_embeddings(payload: BackfillEmbeddingsRequest, user: dict = Depends(obter_usuario_assinante)):
-    """Backfill embeddings das ideias sem vetor (apenas do usuario autenticado)"""
-    if not user:
-        raise HTTPException(status_code=401, detail="Nao autenticado")
-    
-    usuario_id = user["user_id"]
-    limite = payload.limite if payload.limite and payload.limite > 0 else 50
-    limite = min(max(limite, 1), 200)
-    forcar = bool(payload.forcar)
+    try:
+        job_id = _create_background_job(usuario_id, "agrupamento_ideias", parametros)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao criar job de agrupamento: {str(e)}")
+
+    background_tasks.add_task(_processar_agrupamento_ideias, job_id, usuario_id, payload.k, payload.espaco_id)
+    return {"job_id": job_id, "status": "pendente", "status_url": f"/api/jobs/{job_id}"}
+
+# =============================
+# Exportacao dos dados do usuario
+# =============================
+
+
+def _export_sections(incluir_embeddings: bool) -> List[tuple]:
+    """Secoes exportadas, na ordem em que saem no arquivo: (nome, SQL filtrado por usuario)."""
+    embedding_field = ", i.embedding::text AS embedding" if incluir_embeddings else ""
+    return [
+        (
+            "espacos",
+            """
+            SELECT e.id, e.nome, e.descricao, e.cor, e.created_at, e.updated_at
+            FROM espacos e
+            WHERE e.usuario_id = %s
+            ORDER BY e.id
+            """,
+        ),
+        (
+            "projetos",
+            """
+            SELECT p.id, p.espaco_id, p.nome, p.descricao, p.created_at, p.updated_at
+            FROM projetos p
+            WHERE p.usuario_id = %s
+            ORDER BY p.id
+            """,
+        ),
+        (
+            "kanbans",
+            """
+            SELECT k.id, k.projeto_id, k.nome, k.descricao, k.cor, k.checklist, k.created_at, k.updated_at
+            FROM kanbans k
+            WHERE k.usuario_id = %s
+            ORDER BY k.id
+            """,
+        ),
+        (
+            "ideias",
+            f"""
+            SELECT
+                i.id,
+                i.titulo,
+                i.tag,
+                i.ideia,
+                i.data,
+                i.created_at,
+                i.updated_at,
+                i.projeto_id,
+                i.kanban_id,
+                i.kanban_ativo,
+                i.kanban_status,
+                i.kanban_updated_at,
+                i.kanban_posicao,
+                i.agenda_data,
+                i.agenda_observacao
+                {embedding_field}
+            FROM ideias i
+            WHERE i.usuario_id = %s
+            ORDER BY i.id
+            """,
+        ),
+        (
+            "kanban_cards",
+            """
+            SELECT
+                kc.id,
+                kc.kanban_id,
+                kc.projeto_id,
+                kc.titulo,
+                kc.descricao,
+                kc.checklist,
+                kc.prazo_entrega,
+                kc.kanban_status,
+                kc.kanban_posicao,
+                kc.created_at,
+                kc.updated_at
+            FROM kanban_cards kc
+            WHERE kc.usuario_id = %s
+            ORDER BY kc.id
+            """,
+        ),
+        (
+            "kanban_historico",
+            """
+            SELECT h.id, h.ideia_id, h.de_status, h.para_status, h.observacao, h.moved_at
+            FROM ideias_kanban_historico h
+            WHERE h.usuario_id = %s
+            ORDER BY h.moved_at, h.id
+            """,
+        ),
+    ]
+
+
+def _iter_export_rows(conn, section: str, sql: str, usuario_id: int):
+    """Le a secao por cursor nomeado (server-side), trazendo EXPORT_ITERSIZE linhas por vez."""
+    with conn.cursor(name=f"export_{section}", cursor_factory=RealDictCursor) as cur:
+        cur.itersize = EXPORT_ITERSIZE
+        cur.execute(sql, (usuario_id,))
+        for row in cur:
+            yield row
 
-    modelo = get_embeddings_model()
-    if not modelo:
-        raise HTTPException(status_code=400, detail="Modelo de embeddings indisponivel (OPENAI_API_KEY nao configurada)")
 
+def _export_json_default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def _export_ndjson_line(section: str, row: dict) -> bytes:
+    registro = dict(row)
+    if isinstance(registro.get("embedding"), str):
+        registro["embedding"] = json.loads(registro["embedding"])
+    return (
+        json.dumps({"tipo": section, "dados": registro}, ensure_ascii=False, default=_export_json_default)
+        + "\n"
+    ).encode("utf-8")
+
+
+def _export_csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _iter_export_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header_written = False
+    for row in rows:
+        if not header_written:
+            writer.writerow(list(row.keys()))
+            header_written = True
+        writer.writerow([_export_csv_value(v) for v in row.values()])
+        if buffer.tell() >= 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class _ZipStreamBuffer:
+    """Destino nao-seekable para o zipfile: acumula bytes ate serem drenados pela resposta."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _stream_export(usuario_id: int, formato: str, secao: Optional[str], incluir_embeddings: bool):
     conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            if forcar:
-                cur.execute("""
-                    SELECT id, titulo, tag, ideia
-                    FROM ideias
-                    WHERE usuario_id = %s
-                    ORDER BY data DESC
-                    LIMIT %s
-                """, (usuario_id, limite))
-            else:
-                cur.execute("""
-                    SELECT id, titulo, tag, ideia
-                    FROM ideias
-                    WHERE usuario_id = %s AND embedding IS NULL
-                    ORDER BY data DESC
-                    LIMIT %s
-                """, (usuario_id, limite))
-            ideias = cur.fetchall()
-            if not ideias:
-                return {"total": 0, "updated": 0, "skipped": 0, "ids": []}
-
-            updated_ids = []
-            skipped = 0
-            for ideia in ideias:
-                texto = f"{ideia['titulo']} {ideia.get('tag') or ''} {ideia['ideia']}".strip()
-                embedding = gerar_embedding(texto)
-                if not embedding:
-                    skipped += 1
-                    continue
-                embedding_str = "[" + ",".join(map(str, embedding)) + "]"
-                cur.execute(
-                    "UPDATE ideias SET embedding = %s::vector, updated_at = NOW() WHERE id = %s AND usuario_id = %s",
-                    (embedding_str, ideia["id"], usuario_id)
-                )
-                updated_ids.append(ideia["id"])
-            conn.commit()
-            return {
-                "total": len(ideias),
-                "updated": len(updated_ids),
-                "skipped": skipped,
-                "ids": updated_ids
-            }
-    except HTTPException:
-        raise
-    except Exception as e:
+        sections = _export_sections(incluir_embeddings)
+        if formato == "ndjson":
+            for section, sql in sections:
+                for row in _iter_export_rows(conn, section, sql, usuario_id):
+                    yield _export_ndjson_line(section, row)
+        elif formato == "csv":
+            section, sql = next(item for item in sections if item[0] == secao)
+            for chunk in _iter_export_csv(_iter_export_rows(conn, section, sql, usuario_id)):
+                yield chunk.encode("utf-8")
+        else:
+            destino = _ZipStreamBuffer()
+            with zipfile.ZipFile(destino, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+                for section, sql in sections:
+                    with zf.open(f"{section}.csv", mode="w") as entrada:
+                        for chunk in _iter_export_csv(_iter_export_rows(conn, section, sql, usuario_id)):
+                            entrada.write(chunk.encode("utf-8"))
+                            data = destino.drain()
+                            if data:
+                                yield data
+                    data = destino.drain()
+                    if data:
+                        yield data
+            data = destino.drain()
+            if data:
+                yield data
         conn.rollback()
-        raise HTTPException(status_code=500, detail=f"Erro ao fazer backfill de embeddings: {str(e)}")
     finally:
         conn.close()
 
 
+@app.get("/api/export")
+def exportar_dados(
+    formato: str = Query("ndjson"),
+    secao: Optional[str] = Query(None),
+    incluir_embeddings: bool = Query(False),
+    user: dict = Depends(obter_usuario_atual),
+):
+    """Exporta ideias, kanbans, cards, historico e workspace do usuario em streaming."""
+    usuario_id = user["user_id"]
+    formato = (formato or "").strip().lower()
+    if formato not in ("ndjson", "csv", "zip"):
+        raise HTTPException(status_code=400, detail="Formato invalido. Use: ndjson, csv, zip")
+
+    secoes_validas = [section for section, _ in _export_sections(incluir_embeddings)]
+    if formato == "csv":
+        secao = (secao or "ideias").strip().lower()
+        if secao not in secoes_validas:
+            raise HTTPException(status_code=400, detail=f"Secao invalida. Use: {', '.join(secoes_validas)}")
+
+    data_arquivo = _now_utc().strftime("%Y%m%d")
+    if formato == "ndjson":
+        media_type, nome_arquivo = "application/x-ndjson", f"sacola-ideias-{data_arquivo}.ndjson"
+    elif formato == "csv":
+        media_type, nome_arquivo = "text/csv; charset=utf-8", f"sacola-ideias-{secao}-{data_arquivo}.csv"
+    else:
+        media_type, nome_arquivo = "application/zip", f"sacola-ideias-{data_arquivo}.zip"
+
+    return StreamingResponse(
+        _stream_export(usuario_id, formato, secao, incluir_embeddings),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{nome_arquivo}"'},
+    )
+
 # =============================
 # Stripe - Checkout e Webhook
 # =============================
@@ -3446,6 +7322,7 @@ def registrar_usuario(register_data: RegisterRequest):
             conn.close()
 
 @app.post("/api/auth/login", response_model=UserResponse)
+@orcamento_sql(2)
 def login_usuario(login_data: LoginRequest):
     """Login com email e senha"""
     import sys
@@ -3979,7 +7856,12 @@ def limpar_todas_ideias():
     try:
         with conn.cursor() as cur:
             cur.execute("TRUNCATE TABLE ideias RESTART IDENTITY CASCADE")
+            cur.execute("TRUNCATE TABLE tag_centroides")
             conn.commit()
+            search_result_cache.invalidar_todos()
+            tag_centroid_index.invalidar_todos()
+            if vector_index is not None:
+                vector_index.invalidar_todos()
             return {"message": "Todas as ideias foram deletadas", "success": True}
     except Exception as e:
         conn.rollback()
@@ -4107,47 +7989,40 @@ class LembrancaRequest(BaseModel):
 class LembrancaResponse(BaseModel):
     sugestoes: List[str]
 
+LEMBRANCAS_MODELO = "gpt-4o-mini"
+LEMBRANCAS_MAX_SUGESTOES = 5
+
+chat_model = None
+sugestoes_lembranca_cache = CoalescingTTLCache(
+    LEMBRANCAS_CACHE_MAX,
+    LEMBRANCAS_CACHE_TTL_SECONDS,
+    guardar_se=bool,  # listas vazias (erro ou resposta inutil) nao ficam em cache
+)
+
 def get_chat_model():
-    """Obter modelo de chat OpenAI para gerar sugestões"""
+    """Cliente de chat OpenAI compartilhado (criado uma vez; as chamadas async sao concorrentes)"""
+    global chat_model
     if not OPENAI_API_KEY:
         return None
-    try:
-        return ChatOpenAI(
-            openai_api_key=OPENAI_API_KEY,
-            model="gpt-4o-mini",
-            temperature=0.7
-        )
-    except:
-        return None
-
-print("🔍 [DEBUG] Definindo endpoint GET /api/lembrancas/teste...")
-@app.get("/api/lembrancas/teste")
-async def teste_lembrancas():
-    """Endpoint de teste para verificar se a rota está funcionando"""
-    return {"status": "ok", "mensagem": "Endpoint de lembranças está funcionando"}
+    if chat_model is None:
+        try:
+            chat_model = ChatOpenAI(
+                openai_api_key=OPENAI_API_KEY,
+                model=LEMBRANCAS_MODELO,
+                temperature=0.7,
+                # Prazo, novas tentativas e disjuntor ficam com politica_chat
+                timeout=politica_chat.timeout_tentativa,
+                max_retries=0,
+            )
+        except Exception as e:
+            print(f"⚠️  Não foi possível criar o modelo de chat: {e}")
+            return None
+    return chat_model
 
-print("🔍 [DEBUG] Definindo endpoint POST /api/lembrancas/sugerir...")
-@app.post("/api/lembrancas/sugerir", response_model=LembrancaResponse)
-async def sugerir_lembranca(lembranca: LembrancaRequest, request: Request):
-    """Gerar sugestões de lembrança usando IA baseado no texto descritivo"""
-    print("=" * 80)
-    print("💭 SUGESTÃO DE LEMBRANÇA - ENDPOINT CHAMADO!")
-    print(f"   Texto recebido: {lembranca.texto[:100]}...")
-    print("=" * 80)
-    
-    if not lembranca.texto.strip():
-        return LembrancaResponse(sugestoes=[])
-    
-    modelo = get_chat_model()
-    if not modelo:
-        print("⚠️  OpenAI API Key não configurada")
-        return LembrancaResponse(sugestoes=[])
-    
-    try:
-        # Prompt para a IA gerar sugestões contextuais
-        prompt = f"""Você é um assistente de memória. O usuário está tentando lembrar de algo e descreveu:
+def _prompt_lembranca(texto: str) -> str:
+    return f"""Você é um assistente de memória. O usuário está tentando lembrar de algo e descreveu:
 
-"{lembranca.texto}"
+"{texto}"
 
 Com base nessa descrição, gere 3-5 sugestões curtas e específicas que possam ajudar a pessoa a lembrar. 
 As sugestões devem ser:
@@ -4164,30 +8039,53 @@ Exemplos de boas sugestões:
 
 Retorne APENAS as sugestões, uma por linha, sem numeração ou marcadores."""
 
-        resposta = modelo.invoke(prompt)
-        print(f"📝 Resposta bruta da IA: {resposta.content[:200]}...")
-        
-        sugestoes_texto = resposta.content.strip()
-        
-        # Separar sugestões por linha e limpar
-        sugestoes = [
-            s.strip() 
-            for s in sugestoes_texto.split('\n') 
-            if s.strip() and not s.strip().startswith(('1.', '2.', '3.', '4.', '5.', '-', '*', '•'))
-        ]
-        
-        # Limitar a 5 sugestões
-        sugestoes = sugestoes[:5]
-        
-        print(f"✅ {len(sugestoes)} sugestões geradas")
-        for i, sug in enumerate(sugestoes, 1):
-            print(f"   {i}. {sug}")
-        print("=" * 80)
-        
+def _linha_sugestao(linha: str) -> Optional[str]:
+    """Linha da resposta que vale como sugestao (descarta numeracao e marcadores)."""
+    sugestao = linha.strip()
+    if not sugestao or sugestao.startswith(('1.', '2.', '3.', '4.', '5.', '-', '*', '•')):
+        return None
+    return sugestao
+
+async def _gerar_sugestoes_lembranca(texto: str) -> List[str]:
+    modelo = get_chat_model()
+    resposta = await politica_chat.executar_async(lambda: modelo.ainvoke(_prompt_lembranca(texto)))
+    print(f"📝 Resposta bruta da IA: {resposta.content[:200]}...")
+    sugestoes = [s for s in map(_linha_sugestao, resposta.content.strip().split('\n')) if s]
+    return sugestoes[:LEMBRANCAS_MAX_SUGESTOES]
+
+def _evento_sse(evento: str, dados: dict) -> str:
+    return f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+print("🔍 [DEBUG] Definindo endpoint GET /api/lembrancas/teste...")
+@app.get("/api/lembrancas/teste")
+async def teste_lembrancas():
+    """Endpoint de teste para verificar se a rota está funcionando"""
+    return {"status": "ok", "mensagem": "Endpoint de lembranças está funcionando"}
+
+print("🔍 [DEBUG] Definindo endpoint POST /api/lembrancas/sugerir...")
+@app.post("/api/lembrancas/sugerir", response_model=LembrancaResponse)
+async def sugerir_lembranca(lembranca: LembrancaRequest, request: Request):
+    """Gerar sugestões de lembrança usando IA baseado no texto descritivo
+
+    Textos iguais (apos normalizar) saem do cache; pedidos identicos simultaneos
+    compartilham a mesma chamada ao modelo.
+    """
+    texto = lembranca.texto.strip()
+    if not texto:
+        return LembrancaResponse(sugestoes=[])
+    
+    if not get_chat_model():
+        print("⚠️  OpenAI API Key não configurada")
+        return LembrancaResponse(sugestoes=[])
+    
+    try:
+        sugestoes = await sugestoes_lembranca_cache.obter_ou_calcular(
+            normalizar_termo(texto),
+            lambda: _gerar_sugestoes_lembranca(texto),
+        )
         if not sugestoes:
             print("⚠️  Nenhuma sugestão foi gerada, retornando lista vazia")
-        
-        return LembrancaResponse(sugestoes=sugestoes)
+        return LembrancaResponse(sugestoes=list(sugestoes))
         
     except Exception as e:
         print(f"❌ Erro ao gerar sugestões: {e}")
@@ -4196,6 +8094,70 @@ Retorne APENAS as sugestões, uma por linha, sem numeração ou marcadores."""
         # Retornar lista vazia em caso de erro
         return LembrancaResponse(sugestoes=[])
 
+@app.post("/api/lembrancas/sugerir/stream")
+async def sugerir_lembranca_stream(lembranca: LembrancaRequest):
+    """Mesmas sugestões via Server-Sent Events: um evento `sugestao` por linha assim que
+    o modelo a termina, depois `fim` com a lista completa (ou `erro`)."""
+    texto = lembranca.texto.strip()
+    modelo = get_chat_model() if texto else None
+    chave = normalizar_termo(texto)
+
+    async def eventos():
+        if not modelo:
+            yield _evento_sse("fim", {"sugestoes": []})
+            return
+
+        prontas = sugestoes_lembranca_cache.obter(chave)
+        if prontas is None:
+            futuro = sugestoes_lembranca_cache.em_andamento(chave)
+            if futuro is not None:
+                try:
+                    prontas = await asyncio.shield(futuro)
+                except Exception:
+                    prontas = []
+        if prontas is not None:
+            for sugestao in prontas:
+                yield _evento_sse("sugestao", {"sugestao": sugestao})
+            yield _evento_sse("fim", {"sugestoes": list(prontas)})
+            return
+
+        futuro = sugestoes_lembranca_cache.registrar(chave)
+        sugestoes: List[str] = []
+        pendente = ""
+        try:
+            async with politica_chat.em_stream() as limitar:
+                # aclosing: no break, o stream da OpenAI fecha antes de a vaga ser liberada
+                async with contextlib.aclosing(limitar(modelo.astream(_prompt_lembranca(texto)))) as partes:
+                    async for parte in partes:
+                        pendente += parte.content or ""
+                        *linhas, pendente = pendente.split("\n")
+                        for linha in linhas:
+                            sugestao = _linha_sugestao(linha)
+                            if sugestao and len(sugestoes) < LEMBRANCAS_MAX_SUGESTOES:
+                                sugestoes.append(sugestao)
+                                yield _evento_sse("sugestao", {"sugestao": sugestao})
+                        if len(sugestoes) >= LEMBRANCAS_MAX_SUGESTOES:
+                            break
+            sugestao = _linha_sugestao(pendente)
+            if sugestao and len(sugestoes) < LEMBRANCAS_MAX_SUGESTOES:
+                sugestoes.append(sugestao)
+                yield _evento_sse("sugestao", {"sugestao": sugestao})
+            sugestoes_lembranca_cache.concluir(futuro, sugestoes)
+            yield _evento_sse("fim", {"sugestoes": sugestoes})
+        except Exception as e:
+            print(f"❌ Erro ao gerar sugestões (stream): {e}")
+            sugestoes_lembranca_cache.falhar(futuro, e)
+            yield _evento_sse("erro", {"erro": "Erro ao gerar sugestões"})
+        finally:
+            # Cliente desconectou no meio: libera quem esperava por este resultado
+            sugestoes_lembranca_cache.falhar(futuro, RuntimeError("Geração de sugestões interrompida"))
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 if __name__ == "__main__":
     import uvicorn
     PORT = int(os.getenv("PORT") or os.getenv("BACKEND_PORT", "8002"))
@@ -0,0 +1,22 @@
+"""
+Benchmark de carga do backend com dependencias locais.
+
+Sobe um Postgres descartavel com pgvector e pg_stat_statements, um servidor
+falso compativel com a API do OpenAI (embeddings e chat) e o backend
+(uvicorn) apontando para os dois; semeia N usuarios x M ideias/cards/historico
+com tamanhos realistas e mede cada endpoint em uma fase propria, com
+concorrencia fixa. O relatorio JSON traz, por endpoint, vazao, p50/p95/p99,
+consultas/linhas/tempo de banco por requisicao e chamadas ao OpenAI.
+
+Rodar de dentro de backend/:
+    python -m benchmark executar --usuarios 20 --ideias 500 --saida relatorio.json
+    python -m benchmark executar --dsn postgresql://postgres@localhost/bench --cenarios buscar,board
+    python -m benchmark comparar base.json relatorio.json --tolerancia 0.2
+
+Modulos:
+    local_postgres  Postgres via Docker (pgvector/pgvector) ou initdb/pg_ctl locais
+    fake_openai     /v1/embeddings e /v1/chat/completions com latencia e erros simulados
+    seed            esquema base (usuarios, assinaturas, ideias) e dados sinteticos
+    load            cenarios, fases de carga e contadores do pg_stat_statements
+    runner          orquestra tudo e compara relatorios
+"""
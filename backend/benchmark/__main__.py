@@ -0,0 +1,101 @@
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+from benchmark.load import CENARIOS
+from benchmark.local_postgres import MODOS
+from benchmark.runner import comparar_relatorios, executar_benchmark, gravar_relatorio
+
+
+def _ambiente(pares: List[str]) -> dict:
+    ambiente = {}
+    for par in pares:
+        chave, separador, valor = par.partition("=")
+        if not separador:
+            raise argparse.ArgumentTypeError(f"--env espera CHAVE=VALOR: {par}")
+        ambiente[chave] = valor
+    return ambiente
+
+
+def _main(argv: List[str]) -> Optional[int]:
+    parser = argparse.ArgumentParser(prog="python -m benchmark")
+    sub = parser.add_subparsers(dest="comando")
+
+    execucao = sub.add_parser("executar", help="sobe as dependencias, semeia, mede cada endpoint e grava o JSON")
+    execucao.add_argument("--usuarios", type=int, default=20)
+    execucao.add_argument("--ideias", type=int, default=500, help="ideias por usuario")
+    execucao.add_argument("--cards", type=int, default=100, help="cards nativos por usuario")
+    execucao.add_argument("--historico", type=int, default=5, help="movimentacoes por item do kanban")
+    execucao.add_argument("--cenarios", default=",".join(CENARIOS), help=f"lista separada por virgula ({', '.join(CENARIOS)})")
+    execucao.add_argument("--concorrencia", type=int, default=16)
+    execucao.add_argument("--duracao", type=float, default=20.0, help="segundos medidos por cenario")
+    execucao.add_argument("--aquecimento", type=float, default=3.0, help="segundos descartados antes de medir")
+    execucao.add_argument("--dsn", default=None, help="Postgres ja existente (com pgvector) em vez de subir um")
+    execucao.add_argument("--postgres", choices=MODOS, default="docker")
+    execucao.add_argument("--porta-postgres", type=int, default=55432)
+    execucao.add_argument("--porta-backend", type=int, default=8802)
+    execucao.add_argument("--porta-openai", type=int, default=8900)
+    execucao.add_argument("--workers", type=int, default=1, help="workers do uvicorn")
+    execucao.add_argument("--latencia-openai-ms", type=float, default=50.0)
+    execucao.add_argument("--erros-openai", type=float, default=0.0, help="fracao de chamadas ao OpenAI que falham")
+    execucao.add_argument("--env", action="append", default=[], metavar="CHAVE=VALOR", help="variavel extra do backend")
+    execucao.add_argument("--logs", default="benchmark_logs", help="diretorio dos logs do backend e do OpenAI falso")
+    execucao.add_argument("--semente", type=int, default=42)
+    execucao.add_argument("--saida", default="benchmark_relatorio.json")
+
+    comparacao = sub.add_parser("comparar", help="compara dois relatorios; sai com 1 se houver regressao")
+    comparacao.add_argument("base")
+    comparacao.add_argument("novo")
+    comparacao.add_argument("--tolerancia", type=float, default=0.2, help="variacao aceita em latencia e vazao")
+
+    args = parser.parse_args(argv[1:])
+    if args.comando == "comparar":
+        with open(args.base, encoding="utf-8") as arquivo:
+            base = json.load(arquivo)
+        with open(args.novo, encoding="utf-8") as arquivo:
+            novo = json.load(arquivo)
+        linhas, regressao = comparar_relatorios(base, novo, args.tolerancia)
+        print(f"📊 {base.get('commit') or args.base} -> {novo.get('commit') or args.novo}")
+        for linha in linhas:
+            print(linha)
+        return 1 if regressao else 0
+    if args.comando != "executar":
+        parser.print_help()
+        return 1
+
+    try:
+        relatorio = executar_benchmark(
+            [c.strip() for c in args.cenarios.split(",") if c.strip()],
+            args.usuarios,
+            args.ideias,
+            args.cards,
+            args.historico,
+            args.concorrencia,
+            args.duracao,
+            args.aquecimento,
+            dsn=args.dsn,
+            modo_postgres=args.postgres,
+            porta_postgres=args.porta_postgres,
+            porta_backend=args.porta_backend,
+            porta_openai=args.porta_openai,
+            workers=args.workers,
+            latencia_openai_ms=args.latencia_openai_ms,
+            erros_openai=args.erros_openai,
+            ambiente=_ambiente(args.env),
+            diretorio_logs=args.logs,
+            semente=args.semente,
+        )
+    except KeyboardInterrupt:
+        print("⏸️  Interrompido.")
+        return 1
+    except Exception as e:
+        print(f"❌ Erro no benchmark: {e}")
+        return 1
+    gravar_relatorio(relatorio, args.saida)
+    print(f"✅ Relatorio gravado em {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv))
@@ -0,0 +1,214 @@
+"""
+Servidor falso compativel com a API do OpenAI, para o benchmark rodar sem rede.
+
+    POST /v1/embeddings        vetores do LocalHashingEmbeddingProvider (textos
+                               parecidos ficam proximos, entao a busca devolve
+                               resultados plausiveis); aceita `input` como texto,
+                               lista de textos ou listas de tokens (o langchain envia
+                               tokens do tiktoken, decodificados com cl100k_base),
+                               `dimensions` e `encoding_format` float/base64
+    POST /v1/chat/completions  sugestoes derivadas da ultima mensagem, com ou sem stream
+    GET  /estatisticas         chamadas e erros simulados por rota
+
+Latencia artificial (com jitter de +-50%) e taxa de erros 500/429 simulados
+exercitam prazos, novas tentativas e o disjuntor do backend.
+
+    python -m benchmark.fake_openai --porta 8900 --latencia-ms 80 --erros 0.01
+
+O backend usa o servidor com OPENAI_BASE_URL=http://127.0.0.1:8900/v1 e qualquer
+OPENAI_API_KEY. O tiktoken precisa do cl100k_base em cache (TIKTOKEN_CACHE_DIR)
+quando a maquina nao tem rede.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from embedding_providers import DIMENSOES_PADRAO, LocalHashingEmbeddingProvider
+
+
+@lru_cache(maxsize=8)
+def _provedor(dimensoes: int) -> LocalHashingEmbeddingProvider:
+    return LocalHashingEmbeddingProvider(dimensoes)
+
+
+def vetor_fake(texto: str, dimensoes: int = DIMENSOES_PADRAO) -> List[float]:
+    """Vetor devolvido pelo servidor para `texto` (o seed usa o mesmo para as ideias)."""
+    return _provedor(dimensoes).embed_query(texto)
+
+
+@lru_cache(maxsize=1)
+def _codificacao():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"⚠️  tiktoken indisponivel ({e}); tokens viram texto literal")
+        return None
+
+
+def _texto_da_entrada(entrada) -> str:
+    if isinstance(entrada, str):
+        return entrada
+    codificacao = _codificacao()
+    if codificacao is not None:
+        return codificacao.decode(list(entrada))
+    return " ".join(str(token) for token in entrada)
+
+
+def _entradas(payload) -> List[str]:
+    entrada = payload.get("input")
+    if isinstance(entrada, str):
+        return [entrada]
+    if entrada and isinstance(entrada[0], int):
+        return [_texto_da_entrada(entrada)]
+    return [_texto_da_entrada(item) for item in entrada or []]
+
+
+def _sugestoes(texto: str, quantidade: int = 5) -> List[str]:
+    palavras = [p for p in texto.split() if len(p) > 3][:6] or ["algo"]
+    return [f"{i}. Lembrar de {' '.join(palavras[: 2 + i % 3])} ({i})" for i in range(1, quantidade + 1)]
+
+
+class EstatisticasFake:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.chamadas = {}
+        self.erros = {}
+
+    def contar(self, rota: str, erro: bool = False):
+        with self._lock:
+            self.chamadas[rota] = self.chamadas.get(rota, 0) + 1
+            if erro:
+                self.erros[rota] = self.erros.get(rota, 0) + 1
+
+    def copia(self) -> dict:
+        with self._lock:
+            return {"chamadas": dict(self.chamadas), "erros": dict(self.erros)}
+
+
+def criar_app(latencia_ms: float = 0.0, erros: float = 0.0, semente: Optional[int] = None) -> FastAPI:
+    app = FastAPI(title="OpenAI falso (benchmark)")
+    estatisticas = EstatisticasFake()
+    sorteio = random.Random(semente)
+
+    async def _simular(rota: str) -> Optional[JSONResponse]:
+        if latencia_ms:
+            await asyncio.sleep(latencia_ms / 1000 * sorteio.uniform(0.5, 1.5))
+        if erros and sorteio.random() < erros:
+            estatisticas.contar(rota, erro=True)
+            status = sorteio.choice((429, 500))
+            return JSONResponse(
+                status_code=status,
+                content={"error": {"message": "falha simulada", "type": "server_error", "code": status}},
+            )
+        estatisticas.contar(rota)
+        return None
+
+    @app.get("/estatisticas")
+    def ler_estatisticas():
+        return estatisticas.copia()
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        payload = await request.json()
+        falha = await _simular("embeddings")
+        if falha is not None:
+            return falha
+        dimensoes = int(payload.get("dimensions") or DIMENSOES_PADRAO)
+        textos = _entradas(payload)
+        # Hashing de n-gramas e CPU pura: fora do event loop
+        vetores = await asyncio.to_thread(lambda: [vetor_fake(texto, dimensoes) for texto in textos])
+        base64_pedido = payload.get("encoding_format") == "base64"
+        dados = []
+        for indice, vetor in enumerate(vetores):
+            valor = (
+                base64.b64encode(np.asarray(vetor, dtype="<f4").tobytes()).decode("ascii")
+                if base64_pedido
+                else vetor
+            )
+            dados.append({"object": "embedding", "index": indice, "embedding": valor})
+        tokens = sum(len(texto.split()) for texto in textos)
+        return {
+            "object": "list",
+            "data": dados,
+            "model": payload.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat(request: Request):
+        payload = await request.json()
+        falha = await _simular("chat")
+        if falha is not None:
+            return falha
+        mensagens = payload.get("messages") or [{}]
+        conteudo = "\n".join(_sugestoes(str(mensagens[-1].get("content", ""))))
+        modelo = payload.get("model", "gpt-4o-mini")
+        identificador = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        criado = int(time.time())
+
+        if not payload.get("stream"):
+            return {
+                "id": identificador,
+                "object": "chat.completion",
+                "created": criado,
+                "model": modelo,
+                "choices": [
+                    {"index": 0, "message": {"role": "assistant", "content": conteudo}, "finish_reason": "stop"}
+                ],
+                "usage": {"prompt_tokens": 50, "completion_tokens": 50, "total_tokens": 100},
+            }
+
+        async def partes():
+            def pedaco(delta: dict, fim: Optional[str] = None) -> str:
+                corpo = {
+                    "id": identificador,
+                    "object": "chat.completion.chunk",
+                    "created": criado,
+                    "model": modelo,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": fim}],
+                }
+                return f"data: {json.dumps(corpo, ensure_ascii=False)}\n\n"
+
+            yield pedaco({"role": "assistant", "content": ""})
+            for palavra in conteudo.split(" "):
+                await asyncio.sleep(0.005)
+                yield pedaco({"content": palavra + " "})
+            yield pedaco({}, "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(partes(), media_type="text/event-stream")
+
+    return app
+
+
+def _main(argv: List[str]) -> Optional[int]:
+    parser = argparse.ArgumentParser(prog="python -m benchmark.fake_openai")
+    parser.add_argument("--porta", type=int, default=8900)
+    parser.add_argument("--latencia-ms", type=float, default=0.0)
+    parser.add_argument("--erros", type=float, default=0.0, help="fracao de chamadas que falham (0 a 1)")
+    args = parser.parse_args(argv[1:])
+
+    import uvicorn
+
+    print(f"🤖 OpenAI falso na porta {args.porta} (latencia {args.latencia_ms:.0f} ms, erros {args.erros:.1%})")
+    uvicorn.run(criar_app(args.latencia_ms, args.erros), host="127.0.0.1", port=args.porta, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv))
@@ -0,0 +1,262 @@
+"""
+Cenarios de carga, fases com concorrencia fixa e contadores de banco.
+
+Cada cenario monta uma requisicao a partir de um usuario sorteado do
+manifesto. Uma fase roda um cenario por vez: aquecimento (descartado), zera o
+pg_stat_statements e mede por `duracao` segundos com `concorrencia` clientes em
+laco fechado. Como so um endpoint roda por fase, as consultas do periodo sao
+atribuidas a ele (os loops de manutencao do backend entram como ruido pequeno).
+"""
+
+import asyncio
+import random
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+import psycopg2
+
+from benchmark.seed import STATUS_KANBAN
+
+
+# (metodo, caminho, corpo json)
+Requisicao = Tuple[str, str, Optional[dict]]
+
+
+def _login(usuario, manifesto, sorteio) -> Requisicao:
+    return "POST", "/api/auth/login", {"email": usuario["email"], "senha": manifesto["senha"]}
+
+
+def _listar_ideias(usuario, manifesto, sorteio) -> Requisicao:
+    return "GET", "/api/ideias", None
+
+
+def _buscar(usuario, manifesto, sorteio) -> Requisicao:
+    return "POST", "/api/ideias/buscar", {"termo": sorteio.choice(manifesto["termos"]), "limite": 10}
+
+
+def _workspace(usuario, manifesto, sorteio) -> Requisicao:
+    return "GET", "/api/workspace", None
+
+
+def _board(usuario, manifesto, sorteio) -> Requisicao:
+    return "GET", f"/api/kanbans/{sorteio.choice(usuario['kanbans'])['id']}/board", None
+
+
+def _cards(usuario, manifesto, sorteio) -> Requisicao:
+    return "GET", f"/api/kanbans/{sorteio.choice(usuario['kanbans'])['id']}/cards", None
+
+
+def _mover(usuario, manifesto, sorteio) -> Requisicao:
+    kanbans = [k for k in usuario["kanbans"] if k["cards"] or k["ideias"]] or usuario["kanbans"]
+    kanban = sorteio.choice(kanbans)
+    if kanban["cards"] and (not kanban["ideias"] or sorteio.random() < 0.5):
+        tipo, item_id = "card", sorteio.choice(kanban["cards"])
+    elif kanban["ideias"]:
+        tipo, item_id = "ideia", sorteio.choice(kanban["ideias"])
+    else:
+        tipo, item_id = "card", 0
+    # Sem vizinhos: vai para o topo da coluna sorteada
+    corpo = {"item_tipo": tipo, "id": item_id, "kanban_status": sorteio.choice(STATUS_KANBAN)}
+    return "POST", f"/api/kanbans/{kanban['id']}/mover", corpo
+
+
+def _criar_card(usuario, manifesto, sorteio) -> Requisicao:
+    corpo = {
+        "titulo": f"Card de carga {sorteio.randint(1, 10 ** 6)}",
+        "descricao": sorteio.choice(manifesto["termos"]),
+        "kanban_status": sorteio.choice(STATUS_KANBAN),
+    }
+    return "POST", f"/api/kanbans/{sorteio.choice(usuario['kanbans'])['id']}/cards", corpo
+
+
+# nome -> (rota no relatorio, exige token, funcao (usuario, manifesto, sorteio) -> Requisicao)
+CENARIOS: Dict[str, Tuple[str, bool, Callable[..., Requisicao]]] = {
+    "login": ("POST /api/auth/login", False, _login),
+    "ideias": ("GET /api/ideias", True, _listar_ideias),
+    "buscar": ("POST /api/ideias/buscar", True, _buscar),
+    "workspace": ("GET /api/workspace", True, _workspace),
+    "board": ("GET /api/kanbans/{id}/board", True, _board),
+    "cards": ("GET /api/kanbans/{id}/cards", True, _cards),
+    "mover": ("POST /api/kanbans/{id}/mover", True, _mover),
+    "criar_card": ("POST /api/kanbans/{id}/cards", True, _criar_card),
+}
+
+
+class EstatisticasBanco:
+    """Consultas, linhas e tempo de execucao no banco do benchmark, via pg_stat_statements."""
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self.disponivel = False
+        self._filtro_topo = ""
+        try:
+            conn = psycopg2.connect(dsn)
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1 FROM pg_stat_statements LIMIT 1")
+                    cur.execute("SHOW server_version_num")
+                    # Chamadas aninhadas (funcoes, triggers) ficam de fora a partir do PG 14
+                    if int(cur.fetchone()[0]) >= 140000:
+                        self._filtro_topo = "AND toplevel"
+                self.disponivel = True
+            finally:
+                conn.close()
+        except psycopg2.Error as e:
+            print(f"⚠️  pg_stat_statements indisponivel, sem contagem de consultas: {str(e).strip()}")
+
+    def zerar(self):
+        if self.disponivel:
+            self._executar("SELECT pg_stat_statements_reset()")
+
+    def ler(self) -> Optional[dict]:
+        if not self.disponivel:
+            return None
+        linha = self._executar(
+            f"""
+            SELECT COALESCE(SUM(calls), 0), COALESCE(SUM(rows), 0), COALESCE(SUM(total_exec_time), 0)
+            FROM pg_stat_statements
+            WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+              AND query NOT ILIKE '%pg_stat_statements%'
+              {self._filtro_topo}
+            """
+        )
+        return {"consultas": int(linha[0]), "linhas": int(linha[1]), "tempo_ms": float(linha[2])}
+
+    def _executar(self, sql: str):
+        conn = psycopg2.connect(self.dsn)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql)
+                return cur.fetchone()
+        finally:
+            conn.close()
+
+
+def percentis(latencias: List[float]) -> dict:
+    if not latencias:
+        return {"p50": None, "p95": None, "p99": None, "max": None, "media": None}
+    valores = np.array(latencias)
+    return {
+        "p50": round(float(np.percentile(valores, 50)), 2),
+        "p95": round(float(np.percentile(valores, 95)), 2),
+        "p99": round(float(np.percentile(valores, 99)), 2),
+        "max": round(float(valores.max()), 2),
+        "media": round(float(valores.mean()), 2),
+    }
+
+
+async def _rodar(
+    cliente: httpx.AsyncClient,
+    cenario: str,
+    manifesto: dict,
+    tokens: Dict[int, str],
+    concorrencia: int,
+    duracao: float,
+    semente: int,
+) -> Tuple[List[float], Dict[str, int], float]:
+    _, autenticado, montar = CENARIOS[cenario]
+    latencias: List[float] = []
+    status: Dict[str, int] = {}
+    fim = time.monotonic() + duracao
+
+    async def cliente_virtual(numero: int):
+        sorteio = random.Random(semente * 1000 + numero)
+        while time.monotonic() < fim:
+            usuario = sorteio.choice(manifesto["usuarios"])
+            metodo, caminho, corpo = montar(usuario, manifesto, sorteio)
+            cabecalhos = {"Authorization": f"Bearer {tokens[usuario['id']]}"} if autenticado else {}
+            inicio = time.perf_counter()
+            try:
+                resposta = await cliente.request(metodo, caminho, json=corpo, headers=cabecalhos)
+                chave = str(resposta.status_code)
+            except httpx.HTTPError as e:
+                chave = type(e).__name__
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            status[chave] = status.get(chave, 0) + 1
+
+    inicio = time.monotonic()
+    await asyncio.gather(*(cliente_virtual(n) for n in range(concorrencia)))
+    return latencias, status, time.monotonic() - inicio
+
+
+async def autenticar(cliente: httpx.AsyncClient, manifesto: dict, concorrencia: int = 8) -> Dict[int, str]:
+    """Token JWT de cada usuario do manifesto (login real, como o frontend)."""
+    tokens: Dict[int, str] = {}
+    vagas = asyncio.Semaphore(concorrencia)
+
+    async def entrar(usuario):
+        async with vagas:
+            resposta = await cliente.post(
+                "/api/auth/login", json={"email": usuario["email"], "senha": manifesto["senha"]}
+            )
+            resposta.raise_for_status()
+            tokens[usuario["id"]] = resposta.json()["token"]
+
+    await asyncio.gather(*(entrar(usuario) for usuario in manifesto["usuarios"]))
+    return tokens
+
+
+def medir_cenario(
+    url: str,
+    cenario: str,
+    manifesto: dict,
+    tokens: Dict[int, str],
+    banco: EstatisticasBanco,
+    concorrencia: int,
+    duracao: float,
+    aquecimento: float,
+    semente: int = 42,
+    contar_openai: Optional[Callable[[], dict]] = None,
+    timeout: float = 60.0,
+) -> dict:
+    rota = CENARIOS[cenario][0]
+
+    async def fase():
+        limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+        async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limites) as cliente:
+            if aquecimento > 0:
+                await _rodar(cliente, cenario, manifesto, tokens, concorrencia, aquecimento, semente + 1)
+            banco.zerar()
+            openai_antes = contar_openai() if contar_openai else None
+            resultado = await _rodar(cliente, cenario, manifesto, tokens, concorrencia, duracao, semente)
+            openai_depois = contar_openai() if contar_openai else None
+            return resultado, openai_antes, openai_depois
+
+    (latencias, status, decorrido), openai_antes, openai_depois = asyncio.run(fase())
+    requisicoes = len(latencias)
+    contadores = banco.ler()
+    erros = sum(quantidade for chave, quantidade in status.items() if not chave.startswith(("2", "3")))
+
+    relatorio = {
+        "cenario": cenario,
+        "rota": rota,
+        "requisicoes": requisicoes,
+        "erros": erros,
+        "status": status,
+        "duracao_s": round(decorrido, 2),
+        "throughput_rps": round(requisicoes / decorrido, 2) if decorrido else None,
+        "latencia_ms": percentis(latencias),
+        "banco": None,
+        "openai": None,
+    }
+    if contadores is not None and requisicoes:
+        relatorio["banco"] = {
+            **contadores,
+            "tempo_ms": round(contadores["tempo_ms"], 2),
+            "consultas_por_requisicao": round(contadores["consultas"] / requisicoes, 2),
+            "linhas_por_requisicao": round(contadores["linhas"] / requisicoes, 2),
+            "tempo_ms_por_requisicao": round(contadores["tempo_ms"] / requisicoes, 3),
+        }
+    if openai_antes is not None and openai_depois is not None and requisicoes:
+        chamadas = {
+            rota_openai: total - openai_antes.get(rota_openai, 0)
+            for rota_openai, total in openai_depois.items()
+        }
+        relatorio["openai"] = {
+            rota_openai: {"chamadas": total, "por_requisicao": round(total / requisicoes, 3)}
+            for rota_openai, total in chamadas.items()
+            if total
+        }
+    return relatorio
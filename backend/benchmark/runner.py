@@ -0,0 +1,284 @@
+"""
+Orquestracao do benchmark: Postgres, OpenAI falso, backend, seed, fases e relatorio.
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import psycopg2
+
+from benchmark.load import CENARIOS, EstatisticasBanco, autenticar, medir_cenario
+from benchmark.local_postgres import PostgresLocal
+from benchmark.seed import criar_esquema_base, finalizar, semear
+
+
+DIRETORIO_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ProcessoServidor:
+    """Subprocesso HTTP (uvicorn) com log em arquivo; pronto quando `url_saude` responde 200."""
+
+    def __init__(self, nome: str, comando: List[str], url_saude: str, arquivo_log: str, env: Optional[dict] = None):
+        self.nome = nome
+        self.comando = comando
+        self.url_saude = url_saude
+        self.arquivo_log = arquivo_log
+        self.env = env
+        self._processo: Optional[subprocess.Popen] = None
+
+    def iniciar(self, espera: float = 120.0):
+        log = open(self.arquivo_log, "ab")
+        self._processo = subprocess.Popen(
+            self.comando, cwd=DIRETORIO_BACKEND, env=self.env, stdout=log, stderr=subprocess.STDOUT
+        )
+        log.close()
+        limite = time.monotonic() + espera
+        while True:
+            if self._processo.poll() is not None:
+                raise RuntimeError(f"{self.nome} terminou ao iniciar (ver {self.arquivo_log})")
+            try:
+                if httpx.get(self.url_saude, timeout=2).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() >= limite:
+                self.parar()
+                raise RuntimeError(f"{self.nome} nao respondeu em {espera:.0f}s (ver {self.arquivo_log})")
+            time.sleep(0.5)
+
+    def parar(self):
+        if self._processo is None:
+            return
+        self._processo.terminate()
+        try:
+            self._processo.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self._processo.kill()
+            self._processo.wait()
+        self._processo = None
+
+
+def _ambiente_backend(dsn: str, url_openai: str, extras: Dict[str, str]) -> dict:
+    env = dict(os.environ)
+    # DATABASE_URL tem prioridade em build_db_config; o .env do backend nao sobrescreve o ambiente
+    env.update(
+        {
+            "DATABASE_URL": dsn,
+            "OPENAI_API_KEY": "sk-benchmark",
+            "OPENAI_BASE_URL": url_openai,
+            "OPENAI_API_BASE": url_openai,
+            "EMBEDDING_PROVEDOR": "openai",
+            "JWT_SECRET": "benchmark-jwt",
+            "PYTHONUNBUFFERED": "1",
+        }
+    )
+    env.update(extras)
+    return env
+
+
+def _commit_atual() -> Optional[str]:
+    try:
+        resultado = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=DIRETORIO_BACKEND, capture_output=True, text=True, timeout=10
+        )
+        return resultado.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _versao_postgres(dsn: str) -> Optional[str]:
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SHOW server_version")
+            postgres = cur.fetchone()[0]
+            cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            linha = cur.fetchone()
+            return f"{postgres} (pgvector {linha[0] if linha else 'ausente'})"
+    finally:
+        conn.close()
+
+
+def executar_benchmark(
+    cenarios: List[str],
+    usuarios: int,
+    ideias: int,
+    cards: int,
+    historico: int,
+    concorrencia: int,
+    duracao: float,
+    aquecimento: float,
+    dsn: Optional[str] = None,
+    modo_postgres: str = "docker",
+    porta_postgres: int = 55432,
+    porta_backend: int = 8802,
+    porta_openai: int = 8900,
+    workers: int = 1,
+    latencia_openai_ms: float = 50.0,
+    erros_openai: float = 0.0,
+    ambiente: Optional[Dict[str, str]] = None,
+    diretorio_logs: str = "benchmark_logs",
+    semente: int = 42,
+) -> dict:
+    desconhecidos = [c for c in cenarios if c not in CENARIOS]
+    if desconhecidos:
+        raise ValueError(f"Cenario(s) desconhecido(s): {', '.join(desconhecidos)} (use {', '.join(CENARIOS)})")
+    os.makedirs(diretorio_logs, exist_ok=True)
+    postgres = None if dsn else PostgresLocal(modo_postgres, porta_postgres)
+    url_openai = f"http://127.0.0.1:{porta_openai}"
+    url_backend = f"http://127.0.0.1:{porta_backend}"
+    openai_falso = ProcessoServidor(
+        "OpenAI falso",
+        [
+            sys.executable, "-m", "benchmark.fake_openai", "--porta", str(porta_openai),
+            "--latencia-ms", str(latencia_openai_ms), "--erros", str(erros_openai),
+        ],
+        f"{url_openai}/estatisticas",
+        os.path.join(diretorio_logs, "fake_openai.log"),
+    )
+    backend = None
+    try:
+        if postgres:
+            print(f"🐘 Subindo Postgres ({modo_postgres}) na porta {porta_postgres}...")
+            postgres.iniciar()
+            dsn = postgres.dsn
+        conn = psycopg2.connect(dsn)
+        try:
+            criar_esquema_base(conn)
+        finally:
+            conn.close()
+
+        openai_falso.iniciar()
+        backend = ProcessoServidor(
+            "Backend",
+            [
+                sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(porta_backend),
+                "--workers", str(workers), "--log-level", "warning",
+            ],
+            f"{url_backend}/",
+            os.path.join(diretorio_logs, "backend.log"),
+            _ambiente_backend(dsn, f"{url_openai}/v1", ambiente or {}),
+        )
+        # O startup do backend cria o resto do esquema; o seed roda com ele parado e
+        # o backend sobe de novo para comecar com caches vazios sobre os dados finais
+        print("⚙️  Criando esquema pelo startup do backend...")
+        backend.iniciar()
+        backend.parar()
+
+        print(f"🌱 Semeando {usuarios} usuario(s) x {ideias} ideia(s), {cards} card(s), {historico} movimentacao(oes)/item...")
+        conn = psycopg2.connect(dsn)
+        try:
+            manifesto = semear(conn, usuarios, ideias, cards, historico, semente=semente)
+            finalizar(conn)
+        finally:
+            conn.close()
+
+        backend.iniciar()
+        tokens = asyncio.run(_autenticar(url_backend, manifesto))
+        banco = EstatisticasBanco(dsn)
+
+        def contar_openai() -> dict:
+            return httpx.get(f"{url_openai}/estatisticas", timeout=5).json()["chamadas"]
+
+        endpoints = []
+        for cenario in cenarios:
+            print(f"🚀 {CENARIOS[cenario][0]}: {concorrencia} cliente(s) por {duracao:.0f}s...")
+            resultado = medir_cenario(
+                url_backend, cenario, manifesto, tokens, banco, concorrencia, duracao, aquecimento,
+                semente=semente, contar_openai=contar_openai,
+            )
+            endpoints.append(resultado)
+            _imprimir_linha(resultado)
+
+        return {
+            "gerado_em": datetime.now(timezone.utc).isoformat(),
+            "commit": _commit_atual(),
+            "postgres": _versao_postgres(dsn),
+            "parametros": {
+                "usuarios": usuarios,
+                "ideias_por_usuario": ideias,
+                "cards_por_usuario": cards,
+                "historico_por_item": historico,
+                "concorrencia": concorrencia,
+                "duracao_s": duracao,
+                "aquecimento_s": aquecimento,
+                "workers": workers,
+                "latencia_openai_ms": latencia_openai_ms,
+                "erros_openai": erros_openai,
+                "ambiente": ambiente or {},
+                "semente": semente,
+            },
+            "dados": manifesto["totais"],
+            "endpoints": endpoints,
+        }
+    finally:
+        if backend:
+            backend.parar()
+        openai_falso.parar()
+        if postgres:
+            postgres.parar()
+
+
+async def _autenticar(url: str, manifesto: dict) -> Dict[int, str]:
+    async with httpx.AsyncClient(base_url=url, timeout=60) as cliente:
+        return await autenticar(cliente, manifesto)
+
+
+def _imprimir_linha(resultado: dict):
+    latencia = resultado["latencia_ms"]
+    banco = resultado["banco"] or {}
+    print(
+        f"   {resultado['requisicoes']} req, {resultado['throughput_rps'] or 0:.1f} req/s, "
+        f"p50 {latencia['p50'] or 0:.1f} / p95 {latencia['p95'] or 0:.1f} / p99 {latencia['p99'] or 0:.1f} ms, "
+        f"{banco.get('consultas_por_requisicao', '-')} consulta(s)/req, erros {resultado['erros']}"
+    )
+
+
+def comparar_relatorios(base: dict, novo: dict, tolerancia: float = 0.2) -> Tuple[List[str], bool]:
+    """Linhas de comparacao por cenario e se houve regressao.
+
+    Regressao: p95 ou p99 acima de (1 + tolerancia) x base, vazao abaixo de
+    (1 - tolerancia) x base, ou mais consultas por requisicao (alem de 0.5 de folga
+    para ruido dos loops de manutencao).
+    """
+    anteriores = {linha["cenario"]: linha for linha in base.get("endpoints", [])}
+    linhas = []
+    regressao = False
+    for atual in novo.get("endpoints", []):
+        anterior = anteriores.get(atual["cenario"])
+        if anterior is None:
+            linhas.append(f"   {atual['rota']:<32} novo (sem base)")
+            continue
+        problemas = []
+        for percentil in ("p95", "p99"):
+            antes, depois = anterior["latencia_ms"][percentil], atual["latencia_ms"][percentil]
+            if antes and depois and depois > antes * (1 + tolerancia):
+                problemas.append(f"{percentil} {antes:.1f} -> {depois:.1f} ms")
+        antes, depois = anterior["throughput_rps"], atual["throughput_rps"]
+        if antes and depois is not None and depois < antes * (1 - tolerancia):
+            problemas.append(f"vazao {antes:.1f} -> {depois:.1f} req/s")
+        consultas_antes = (anterior.get("banco") or {}).get("consultas_por_requisicao")
+        consultas_depois = (atual.get("banco") or {}).get("consultas_por_requisicao")
+        if consultas_antes is not None and consultas_depois is not None and consultas_depois > consultas_antes + 0.5:
+            problemas.append(f"consultas/req {consultas_antes} -> {consultas_depois}")
+        if problemas:
+            regressao = True
+            linhas.append(f"❌ {atual['rota']:<32} {'; '.join(problemas)}")
+        else:
+            linhas.append(
+                f"✅ {atual['rota']:<32} p95 {anterior['latencia_ms']['p95']} -> {atual['latencia_ms']['p95']} ms, "
+                f"consultas/req {consultas_antes} -> {consultas_depois}"
+            )
+    return linhas, regressao
+
+
+def gravar_relatorio(relatorio: dict, arquivo: str):
+    with open(arquivo, "w", encoding="utf-8") as saida:
+        json.dump(relatorio, saida, ensure_ascii=False, indent=2)
@@ -0,0 +1,377 @@
+"""
+Esquema base e dados sinteticos do benchmark.
+
+As tabelas usuarios, assinaturas e ideias vivem no Supabase em producao e nao
+sao criadas pelo backend; `ESQUEMA_BASE` as recria com as colunas que o app
+usa. O resto (workspace, kanban, historico, indices) vem do startup do backend.
+
+`semear` cria, por usuario: assinatura pro ativa, um espaco com dois projetos
+(um kanban cada), M ideias com texto de tamanho log-normal e embedding do mesmo
+espaco vetorial do OpenAI falso, parte delas no kanban, cards nativos e o
+historico de movimentacao (ideias_kanban_historico e kanban_events). Devolve o
+manifesto (ids por usuario) usado pelos cenarios de carga.
+"""
+
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List
+
+import bcrypt
+from psycopg2.extras import execute_values
+
+from embedding_providers import DIMENSOES_PADRAO, modelo_do_provedor
+from embedding_versions import texto_ideia
+from kanban_rank import ranks_espacados
+
+from benchmark.fake_openai import vetor_fake
+
+
+SENHA_PADRAO = "benchmark123"
+# Mesma ordem de KANBAN_STATUS_ORDER no app.py (codigos de kanban_events comecam em 1)
+STATUS_KANBAN = ["novo", "verificando", "em_producao", "teste", "fechado"]
+FRACAO_IDEIAS_NO_KANBAN = 0.3
+
+ESQUEMA_BASE = """
+CREATE EXTENSION IF NOT EXISTS vector;
+
+CREATE TABLE IF NOT EXISTS usuarios (
+    id BIGSERIAL PRIMARY KEY,
+    email VARCHAR(255) NOT NULL UNIQUE,
+    senha_hash TEXT,
+    nome VARCHAR(255),
+    foto_url TEXT,
+    google_id VARCHAR(255),
+    metodo_auth VARCHAR(20) DEFAULT 'email',
+    role VARCHAR(20) DEFAULT 'user',
+    ativo BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS assinaturas (
+    id BIGSERIAL PRIMARY KEY,
+    usuario_id BIGINT NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+    plano VARCHAR(20) NOT NULL DEFAULT 'free',
+    status VARCHAR(20) NOT NULL DEFAULT 'trial',
+    limite_buscas INTEGER,
+    limite_embeddings INTEGER,
+    stripe_customer_id TEXT,
+    stripe_subscription_id TEXT,
+    data_inicio TIMESTAMPTZ,
+    criado_em TIMESTAMPTZ DEFAULT NOW(),
+    trial_expira_em TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS idx_assinaturas_usuario ON assinaturas (usuario_id, id DESC);
+
+CREATE TABLE IF NOT EXISTS ideias (
+    id BIGSERIAL PRIMARY KEY,
+    titulo VARCHAR(255) NOT NULL,
+    tag VARCHAR(100),
+    ideia TEXT NOT NULL,
+    embedding vector(1536),
+    usuario_id BIGINT REFERENCES usuarios(id) ON DELETE CASCADE,
+    data TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_ideias_usuario_data ON ideias (usuario_id, data DESC);
+"""
+
+TEMAS: Dict[str, List[str]] = {
+    "trabalho": ["reuniao", "relatorio", "cliente", "prazo", "apresentacao", "planilha", "equipe", "meta", "orcamento", "contrato"],
+    "estudos": ["curso", "livro", "capitulo", "resumo", "prova", "exercicio", "aula", "artigo", "pesquisa", "anotacoes"],
+    "casa": ["cozinha", "jardim", "pintura", "mudanca", "armario", "limpeza", "reforma", "janela", "sofa", "horta"],
+    "saude": ["corrida", "academia", "medico", "dieta", "sono", "alongamento", "consulta", "exame", "agua", "meditacao"],
+    "viagem": ["passagem", "hotel", "roteiro", "praia", "montanha", "mala", "passaporte", "museu", "trilha", "mapa"],
+    "financas": ["investimento", "poupanca", "fatura", "imposto", "gastos", "salario", "reserva", "acoes", "boleto", "cartao"],
+    "projetos": ["aplicativo", "site", "prototipo", "design", "backend", "banco", "deploy", "usuarios", "feedback", "lancamento"],
+    "familia": ["aniversario", "presente", "festa", "escola", "ferias", "almoco", "visita", "fotos", "receita", "natal"],
+}
+PALAVRAS_COMUNS = [
+    "fazer", "preciso", "lembrar", "ideia", "melhorar", "comecar", "terminar", "depois", "semana", "proximo",
+    "talvez", "importante", "rapido", "testar", "organizar", "comprar", "revisar", "planejar", "novo", "antigo",
+]
+
+
+def _frase(sorteio: random.Random, tema: str, palavras: int) -> str:
+    vocabulario = TEMAS[tema]
+    return " ".join(
+        sorteio.choice(vocabulario) if sorteio.random() < 0.4 else sorteio.choice(PALAVRAS_COMUNS)
+        for _ in range(palavras)
+    )
+
+
+def _texto(sorteio: random.Random, tema: str, media_palavras: float, maximo: int) -> str:
+    # Log-normal: a maioria curta, algumas notas longas
+    total = int(min(max(sorteio.lognormvariate(0, 0.8) * media_palavras, 3), maximo))
+    frases = []
+    while total > 0:
+        tamanho = min(total, sorteio.randint(6, 16))
+        frases.append(_frase(sorteio, tema, tamanho).capitalize() + ".")
+        total -= tamanho
+    return " ".join(frases)
+
+
+def termos_busca(sorteio: random.Random, quantidade: int = 200) -> List[str]:
+    """Consultas parecidas com as reais: 1 a 3 palavras de um tema."""
+    termos = []
+    for _ in range(quantidade):
+        tema = sorteio.choice(list(TEMAS))
+        termos.append(" ".join(sorteio.sample(TEMAS[tema], sorteio.randint(1, 3))))
+    return termos
+
+
+def criar_esquema_base(conn):
+    with conn.cursor() as cur:
+        cur.execute(ESQUEMA_BASE)
+    conn.commit()
+
+
+def _vetor_literal(vetor: List[float]) -> str:
+    return "[" + ",".join(f"{valor:.6f}" for valor in vetor) + "]"
+
+
+def semear(
+    conn,
+    usuarios: int,
+    ideias_por_usuario: int,
+    cards_por_usuario: int,
+    historico_por_item: int,
+    modelo_embedding: str = modelo_do_provedor("openai"),
+    semente: int = 42,
+    log: Callable[[str], None] = print,
+) -> dict:
+    sorteio = random.Random(semente)
+    agora = datetime.now(timezone.utc)
+    # Um hash so para todos (bcrypt e lento de proposito)
+    senha_hash = bcrypt.hashpw(SENHA_PADRAO.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    manifesto = {"senha": SENHA_PADRAO, "usuarios": [], "termos": termos_busca(sorteio)}
+    totais = {"usuarios": 0, "ideias": 0, "cards": 0, "historico": 0, "eventos": 0}
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM usuarios")
+        primeiro = cur.fetchone()[0] + 1
+
+    for numero in range(primeiro, primeiro + usuarios):
+        with conn.cursor() as cur:
+            usuario = _semear_usuario(
+                cur, sorteio, agora, numero, senha_hash, ideias_por_usuario,
+                cards_por_usuario, historico_por_item, modelo_embedding, totais,
+            )
+        conn.commit()
+        manifesto["usuarios"].append(usuario)
+        totais["usuarios"] += 1
+        log(f"   usuario {totais['usuarios']}/{usuarios}: {ideias_por_usuario} ideia(s), {cards_por_usuario} card(s)")
+
+    manifesto["totais"] = totais
+    return manifesto
+
+
+def _semear_usuario(
+    cur, sorteio, agora, numero, senha_hash, ideias_total, cards_total, historico_por_item, modelo_embedding, totais
+) -> dict:
+    email = f"bench{numero}@exemplo.com"
+    cur.execute(
+        """
+        INSERT INTO usuarios (email, senha_hash, nome, metodo_auth, role)
+        VALUES (%s, %s, %s, 'email', 'user')
+        RETURNING id
+        """,
+        (email, senha_hash, f"Usuario Bench {numero}"),
+    )
+    usuario_id = cur.fetchone()[0]
+    cur.execute(
+        """
+        INSERT INTO assinaturas (usuario_id, plano, status, limite_buscas, limite_embeddings, data_inicio)
+        VALUES (%s, 'pro', 'ativa', NULL, NULL, NOW())
+        """,
+        (usuario_id,),
+    )
+    cur.execute(
+        "INSERT INTO espacos (usuario_id, nome, cor) VALUES (%s, 'Pessoal', '#4f46e5') RETURNING id",
+        (usuario_id,),
+    )
+    espaco_id = cur.fetchone()[0]
+    kanbans = []
+    for nome in ("Projeto A", "Projeto B"):
+        cur.execute(
+            "INSERT INTO projetos (espaco_id, usuario_id, nome) VALUES (%s, %s, %s) RETURNING id",
+            (espaco_id, usuario_id, nome),
+        )
+        projeto_id = cur.fetchone()[0]
+        cur.execute(
+            "INSERT INTO kanbans (projeto_id, usuario_id, nome) VALUES (%s, %s, 'Quadro') RETURNING id",
+            (projeto_id, usuario_id),
+        )
+        kanbans.append({"id": cur.fetchone()[0], "projeto_id": projeto_id, "ideias": [], "cards": []})
+
+    # Ideias: texto, tag e embedding; parte entra em um kanban
+    linhas_ideias = []
+    no_kanban = []
+    for _ in range(ideias_total):
+        tema = sorteio.choice(list(TEMAS))
+        titulo = _frase(sorteio, tema, sorteio.randint(3, 9)).capitalize()
+        ideia = _texto(sorteio, tema, 70, 1500)
+        data = agora - timedelta(days=sorteio.uniform(0, 365))
+        kanban = sorteio.choice(kanbans) if sorteio.random() < FRACAO_IDEIAS_NO_KANBAN else None
+        vetor = vetor_fake(texto_ideia(titulo, tema, ideia))
+        linhas_ideias.append(
+            (
+                titulo, tema, ideia, _vetor_literal(vetor), modelo_embedding, DIMENSOES_PADRAO, usuario_id,
+                data, data, data, kanban["projeto_id"] if kanban else None, kanban["id"] if kanban else None,
+                kanban is not None, sorteio.choice(STATUS_KANBAN) if kanban else None,
+            )
+        )
+        no_kanban.append(kanban)
+    ids = execute_values(
+        cur,
+        """
+        INSERT INTO ideias (
+            titulo, tag, ideia, embedding, embedding_modelo, embedding_dimensoes, usuario_id,
+            data, created_at, updated_at, projeto_id, kanban_id, kanban_ativo, kanban_status
+        )
+        VALUES %s
+        RETURNING id
+        """,
+        linhas_ideias,
+        template="(%s, %s, %s, %s::vector, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        page_size=len(linhas_ideias) or 1,
+        fetch=True,
+    )
+    itens_por_coluna: Dict[tuple, List[tuple]] = {}
+    for (ideia_id,), linha, kanban in zip(ids, linhas_ideias, no_kanban):
+        if kanban:
+            kanban["ideias"].append(ideia_id)
+            itens_por_coluna.setdefault((kanban["id"], linha[13]), []).append(("ideia", ideia_id))
+    totais["ideias"] += len(ids)
+
+    # Cards nativos
+    linhas_cards = []
+    for _ in range(cards_total):
+        kanban = sorteio.choice(kanbans)
+        tema = sorteio.choice(list(TEMAS))
+        checklist = [
+            {"id": f"c{i}", "titulo": _frase(sorteio, tema, 3), "concluido": sorteio.random() < 0.5}
+            for i in range(sorteio.randint(0, 5))
+        ]
+        linhas_cards.append(
+            (
+                kanban["id"], kanban["projeto_id"], usuario_id, _frase(sorteio, tema, sorteio.randint(2, 8)).capitalize(),
+                _texto(sorteio, tema, 25, 300) if sorteio.random() < 0.7 else None,
+                json.dumps(checklist, ensure_ascii=False), sorteio.choice(STATUS_KANBAN),
+            )
+        )
+    if linhas_cards:
+        ids_cards = execute_values(
+            cur,
+            """
+            INSERT INTO kanban_cards (kanban_id, projeto_id, usuario_id, titulo, descricao, checklist, kanban_status)
+            VALUES %s
+            RETURNING id, kanban_id, kanban_status
+            """,
+            linhas_cards,
+            template="(%s, %s, %s, %s, %s, %s::jsonb, %s)",
+            page_size=len(linhas_cards),
+            fetch=True,
+        )
+        por_id = {kanban["id"]: kanban for kanban in kanbans}
+        for card_id, kanban_id, status in ids_cards:
+            por_id[kanban_id]["cards"].append(card_id)
+            itens_por_coluna.setdefault((kanban_id, status), []).append(("card", card_id))
+        totais["cards"] += len(ids_cards)
+
+    # Ranks unicos por coluna, ideias e cards misturados
+    posicoes = {"ideia": [], "card": []}
+    for itens in itens_por_coluna.values():
+        sorteio.shuffle(itens)
+        for (tipo, item_id), rank in zip(itens, ranks_espacados(len(itens))):
+            posicoes[tipo].append((item_id, rank))
+    for tipo, tabela in (("ideia", "ideias"), ("card", "kanban_cards")):
+        if posicoes[tipo]:
+            execute_values(
+                cur,
+                f"UPDATE {tabela} t SET kanban_posicao = v.rank FROM (VALUES %s) AS v(id, rank) WHERE t.id = v.id",
+                posicoes[tipo],
+                template="(%s::bigint, %s)",
+                page_size=len(posicoes[tipo]),
+            )
+
+    _semear_historico(cur, sorteio, agora, usuario_id, kanbans, historico_por_item, totais)
+    return {
+        "id": usuario_id,
+        "email": email,
+        "kanbans": [{"id": k["id"], "ideias": k["ideias"], "cards": k["cards"]} for k in kanbans],
+    }
+
+
+def _semear_historico(cur, sorteio, agora, usuario_id, kanbans, historico_por_item, totais):
+    if historico_por_item <= 0:
+        return
+    historico = []
+    eventos = []
+    for kanban in kanbans:
+        for tipo, itens in (("ideia", kanban["ideias"]), ("card", kanban["cards"])):
+            for item_id in itens:
+                momento = agora - timedelta(days=sorteio.uniform(1, 90))
+                status = STATUS_KANBAN[0]
+                eventos.append((kanban["id"], usuario_id, 1 if tipo == "ideia" else 2, item_id, 1, None, 1, momento))
+                for _ in range(historico_por_item):
+                    momento += timedelta(hours=sorteio.uniform(1, 72))
+                    if momento >= agora:
+                        break
+                    novo = sorteio.choice([s for s in STATUS_KANBAN if s != status])
+                    if tipo == "ideia":
+                        historico.append((item_id, usuario_id, kanban["id"], status, novo, momento))
+                    eventos.append(
+                        (
+                            kanban["id"], usuario_id, 1 if tipo == "ideia" else 2, item_id, 2,
+                            STATUS_KANBAN.index(status) + 1, STATUS_KANBAN.index(novo) + 1, momento,
+                        )
+                    )
+                    status = novo
+    if historico:
+        execute_values(
+            cur,
+            """
+            INSERT INTO ideias_kanban_historico (ideia_id, usuario_id, kanban_id, de_status, para_status, moved_at)
+            VALUES %s
+            """,
+            historico,
+            page_size=1000,
+        )
+    if eventos:
+        execute_values(
+            cur,
+            """
+            INSERT INTO kanban_events (kanban_id, usuario_id, item_tipo, item_id, evento, de_status, para_status, ocorrido_em)
+            VALUES %s
+            """,
+            eventos,
+            page_size=1000,
+        )
+    totais["historico"] += len(historico)
+    totais["eventos"] += len(eventos)
+
+
+def finalizar(conn, log: Callable[[str], None] = print):
+    """Indice ivfflat (como em producao) e estatisticas do planner depois da carga inicial."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM ideias WHERE embedding IS NOT NULL")
+        total = cur.fetchone()[0]
+        listas = max(10, total // 1000)
+        log(f"   indice ivfflat com {listas} lista(s) para {total} embedding(s)...")
+        cur.execute("DROP INDEX IF EXISTS idx_ideias_embedding_ivfflat")
+        cur.execute(
+            f"""
+            CREATE INDEX idx_ideias_embedding_ivfflat
+            ON ideias USING ivfflat (embedding vector_cosine_ops) WITH (lists = {listas})
+            """
+        )
+    conn.commit()
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("VACUUM ANALYZE")
+    finally:
+        conn.autocommit = autocommit
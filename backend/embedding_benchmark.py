@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Recall x latencia da busca vetorial em cada armazenamento de embedding.
+
+Usa embeddings de ideias sorteadas como consultas (dentro da conta do dono) e
+compara, para cada configuracao, o top-k devolvido com o top-k exato calculado
+por varredura sequencial. Mede o vetor completo no ivfflat (com varios probes) e
+cada coluna compacta ja migrada (embedding_h*/embedding_b*, ver
+embedding_storage.py) com varios fatores de reordenacao. Tambem informa o
+tamanho medio por linha e o tamanho de cada indice.
+
+    python embedding_benchmark.py --consultas 100 --k 10
+    python embedding_benchmark.py --usuario 42 --json resultado.json
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import psycopg2
+from dotenv import load_dotenv
+from psycopg2.extras import RealDictCursor
+
+from db_config import build_db_config
+from embedding_storage import ArmazenamentoEmbedding, configurar_busca, consulta_candidatos_sql
+
+
+def _sortear_consultas(cur, quantidade: int, usuario_id: Optional[int]) -> List[dict]:
+    filtro = "AND usuario_id = %s" if usuario_id is not None else ""
+    cur.execute(
+        f"""
+        SELECT id, usuario_id, embedding_modelo, embedding::text AS embedding
+        FROM ideias
+        WHERE embedding IS NOT NULL AND usuario_id IS NOT NULL {filtro}
+        ORDER BY random()
+        LIMIT %s
+        """,
+        (*((usuario_id,) if usuario_id is not None else ()), quantidade),
+    )
+    return [dict(row) for row in cur.fetchall()]
+
+
+def _top_k_exato(cur, consulta: dict, k: int) -> List[int]:
+    # CTE materializado: sem indice vetorial, distancia exata para todas as linhas do usuario
+    cur.execute(
+        """
+        WITH linhas AS MATERIALIZED (
+            SELECT id, embedding FROM ideias
+            WHERE usuario_id = %s AND embedding_modelo = %s AND embedding IS NOT NULL
+        )
+        SELECT id FROM linhas ORDER BY embedding <=> %s::vector, id LIMIT %s
+        """,
+        (consulta["usuario_id"], consulta["embedding_modelo"], consulta["embedding"], k),
+    )
+    return [row["id"] for row in cur.fetchall()]
+
+
+def _consulta_ivfflat(probes: int) -> Callable:
+    def executar(cur, consulta: dict, k: int) -> List[int]:
+        cur.execute("SET LOCAL ivfflat.probes = %s", (probes,))
+        cur.execute(
+            """
+            SELECT id FROM ideias
+            WHERE usuario_id = %s AND embedding_modelo = %s AND embedding IS NOT NULL
+            ORDER BY embedding <=> %s::vector
+            LIMIT %s
+            """,
+            (consulta["usuario_id"], consulta["embedding_modelo"], consulta["embedding"], k),
+        )
+        return [row["id"] for row in cur.fetchall()]
+    return executar
+
+
+def _consulta_compacta(armazenamento: ArmazenamentoEmbedding) -> Callable:
+    sql = consulta_candidatos_sql(armazenamento)
+
+    def executar(cur, consulta: dict, k: int) -> List[int]:
+        configurar_busca(cur, armazenamento, k, filtrada=False)
+        cur.execute(
+            sql,
+            (
+                consulta["usuario_id"],
+                consulta["embedding_modelo"],
+                consulta["embedding"],
+                k * armazenamento.fator_rerank,
+                consulta["embedding"],
+                k,
+            ),
+        )
+        return [row["id"] for row in cur.fetchall()]
+    return executar
+
+
+def _colunas_compactas(cur) -> List[str]:
+    cur.execute(
+        """
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = 'ideias' AND column_name ~ '^embedding_[hb][0-9]+$'
+        ORDER BY column_name
+        """
+    )
+    return [row["column_name"] for row in cur.fetchall()]
+
+
+def _tamanhos(cur, colunas: List[str]) -> Dict[str, dict]:
+    tamanhos = {}
+    for coluna in ["embedding", *colunas]:
+        cur.execute(f"SELECT AVG(pg_column_size({coluna}))::float AS bytes FROM ideias WHERE {coluna} IS NOT NULL")
+        media = cur.fetchone()["bytes"]
+        cur.execute(
+            """
+            SELECT COALESCE(SUM(pg_relation_size(i.indexrelid)), 0)::bigint AS bytes
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = 'public.ideias'::regclass AND a.attname = %s
+            """,
+            (coluna,),
+        )
+        tamanhos[coluna] = {
+            "bytes_por_linha": round(media, 1) if media is not None else None,
+            "bytes_indices": int(cur.fetchone()["bytes"]),
+        }
+    return tamanhos
+
+
+def _medir(conn, nome: str, executar: Callable, consultas: List[dict], verdades: List[List[int]], k: int) -> dict:
+    latencias = []
+    recalls = []
+    for consulta, verdade in zip(consultas, verdades):
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            inicio = time.perf_counter()
+            ids = executar(cur, consulta, k)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        conn.rollback()
+        if verdade:
+            recalls.append(len(set(ids) & set(verdade)) / len(verdade))
+    latencias_np = np.array(latencias)
+    return {
+        "configuracao": nome,
+        "recall": round(float(np.mean(recalls)), 4) if recalls else None,
+        "p50_ms": round(float(np.percentile(latencias_np, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencias_np, 95)), 2),
+        "media_ms": round(float(latencias_np.mean()), 2),
+    }
+
+
+def executar_benchmark(
+    conn,
+    consultas_total: int,
+    k: int,
+    usuario_id: Optional[int] = None,
+    probes: List[int] = (1, 5, 10, 20),
+    fatores: List[int] = (1, 2, 4, 8),
+) -> dict:
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        consultas = _sortear_consultas(cur, consultas_total, usuario_id)
+        colunas = _colunas_compactas(cur)
+        tamanhos = _tamanhos(cur, colunas)
+    conn.rollback()
+    if not consultas:
+        return {"consultas": 0, "k": k, "tamanhos": tamanhos, "resultados": []}
+
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        verdades = [_top_k_exato(cur, consulta, k) for consulta in consultas]
+    conn.rollback()
+
+    resultados = [
+        _medir(conn, f"vector ivfflat probes={p}", _consulta_ivfflat(p), consultas, verdades, k)
+        for p in probes
+    ]
+    for coluna in colunas:
+        for fator in fatores:
+            armazenamento = ArmazenamentoEmbedding.da_coluna(coluna, fator)
+            nome = f"{coluna} hnsw rerank x{fator}"
+            resultados.append(_medir(conn, nome, _consulta_compacta(armazenamento), consultas, verdades, k))
+    return {"consultas": len(consultas), "k": k, "tamanhos": tamanhos, "resultados": resultados}
+
+
+def _main(argv: List[str]) -> Optional[int]:
+    parser = argparse.ArgumentParser(prog="embedding_benchmark.py")
+    parser.add_argument("--consultas", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--usuario", type=int, default=None)
+    parser.add_argument("--json", dest="arquivo_json", default=None, help="grava o relatorio em JSON")
+    args = parser.parse_args(argv[1:])
+
+    load_dotenv()
+    db_config, _ = build_db_config(default_database="sacola_ideias")
+    conn = psycopg2.connect(**db_config)
+    try:
+        relatorio = executar_benchmark(conn, args.consultas, args.k, args.usuario)
+    except Exception as e:
+        print(f"❌ Erro no benchmark: {e}")
+        return 1
+    finally:
+        conn.close()
+
+    print(f"📊 {relatorio['consultas']} consulta(s), recall@{relatorio['k']}")
+    for coluna, tamanho in relatorio["tamanhos"].items():
+        print(f"   {coluna:<18} {tamanho['bytes_por_linha'] or 0:>8} B/linha   indices: {tamanho['bytes_indices'] / 1024 / 1024:.1f} MB")
+    print(f"   {'configuracao':<32} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for linha in relatorio["resultados"]:
+        print(f"   {linha['configuracao']:<32} {linha['recall'] or 0:>7.3f} {linha['p50_ms']:>8.2f} {linha['p95_ms']:>8.2f}")
+    if args.arquivo_json:
+        with open(args.arquivo_json, "w", encoding="utf-8") as arquivo:
+            json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+        print(f"✅ Relatorio gravado em {args.arquivo_json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv))
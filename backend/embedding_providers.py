@@ -0,0 +1,226 @@
+"""
+Provedores de embedding.
+
+Todos expoem a mesma interface do OpenAIEmbeddings do langchain
+(`embed_query`, `embed_documents`) mais a identidade do modelo gravada em cada
+linha (`ideias.embedding_modelo`, `ideias.embedding_dimensoes`): vetores de
+modelos diferentes nunca sao comparados entre si.
+
+    openai  text-embedding-3-small pela API (padrao quando ha OPENAI_API_KEY)
+    local   n-gramas de caracteres e palavras com feature hashing assinado em
+            NumPy; deterministico, sem rede, bom para rodar offline e em dev
+    fake    vetor pseudoaleatorio derivado do hash do texto, para testes
+
+Escolha com EMBEDDING_PROVEDOR (openai | local | fake) e, opcionalmente,
+EMBEDDING_PROVEDOR_DIMENSOES (padrao 1536; os modelos text-embedding-3 aceitam
+menos). A identidade inclui as dimensoes quando diferem do padrao, ex.:
+`openai:text-embedding-3-small`, `openai:text-embedding-3-small@512`.
+"""
+
+import hashlib
+import re
+import unicodedata
+from typing import List, Optional
+
+import numpy as np
+
+
+PROVEDORES = ("openai", "local", "fake")
+DIMENSOES_PADRAO = 1536
+MODELO_LOCAL = "local:hash-ngram-v1"
+
+
+def _identidade(base: str, dimensoes: int) -> str:
+    return base if dimensoes == DIMENSOES_PADRAO else f"{base}@{dimensoes}"
+
+
+class EmbeddingProvider:
+    """Interface comum; `modelo` identifica unicamente o espaco vetorial gerado."""
+
+    modelo: str = ""
+    dimensoes: int = 0
+
+    def embed_query(self, texto: str) -> List[float]:
+        return self.embed_documents([texto])[0]
+
+    def embed_documents(self, textos: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    def descricao(self) -> dict:
+        return {"provedor": type(self).__name__, "modelo": self.modelo, "dimensoes": self.dimensoes}
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    def __init__(
+        self,
+        api_key: str,
+        modelo: str = "text-embedding-3-small",
+        dimensoes: int = DIMENSOES_PADRAO,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+    ):
+        from langchain_openai import OpenAIEmbeddings
+
+        opcoes = {"request_timeout": timeout} if timeout is not None else {}
+        if max_retries is not None:
+            opcoes["max_retries"] = max_retries
+        self._cliente = OpenAIEmbeddings(
+            openai_api_key=api_key,
+            model=modelo,
+            dimensions=None if dimensoes == DIMENSOES_PADRAO else dimensoes,
+            **opcoes,
+        )
+        self.nome_modelo = modelo
+        self.modelo = _identidade(f"openai:{modelo}", dimensoes)
+        self.dimensoes = dimensoes
+
+    def embed_query(self, texto: str) -> List[float]:
+        return self._cliente.embed_query(texto)
+
+    def embed_documents(self, textos: List[str]) -> List[List[float]]:
+        return self._cliente.embed_documents(textos)
+
+
+class LocalHashingEmbeddingProvider(EmbeddingProvider):
+    """Bag de n-gramas de caracteres (3 a 5) e de palavras projetado por hashing assinado.
+
+    Cada n-grama cai em uma dimensao escolhida por hash com sinal +-1 (uma projecao
+    aleatoria esparsa do espaco de n-gramas); o vetor final e normalizado. Textos
+    com vocabulario parecido ficam proximos, sem nenhuma chamada de rede.
+    """
+
+    def __init__(self, dimensoes: int = DIMENSOES_PADRAO, semente: int = 0):
+        self.dimensoes = dimensoes
+        self.semente = semente
+        self.modelo = _identidade(MODELO_LOCAL if not semente else f"{MODELO_LOCAL}-s{semente}", dimensoes)
+
+    def embed_documents(self, textos: List[str]) -> List[List[float]]:
+        return [self._vetor(texto).tolist() for texto in textos]
+
+    def _vetor(self, texto: str) -> np.ndarray:
+        normalizado = unicodedata.normalize("NFKD", (texto or "").lower())
+        normalizado = "".join(c for c in normalizado if not unicodedata.combining(c))
+        palavras = re.findall(r"\w+", normalizado)
+
+        atributos = list(palavras)
+        for palavra in palavras:
+            marcada = f"<{palavra}>"
+            for n in (3, 4, 5):
+                atributos.extend(marcada[i:i + n] for i in range(len(marcada) - n + 1))
+
+        vetor = np.zeros(self.dimensoes, dtype=np.float32)
+        if not atributos:
+            return vetor
+        digestos = np.frombuffer(
+            b"".join(
+                hashlib.blake2b(atributo.encode("utf-8"), digest_size=8, salt=self._sal).digest()
+                for atributo in atributos
+            ),
+            dtype=np.uint64,
+        )
+        indices = (digestos % np.uint64(self.dimensoes)).astype(np.int64)
+        sinais = np.where((digestos >> np.uint64(63)) == 1, -1.0, 1.0).astype(np.float32)
+        np.add.at(vetor, indices, sinais)
+        norma = float(np.linalg.norm(vetor))
+        return vetor / norma if norma else vetor
+
+    @property
+    def _sal(self) -> bytes:
+        return self.semente.to_bytes(8, "little")
+
+
+class FakeEmbeddingProvider(EmbeddingProvider):
+    """Vetor unitario pseudoaleatorio por texto (mesmo texto, mesmo vetor); conta as chamadas."""
+
+    def __init__(self, dimensoes: int = DIMENSOES_PADRAO):
+        self.dimensoes = dimensoes
+        self.modelo = _identidade("fake", dimensoes)
+        self.chamadas = 0
+
+    def embed_documents(self, textos: List[str]) -> List[List[float]]:
+        self.chamadas += 1
+        vetores = []
+        for texto in textos:
+            semente = int.from_bytes(hashlib.sha256((texto or "").encode("utf-8")).digest()[:8], "little")
+            vetor = np.random.default_rng(semente).standard_normal(self.dimensoes).astype(np.float32)
+            vetores.append((vetor / np.linalg.norm(vetor)).tolist())
+        return vetores
+
+
+def modelo_do_provedor(
+    nome: str,
+    openai_modelo: str = "text-embedding-3-small",
+    dimensoes: int = DIMENSOES_PADRAO,
+) -> str:
+    """Identidade gravada nas linhas pelo provedor `nome`, sem instancia-lo (nem precisar de chave)."""
+    nome = (nome or "openai").strip().lower()
+    if nome == "openai":
+        return _identidade(f"openai:{openai_modelo}", dimensoes)
+    if nome == "local":
+        return _identidade(MODELO_LOCAL, dimensoes)
+    if nome == "fake":
+        return _identidade("fake", dimensoes)
+    raise ValueError(f"Provedor de embedding invalido: {nome} (use {', '.join(PROVEDORES)})")
+
+
+def criar_provedor(
+    nome: str,
+    openai_api_key: Optional[str] = None,
+    openai_modelo: str = "text-embedding-3-small",
+    dimensoes: int = DIMENSOES_PADRAO,
+    timeout: Optional[float] = None,
+    max_retries: Optional[int] = None,
+) -> Optional[EmbeddingProvider]:
+    """Instancia o provedor configurado; None quando o OpenAI nao tem chave.
+
+    `timeout`/`max_retries` vao para o cliente HTTP do OpenAI (por tentativa).
+    """
+    nome = (nome or "openai").strip().lower()
+    if nome == "openai":
+        if not openai_api_key:
+            return None
+        return OpenAIEmbeddingProvider(openai_api_key, openai_modelo, dimensoes, timeout, max_retries)
+    if nome == "local":
+        return LocalHashingEmbeddingProvider(dimensoes)
+    if nome == "fake":
+        return FakeEmbeddingProvider(dimensoes)
+    raise ValueError(f"Provedor de embedding invalido: {nome} (use {', '.join(PROVEDORES)})")
+
+
+def ensure_schema(cur):
+    """Colunas com a identidade do embedding de cada ideia."""
+    cur.execute("ALTER TABLE ideias ADD COLUMN IF NOT EXISTS embedding_modelo VARCHAR(100)")
+    cur.execute("ALTER TABLE ideias ADD COLUMN IF NOT EXISTS embedding_dimensoes INTEGER")
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_ideias_usuario_embedding_modelo
+        ON ideias (usuario_id, embedding_modelo)
+        WHERE embedding IS NOT NULL
+        """
+    )
+
+
+def preencher_modelo_legado(conn, modelo: str, lote: int = 5000) -> int:
+    """Embeddings gravados antes das colunas de identidade recebem `modelo`, um commit por lote."""
+    total = 0
+    while True:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE ideias
+                SET embedding_modelo = %s,
+                    embedding_dimensoes = vector_dims(embedding)
+                WHERE id IN (
+                    SELECT id FROM ideias
+                    WHERE embedding IS NOT NULL AND embedding_modelo IS NULL
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                """,
+                (modelo, lote),
+            )
+            atualizadas = cur.rowcount
+        conn.commit()
+        if not atualizadas:
+            return total
+        total += atualizadas
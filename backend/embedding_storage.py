@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Armazenamento compacto dos embeddings das ideias.
+
+`ideias.embedding` guarda o vetor completo (1536 floats, ~6 KB, fora da linha no
+TOAST). Nos modos compactos, uma coluna derivada guarda uma versao reduzida do
+vetor e recebe o indice HNSW; a busca gera candidatos nesse indice pequeno e
+reordena so os candidatos pela distancia exata do vetor completo.
+
+Modos (EMBEDDING_ARMAZENAMENTO):
+    vector   vetor completo, indice ivfflat existente (padrao)
+    halfvec  float16 nas primeiras EMBEDDING_DIMENSOES dimensoes (Matryoshka:
+             os modelos text-embedding-3 aceitam truncamento), distancia de cosseno
+    binario  1 bit por dimensao (binary_quantize), distancia de Hamming
+
+O nome da coluna inclui modo e dimensoes (ex.: embedding_h512, embedding_b1536),
+entao configuracoes diferentes convivem e podem ser comparadas no benchmark. Um
+trigger mantem a coluna em dia nas escritas; as linhas existentes sao migradas
+em lotes e o indice e criado sem bloquear escritas:
+    python embedding_storage.py migrar --modo halfvec --dimensoes 512
+"""
+
+import argparse
+import re
+import sys
+import time
+from typing import List, Optional, Tuple
+
+import psycopg2
+from dotenv import load_dotenv
+
+from db_config import build_db_config
+
+
+MODOS = ("vector", "halfvec", "binario")
+DIMENSOES_COMPLETAS = 1536
+# Candidatos por resultado antes da reordenacao exata
+FATOR_RERANK_PADRAO = {"halfvec": 2, "binario": 8}
+HNSW_EF_SEARCH_MAXIMO = 1000
+
+
+class ArmazenamentoEmbedding:
+    """Descreve a coluna compacta de um modo: tipo, expressao derivada, operador e indice."""
+
+    def __init__(self, modo: str, dimensoes: int = DIMENSOES_COMPLETAS, fator_rerank: Optional[int] = None):
+        if modo not in MODOS:
+            raise ValueError(f"Modo de armazenamento invalido: {modo} (use {', '.join(MODOS)})")
+        if not 1 <= dimensoes <= DIMENSOES_COMPLETAS:
+            raise ValueError(f"Dimensoes devem estar entre 1 e {DIMENSOES_COMPLETAS}")
+        self.modo = modo
+        self.dimensoes = dimensoes
+        self.fator_rerank = max(fator_rerank or FATOR_RERANK_PADRAO.get(modo, 1), 1)
+
+    @property
+    def compacto(self) -> bool:
+        return self.modo != "vector"
+
+    @property
+    def coluna(self) -> str:
+        return f"embedding_{'h' if self.modo == 'halfvec' else 'b'}{self.dimensoes}"
+
+    @property
+    def tipo(self) -> str:
+        return f"halfvec({self.dimensoes})" if self.modo == "halfvec" else f"bit({self.dimensoes})"
+
+    @property
+    def operador(self) -> str:
+        return "<=>" if self.modo == "halfvec" else "<~>"
+
+    @property
+    def opclass(self) -> str:
+        return "halfvec_cosine_ops" if self.modo == "halfvec" else "bit_hamming_ops"
+
+    @property
+    def indice(self) -> str:
+        return f"idx_ideias_{self.coluna}_hnsw"
+
+    def expressao(self, vetor_sql: str) -> str:
+        """SQL que converte um `vector` completo no valor compacto."""
+        truncado = f"subvector({vetor_sql}, 1, {self.dimensoes})"
+        if self.modo == "halfvec":
+            return f"{truncado}::halfvec({self.dimensoes})"
+        return f"binary_quantize({truncado})::bit({self.dimensoes})"
+
+    def descricao(self) -> dict:
+        return {
+            "modo": self.modo,
+            "dimensoes": self.dimensoes,
+            "coluna": self.coluna if self.compacto else "embedding",
+            "fator_rerank": self.fator_rerank if self.compacto else None,
+        }
+
+    @classmethod
+    def da_coluna(cls, coluna: str, fator_rerank: Optional[int] = None) -> Optional["ArmazenamentoEmbedding"]:
+        encontrado = re.fullmatch(r"embedding_([hb])(\d+)", coluna)
+        if not encontrado:
+            return None
+        modo = "halfvec" if encontrado.group(1) == "h" else "binario"
+        return cls(modo, int(encontrado.group(2)), fator_rerank)
+
+
+def versao_pgvector(cur) -> Tuple[int, int]:
+    cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+    row = cur.fetchone()
+    if not row:
+        return (0, 0)
+    versao = row["extversion"] if isinstance(row, dict) else row[0]
+    return tuple(int(parte) for parte in re.findall(r"\d+", versao)[:2])
+
+
+def ensure_schema(cur, armazenamento: ArmazenamentoEmbedding):
+    """Coluna compacta (nula, sem reescrever a tabela) e trigger que a preenche nas escritas."""
+    coluna = armazenamento.coluna
+    cur.execute(f"ALTER TABLE ideias ADD COLUMN IF NOT EXISTS {coluna} {armazenamento.tipo}")
+    # Vetores menores que a coluna (outro modelo) ficam sem valor compacto em vez de falhar a escrita
+    cur.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION ideias_sincronizar_{coluna}() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.embedding IS NULL OR vector_dims(NEW.embedding) < {armazenamento.dimensoes} THEN
+                NEW.{coluna} := NULL;
+            ELSE
+                NEW.{coluna} := {armazenamento.expressao("NEW.embedding")};
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    cur.execute(f"DROP TRIGGER IF EXISTS trg_ideias_{coluna} ON ideias")
+    cur.execute(
+        f"""
+        CREATE TRIGGER trg_ideias_{coluna}
+        BEFORE INSERT OR UPDATE OF embedding ON ideias
+        FOR EACH ROW EXECUTE FUNCTION ideias_sincronizar_{coluna}()
+        """
+    )
+
+
+def linhas_pendentes_sql(armazenamento: ArmazenamentoEmbedding) -> str:
+    return (
+        f"embedding IS NOT NULL AND {armazenamento.coluna} IS NULL "
+        f"AND vector_dims(embedding) >= {armazenamento.dimensoes}"
+    )
+
+
+def esta_pronto(cur, armazenamento: ArmazenamentoEmbedding) -> bool:
+    """Coluna existe, indice criado e nenhuma linha aguardando migracao."""
+    cur.execute("SELECT to_regclass(%s)", (f"public.{armazenamento.indice}",))
+    row = cur.fetchone()
+    if not (row["to_regclass"] if isinstance(row, dict) else row[0]):
+        return False
+    cur.execute(f"SELECT EXISTS (SELECT 1 FROM ideias WHERE {linhas_pendentes_sql(armazenamento)}) AS pendente")
+    row = cur.fetchone()
+    return not (row["pendente"] if isinstance(row, dict) else row[0])
+
+
+def configurar_busca(cur, armazenamento: ArmazenamentoEmbedding, limite: int, filtrada: bool):
+    """Parametros da sessao (SET LOCAL) para a consulta de candidatos no HNSW."""
+    candidatos = limite * armazenamento.fator_rerank
+    cur.execute("SET LOCAL hnsw.ef_search = %s", (min(max(candidatos, 40), HNSW_EF_SEARCH_MAXIMO),))
+    if filtrada:
+        cur.execute("SET LOCAL hnsw.iterative_scan = relaxed_order")
+
+
+def consulta_candidatos_sql(
+    armazenamento: ArmazenamentoEmbedding,
+    filtros_sql: str = "",
+    corte_sql: str = "",
+) -> str:
+    """Top-k aproximado na coluna compacta, reordenado pela distancia exata do vetor completo.
+
+    Parametros, em ordem: usuario_id, modelo do embedding, *filtros, vetor da consulta, candidatos,
+    vetor da consulta, *corte (condicoes sobre `distancia` e `id`), limite.
+    """
+    coluna = armazenamento.coluna
+    return f"""
+        WITH candidatos AS MATERIALIZED (
+            SELECT i.id
+            FROM ideias i
+            WHERE i.usuario_id = %s AND i.embedding_modelo = %s AND i.{coluna} IS NOT NULL{filtros_sql}
+            ORDER BY i.{coluna} {armazenamento.operador} {armazenamento.expressao("%s::vector")}
+            LIMIT %s
+        ),
+        reordenados AS (
+            SELECT i.id, i.titulo, i.tag, i.ideia, i.data, i.embedding <=> %s::vector AS distancia
+            FROM candidatos c
+            JOIN ideias i ON i.id = c.id
+        )
+        SELECT id, titulo, tag, ideia, data, 1 - distancia AS similarity, distancia
+        FROM reordenados
+        WHERE TRUE{corte_sql}
+        ORDER BY distancia, id
+        LIMIT %s
+    """
+
+
+def migrar(conn, armazenamento: ArmazenamentoEmbedding, lote: int, pausa: float = 0.0) -> int:
+    """Preenche a coluna compacta em lotes (um commit por lote; pode ser interrompido e retomado)."""
+    with conn.cursor() as cur:
+        ensure_schema(cur, armazenamento)
+    conn.commit()
+
+    total = 0
+    while True:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""
+                UPDATE ideias
+                SET {armazenamento.coluna} = {armazenamento.expressao("embedding")}
+                WHERE id IN (
+                    SELECT id
+                    FROM ideias
+                    WHERE {linhas_pendentes_sql(armazenamento)}
+                    ORDER BY id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                """,
+                (lote,),
+            )
+            atualizadas = cur.rowcount
+        conn.commit()
+        if not atualizadas:
+            return total
+        total += atualizadas
+        print(f"   {total} linha(s) migrada(s)...")
+        if pausa:
+            time.sleep(pausa)
+
+
+def criar_indice(conn, armazenamento: ArmazenamentoEmbedding):
+    """CREATE INDEX CONCURRENTLY precisa rodar fora de transacao."""
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS {armazenamento.indice}
+                ON ideias USING hnsw ({armazenamento.coluna} {armazenamento.opclass})
+                """
+            )
+    finally:
+        conn.autocommit = autocommit
+
+
+def _main(argv: List[str]) -> Optional[int]:
+    parser = argparse.ArgumentParser(prog="embedding_storage.py")
+    sub = parser.add_subparsers(dest="comando")
+    migracao = sub.add_parser("migrar", help="preenche a coluna compacta e cria o indice HNSW")
+    migracao.add_argument("--modo", choices=[m for m in MODOS if m != "vector"], required=True)
+    migracao.add_argument("--dimensoes", type=int, default=DIMENSOES_COMPLETAS)
+    migracao.add_argument("--lote", type=int, default=1000)
+    migracao.add_argument("--pausa", type=float, default=0.0, help="segundos entre lotes")
+    args = parser.parse_args(argv[1:])
+    if args.comando != "migrar":
+        parser.print_help()
+        return 1
+
+    armazenamento = ArmazenamentoEmbedding(args.modo, args.dimensoes)
+    load_dotenv()
+    db_config, _ = build_db_config(default_database="sacola_ideias")
+    conn = psycopg2.connect(**db_config)
+    try:
+        with conn.cursor() as cur:
+            if versao_pgvector(cur) < (0, 7):
+                print("❌ halfvec/binary_quantize exigem pgvector >= 0.7.")
+                return 1
+        print(f"📦 Migrando embeddings para {armazenamento.coluna} ({armazenamento.tipo})...")
+        total = migrar(conn, armazenamento, args.lote, args.pausa)
+        print(f"✅ {total} linha(s) migrada(s). Criando indice {armazenamento.indice}...")
+        criar_indice(conn, armazenamento)
+        print(
+            f"✅ Indice pronto. Configure EMBEDDING_ARMAZENAMENTO={armazenamento.modo} "
+            f"e EMBEDDING_DIMENSOES={armazenamento.dimensoes} e reinicie o backend."
+        )
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Erro na migracao: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv))
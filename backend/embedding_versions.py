@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""
+Troca de modelo de embedding sem parar a busca (expand/contract).
+
+Com EMBEDDING_PROVEDOR_PROXIMO configurado, cada ideia ganha um segundo vetor
+em `ideias.embedding_proximo` (identidade em `embedding_proximo_modelo`):
+
+1. o backend grava os dois vetores em toda escrita (dual-write), gerando o novo
+   antes de abrir a transacao de escrita (`gerar_proximos`);
+2. `reembedar` percorre todas as ideias de todos os usuarios em ordem de id, em
+   lotes e com limite de ideias por segundo, gravando o progresso em
+   `embedding_migracoes` (pode ser interrompido e retomado);
+3. a busca de cada usuario passa a usar o vetor novo assim que todas as ideias
+   dele estiverem preenchidas (`usuario_pronto`), e o antigo ate la;
+4. ao final, troque EMBEDDING_PROVEDOR pelo novo e remova o PROXIMO: no startup
+   o backend promove `embedding_proximo` para `embedding` (`promover`).
+
+So troca de modelo com a mesma dimensao da coluna `embedding` (vector(1536) com
+indice ivfflat em producao). Outra dimensao e recusada logo no inicio
+(`verificar_dimensoes`, no startup e em `reembedar`): a promocao em lotes nao
+consegue gravar vetores de outro tamanho na coluna tipada. Mudar de dimensao
+exige janela de manutencao (ALTER COLUMN ... TYPE vector(n) USING
+embedding_proximo e recriar o indice), fora deste fluxo.
+
+`embedding_proximo` e `vector` sem dimensao fixa e sem indice ANN: durante a
+troca, a busca de um usuario ja pronto e um scan exato das ideias dele (filtro
+por usuario_id). Custa O(ideias do usuario) por busca, aceitavel para contas
+comuns mas perceptivel nas maiores; por isso a troca deve ser curta.
+
+    python embedding_versions.py reembedar --lote 100 --taxa 20
+    python embedding_versions.py status
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from typing import Callable, List, Optional
+
+import psycopg2
+from cachetools import TTLCache
+from dotenv import load_dotenv
+from psycopg2.extras import RealDictCursor, execute_values
+
+from db_config import build_db_config
+from embedding_providers import DIMENSOES_PADRAO, EmbeddingProvider, criar_provedor
+
+
+MAX_PASSADAS_PADRAO = 3
+
+
+class VersaoEmbedding:
+    """Coluna de vetor, coluna de identidade, modelo e provedor de uma versao dos embeddings."""
+
+    def __init__(self, coluna: str, coluna_modelo: str, modelo: str, provedor: Optional[EmbeddingProvider]):
+        self.coluna = coluna
+        self.coluna_modelo = coluna_modelo
+        self.modelo = modelo
+        self.provedor = provedor
+
+    @property
+    def principal(self) -> bool:
+        return self.coluna == "embedding"
+
+    def descricao(self) -> dict:
+        return {"coluna": self.coluna, "modelo": self.modelo, "disponivel": self.provedor is not None}
+
+
+class ProntidaoUsuarios:
+    """Cache (com TTL) de `usuario_pronto` por usuario, para a busca nao consultar a cada pedido."""
+
+    def __init__(self, max_usuarios: int, ttl_segundos: float):
+        self._itens = TTLCache(maxsize=max(max_usuarios, 1), ttl=max(ttl_segundos, 0.001))
+        self._lock = threading.Lock()
+
+    def obter(self, usuario_id: int) -> Optional[bool]:
+        with self._lock:
+            return self._itens.get(usuario_id)
+
+    def guardar(self, usuario_id: int, pronto: bool):
+        with self._lock:
+            self._itens[usuario_id] = pronto
+
+    def invalidar(self, usuario_id: int):
+        with self._lock:
+            self._itens.pop(usuario_id, None)
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            prontos = sum(1 for pronto in self._itens.values() if pronto)
+            return {"usuarios_em_cache": len(self._itens), "prontos": prontos}
+
+
+def texto_ideia(titulo: str, tag: Optional[str], ideia: str) -> str:
+    """Mesmo texto usado pelo backend para gerar o embedding de uma ideia."""
+    return f"{titulo} {tag or ''} {ideia}".strip()
+
+
+def ensure_schema(cur):
+    cur.execute("ALTER TABLE ideias ADD COLUMN IF NOT EXISTS embedding_proximo vector")
+    cur.execute("ALTER TABLE ideias ADD COLUMN IF NOT EXISTS embedding_proximo_modelo VARCHAR(100)")
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS embedding_migracoes (
+            modelo VARCHAR(100) PRIMARY KEY,
+            status VARCHAR(20) NOT NULL DEFAULT 'pendente',
+            passada INTEGER NOT NULL DEFAULT 1,
+            ultimo_id BIGINT NOT NULL DEFAULT 0,
+            processadas BIGINT NOT NULL DEFAULT 0,
+            falhas BIGINT NOT NULL DEFAULT 0,
+            erro TEXT,
+            iniciado_em TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            atualizado_em TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            concluido_em TIMESTAMPTZ
+        )
+        """
+    )
+
+
+def dimensoes_coluna(cur, coluna: str = "embedding") -> Optional[int]:
+    """Dimensao declarada de ideias.<coluna> (vector(n)); None se a coluna nao fixa dimensao."""
+    cur.execute(
+        """
+        SELECT atttypmod FROM pg_attribute
+        WHERE attrelid = 'ideias'::regclass AND attname = %s AND NOT attisdropped
+        """,
+        (coluna,),
+    )
+    row = cur.fetchone()
+    if not row:
+        return None
+    typmod = row["atttypmod"] if isinstance(row, dict) else row[0]
+    return typmod if typmod and typmod > 0 else None
+
+
+def verificar_dimensoes(cur, modelo: str, dimensoes: int):
+    """ValueError se vetores de `dimensoes` nao cabem em ideias.embedding.
+
+    Vale para o modelo atual (toda escrita de vetor falharia) e para o proximo (a
+    promocao falharia).
+    """
+    declaradas = dimensoes_coluna(cur)
+    if declaradas is not None and declaradas != dimensoes:
+        raise ValueError(
+            f"{modelo} gera {dimensoes} dimensoes, mas ideias.embedding e vector({declaradas}). "
+            "Para mudar de dimensao e preciso alterar o tipo da coluna e recriar o indice em "
+            "janela de manutencao."
+        )
+
+
+def usuario_pronto(cur, usuario_id: int, modelo: str) -> bool:
+    """Todas as ideias com embedding do usuario ja tem o vetor do `modelo` em embedding_proximo."""
+    cur.execute(
+        """
+        SELECT NOT EXISTS (
+            SELECT 1
+            FROM ideias
+            WHERE usuario_id = %s
+              AND (embedding IS NOT NULL OR embedding_proximo IS NOT NULL)
+              AND embedding_proximo_modelo IS DISTINCT FROM %s
+        ) AS pronto
+        """,
+        (usuario_id, modelo),
+    )
+    row = cur.fetchone()
+    return bool(row["pronto"] if isinstance(row, dict) else row[0])
+
+
+def gerar_proximos(provedor: EmbeddingProvider, textos: List[str]) -> Optional[List[List[float]]]:
+    """Vetores do proximo modelo para `textos` (texto_ideia); None se o provedor falhar.
+
+    E uma chamada de rede: gere antes de travar as linhas / abrir a transacao de escrita
+    e passe o resultado para `gravar_proximos`.
+    """
+    if not textos:
+        return None
+    try:
+        return provedor.embed_documents(textos) or None
+    except Exception as e:
+        print(f"Erro ao gerar embeddings do proximo modelo: {e}")
+        return None
+
+
+def gravar_proximos(cur, modelo: str, ideia_ids: List[int], vetores: Optional[List[List[float]]]) -> int:
+    """Dual-write: grava os vetores de `gerar_proximos` para as ideias recem-gravadas.
+
+    Sem `vetores` (o provedor falhou ou o texto mudou depois da geracao) o vetor proximo
+    dessas ideias e apagado, pois o antigo ficaria errado; o usuario volta a buscar no
+    vetor atual ate o job refaze-lo.
+    """
+    if not ideia_ids:
+        return 0
+    if not vetores:
+        cur.execute(
+            "UPDATE ideias SET embedding_proximo = NULL, embedding_proximo_modelo = NULL WHERE id = ANY(%s)",
+            (list(ideia_ids),),
+        )
+        return 0
+    execute_values(
+        cur,
+        """
+        UPDATE ideias AS i
+        SET embedding_proximo = v.embedding::vector,
+            embedding_proximo_modelo = v.modelo
+        FROM (VALUES %s) AS v (id, embedding, modelo)
+        WHERE i.id = v.id
+        """,
+        [(ideia_id, _literal(vetor), modelo) for ideia_id, vetor in zip(ideia_ids, vetores)],
+    )
+    return len(ideia_ids)
+
+
+def _literal(vetor) -> str:
+    return "[" + ",".join(map(str, vetor)) + "]"
+
+
+def reembedar(
+    conn,
+    provedor: EmbeddingProvider,
+    lote: int = 100,
+    taxa: float = 0.0,
+    max_passadas: int = MAX_PASSADAS_PADRAO,
+    log: Callable[[str], None] = print,
+) -> dict:
+    """Preenche embedding_proximo de todas as ideias com o `provedor`.
+
+    Retoma de `embedding_migracoes.ultimo_id`. `taxa` limita ideias por segundo (0 = sem
+    limite). Lotes que falham sao pulados e refeitos na passada seguinte, ate `max_passadas`.
+    Uma ideia editada durante o lote (updated_at mudou) nao e sobrescrita: o dual-write
+    ja gravou o vetor do texto novo.
+    """
+    modelo = provedor.modelo
+    with conn.cursor() as cur:
+        ensure_schema(cur)
+        try:
+            verificar_dimensoes(cur, modelo, provedor.dimensoes)
+        except ValueError:
+            conn.rollback()
+            raise
+        cur.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (f"embedding_migracoes:{modelo}",))
+        if not cur.fetchone()[0]:
+            conn.rollback()
+            raise RuntimeError(f"Ja existe uma re-geracao de embeddings para {modelo} em andamento")
+        cur.execute(
+            """
+            INSERT INTO embedding_migracoes (modelo, status)
+            VALUES (%s, 'em_andamento')
+            ON CONFLICT (modelo) DO UPDATE
+            SET status = 'em_andamento', erro = NULL, atualizado_em = NOW(),
+                passada = CASE WHEN embedding_migracoes.status IN ('concluida', 'incompleta')
+                               THEN 1 ELSE embedding_migracoes.passada END,
+                ultimo_id = CASE WHEN embedding_migracoes.status IN ('concluida', 'incompleta')
+                                 THEN 0 ELSE embedding_migracoes.ultimo_id END
+            RETURNING passada, ultimo_id
+            """,
+            (modelo,),
+        )
+        passada, ultimo_id = cur.fetchone()
+    conn.commit()
+
+    processadas = falhas = 0
+    try:
+        while True:
+            inicio = time.monotonic()
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    """
+                    SELECT id, titulo, tag, ideia, updated_at
+                    FROM ideias
+                    WHERE id > %s AND embedding_proximo_modelo IS DISTINCT FROM %s
+                    ORDER BY id
+                    LIMIT %s
+                    """,
+                    (ultimo_id, modelo, lote),
+                )
+                ideias = cur.fetchall()
+            conn.rollback()
+
+            if not ideias:
+                # Fim da passada: sobram ideias de lotes com erro ou editadas no meio do lote
+                pendentes = _existem_pendentes(conn, modelo)
+                if pendentes and passada < max_passadas:
+                    passada, ultimo_id = passada + 1, 0
+                    log(f"   passada {passada}: refazendo ideias que ficaram sem vetor...")
+                    continue
+                status = "incompleta" if pendentes else "concluida"
+                break
+
+            try:
+                vetores = provedor.embed_documents(
+                    [texto_ideia(i["titulo"], i.get("tag"), i["ideia"]) for i in ideias]
+                )
+            except Exception as e:
+                log(f"   ⚠️  lote apos id {ultimo_id} falhou: {e}")
+                vetores = None
+
+            atualizadas = 0
+            with conn.cursor() as cur:
+                if vetores:
+                    execute_values(
+                        cur,
+                        """
+                        UPDATE ideias AS i
+                        SET embedding_proximo = v.embedding::vector,
+                            embedding_proximo_modelo = v.modelo
+                        FROM (VALUES %s) AS v (id, embedding, modelo, updated_at)
+                        WHERE i.id = v.id AND i.updated_at IS NOT DISTINCT FROM v.updated_at::timestamptz
+                        """,
+                        [(i["id"], _literal(vetor), modelo, i["updated_at"]) for i, vetor in zip(ideias, vetores)],
+                        page_size=len(ideias),
+                    )
+                    atualizadas = cur.rowcount
+                else:
+                    falhas += len(ideias)
+                processadas += atualizadas
+                ultimo_id = ideias[-1]["id"]
+                cur.execute(
+                    """
+                    UPDATE embedding_migracoes
+                    SET passada = %s, ultimo_id = %s,
+                        processadas = processadas + %s, falhas = falhas + %s,
+                        atualizado_em = NOW()
+                    WHERE modelo = %s
+                    """,
+                    (passada, ultimo_id, atualizadas, 0 if vetores else len(ideias), modelo),
+                )
+            conn.commit()
+            log(f"   {processadas} ideia(s) re-geradas (ate id {ultimo_id})...")
+
+            if taxa > 0:
+                espera = len(ideias) / taxa - (time.monotonic() - inicio)
+                if espera > 0:
+                    time.sleep(espera)
+    except BaseException as e:
+        conn.rollback()
+        try:
+            _finalizar(conn, modelo, "interrompida", str(e) or type(e).__name__)
+        except Exception:
+            pass
+        raise
+    _finalizar(conn, modelo, status)
+    return {"modelo": modelo, "status": status, "processadas": processadas, "falhas": falhas}
+
+
+def _existem_pendentes(conn, modelo: str) -> bool:
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT EXISTS (SELECT 1 FROM ideias WHERE embedding_proximo_modelo IS DISTINCT FROM %s)",
+            (modelo,),
+        )
+        pendentes = cur.fetchone()[0]
+    conn.rollback()
+    return pendentes
+
+
+def _finalizar(conn, modelo: str, status: str, erro: Optional[str] = None):
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE embedding_migracoes
+            SET status = %s, erro = %s, atualizado_em = NOW(),
+                concluido_em = CASE WHEN %s = 'concluida' THEN NOW() ELSE NULL END
+            WHERE modelo = %s
+            """,
+            (status, erro, status, modelo),
+        )
+        cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", (f"embedding_migracoes:{modelo}",))
+    conn.commit()
+
+
+def promover(conn, modelo: str, lote: int = 5000) -> int:
+    """Passa embedding_proximo do `modelo` para embedding (um commit por lote).
+
+    ValueError, sem alterar nada, se os vetores do `modelo` tem outra dimensao que a coluna.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT vector_dims(embedding_proximo) FROM ideias WHERE embedding_proximo_modelo = %s LIMIT 1",
+            (modelo,),
+        )
+        row = cur.fetchone()
+        try:
+            if row:
+                verificar_dimensoes(cur, modelo, row[0])
+        finally:
+            conn.rollback()
+    if not row:
+        return 0
+    total = 0
+    while True:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE ideias
+                SET embedding = embedding_proximo,
+                    embedding_modelo = embedding_proximo_modelo,
+                    embedding_dimensoes = vector_dims(embedding_proximo),
+                    embedding_proximo = NULL,
+                    embedding_proximo_modelo = NULL
+                WHERE id IN (
+                    SELECT id FROM ideias
+                    WHERE embedding_proximo_modelo = %s
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                """,
+                (modelo, lote),
+            )
+            atualizadas = cur.rowcount
+        conn.commit()
+        if not atualizadas:
+            return total
+        total += atualizadas
+
+
+def estado(cur) -> List[dict]:
+    cur.execute(
+        """
+        SELECT modelo, status, passada, ultimo_id, processadas, falhas, erro,
+               iniciado_em, atualizado_em, concluido_em
+        FROM embedding_migracoes
+        ORDER BY iniciado_em DESC
+        """
+    )
+    return [dict(row) for row in cur.fetchall()]
+
+
+def _provedor_proximo() -> Optional[EmbeddingProvider]:
+    nome = os.getenv("EMBEDDING_PROVEDOR_PROXIMO", "").strip().lower()
+    if not nome:
+        return None
+    return criar_provedor(
+        nome,
+        os.getenv("OPENAI_API_KEY"),
+        os.getenv("EMBEDDING_PROXIMO_MODELO_OPENAI", "text-embedding-3-small"),
+        int(os.getenv("EMBEDDING_PROXIMO_DIMENSOES", str(DIMENSOES_PADRAO))),
+    )
+
+
+def _main(argv: List[str]) -> Optional[int]:
+    parser = argparse.ArgumentParser(prog="embedding_versions.py")
+    sub = parser.add_subparsers(dest="comando")
+    job = sub.add_parser("reembedar", help="gera o vetor do EMBEDDING_PROVEDOR_PROXIMO para todas as ideias")
+    job.add_argument("--lote", type=int, default=100)
+    job.add_argument("--taxa", type=float, default=0.0, help="ideias por segundo (0 = sem limite)")
+    job.add_argument("--passadas", type=int, default=MAX_PASSADAS_PADRAO)
+    sub.add_parser("status", help="progresso das re-geracoes")
+    args = parser.parse_args(argv[1:])
+    if args.comando not in ("reembedar", "status"):
+        parser.print_help()
+        return 1
+
+    load_dotenv()
+    db_config, _ = build_db_config(default_database="sacola_ideias")
+    conn = psycopg2.connect(**db_config)
+    try:
+        if args.comando == "status":
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                ensure_schema(cur)
+                for linha in estado(cur):
+                    print(
+                        f"   {linha['modelo']:<40} {linha['status']:<13} passada {linha['passada']} "
+                        f"ate id {linha['ultimo_id']}: {linha['processadas']} ok, {linha['falhas']} falha(s)"
+                    )
+            conn.rollback()
+            return 0
+
+        provedor = _provedor_proximo()
+        if provedor is None:
+            print("❌ Configure EMBEDDING_PROVEDOR_PROXIMO (e OPENAI_API_KEY, se for openai).")
+            return 1
+        print(f"📦 Re-gerando embeddings com {provedor.modelo}...")
+        resultado = reembedar(conn, provedor, args.lote, args.taxa, args.passadas)
+        print(f"✅ {resultado['processadas']} ideia(s) re-geradas, {resultado['falhas']} falha(s): {resultado['status']}.")
+        if resultado["status"] == "concluida":
+            print("   Configure EMBEDDING_PROVEDOR com o novo modelo, remova o PROXIMO e reinicie o backend.")
+    except KeyboardInterrupt:
+        print("⏸️  Interrompido; rode de novo para continuar de onde parou.")
+        return 1
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Erro na re-geracao: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv))
@@ -0,0 +1,148 @@
+"""
+Agrupamento das ideias de um usuario para sugerir projetos.
+
+K-means esferico (vetores normalizados, similaridade de cosseno) vetorizado em
+NumPy, com inicializacao k-means++. Cada grupo recebe um nome a partir das tags
+mais frequentes e dos termos mais caracteristicos dos textos do grupo.
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+
+STOPWORDS = {
+    "a", "ao", "aos", "as", "com", "como", "da", "das", "de", "do", "dos", "e", "ela", "ele",
+    "em", "entre", "era", "essa", "esse", "esta", "este", "eu", "foi", "ha", "isso", "isto",
+    "ja", "mais", "mas", "me", "mesmo", "meu", "minha", "muito", "na", "nas", "nao", "nem",
+    "no", "nos", "num", "numa", "o", "os", "ou", "para", "pela", "pelas", "pelo", "pelos",
+    "por", "pra", "qual", "quando", "que", "se", "sem", "ser", "seu", "sua", "so", "sobre",
+    "tambem", "tem", "ter", "um", "uma", "umas", "uns", "vai", "voce",
+    "the", "and", "for", "with", "of", "to", "in", "on", "is",
+}
+
+_PALAVRA = re.compile(r"[a-z0-9]{3,}")
+
+
+def escolher_k(quantidade: int) -> int:
+    """Heuristica sqrt(n/2), limitada a um numero de projetos que faca sentido sugerir."""
+    return int(min(max(round((quantidade / 2) ** 0.5), 2), 12, quantidade))
+
+
+def kmeans(
+    matriz: np.ndarray,
+    k: int,
+    iteracoes: int = 50,
+    semente: int = 0,
+    tolerancia: float = 1e-4,
+):
+    """Retorna (rotulos, centroides) para linhas ja normalizadas de `matriz`."""
+    n = matriz.shape[0]
+    k = max(1, min(k, n))
+    rng = np.random.default_rng(semente)
+
+    # k-means++ com distancia de cosseno (1 - similaridade)
+    centroides = np.empty((k, matriz.shape[1]), dtype=np.float32)
+    centroides[0] = matriz[rng.integers(n)]
+    distancias = 1.0 - matriz @ centroides[0]
+    for indice in range(1, k):
+        pesos = np.clip(distancias, 0, None) ** 2
+        total = float(pesos.sum())
+        escolhido = rng.choice(n, p=pesos / total) if total > 0 else rng.integers(n)
+        centroides[indice] = matriz[escolhido]
+        distancias = np.minimum(distancias, 1.0 - matriz @ centroides[indice])
+
+    rotulos = np.zeros(n, dtype=np.int64)
+    for _ in range(iteracoes):
+        rotulos = np.argmax(matriz @ centroides.T, axis=1)
+        somas = np.zeros_like(centroides)
+        np.add.at(somas, rotulos, matriz)
+        contagens = np.bincount(rotulos, minlength=k)
+        vazios = contagens == 0
+        if vazios.any():
+            # Grupo vazio recebe o ponto mais distante do proprio centroide
+            similaridade_atual = np.einsum("ij,ij->i", matriz, centroides[rotulos])
+            for indice in np.flatnonzero(vazios):
+                mais_distante = int(np.argmin(similaridade_atual))
+                somas[indice] = matriz[mais_distante]
+                similaridade_atual[mais_distante] = np.inf
+        normas = np.linalg.norm(somas, axis=1, keepdims=True)
+        normas[normas == 0] = 1.0
+        novos = (somas / normas).astype(np.float32)
+        deslocamento = float(np.max(1.0 - np.einsum("ij,ij->i", novos, centroides)))
+        centroides = novos
+        if deslocamento < tolerancia:
+            break
+
+    rotulos = np.argmax(matriz @ centroides.T, axis=1)
+    return rotulos, centroides
+
+
+def agrupar(
+    ids: Sequence[int],
+    matriz: np.ndarray,
+    tags: Sequence[Optional[str]],
+    textos: Sequence[str],
+    k: Optional[int] = None,
+) -> List[dict]:
+    """Agrupa as ideias e devolve os grupos (maiores primeiro) com nome sugerido."""
+    if not len(ids):
+        return []
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    matriz = (matriz / normas).astype(np.float32, copy=False)
+
+    rotulos, centroides = kmeans(matriz, k or escolher_k(len(ids)))
+    similaridades = np.einsum("ij,ij->i", matriz, centroides[rotulos])
+
+    tokens = [_tokens(texto) for texto in textos]
+    frequencia_documentos = Counter(termo for conjunto in tokens for termo in conjunto)
+    total_documentos = len(tokens)
+
+    grupos = []
+    for rotulo in range(centroides.shape[0]):
+        membros = np.flatnonzero(rotulos == rotulo)
+        if not membros.size:
+            continue
+        # Membros mais proximos do centroide primeiro
+        membros = membros[np.argsort(-similaridades[membros], kind="stable")]
+
+        contagem_tags = Counter(
+            tags[i].strip().lower() for i in membros if tags[i] and tags[i].strip()
+        )
+        contagem_termos = Counter(termo for i in membros for termo in tokens[i])
+        pontuacao_termos = {
+            termo: quantidade * np.log(1 + total_documentos / frequencia_documentos[termo])
+            for termo, quantidade in contagem_termos.items()
+            if quantidade > 1 or membros.size == 1
+        }
+        termos = [t for t, _ in sorted(pontuacao_termos.items(), key=lambda item: (-item[1], item[0]))[:5]]
+        tags_principais = [tag for tag, _ in contagem_tags.most_common(3)]
+
+        grupos.append({
+            "nome_sugerido": _nome_grupo(tags_principais, termos),
+            "tamanho": int(membros.size),
+            "coesao": round(float(similaridades[membros].mean()), 4),
+            "tags": tags_principais,
+            "termos": termos,
+            "ideia_ids": [int(ids[i]) for i in membros],
+        })
+    grupos.sort(key=lambda grupo: (-grupo["tamanho"], -grupo["coesao"]))
+    return grupos
+
+
+def _tokens(texto: str) -> set:
+    normalizado = unicodedata.normalize("NFKD", (texto or "").lower())
+    sem_acentos = "".join(c for c in normalizado if not unicodedata.combining(c))
+    return {palavra for palavra in _PALAVRA.findall(sem_acentos) if palavra not in STOPWORDS}
+
+
+def _nome_grupo(tags: List[str], termos: List[str]) -> str:
+    partes = []
+    if tags:
+        partes.append(tags[0])
+    partes.extend(termo for termo in termos if termo not in partes)
+    return " / ".join(partes[:3]).capitalize() if partes else "Outras ideias"
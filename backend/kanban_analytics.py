@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Metricas de fluxo do Kanban (CFD, throughput, lead time e cycle time).
+
+Cada movimentacao gravada em ideias_kanban_historico atualiza, na mesma transacao,
+uma linha diaria por (kanban, coluna) em kanban_fluxo_diario. As consultas de
+leitura percorrem apenas essas linhas diarias, nunca o historico completo.
+
+Backfill do historico existente:
+    python kanban_analytics.py backfill
+"""
+
+import sys
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import psycopg2
+from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+
+from db_config import build_db_config
+
+
+STATUS_CONCLUIDO = "fechado"
+STATUS_INICIO_TRABALHO = "em_producao"
+
+
+def ensure_schema(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS kanban_fluxo_diario (
+            kanban_id BIGINT NOT NULL REFERENCES kanbans(id) ON DELETE CASCADE,
+            kanban_status VARCHAR(30) NOT NULL,
+            dia DATE NOT NULL,
+            entradas INTEGER NOT NULL DEFAULT 0,
+            saidas INTEGER NOT NULL DEFAULT 0,
+            lead_time_segundos DOUBLE PRECISION NOT NULL DEFAULT 0,
+            cycle_time_segundos DOUBLE PRECISION NOT NULL DEFAULT 0,
+            concluidos_com_cycle INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (kanban_id, kanban_status, dia)
+        )
+        """
+    )
+
+
+# Para cada linha do historico: a coluna de origem (kanban da linha anterior da
+# mesma ideia), a entrada mais recente no quadro (de_status nulo) e o primeiro
+# movimento para "em_producao" depois dela, usados no lead/cycle time.
+_MOVIMENTOS_SQL = """
+    SELECT
+        h.kanban_id,
+        h.de_status,
+        h.para_status,
+        h.moved_at,
+        (h.moved_at AT TIME ZONE 'UTC')::date AS dia,
+        COALESCE(anterior.kanban_id, h.kanban_id) AS kanban_origem,
+        entrada.moved_at AS entrada_em,
+        inicio.moved_at AS inicio_em
+    FROM ideias_kanban_historico h
+    LEFT JOIN LATERAL (
+        SELECT a.kanban_id
+        FROM ideias_kanban_historico a
+        WHERE a.ideia_id = h.ideia_id
+          AND (a.moved_at, a.id) < (h.moved_at, h.id)
+        ORDER BY a.moved_at DESC, a.id DESC
+        LIMIT 1
+    ) anterior ON h.de_status IS NOT NULL
+    LEFT JOIN LATERAL (
+        SELECT e.moved_at
+        FROM ideias_kanban_historico e
+        WHERE e.ideia_id = h.ideia_id
+          AND e.de_status IS NULL
+          AND (e.moved_at, e.id) <= (h.moved_at, h.id)
+        ORDER BY e.moved_at DESC, e.id DESC
+        LIMIT 1
+    ) entrada ON h.para_status = %(concluido)s
+    LEFT JOIN LATERAL (
+        SELECT MIN(w.moved_at) AS moved_at
+        FROM ideias_kanban_historico w
+        WHERE w.ideia_id = h.ideia_id
+          AND w.para_status = %(inicio_trabalho)s
+          AND (w.moved_at, w.id) < (h.moved_at, h.id)
+          AND w.moved_at >= COALESCE(entrada.moved_at, '-infinity'::timestamptz)
+    ) inicio ON h.para_status = %(concluido)s
+    WHERE {filtro}
+"""
+
+_DELTAS_SQL = """
+    SELECT
+        kanban_id,
+        para_status AS kanban_status,
+        dia,
+        1 AS entradas,
+        0 AS saidas,
+        CASE
+            WHEN para_status = %(concluido)s
+            THEN EXTRACT(EPOCH FROM moved_at - COALESCE(entrada_em, moved_at))
+            ELSE 0
+        END AS lead_time_segundos,
+        CASE
+            WHEN para_status = %(concluido)s AND inicio_em IS NOT NULL
+            THEN EXTRACT(EPOCH FROM moved_at - inicio_em)
+            ELSE 0
+        END AS cycle_time_segundos,
+        CASE WHEN para_status = %(concluido)s AND inicio_em IS NOT NULL THEN 1 ELSE 0 END AS concluidos_com_cycle
+    FROM movimentos
+    WHERE kanban_id IS NOT NULL
+    UNION ALL
+    SELECT kanban_origem, de_status, dia, 0, 1, 0, 0, 0
+    FROM movimentos
+    WHERE de_status IS NOT NULL AND kanban_origem IS NOT NULL
+"""
+
+_UPSERT_SQL = """
+    INSERT INTO kanban_fluxo_diario (
+        kanban_id,
+        kanban_status,
+        dia,
+        entradas,
+        saidas,
+        lead_time_segundos,
+        cycle_time_segundos,
+        concluidos_com_cycle
+    )
+    SELECT
+        d.kanban_id,
+        d.kanban_status,
+        d.dia,
+        SUM(d.entradas),
+        SUM(d.saidas),
+        SUM(d.lead_time_segundos),
+        SUM(d.cycle_time_segundos),
+        SUM(d.concluidos_com_cycle)
+    FROM deltas d
+    JOIN kanbans k ON k.id = d.kanban_id
+    GROUP BY d.kanban_id, d.kanban_status, d.dia
+    ON CONFLICT (kanban_id, kanban_status, dia) DO UPDATE
+    SET entradas = kanban_fluxo_diario.entradas + EXCLUDED.entradas,
+        saidas = kanban_fluxo_diario.saidas + EXCLUDED.saidas,
+        lead_time_segundos = kanban_fluxo_diario.lead_time_segundos + EXCLUDED.lead_time_segundos,
+        cycle_time_segundos = kanban_fluxo_diario.cycle_time_segundos + EXCLUDED.cycle_time_segundos,
+        concluidos_com_cycle = kanban_fluxo_diario.concluidos_com_cycle + EXCLUDED.concluidos_com_cycle
+"""
+
+
+def _params(**extra) -> dict:
+    return {"concluido": STATUS_CONCLUIDO, "inicio_trabalho": STATUS_INICIO_TRABALHO, **extra}
+
+
+def registrar_historico(cur, historico_ids: Iterable[int]):
+    """Soma nas linhas diarias as movimentacoes recem-gravadas no historico."""
+    ids = list(historico_ids)
+    if not ids:
+        return
+    cur.execute(
+        f"""
+        WITH movimentos AS ({_MOVIMENTOS_SQL.format(filtro="h.id = ANY(%(ids)s)")}),
+        deltas AS ({_DELTAS_SQL})
+        {_UPSERT_SQL}
+        """,
+        _params(ids=ids),
+    )
+
+
+def registrar_saidas(cur, saidas: Iterable[Tuple[int, str]]):
+    """Registra saidas sem linha de historico (ideia excluida ou desvinculada do quadro)."""
+    valores = [(kanban_id, status) for kanban_id, status in saidas if kanban_id is not None and status]
+    if not valores:
+        return
+    execute_values(
+        cur,
+        """
+        INSERT INTO kanban_fluxo_diario (kanban_id, kanban_status, dia, saidas)
+        SELECT v.kanban_id, v.kanban_status, (NOW() AT TIME ZONE 'UTC')::date, COUNT(*)
+        FROM (VALUES %s) AS v (kanban_id, kanban_status)
+        JOIN kanbans k ON k.id = v.kanban_id
+        GROUP BY v.kanban_id, v.kanban_status
+        ON CONFLICT (kanban_id, kanban_status, dia) DO UPDATE
+        SET saidas = kanban_fluxo_diario.saidas + EXCLUDED.saidas
+        """,
+        valores,
+        template="(%s::bigint, %s::varchar)",
+    )
+
+
+def backfill(conn) -> int:
+    """Recalcula kanban_fluxo_diario a partir de todo o historico.
+
+    Linhas antigas do historico sem kanban_id recebem o quadro atual da ideia.
+    Ideias que sairam do quadro sem movimentacao registrada ganham uma saida na
+    data de kanban_updated_at. Ideias ja excluidas nao aparecem, pois o historico
+    delas foi removido em cascata.
+    """
+    with conn.cursor() as cur:
+        # Bloqueia as escritas incrementais ate o fim do recalculo.
+        cur.execute("LOCK TABLE kanban_fluxo_diario IN EXCLUSIVE MODE")
+        cur.execute(
+            """
+            UPDATE ideias_kanban_historico h
+            SET kanban_id = i.kanban_id
+            FROM ideias i
+            WHERE h.kanban_id IS NULL
+              AND i.id = h.ideia_id
+              AND i.kanban_id IS NOT NULL
+            """
+        )
+        cur.execute("DELETE FROM kanban_fluxo_diario")
+        cur.execute(
+            f"""
+            WITH movimentos AS ({_MOVIMENTOS_SQL.format(filtro="TRUE")}),
+            deltas AS (
+                {_DELTAS_SQL}
+                UNION ALL
+                SELECT
+                    ultimo.kanban_id,
+                    ultimo.para_status,
+                    (COALESCE(i.kanban_updated_at, i.updated_at) AT TIME ZONE 'UTC')::date,
+                    0, 1, 0, 0, 0
+                FROM ideias i
+                JOIN LATERAL (
+                    SELECT u.kanban_id, u.para_status
+                    FROM ideias_kanban_historico u
+                    WHERE u.ideia_id = i.id
+                    ORDER BY u.moved_at DESC, u.id DESC
+                    LIMIT 1
+                ) ultimo ON TRUE
+                WHERE ultimo.kanban_id IS NOT NULL
+                  AND NOT (i.kanban_ativo IS TRUE AND i.kanban_id IS NOT DISTINCT FROM ultimo.kanban_id)
+            )
+            {_UPSERT_SQL}
+            """,
+            _params(),
+        )
+        linhas = cur.rowcount
+    conn.commit()
+    return linhas
+
+
+def consultar_fluxo(cur, kanban_id: int, statuses: List[str], inicio: date, fim: date) -> dict:
+    """Monta CFD, throughput e tempos medios do periodo com O(dias) linhas lidas."""
+    cur.execute(
+        """
+        SELECT kanban_status, SUM(entradas - saidas) AS saldo
+        FROM kanban_fluxo_diario
+        WHERE kanban_id = %s AND dia < %s
+        GROUP BY kanban_status
+        """,
+        (kanban_id, inicio),
+    )
+    saldo: Dict[str, int] = {status: 0 for status in statuses}
+    for row in cur.fetchall():
+        if row["kanban_status"] in saldo:
+            saldo[row["kanban_status"]] = int(row["saldo"] or 0)
+
+    cur.execute(
+        """
+        SELECT
+            dia,
+            kanban_status,
+            entradas,
+            saidas,
+            lead_time_segundos,
+            cycle_time_segundos,
+            concluidos_com_cycle
+        FROM kanban_fluxo_diario
+        WHERE kanban_id = %s AND dia BETWEEN %s AND %s
+        ORDER BY dia
+        """,
+        (kanban_id, inicio, fim),
+    )
+    por_dia: Dict[date, List[dict]] = {}
+    for row in cur.fetchall():
+        por_dia.setdefault(row["dia"], []).append(row)
+
+    dias = []
+    concluidos_total = 0
+    lead_total = 0.0
+    cycle_total = 0.0
+    cycle_qtd = 0
+    dia = inicio
+    while dia <= fim:
+        entradas = {status: 0 for status in statuses}
+        for row in por_dia.get(dia, []):
+            status = row["kanban_status"]
+            if status not in saldo:
+                continue
+            saldo[status] += row["entradas"] - row["saidas"]
+            entradas[status] += row["entradas"]
+            if status == STATUS_CONCLUIDO:
+                lead_total += row["lead_time_segundos"] or 0
+                cycle_total += row["cycle_time_segundos"] or 0
+                cycle_qtd += row["concluidos_com_cycle"] or 0
+        concluidos = entradas.get(STATUS_CONCLUIDO, 0)
+        concluidos_total += concluidos
+        dias.append(
+            {
+                "dia": dia,
+                "quantidade_por_status": {status: max(saldo[status], 0) for status in statuses},
+                "entradas_por_status": entradas,
+                "concluidos": concluidos,
+            }
+        )
+        dia += timedelta(days=1)
+
+    return {
+        "dias": dias,
+        "throughput_total": concluidos_total,
+        "lead_time_medio_horas": round(lead_total / concluidos_total / 3600, 2) if concluidos_total else None,
+        "cycle_time_medio_horas": round(cycle_total / cycle_qtd / 3600, 2) if cycle_qtd else None,
+    }
+
+
+def _main(argv: List[str]) -> Optional[int]:
+    if len(argv) < 2 or argv[1] != "backfill":
+        print("Uso: python kanban_analytics.py backfill")
+        return 1
+
+    load_dotenv()
+    db_config, _ = build_db_config(default_database="sacola_ideias")
+    conn = psycopg2.connect(**db_config)
+    try:
+        print("📊 Recalculando kanban_fluxo_diario a partir do historico...")
+        ensure_schema(conn.cursor())
+        linhas = backfill(conn)
+        print(f"✅ Backfill concluido: {linhas} linha(s) diaria(s).")
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Erro no backfill: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv))
@@ -0,0 +1,85 @@
+"""
+Ranks fracionarios lexicograficos para ordenar cards dentro das colunas do Kanban.
+
+Cada rank e uma string em base 62 comparada byte a byte (COLLATE "C" no banco).
+Entre dois ranks sempre existe outro, entao mover um card grava apenas a sua
+propria linha; quando os ranks ficam longos demais a coluna e rebalanceada.
+"""
+
+from typing import List, Optional
+
+
+ALFABETO = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE = len(ALFABETO)
+_INDICE = {char: idx for idx, char in enumerate(ALFABETO)}
+
+
+def _digito(rank: str, posicao: int) -> int:
+    try:
+        return _INDICE[rank[posicao]]
+    except KeyError:
+        raise ValueError(f"Rank com caractere invalido: {rank!r}")
+
+
+def rank_between(anterior: Optional[str], proximo: Optional[str]) -> str:
+    """Retorna um rank estritamente entre `anterior` e `proximo` (None = extremidade aberta)."""
+    inicio_aberto = anterior is None
+    fim_aberto = proximo is None
+    anterior = anterior or ""
+    if proximo is not None and anterior >= proximo:
+        raise ValueError(f"Ranks fora de ordem: {anterior!r} >= {proximo!r}")
+
+    resultado = []
+    posicao = 0
+    while True:
+        digito_anterior = _digito(anterior, posicao) if posicao < len(anterior) else 0
+        if proximo is None:
+            digito_proximo = BASE
+        elif posicao < len(proximo):
+            digito_proximo = _digito(proximo, posicao)
+        else:
+            raise ValueError(f"Nao existe rank entre {anterior!r} e {proximo!r}")
+
+        if digito_proximo - digito_anterior > 1:
+            # Nas pontas abertas (topo/fim da coluna) anda um digito por vez, para que
+            # insercoes repetidas no mesmo extremo nao facam o rank crescer rapido.
+            # Nos demais casos usa o ponto medio. O digito escolhido nunca e "0",
+            # entao nenhum rank termina no menor digito e sempre sobra espaco antes dele.
+            if inicio_aberto and posicao >= len(anterior):
+                escolhido = digito_proximo - 1
+            elif fim_aberto:
+                escolhido = digito_anterior + 1
+            else:
+                escolhido = (digito_anterior + digito_proximo) // 2
+            resultado.append(ALFABETO[escolhido])
+            return "".join(resultado)
+
+        resultado.append(ALFABETO[digito_anterior])
+        if digito_proximo - digito_anterior == 1:
+            # O prefixo ja ficou menor que `proximo`; daqui em diante o limite superior e aberto.
+            proximo = None
+        posicao += 1
+
+
+def ranks_espacados(quantidade: int) -> List[str]:
+    """Gera `quantidade` ranks curtos, de mesmo tamanho e igualmente espacados."""
+    if quantidade <= 0:
+        return []
+
+    largura = 1
+    while BASE ** largura <= quantidade * 2:
+        largura += 1
+    espaco = BASE ** largura
+
+    ranks = []
+    for indice in range(1, quantidade + 1):
+        valor = indice * espaco // (quantidade + 1)
+        digitos = []
+        for _ in range(largura):
+            valor, resto = divmod(valor, BASE)
+            digitos.append(ALFABETO[resto])
+        rank = "".join(reversed(digitos))
+        if rank.endswith(ALFABETO[0]):
+            rank += ALFABETO[BASE // 2]
+        ranks.append(rank)
+    return ranks
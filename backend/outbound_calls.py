@@ -0,0 +1,352 @@
+"""
+Chamadas de saida (OpenAI) com prazo, novas tentativas, disjuntor e limite global.
+
+Cada tipo de chamada (embeddings, chat) tem sua `PoliticaChamada`:
+
+- prazo total por chamada, somando tentativas e esperas (o cliente HTTP recebe
+  `timeout_tentativa` = prazo / tentativas e nao tenta de novo por conta propria);
+- novas tentativas com backoff exponencial e jitter "full", so para erros
+  transitorios (timeout, conexao, 429, 5xx) e se ainda couberem no prazo;
+- disjuntor: depois de N falhas transitorias seguidas, abre e falha na hora por
+  alguns segundos (quem chama cai no fallback, ex.: busca textual); depois deixa
+  passar uma chamada de teste e fecha se ela der certo;
+- um `LimiteConcorrencia` compartilhado por todas as politicas limita as chamadas
+  em andamento no processo; sem vaga dentro de `espera_vaga`, falha na hora.
+
+Funciona tanto nas threads dos endpoints sincronos quanto no event loop.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, List, Optional
+
+import numpy as np
+
+from embedding_providers import EmbeddingProvider
+
+
+class ChamadaIndisponivel(Exception):
+    """Falha rapida: disjuntor aberto ou limite de chamadas simultaneas atingido."""
+
+
+def erro_transitorio(erro: BaseException) -> bool:
+    """Timeouts, falhas de conexao, 429 e 5xx valem nova tentativa; 4xx (chave, payload) nao."""
+    if isinstance(erro, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    if type(erro).__name__ in ("APITimeoutError", "APIConnectionError", "Timeout", "ConnectError", "ReadTimeout"):
+        return True
+    status = getattr(erro, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return False
+
+
+class LimiteConcorrencia:
+    """Semaforo de chamadas em andamento usavel por threads e por corrotinas."""
+
+    def __init__(self, maximo: int):
+        self.maximo = max(maximo, 1)
+        self._em_andamento = 0
+        self._condicao = threading.Condition()
+        self.pico = 0
+
+    @property
+    def em_andamento(self) -> int:
+        return self._em_andamento
+
+    def tentar_adquirir(self) -> bool:
+        with self._condicao:
+            if self._em_andamento >= self.maximo:
+                return False
+            self._em_andamento += 1
+            self.pico = max(self.pico, self._em_andamento)
+            return True
+
+    def adquirir(self, espera: float) -> bool:
+        limite = time.monotonic() + espera
+        with self._condicao:
+            while self._em_andamento >= self.maximo:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                self._condicao.wait(restante)
+            self._em_andamento += 1
+            self.pico = max(self.pico, self._em_andamento)
+            return True
+
+    async def adquirir_async(self, espera: float) -> bool:
+        # Sem bloquear o loop: tenta de novo em intervalos curtos ate o limite de espera
+        limite = time.monotonic() + espera
+        while not self.tentar_adquirir():
+            if time.monotonic() >= limite:
+                return False
+            await asyncio.sleep(0.02)
+        return True
+
+    def liberar(self):
+        with self._condicao:
+            self._em_andamento -= 1
+            self._condicao.notify()
+
+
+class CircuitBreaker:
+    """fechado -> (falhas seguidas >= limite) -> aberto -> (espera) -> meio_aberto -> 1 chamada de teste."""
+
+    def __init__(self, limite_falhas: int, espera_segundos: float):
+        self.limite_falhas = max(limite_falhas, 1)
+        self.espera_segundos = espera_segundos
+        self._lock = threading.Lock()
+        self._falhas_seguidas = 0
+        self._aberto_ate = 0.0
+        self._teste_em_andamento = False
+        self.aberturas = 0
+
+    @property
+    def estado(self) -> str:
+        with self._lock:
+            if self._falhas_seguidas < self.limite_falhas:
+                return "fechado"
+            return "aberto" if time.monotonic() < self._aberto_ate else "meio_aberto"
+
+    def permitir(self) -> bool:
+        with self._lock:
+            if self._falhas_seguidas < self.limite_falhas:
+                return True
+            if time.monotonic() < self._aberto_ate or self._teste_em_andamento:
+                return False
+            self._teste_em_andamento = True
+            return True
+
+    def registrar_sucesso(self):
+        with self._lock:
+            self._falhas_seguidas = 0
+            self._teste_em_andamento = False
+
+    def registrar_falha(self):
+        with self._lock:
+            self._falhas_seguidas += 1
+            self._teste_em_andamento = False
+            if self._falhas_seguidas >= self.limite_falhas:
+                if time.monotonic() >= self._aberto_ate:
+                    self.aberturas += 1
+                self._aberto_ate = time.monotonic() + self.espera_segundos
+
+    def liberar_teste(self):
+        """Chamada de teste terminou sem dizer nada sobre o servico (ex.: erro 4xx)."""
+        with self._lock:
+            self._teste_em_andamento = False
+
+
+class PoliticaChamada:
+    def __init__(
+        self,
+        nome: str,
+        limite: LimiteConcorrencia,
+        prazo_segundos: float,
+        tentativas: int = 3,
+        backoff_base: float = 0.25,
+        backoff_maximo: float = 4.0,
+        espera_vaga: float = 2.0,
+        limite_falhas: int = 5,
+        espera_disjuntor: float = 30.0,
+    ):
+        self.nome = nome
+        self.limite = limite
+        self.prazo_segundos = prazo_segundos
+        self.tentativas = max(tentativas, 1)
+        self.backoff_base = backoff_base
+        self.backoff_maximo = backoff_maximo
+        self.espera_vaga = espera_vaga
+        self.disjuntor = CircuitBreaker(limite_falhas, espera_disjuntor)
+        self._lock = threading.Lock()
+        self._latencias = deque(maxlen=500)
+        self.contadores = {
+            "chamadas": 0,
+            "sucessos": 0,
+            "falhas": 0,
+            "novas_tentativas": 0,
+            "timeouts": 0,
+            "rejeitadas_disjuntor": 0,
+            "rejeitadas_limite": 0,
+        }
+
+    @property
+    def timeout_tentativa(self) -> float:
+        return self.prazo_segundos / self.tentativas
+
+    def executar(self, funcao: Callable[..., Any], *args, **kwargs) -> Any:
+        """Chama `funcao` (sincrona) sob a politica; levanta ChamadaIndisponivel ou o ultimo erro."""
+        inicio = time.monotonic()
+        self._admitir()
+        if not self.limite.adquirir(self.espera_vaga):
+            self._rejeitar_limite()
+        try:
+            tentativa = 1
+            while True:
+                try:
+                    resultado = funcao(*args, **kwargs)
+                except Exception as e:
+                    espera = self._depois_da_falha(e, tentativa, inicio)
+                    if espera is None:
+                        raise
+                    time.sleep(espera)
+                    tentativa += 1
+                    continue
+                self._depois_do_sucesso(inicio)
+                return resultado
+        finally:
+            self.limite.liberar()
+
+    async def executar_async(self, criar: Callable[[], Awaitable[Any]]) -> Any:
+        """Versao async: `criar` devolve uma nova corrotina a cada tentativa."""
+        inicio = time.monotonic()
+        self._admitir()
+        if not await self.limite.adquirir_async(self.espera_vaga):
+            self._rejeitar_limite()
+        try:
+            tentativa = 1
+            while True:
+                restante = self.prazo_segundos - (time.monotonic() - inicio)
+                try:
+                    prazo_tentativa = min(self.timeout_tentativa, restante)
+                    resultado = await asyncio.wait_for(criar(), timeout=max(prazo_tentativa, 0.001))
+                except asyncio.CancelledError:
+                    self.disjuntor.liberar_teste()
+                    raise
+                except Exception as e:
+                    espera = self._depois_da_falha(e, tentativa, inicio)
+                    if espera is None:
+                        raise
+                    await asyncio.sleep(espera)
+                    tentativa += 1
+                    continue
+                self._depois_do_sucesso(inicio)
+                return resultado
+        finally:
+            self.limite.liberar()
+
+    @asynccontextmanager
+    async def em_stream(self):
+        """Para respostas em streaming: disjuntor, vaga e prazo valem para o stream inteiro.
+
+            async with politica.em_stream() as limitar:
+                async for parte in limitar(modelo.astream(...)):
+
+        O prazo e conferido a cada parte (asyncio.wait_for no proximo item, com o tempo
+        que resta), o que funciona no Python 3.10; asyncio.timeout so existe no 3.11.
+        Nao ha nova tentativa (parte da resposta ja pode ter sido enviada ao cliente).
+        """
+        inicio = time.monotonic()
+        prazo_final = inicio + self.prazo_segundos
+        self._admitir()
+        if not await self.limite.adquirir_async(self.espera_vaga):
+            self._rejeitar_limite()
+
+        async def limitar(partes):
+            iterador = partes.__aiter__()
+            try:
+                while True:
+                    restante = prazo_final - time.monotonic()
+                    if restante <= 0:
+                        raise asyncio.TimeoutError(f"{self.nome}: prazo de {self.prazo_segundos}s esgotado")
+                    try:
+                        parte = await asyncio.wait_for(iterador.__anext__(), timeout=restante)
+                    except StopAsyncIteration:
+                        return
+                    yield parte
+            finally:
+                fechar = getattr(iterador, "aclose", None)
+                if fechar is not None:
+                    try:
+                        await fechar()
+                    except Exception:
+                        pass
+
+        try:
+            yield limitar
+        except Exception as e:
+            self._depois_da_falha(e, self.tentativas, inicio)
+            raise
+        except BaseException:
+            # Cliente desconectou no meio do stream: nao diz nada sobre o servico
+            self.disjuntor.liberar_teste()
+            raise
+        else:
+            self._depois_do_sucesso(inicio)
+        finally:
+            self.limite.liberar()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            latencias = np.array(self._latencias) if self._latencias else None
+            return {
+                **self.contadores,
+                "disjuntor": self.disjuntor.estado,
+                "aberturas_disjuntor": self.disjuntor.aberturas,
+                "prazo_segundos": self.prazo_segundos,
+                "latencia_p50_ms": round(float(np.percentile(latencias, 50)), 1) if latencias is not None else None,
+                "latencia_p95_ms": round(float(np.percentile(latencias, 95)), 1) if latencias is not None else None,
+            }
+
+    def _contar(self, chave: str):
+        with self._lock:
+            self.contadores[chave] += 1
+
+    def _admitir(self):
+        self._contar("chamadas")
+        if not self.disjuntor.permitir():
+            self._contar("rejeitadas_disjuntor")
+            raise ChamadaIndisponivel(f"{self.nome}: disjuntor aberto")
+
+    def _rejeitar_limite(self):
+        self.disjuntor.liberar_teste()
+        self._contar("rejeitadas_limite")
+        raise ChamadaIndisponivel(f"{self.nome}: limite de chamadas simultaneas atingido")
+
+    def _depois_do_sucesso(self, inicio: float):
+        self.disjuntor.registrar_sucesso()
+        with self._lock:
+            self.contadores["sucessos"] += 1
+            self._latencias.append((time.monotonic() - inicio) * 1000)
+
+    def _depois_da_falha(self, erro: BaseException, tentativa: int, inicio: float) -> Optional[float]:
+        """Segundos ate a proxima tentativa, ou None se deve desistir (e contabiliza a falha)."""
+        if isinstance(erro, (TimeoutError, asyncio.TimeoutError)) or type(erro).__name__ == "APITimeoutError":
+            self._contar("timeouts")
+        if not erro_transitorio(erro):
+            self.disjuntor.liberar_teste()
+            self._contar("falhas")
+            return None
+        # Jitter "full": espera aleatoria entre 0 e o backoff exponencial
+        espera = random.uniform(0, min(self.backoff_maximo, self.backoff_base * 2 ** (tentativa - 1)))
+        restante = self.prazo_segundos - (time.monotonic() - inicio)
+        # Sem nova tentativa se o disjuntor abriu enquanto isso (outras chamadas ja falharam)
+        if tentativa >= self.tentativas or espera >= restante or self.disjuntor.estado == "aberto":
+            self.disjuntor.registrar_falha()
+            self._contar("falhas")
+            return None
+        self._contar("novas_tentativas")
+        return espera
+
+
+class ProvedorProtegido(EmbeddingProvider):
+    """Provedor de embeddings cujas chamadas passam pela politica (mesma interface e identidade)."""
+
+    def __init__(self, provedor: EmbeddingProvider, politica: PoliticaChamada):
+        self.provedor = provedor
+        self.politica = politica
+        self.modelo = provedor.modelo
+        self.dimensoes = provedor.dimensoes
+
+    def embed_query(self, texto: str) -> List[float]:
+        return self.politica.executar(self.provedor.embed_query, texto)
+
+    def embed_documents(self, textos: List[str]) -> List[List[float]]:
+        return self.politica.executar(self.provedor.embed_documents, textos)
+
+    def descricao(self) -> dict:
+        return self.provedor.descricao()
@@ -0,0 +1,294 @@
+"""
+Contagem de consultas SQL por requisicao, cabecalho Server-Timing e orcamentos.
+
+`ConexaoMedida` (connection_factory do psycopg2 em get_db_connection) mede cada
+execute dos cursores que abre: consultas, linhas e tempo vao para a
+`MedicaoSql` da requisicao atual. A medicao fica numa ContextVar aberta pelo
+`MedicaoSqlMiddleware`; endpoints e dependencias sincronos rodam no threadpool
+com uma copia do contexto, que aponta para o mesmo objeto. Fora de uma
+requisicao (startup, loops de manutencao) nada e contado.
+
+Orcamentos: `@orcamento_sql(n)` no endpoint limita a requisicao inteira
+(dependencias incluidas) e `trecho_sql(nome, n)` limita um pedaco dela (ex.: a
+dependencia de assinatura). Estouro vira aviso no log e nas metricas; com
+`estrito=True` (SQL_ORCAMENTO_ESTRITO=1 nos testes/CI) a resposta vira 500 com
+o motivo, o que faz o teste do endpoint falhar.
+
+A mesma instrucao repetida `limite_repeticoes` vezes numa requisicao e
+registrada como suspeita de N+1.
+
+`definir_observador` liga um observador chamado a cada instrucao, dentro ou
+fora de requisicao (captura de consultas lentas, ver slow_queries.py); sem
+medicao nem observador o cursor nem cronometra.
+"""
+
+import json
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+import psycopg2.extensions
+
+
+class MedicaoSql:
+    __slots__ = ("origem", "consultas", "linhas", "tempo_ms", "repeticoes", "estouros")
+
+    def __init__(self, origem: Optional[str] = None):
+        self.origem = origem
+        self.consultas = 0
+        self.linhas = 0
+        self.tempo_ms = 0.0
+        self.repeticoes: Counter = Counter()
+        self.estouros: List[str] = []
+
+    def registrar(self, sql: str, linhas: int, duracao_ms: float, execucoes: int = 1):
+        self.consultas += execucoes
+        self.linhas += linhas
+        self.tempo_ms += duracao_ms
+        self.repeticoes[sql] += execucoes
+
+    def mais_repetida(self) -> Tuple[Optional[str], int]:
+        if not self.repeticoes:
+            return None, 0
+        return self.repeticoes.most_common(1)[0]
+
+
+_medicao_atual: ContextVar[Optional[MedicaoSql]] = ContextVar("medicao_sql", default=None)
+_ESPACOS = re.compile(r"\s+")
+# (query, vars, duracao_ms, linhas) -> None; chamado em toda instrucao quando definido
+_observador: Optional[Callable[[object, object, float, int], None]] = None
+
+
+def medicao_atual() -> Optional[MedicaoSql]:
+    return _medicao_atual.get()
+
+
+def definir_observador(observador: Optional[Callable[[object, object, float, int], None]]):
+    global _observador
+    _observador = observador
+
+
+def texto_sql(query) -> str:
+    """Texto da instrucao com espacos colapsados (chave de repeticao e de relatorio)."""
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    elif not isinstance(query, str):
+        # psycopg2.sql.Composed: as_string exige conexao; a repr basta para agrupar
+        query = repr(query)
+    return _ESPACOS.sub(" ", query).strip()
+
+
+class _CursorMedido:
+    """Mixin sobre a cursor_factory pedida; so mede com requisicao em curso ou observador."""
+
+    def execute(self, query, vars=None):
+        medicao = _medicao_atual.get()
+        observador = _observador
+        if medicao is None and observador is None:
+            return super().execute(query, vars)
+        inicio = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            duracao_ms = (time.perf_counter() - inicio) * 1000
+            linhas = max(self.rowcount, 0)
+            if medicao is not None:
+                medicao.registrar(texto_sql(query)[:300], linhas, duracao_ms)
+            if observador is not None:
+                observador(query, vars, duracao_ms, linhas)
+
+    def executemany(self, query, vars_list):
+        medicao = _medicao_atual.get()
+        observador = _observador
+        if medicao is None and observador is None:
+            return super().executemany(query, vars_list)
+        # executemany do psycopg2 faz uma ida ao banco por item
+        vars_list = list(vars_list)
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            duracao_ms = (time.perf_counter() - inicio) * 1000
+            linhas = max(self.rowcount, 0)
+            if medicao is not None:
+                medicao.registrar(texto_sql(query)[:300], linhas, duracao_ms, execucoes=len(vars_list))
+            if observador is not None:
+                observador(query, vars_list[0] if vars_list else None, duracao_ms, linhas)
+
+
+_classes_medidas: Dict[type, type] = {}
+
+
+def _cursor_medido(fabrica: type) -> type:
+    classe = _classes_medidas.get(fabrica)
+    if classe is None:
+        classe = type(f"{fabrica.__name__}Medido", (_CursorMedido, fabrica), {})
+        _classes_medidas[fabrica] = classe
+    return classe
+
+
+class ConexaoMedida(psycopg2.extensions.connection):
+    def cursor(self, *args, **kwargs):
+        fabrica = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs["cursor_factory"] = _cursor_medido(fabrica)
+        return super().cursor(*args, **kwargs)
+
+
+def orcamento_sql(consultas: int) -> Callable:
+    """Declara no endpoint o maximo de consultas por requisicao (dependencias incluidas)."""
+
+    def decorar(endpoint):
+        endpoint.orcamento_sql = consultas
+        return endpoint
+
+    return decorar
+
+
+@contextmanager
+def trecho_sql(nome: str, consultas: int):
+    """Limita as consultas feitas dentro do bloco; estouro entra na medicao da requisicao."""
+    medicao = _medicao_atual.get()
+    antes = medicao.consultas if medicao is not None else 0
+    yield
+    if medicao is not None and medicao.consultas - antes > consultas:
+        medicao.estouros.append(f"{nome} fez {medicao.consultas - antes} consultas (orcamento {consultas})")
+
+
+class EstatisticasSql:
+    """Agregado por rota, para /api/admin/metricas. Atualizado do event loop e do threadpool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rotas: Dict[str, dict] = {}
+        self.estouros = 0
+        self.suspeitas_n_mais_um = 0
+
+    def registrar(self, rota: str, medicao: MedicaoSql, estourou: bool, repetida: Optional[str]):
+        with self._lock:
+            dados = self._rotas.get(rota)
+            if dados is None:
+                dados = {"requisicoes": 0, "consultas": 0, "max_consultas": 0, "linhas": 0, "tempo_ms": 0.0,
+                         "estouros": 0, "n_mais_um": 0, "ultima_repetida": None}
+                self._rotas[rota] = dados
+            dados["requisicoes"] += 1
+            dados["consultas"] += medicao.consultas
+            dados["max_consultas"] = max(dados["max_consultas"], medicao.consultas)
+            dados["linhas"] += medicao.linhas
+            dados["tempo_ms"] += medicao.tempo_ms
+            if estourou:
+                dados["estouros"] += 1
+                self.estouros += 1
+            if repetida is not None:
+                dados["n_mais_um"] += 1
+                dados["ultima_repetida"] = repetida
+                self.suspeitas_n_mais_um += 1
+
+    def estatisticas(self, limite: int = 20) -> dict:
+        with self._lock:
+            rotas = [(rota, dict(dados)) for rota, dados in self._rotas.items()]
+        rotas.sort(key=lambda par: par[1]["consultas"] / par[1]["requisicoes"], reverse=True)
+        return {
+            "estouros_orcamento": self.estouros,
+            "suspeitas_n_mais_um": self.suspeitas_n_mais_um,
+            "rotas": {
+                rota: {
+                    "requisicoes": dados["requisicoes"],
+                    "consultas_media": round(dados["consultas"] / dados["requisicoes"], 2),
+                    "consultas_max": dados["max_consultas"],
+                    "linhas_media": round(dados["linhas"] / dados["requisicoes"], 2),
+                    "tempo_ms_medio": round(dados["tempo_ms"] / dados["requisicoes"], 3),
+                    "estouros": dados["estouros"],
+                    "n_mais_um": dados["n_mais_um"],
+                    "ultima_repetida": dados["ultima_repetida"],
+                }
+                for rota, dados in rotas[:limite]
+            },
+        }
+
+
+class MedicaoSqlMiddleware:
+    """Middleware ASGI puro: abre a medicao, escreve Server-Timing e confere orcamentos."""
+
+    def __init__(
+        self,
+        app,
+        estatisticas: Optional[EstatisticasSql] = None,
+        server_timing: bool = True,
+        estrito: bool = False,
+        limite_repeticoes: int = 10,
+    ):
+        self.app = app
+        self.estatisticas = estatisticas
+        self.server_timing = server_timing
+        self.estrito = estrito
+        self.limite_repeticoes = limite_repeticoes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        medicao = MedicaoSql(f"{scope.get('method', '')} {scope.get('path', '')}")
+        token = _medicao_atual.set(medicao)
+        inicio = time.perf_counter()
+        substituida = False
+
+        async def enviar(mensagem):
+            nonlocal substituida
+            if substituida:
+                # Resposta original descartada: o 500 do orcamento ja foi enviado
+                return
+            if mensagem["type"] == "http.response.start":
+                problemas = self._avaliar(scope, medicao)
+                if problemas and self.estrito:
+                    substituida = True
+                    await self._enviar_estouro(send, problemas, medicao, inicio)
+                    return
+                if self.server_timing:
+                    mensagem["headers"] = list(mensagem.get("headers", [])) + [
+                        (b"server-timing", self._server_timing(medicao, inicio))
+                    ]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _medicao_atual.reset(token)
+
+    def _avaliar(self, scope, medicao: MedicaoSql) -> List[str]:
+        rota_app = scope.get("route")
+        rota = f"{scope.get('method', '')} {getattr(rota_app, 'path', None) or 'sem_rota'}"
+        problemas = list(medicao.estouros)
+        orcamento = getattr(scope.get("endpoint"), "orcamento_sql", None)
+        if orcamento is not None and medicao.consultas > orcamento:
+            problemas.append(f"{rota} fez {medicao.consultas} consultas (orcamento {orcamento})")
+        sql, vezes = medicao.mais_repetida()
+        repetida = sql if vezes >= self.limite_repeticoes else None
+        if repetida is not None:
+            print(f"⚠️  Possivel N+1 em {rota}: {vezes}x {repetida[:120]}")
+        for problema in problemas:
+            print(f"⚠️  Orcamento SQL excedido: {problema}")
+        if self.estatisticas is not None:
+            self.estatisticas.registrar(rota, medicao, bool(problemas), repetida)
+        return problemas
+
+    def _server_timing(self, medicao: MedicaoSql, inicio: float) -> bytes:
+        total_ms = (time.perf_counter() - inicio) * 1000
+        return (
+            f'sql;dur={medicao.tempo_ms:.2f};desc="{medicao.consultas} consultas, {medicao.linhas} linhas", '
+            f"app;dur={total_ms:.2f}"
+        ).encode("latin-1")
+
+    async def _enviar_estouro(self, send, problemas: List[str], medicao: MedicaoSql, inicio: float):
+        corpo = json.dumps({"detail": "Orcamento SQL excedido: " + "; ".join(problemas)}).encode("utf-8")
+        cabecalhos = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(corpo)).encode("latin-1")),
+        ]
+        if self.server_timing:
+            cabecalhos.append((b"server-timing", self._server_timing(medicao, inicio)))
+        await send({"type": "http.response.start", "status": 500, "headers": cabecalhos})
+        await send({"type": "http.response.body", "body": corpo, "more_body": False})
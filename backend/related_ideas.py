@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Vizinhos pre-calculados para o painel "ideias relacionadas".
+
+Cada ideia com embedding tem uma linha em `ideias_relacionadas` com os ids e as
+similaridades dos seus k vizinhos mais proximos; ler o painel e uma busca por
+chave primaria. Escritas que criam, apagam ou alteram embeddings apenas marcam
+as ideias em `ideias_relacionadas_pendentes`; o worker do app drena essa fila,
+recalcula as ideias marcadas (e as listas que as continham) e insere as ideias
+novas nas listas dos seus vizinhos.
+
+Marcar todas as ideias com embedding (o backend processa a fila):
+    python related_ideas.py backfill
+"""
+
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import psycopg2
+from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+
+from db_config import build_db_config
+
+
+def ensure_schema(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ideias_relacionadas (
+            ideia_id BIGINT PRIMARY KEY REFERENCES ideias(id) ON DELETE CASCADE,
+            usuario_id BIGINT NOT NULL,
+            vizinhos BIGINT[] NOT NULL DEFAULT '{}',
+            similaridades REAL[] NOT NULL DEFAULT '{}',
+            atualizado_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_ideias_relacionadas_vizinhos
+        ON ideias_relacionadas USING GIN (vizinhos)
+        """
+    )
+    # Sem FK: a marca precisa sobreviver a exclusao da ideia para limpar as listas dos vizinhos.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ideias_relacionadas_pendentes (
+            ideia_id BIGINT PRIMARY KEY,
+            usuario_id BIGINT NOT NULL,
+            marcado_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_ideias_relacionadas_pendentes_marcado
+        ON ideias_relacionadas_pendentes (marcado_em)
+        """
+    )
+
+
+def marcar(cur, usuario_id: int, ideia_ids: Iterable[int]):
+    """Agenda o recalculo; chamar na mesma transacao da escrita."""
+    ids = sorted({int(ideia_id) for ideia_id in ideia_ids if ideia_id is not None})
+    if not ids:
+        return
+    execute_values(
+        cur,
+        """
+        INSERT INTO ideias_relacionadas_pendentes (ideia_id, usuario_id)
+        VALUES %s
+        ON CONFLICT (ideia_id) DO UPDATE SET marcado_em = NOW()
+        """,
+        [(ideia_id, usuario_id) for ideia_id in ids],
+    )
+
+
+def processar_pendentes(cur, k: int, lote: int, probes: int = 10) -> int:
+    """Processa ate `lote` marcas; retorna quantas foram consumidas.
+
+    As marcas sao removidas com SKIP LOCKED na mesma transacao do recalculo: se algo
+    falhar, o rollback as devolve para a fila, e varios workers nao disputam as mesmas.
+    """
+    cur.execute(
+        """
+        DELETE FROM ideias_relacionadas_pendentes
+        WHERE ideia_id IN (
+            SELECT ideia_id
+            FROM ideias_relacionadas_pendentes
+            ORDER BY marcado_em
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING ideia_id
+        """,
+        (lote,),
+    )
+    marcadas = [row["ideia_id"] for row in cur.fetchall()]
+    if not marcadas:
+        return 0
+
+    cur.execute(
+        "SELECT id FROM ideias WHERE id = ANY(%s) AND embedding IS NOT NULL",
+        (marcadas,),
+    )
+    com_embedding = {row["id"] for row in cur.fetchall()}
+    sem_embedding = [ideia_id for ideia_id in marcadas if ideia_id not in com_embedding]
+    if sem_embedding:
+        cur.execute("DELETE FROM ideias_relacionadas WHERE ideia_id = ANY(%s)", (sem_embedding,))
+
+    # Listas que citavam as ideias marcadas ficaram com similaridades velhas (ou com ids apagados)
+    cur.execute(
+        """
+        SELECT ideia_id
+        FROM ideias_relacionadas
+        WHERE vizinhos && %s::bigint[]
+          AND NOT (ideia_id = ANY(%s))
+        """,
+        (marcadas, marcadas),
+    )
+    recalcular = com_embedding | {row["ideia_id"] for row in cur.fetchall()}
+
+    cur.execute("SET LOCAL ivfflat.probes = %s", (probes,))
+    listas = _calcular_vizinhos(cur, sorted(recalcular), k)
+    _gravar(cur, listas)
+
+    # Ideias novas ou alteradas entram nas listas dos seus vizinhos, se forem proximas o bastante
+    inserir: Dict[int, List[Tuple[int, float]]] = {}
+    for ideia_id in com_embedding:
+        _, vizinhos = listas.get(ideia_id, (None, []))
+        for vizinho_id, similaridade in vizinhos:
+            if vizinho_id not in recalcular:
+                inserir.setdefault(vizinho_id, []).append((ideia_id, similaridade))
+    if inserir:
+        cur.execute(
+            """
+            SELECT ideia_id, usuario_id, vizinhos, similaridades
+            FROM ideias_relacionadas
+            WHERE ideia_id = ANY(%s)
+            """,
+            (list(inserir),),
+        )
+        atualizadas = {}
+        for row in cur.fetchall():
+            atuais = dict(zip(row["vizinhos"], row["similaridades"]))
+            atuais.update(dict(inserir[row["ideia_id"]]))
+            melhores = sorted(atuais.items(), key=lambda item: (-item[1], item[0]))[:k]
+            atualizadas[row["ideia_id"]] = (row["usuario_id"], melhores)
+        _gravar(cur, atualizadas)
+    return len(marcadas)
+
+
+def consultar(cur, ideia_id: int, usuario_id: int, limite: int) -> List[dict]:
+    cur.execute(
+        """
+        SELECT i.id, i.titulo, i.tag, i.data, v.similaridade AS similarity
+        FROM ideias_relacionadas r
+        CROSS JOIN LATERAL unnest(r.vizinhos, r.similaridades) WITH ORDINALITY AS v(id, similaridade, ordem)
+        JOIN ideias i ON i.id = v.id
+        WHERE r.ideia_id = %s AND r.usuario_id = %s
+        ORDER BY v.ordem
+        LIMIT %s
+        """,
+        (ideia_id, usuario_id, limite),
+    )
+    return [dict(row) for row in cur.fetchall()]
+
+
+def backfill(conn) -> int:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO ideias_relacionadas_pendentes (ideia_id, usuario_id)
+            SELECT i.id, i.usuario_id
+            FROM ideias i
+            WHERE i.embedding IS NOT NULL
+              AND i.usuario_id IS NOT NULL
+            ON CONFLICT (ideia_id) DO NOTHING
+            """
+        )
+        total = cur.rowcount
+    conn.commit()
+    return total
+
+
+def _calcular_vizinhos(cur, ideia_ids: List[int], k: int) -> Dict[int, Tuple[int, List[Tuple[int, float]]]]:
+    if not ideia_ids:
+        return {}
+    cur.execute(
+        """
+        SELECT x.id AS ideia_id, x.usuario_id, n.id AS vizinho_id, n.similaridade
+        FROM ideias x
+        LEFT JOIN LATERAL (
+            SELECT o.id, 1 - (o.embedding <=> x.embedding) AS similaridade
+            FROM ideias o
+            WHERE o.usuario_id = x.usuario_id
+              AND o.embedding_modelo = x.embedding_modelo
+              AND o.embedding IS NOT NULL
+              AND o.id <> x.id
+            ORDER BY o.embedding <=> x.embedding
+            LIMIT %s
+        ) n ON TRUE
+        WHERE x.id = ANY(%s) AND x.embedding IS NOT NULL
+        ORDER BY x.id, n.similaridade DESC, n.id
+        """,
+        (k, ideia_ids),
+    )
+    listas: Dict[int, Tuple[int, List[Tuple[int, float]]]] = {}
+    for row in cur.fetchall():
+        _, vizinhos = listas.setdefault(row["ideia_id"], (row["usuario_id"], []))
+        if row["vizinho_id"] is not None:
+            vizinhos.append((row["vizinho_id"], float(row["similaridade"])))
+    return listas
+
+
+def _gravar(cur, listas: Dict[int, Tuple[int, List[Tuple[int, float]]]]):
+    if not listas:
+        return
+    execute_values(
+        cur,
+        """
+        INSERT INTO ideias_relacionadas (ideia_id, usuario_id, vizinhos, similaridades, atualizado_em)
+        VALUES %s
+        ON CONFLICT (ideia_id) DO UPDATE
+        SET vizinhos = EXCLUDED.vizinhos,
+            similaridades = EXCLUDED.similaridades,
+            atualizado_em = NOW()
+        """,
+        [
+            (ideia_id, usuario_id, [v for v, _ in vizinhos], [s for _, s in vizinhos])
+            for ideia_id, (usuario_id, vizinhos) in listas.items()
+        ],
+        template="(%s, %s, %s::bigint[], %s::real[], NOW())",
+    )
+
+
+def _main(argv: List[str]) -> Optional[int]:
+    if len(argv) < 2 or argv[1] != "backfill":
+        print("Uso: python related_ideas.py backfill")
+        return 1
+
+    load_dotenv()
+    db_config, _ = build_db_config(default_database="sacola_ideias")
+    conn = psycopg2.connect(**db_config)
+    try:
+        ensure_schema(conn.cursor())
+        marcadas = backfill(conn)
+        print(f"✅ {marcadas} ideia(s) marcada(s) para calcular vizinhos.")
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Erro no backfill: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv))
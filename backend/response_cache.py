@@ -0,0 +1,93 @@
+"""
+Cache com TTL para respostas de IA, com coalescencia de chamadas em andamento.
+
+Feito para o event loop: todas as operacoes rodam na thread do loop, entao nao
+ha lock. Pedidos identicos que chegam enquanto a primeira chamada ao modelo
+ainda esta em andamento esperam o mesmo resultado em vez de repetir a chamada.
+A chamada roda como task propria: se o cliente que a iniciou desconectar, os
+outros que esperam ainda recebem a resposta.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from cachetools import TTLCache
+
+
+class CoalescingTTLCache:
+    def __init__(self, max_itens: int, ttl_segundos: float, guardar_se: Optional[Callable[[Any], bool]] = None):
+        self._itens = TTLCache(maxsize=max(max_itens, 1), ttl=max(ttl_segundos, 0.001))
+        self._em_andamento: Dict[Hashable, asyncio.Future] = {}
+        self._guardar_se = guardar_se or (lambda valor: valor is not None)
+        self.habilitado = ttl_segundos > 0 and max_itens > 0
+        self.hits = 0
+        self.misses = 0
+        self.coalescidas = 0
+
+    def obter(self, chave: Hashable) -> Optional[Any]:
+        if not self.habilitado:
+            return None
+        valor = self._itens.get(chave)
+        if valor is not None:
+            self.hits += 1
+        return valor
+
+    def em_andamento(self, chave: Hashable) -> Optional[asyncio.Future]:
+        futuro = self._em_andamento.get(chave)
+        if futuro is not None:
+            self.coalescidas += 1
+        return futuro
+
+    async def obter_ou_calcular(self, chave: Hashable, calcular: Callable[[], Awaitable[Any]]) -> Any:
+        valor = self.obter(chave)
+        if valor is not None:
+            return valor
+        futuro = self.em_andamento(chave)
+        if futuro is None:
+            self.misses += 1
+            futuro = asyncio.ensure_future(calcular())
+            self._acompanhar(chave, futuro)
+        return await asyncio.shield(futuro)
+
+    def registrar(self, chave: Hashable) -> asyncio.Future:
+        """Para quem produz o valor aos poucos (streaming): conclua com `concluir`/`falhar`."""
+        self.misses += 1
+        futuro = asyncio.get_running_loop().create_future()
+        self._acompanhar(chave, futuro)
+        return futuro
+
+    def concluir(self, futuro: asyncio.Future, valor: Any):
+        if not futuro.done():
+            futuro.set_result(valor)
+
+    def falhar(self, futuro: asyncio.Future, erro: BaseException):
+        if not futuro.done():
+            futuro.set_exception(erro)
+
+    def estatisticas(self) -> dict:
+        consultas = self.hits + self.misses + self.coalescidas
+        return {
+            "habilitado": self.habilitado,
+            "itens": len(self._itens),
+            "max_itens": int(self._itens.maxsize),
+            "ttl_segundos": self._itens.ttl if self.habilitado else 0,
+            "em_andamento": len(self._em_andamento),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalescidas": self.coalescidas,
+            "taxa_acerto": round((self.hits + self.coalescidas) / consultas, 4) if consultas else None,
+        }
+
+    def _acompanhar(self, chave: Hashable, futuro: asyncio.Future):
+        self._em_andamento[chave] = futuro
+
+        def finalizar(concluido: asyncio.Future):
+            if self._em_andamento.get(chave) is concluido:
+                del self._em_andamento[chave]
+            if concluido.cancelled() or concluido.exception() is not None:
+                return
+            valor = concluido.result()
+            if self.habilitado and self._guardar_se(valor):
+                self._itens[chave] = valor
+
+        futuro.add_done_callback(finalizar)
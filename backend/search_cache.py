@@ -0,0 +1,254 @@
+"""
+Caches da busca semantica.
+
+QueryEmbeddingCache guarda o embedding de cada termo de busca normalizado em um
+LRU em memoria (vetores float32 contiguos) com um segundo nivel opcional no
+Postgres, compartilhado entre workers e reinicios.
+
+SearchResultCache guarda os resultados de cada busca por alguns segundos. A
+chave inclui uma geracao por usuario, incrementada a cada escrita em `ideias`;
+assim uma escrita torna inalcancaveis todas as buscas anteriores do usuario
+sem precisar varrer o cache.
+"""
+
+import hashlib
+import re
+import threading
+import unicodedata
+from typing import Callable, Hashable, List, Optional
+
+import numpy as np
+from cachetools import LRUCache, TTLCache
+
+
+def normalizar_termo(termo: str) -> str:
+    texto = unicodedata.normalize("NFKC", termo or "").lower()
+    return re.sub(r"\s+", " ", texto).strip()
+
+
+class QueryEmbeddingCache:
+    """LRU de termo normalizado -> embedding float32, com nivel opcional no Postgres."""
+
+    def __init__(
+        self,
+        max_itens: int,
+        conexao: Optional[Callable] = None,
+        max_itens_postgres: int = 0,
+    ):
+        self._itens = LRUCache(maxsize=max(max_itens, 1))
+        self._lock = threading.Lock()
+        self._conexao = conexao
+        self._max_itens_postgres = max_itens_postgres
+        self._insercoes_postgres = 0
+        self.hits_memoria = 0
+        self.hits_postgres = 0
+        self.misses = 0
+        self.erros_postgres = 0
+
+    @staticmethod
+    def chave(modelo: str, termo: str) -> str:
+        """Id estavel do embedding de consulta (usado tambem nos cursores de paginacao)."""
+        bruto = f"{modelo}\x00{normalizar_termo(termo)}".encode("utf-8")
+        return hashlib.sha256(bruto).hexdigest()[:32]
+
+    def ensure_schema(self, cur):
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embedding_consultas_cache (
+                chave VARCHAR(32) PRIMARY KEY,
+                modelo VARCHAR(100) NOT NULL,
+                dimensoes INTEGER NOT NULL,
+                embedding BYTEA NOT NULL,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+            """
+        )
+        cur.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_embedding_consultas_cache_created
+            ON embedding_consultas_cache (created_at)
+            """
+        )
+
+    def obter(self, chave: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vetor = self._itens.get(chave)
+            if vetor is not None:
+                self.hits_memoria += 1
+                return vetor
+
+        vetor = self._obter_postgres(chave)
+        with self._lock:
+            if vetor is not None:
+                self.hits_postgres += 1
+                self._itens[chave] = vetor
+            else:
+                self.misses += 1
+        return vetor
+
+    def guardar(self, chave: str, modelo: str, embedding) -> np.ndarray:
+        vetor = np.ascontiguousarray(embedding, dtype=np.float32)
+        vetor.setflags(write=False)
+        with self._lock:
+            self._itens[chave] = vetor
+        self._guardar_postgres(chave, modelo, vetor)
+        return vetor
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            consultas = self.hits_memoria + self.hits_postgres + self.misses
+            return {
+                "itens_memoria": len(self._itens),
+                "max_itens_memoria": int(self._itens.maxsize),
+                "postgres_habilitado": self._conexao is not None,
+                "hits_memoria": self.hits_memoria,
+                "hits_postgres": self.hits_postgres,
+                "misses": self.misses,
+                "erros_postgres": self.erros_postgres,
+                "taxa_acerto": round((self.hits_memoria + self.hits_postgres) / consultas, 4) if consultas else None,
+            }
+
+    def _obter_postgres(self, chave: str) -> Optional[np.ndarray]:
+        if self._conexao is None:
+            return None
+        conn = None
+        try:
+            conn = self._conexao()
+            with conn.cursor() as cur:
+                cur.execute("SELECT embedding FROM embedding_consultas_cache WHERE chave = %s", (chave,))
+                row = cur.fetchone()
+            if not row:
+                return None
+            bruto = row["embedding"] if isinstance(row, dict) else row[0]
+            vetor = np.frombuffer(bytes(bruto), dtype=np.float32)
+            return vetor
+        except Exception as e:
+            self.erros_postgres += 1
+            print(f"⚠️  Cache de embeddings (Postgres) indisponivel: {e}")
+            return None
+        finally:
+            if conn:
+                conn.close()
+
+    def _guardar_postgres(self, chave: str, modelo: str, vetor: np.ndarray):
+        if self._conexao is None:
+            return
+        conn = None
+        try:
+            conn = self._conexao()
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO embedding_consultas_cache (chave, modelo, dimensoes, embedding)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (chave) DO NOTHING
+                    """,
+                    (chave, modelo, int(vetor.shape[0]), vetor.tobytes()),
+                )
+                self._insercoes_postgres += 1
+                if self._max_itens_postgres and self._insercoes_postgres % 500 == 0:
+                    # Poda periodica: mantem apenas os termos mais recentes.
+                    cur.execute(
+                        """
+                        DELETE FROM embedding_consultas_cache
+                        WHERE created_at < (
+                            SELECT created_at
+                            FROM embedding_consultas_cache
+                            ORDER BY created_at DESC
+                            OFFSET %s
+                            LIMIT 1
+                        )
+                        """,
+                        (self._max_itens_postgres,),
+                    )
+            conn.commit()
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            self.erros_postgres += 1
+            print(f"⚠️  Erro ao gravar cache de embeddings no Postgres: {e}")
+        finally:
+            if conn:
+                conn.close()
+
+
+class SearchResultCache:
+    """Resultados de busca por (usuario, geracao, termo normalizado, limite, modo, filtros).
+
+    As geracoes vivem no processo: com varios workers cada um invalida apenas o
+    proprio cache, e o TTL curto limita o tempo em que outro worker ve dados antigos.
+    """
+
+    def __init__(self, max_itens: int, ttl_segundos: float):
+        self._itens = TTLCache(maxsize=max(max_itens, 1), ttl=max(ttl_segundos, 0.001))
+        self._geracoes = {}
+        self._epoca = 0
+        self._lock = threading.Lock()
+        self.habilitado = ttl_segundos > 0 and max_itens > 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidacoes = 0
+
+    def chave(
+        self,
+        usuario_id: int,
+        termo: str,
+        limite: int,
+        modo: str,
+        filtros: Optional[dict] = None,
+    ) -> tuple:
+        # A geracao e lida antes da consulta: se uma escrita terminar no meio da
+        # busca, o resultado fica gravado sob a geracao antiga e nunca e servido.
+        with self._lock:
+            geracao = (self._epoca, self._geracoes.get(usuario_id, 0))
+        filtros_chave = tuple(sorted((k, _valor_hashable(v)) for k, v in (filtros or {}).items() if v is not None))
+        return (usuario_id, geracao, normalizar_termo(termo), limite, modo, filtros_chave)
+
+    def obter(self, chave: tuple) -> Optional[List[dict]]:
+        if not self.habilitado:
+            return None
+        with self._lock:
+            resultados = self._itens.get(chave)
+            if resultados is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return [dict(item) for item in resultados]
+
+    def guardar(self, chave: tuple, resultados: List[dict]):
+        if not self.habilitado:
+            return
+        with self._lock:
+            self._itens[chave] = tuple(dict(item) for item in resultados)
+
+    def invalidar(self, usuario_id: int):
+        """Chamado depois do commit de qualquer escrita em ideias do usuario."""
+        with self._lock:
+            self._geracoes[usuario_id] = self._geracoes.get(usuario_id, 0) + 1
+            self.invalidacoes += 1
+
+    def invalidar_todos(self):
+        with self._lock:
+            self._epoca += 1
+            self._itens.clear()
+            self.invalidacoes += 1
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "habilitado": self.habilitado,
+                "itens": len(self._itens),
+                "max_itens": int(self._itens.maxsize),
+                "ttl_segundos": self._itens.ttl if self.habilitado else 0,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidacoes": self.invalidacoes,
+                "taxa_acerto": round(self.hits / consultas, 4) if consultas else None,
+            }
+
+
+def _valor_hashable(valor) -> Hashable:
+    if isinstance(valor, (list, tuple, set)):
+        return tuple(sorted(str(item) for item in valor))
+    return str(valor)
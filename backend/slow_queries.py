@@ -0,0 +1,238 @@
+"""
+Captura de consultas lentas com amostragem de EXPLAIN.
+
+`CapturaConsultasLentas.observar` e o observador dos cursores de
+query_metrics.ConexaoMedida: toda instrucao passa por ele com a duracao, e as
+que passam de `limite_ms` viram um registro com o SQL normalizado (literais
+trocados por `?`, listas de VALUES colapsadas), o formato dos parametros (tipos
+e tamanhos, nunca os valores), a duracao, as linhas e a requisicao de origem.
+Os registros ficam num buffer circular em memoria, junto de um agregado por
+instrucao normalizada, lidos por /api/admin/consultas-lentas.
+
+Uma amostra (`amostra_explain`, no maximo uma vez por instrucao a cada
+`intervalo_explain_segundos`) guarda os parametros reais ate
+`explicar_pendentes` rodar `EXPLAIN (ANALYZE, BUFFERS)` numa conexao lateral,
+fora da requisicao. ANALYZE executa a consulta de novo, entao so leituras de
+tabela sao amostradas: SELECT/WITH com FROM, sem FOR UPDATE/SHARE e sem funcoes
+com efeito colateral (advisory locks, set_config, nextval, pg_sleep...), e
+sempre em transacao READ ONLY desfeita no fim, com statement_timeout. READ ONLY
+nao impede advisory locks: sem o filtro, um `SELECT pg_advisory_xact_lock(...)`
+lento por contencao faria a conexao lateral disputar a mesma trava. Ajustes de sessao da conexao original (ex.: ivfflat.probes via SET LOCAL)
+nao sao reproduzidos, entao o plano das buscas vetoriais pode divergir.
+"""
+
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+from query_metrics import medicao_atual, texto_sql
+
+
+_LITERAL_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_LITERAL_NUMERO = re.compile(r"(?<![\w$.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s")
+_ITEM = r"(?:\?|NULL|DEFAULT|TRUE|FALSE)(?:\s*::\s*\w+(?:\[\])?)?"
+_LISTA_VALORES = re.compile(rf"\(\s*{_ITEM}(?:\s*,\s*{_ITEM})*\s*\)", re.IGNORECASE)
+_VALUES_REPETIDOS = re.compile(r"(\(\?\.\.\.\))(?:\s*,\s*\(\?\.\.\.\))+")
+_SO_LEITURA = re.compile(r"(SELECT|WITH)\b", re.IGNORECASE)
+_LE_TABELA = re.compile(r"\bFROM\b", re.IGNORECASE)
+_TRAVA_LINHAS = re.compile(r"\bFOR\s+(?:NO\s+KEY\s+)?(?:UPDATE|SHARE|KEY\s+SHARE)\b", re.IGNORECASE)
+_EFEITO_COLATERAL = re.compile(
+    r"\b(?:pg_(?:try_)?advisory\w*|set_config|nextval|setval|pg_sleep\w*|pg_notify"
+    r"|pg_cancel_backend|pg_terminate_backend|lo_\w+|dblink\w*)\s*\(",
+    re.IGNORECASE,
+)
+
+
+def normalizar_sql(query) -> str:
+    """Formato da instrucao sem valores: agrupa execucoes da mesma consulta."""
+    texto = texto_sql(query)
+    texto = _LITERAL_TEXTO.sub("?", texto)
+    texto = _PLACEHOLDER.sub("?", texto)
+    texto = _LITERAL_NUMERO.sub("?", texto)
+    texto = _LISTA_VALORES.sub("(?...)", texto)
+    return _VALUES_REPETIDOS.sub(r"\1, ...", texto)
+
+
+def _formato_valor(valor) -> str:
+    if valor is None:
+        return "None"
+    if isinstance(valor, (str, bytes)):
+        return f"{type(valor).__name__}[{len(valor)}]"
+    if isinstance(valor, (list, tuple)):
+        return f"{type(valor).__name__}[{len(valor)}]"
+    return type(valor).__name__
+
+
+def formato_parametros(vars) -> Optional[object]:
+    if vars is None:
+        return None
+    if isinstance(vars, dict):
+        return {chave: _formato_valor(valor) for chave, valor in vars.items()}
+    if isinstance(vars, (list, tuple)):
+        return [_formato_valor(valor) for valor in vars]
+    return _formato_valor(vars)
+
+
+def explicavel(normalizado: str) -> bool:
+    """Pode ser reexecutada com EXPLAIN ANALYZE: leitura de tabela sem efeito colateral."""
+    # Escrita dentro de WITH falha na transacao READ ONLY e vira "erro" no plano
+    return (
+        _SO_LEITURA.match(normalizado) is not None
+        and _LE_TABELA.search(normalizado) is not None
+        and _TRAVA_LINHAS.search(normalizado) is None
+        and _EFEITO_COLATERAL.search(normalizado) is None
+    )
+
+
+class CapturaConsultasLentas:
+    def __init__(
+        self,
+        limite_ms: float,
+        capacidade: int = 200,
+        amostra_explain: float = 0.1,
+        intervalo_explain_segundos: float = 300.0,
+        max_instrucoes: int = 500,
+        sorteio: Callable[[], float] = random.random,
+    ):
+        self.limite_ms = limite_ms
+        self.amostra_explain = amostra_explain
+        self.intervalo_explain_segundos = intervalo_explain_segundos
+        self.max_instrucoes = max_instrucoes
+        self._sorteio = sorteio
+        self._lock = threading.Lock()
+        self._registros: deque = deque(maxlen=max(capacidade, 1))
+        self._por_instrucao: Dict[str, dict] = {}
+        self._ultimo_explain: Dict[str, float] = {}
+        # (registro, normalizado, query, vars): parametros reais so ate o EXPLAIN rodar
+        self._pendentes: deque = deque(maxlen=20)
+        self.capturadas = 0
+        self.explicadas = 0
+        self.falhas_explain = 0
+
+    @property
+    def habilitada(self) -> bool:
+        return self.limite_ms > 0
+
+    def observar(self, query, vars, duracao_ms: float, linhas: int):
+        if duracao_ms < self.limite_ms or not self.habilitada:
+            return
+        try:
+            self._capturar(query, vars, duracao_ms, linhas)
+        except Exception as e:
+            # Nunca derrubar a consulta da aplicacao por causa da captura
+            print(f"⚠️  Erro ao capturar consulta lenta: {e}")
+
+    def _capturar(self, query, vars, duracao_ms: float, linhas: int):
+        normalizado = normalizar_sql(query)
+        medicao = medicao_atual()
+        registro = {
+            "em": datetime.now(timezone.utc).isoformat(),
+            "sql": normalizado[:2000],
+            "parametros": formato_parametros(vars),
+            "duracao_ms": round(duracao_ms, 2),
+            "linhas": linhas,
+            "origem": medicao.origem if medicao is not None else None,
+            "plano": None,
+        }
+        agora = time.monotonic()
+        with self._lock:
+            self.capturadas += 1
+            self._registros.append(registro)
+            dados = self._por_instrucao.get(normalizado)
+            if dados is None and len(self._por_instrucao) < self.max_instrucoes:
+                dados = {"ocorrencias": 0, "tempo_ms": 0.0, "max_ms": 0.0, "ultimo_plano": None}
+                self._por_instrucao[normalizado] = dados
+            if dados is not None:
+                dados["ocorrencias"] += 1
+                dados["tempo_ms"] += duracao_ms
+                dados["max_ms"] = max(dados["max_ms"], duracao_ms)
+            if not explicavel(normalizado) or self._sorteio() >= self.amostra_explain:
+                return
+            ultimo = self._ultimo_explain.get(normalizado)
+            if ultimo is not None and agora - ultimo < self.intervalo_explain_segundos:
+                return
+            if len(self._ultimo_explain) >= self.max_instrucoes:
+                self._ultimo_explain.clear()
+            self._ultimo_explain[normalizado] = agora
+            registro["plano"] = "pendente"
+            self._pendentes.append((registro, normalizado, query, vars))
+
+    def ha_pendentes(self) -> bool:
+        return bool(self._pendentes)
+
+    def explicar_pendentes(self, conectar: Callable, timeout_ms: int = 5000) -> int:
+        """Roda os EXPLAIN amostrados numa conexao propria (sincrono; chamar fora do event loop)."""
+        with self._lock:
+            pendentes = list(self._pendentes)
+            self._pendentes.clear()
+        if not pendentes:
+            return 0
+        conn = None
+        try:
+            conn = conectar()
+            for registro, normalizado, query, vars in pendentes:
+                plano = self._explicar(conn, query, vars, timeout_ms)
+                with self._lock:
+                    registro["plano"] = plano
+                    dados = self._por_instrucao.get(normalizado)
+                    if dados is not None:
+                        dados["ultimo_plano"] = plano
+            return len(pendentes)
+        except Exception as e:
+            print(f"⚠️  Erro ao conectar para EXPLAIN de consultas lentas: {e}")
+            with self._lock:
+                for registro, *_ in pendentes:
+                    registro["plano"] = f"erro: {e}"
+            return 0
+        finally:
+            if conn:
+                conn.close()
+
+    def _explicar(self, conn, query, vars, timeout_ms: int) -> str:
+        try:
+            if isinstance(query, bytes):
+                query = query.decode("utf-8", "replace")
+            elif not isinstance(query, str):
+                query = query.as_string(conn)
+            with conn.cursor() as cur:
+                cur.execute("SET TRANSACTION READ ONLY")
+                cur.execute("SET LOCAL statement_timeout = %s", (int(timeout_ms),))
+                cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + query, vars)
+                plano = "\n".join(linha[0] for linha in cur.fetchall())
+            self.explicadas += 1
+            return plano
+        except Exception as e:
+            self.falhas_explain += 1
+            return f"erro: {str(e).strip()}"
+        finally:
+            conn.rollback()
+
+    def relatorio(self, limite: int = 50) -> dict:
+        with self._lock:
+            recentes = [dict(registro) for registro in list(self._registros)[-limite:]]
+            instrucoes = [(sql, dict(dados)) for sql, dados in self._por_instrucao.items()]
+        instrucoes.sort(key=lambda par: par[1]["tempo_ms"], reverse=True)
+        return {
+            "limite_ms": self.limite_ms,
+            "amostra_explain": self.amostra_explain,
+            "capturadas": self.capturadas,
+            "explicadas": self.explicadas,
+            "falhas_explain": self.falhas_explain,
+            "recentes": list(reversed(recentes)),
+            "por_instrucao": [
+                {
+                    "sql": sql[:2000],
+                    "ocorrencias": dados["ocorrencias"],
+                    "tempo_ms_total": round(dados["tempo_ms"], 2),
+                    "tempo_ms_medio": round(dados["tempo_ms"] / dados["ocorrencias"], 2),
+                    "max_ms": round(dados["max_ms"], 2),
+                    "ultimo_plano": dados["ultimo_plano"],
+                }
+                for sql, dados in instrucoes[:limite]
+            ],
+        }
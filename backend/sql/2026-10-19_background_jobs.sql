@@ -0,0 +1,19 @@
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS background_jobs (
+    id UUID PRIMARY KEY,
+    usuario_id BIGINT REFERENCES usuarios(id) ON DELETE CASCADE,
+    tipo VARCHAR(60) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pendente',
+    progresso JSONB NOT NULL DEFAULT '{}'::jsonb,
+    resultado JSONB,
+    erro TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_background_jobs_usuario_tipo
+ON background_jobs (usuario_id, tipo, created_at DESC);
+
+COMMIT;
@@ -0,0 +1,19 @@
+-- Indices dos filtros da busca semantica (POST /api/ideias/buscar).
+-- Com filtros seletivos o backend ordena exatamente o conjunto filtrado, que sai destes indices.
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_ideias_usuario_kanban_status
+    ON ideias (usuario_id, kanban_status)
+    WHERE kanban_ativo IS TRUE;
+
+CREATE INDEX IF NOT EXISTS idx_ideias_usuario_tag
+    ON ideias (usuario_id, LOWER(tag));
+
+CREATE INDEX IF NOT EXISTS idx_ideias_usuario_data
+    ON ideias (usuario_id, data);
+
+CREATE INDEX IF NOT EXISTS idx_ideias_usuario_agenda
+    ON ideias (usuario_id, agenda_data)
+    WHERE agenda_data IS NOT NULL;
+
+COMMIT;
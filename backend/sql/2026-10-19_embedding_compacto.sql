@@ -0,0 +1,29 @@
+-- Coluna compacta de embeddings (exemplo: EMBEDDING_ARMAZENAMENTO=halfvec, EMBEDDING_DIMENSOES=512).
+-- Requer pgvector >= 0.7. O backend cria coluna e trigger no startup para o modo configurado;
+-- o preenchimento das linhas existentes (em lotes) e o indice ficam com:
+--   python embedding_storage.py migrar --modo halfvec --dimensoes 512
+BEGIN;
+
+ALTER TABLE ideias ADD COLUMN IF NOT EXISTS embedding_h512 halfvec(512);
+
+CREATE OR REPLACE FUNCTION ideias_sincronizar_embedding_h512() RETURNS trigger AS $$
+BEGIN
+    IF NEW.embedding IS NULL OR vector_dims(NEW.embedding) < 512 THEN
+        NEW.embedding_h512 := NULL;
+    ELSE
+        NEW.embedding_h512 := subvector(NEW.embedding, 1, 512)::halfvec(512);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_ideias_embedding_h512 ON ideias;
+CREATE TRIGGER trg_ideias_embedding_h512
+BEFORE INSERT OR UPDATE OF embedding ON ideias
+FOR EACH ROW EXECUTE FUNCTION ideias_sincronizar_embedding_h512();
+
+COMMIT;
+
+-- Fora da transacao, depois de migrar as linhas:
+-- CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_ideias_embedding_h512_hnsw
+--     ON ideias USING hnsw (embedding_h512 halfvec_cosine_ops);
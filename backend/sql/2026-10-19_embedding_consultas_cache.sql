@@ -0,0 +1,16 @@
+-- Segundo nivel (opcional) do cache de embeddings de termos de busca.
+-- So e usado com QUERY_EMBEDDING_CACHE_POSTGRES=true; o backend tambem cria a tabela no startup.
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS embedding_consultas_cache (
+    chave VARCHAR(32) PRIMARY KEY,
+    modelo VARCHAR(100) NOT NULL,
+    dimensoes INTEGER NOT NULL,
+    embedding BYTEA NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_embedding_consultas_cache_created
+    ON embedding_consultas_cache (created_at);
+
+COMMIT;
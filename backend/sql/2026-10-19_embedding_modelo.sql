@@ -0,0 +1,21 @@
+-- Identidade do embedding de cada ideia (provedor/modelo e dimensoes), para nunca
+-- comparar vetores de modelos diferentes. Vetores ja gravados sao do OpenAI padrao.
+-- O backend aplica o mesmo no startup (ensure_embedding_identity_schema).
+BEGIN;
+
+ALTER TABLE ideias ADD COLUMN IF NOT EXISTS embedding_modelo VARCHAR(100);
+ALTER TABLE ideias ADD COLUMN IF NOT EXISTS embedding_dimensoes INTEGER;
+
+UPDATE ideias
+SET embedding_modelo = 'openai:text-embedding-3-small',
+    embedding_dimensoes = vector_dims(embedding)
+WHERE embedding IS NOT NULL AND embedding_modelo IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_ideias_usuario_embedding_modelo
+ON ideias (usuario_id, embedding_modelo)
+WHERE embedding IS NOT NULL;
+
+ALTER TABLE tag_centroides ADD COLUMN IF NOT EXISTS modelo VARCHAR(100);
+UPDATE tag_centroides SET modelo = 'openai:text-embedding-3-small' WHERE modelo IS NULL;
+
+COMMIT;
@@ -0,0 +1,28 @@
+-- Troca de modelo de embedding sem parar a busca: segundo vetor por ideia (dual-write)
+-- e progresso da re-geracao global. O backend aplica o mesmo no startup
+-- (ensure_embedding_versions_schema); a re-geracao roda com:
+--   python embedding_versions.py reembedar --lote 100 --taxa 20
+--
+-- A troca precisa manter a dimensao de ideias.embedding (vector(1536) com ivfflat);
+-- outra dimensao e recusada no startup e pelo reembedar. embedding_proximo nao tem
+-- dimensao fixa nem indice ANN: durante a troca, a busca dos usuarios ja prontos e
+-- um scan exato das ideias de cada um (O(ideias do usuario) por busca).
+BEGIN;
+
+ALTER TABLE ideias ADD COLUMN IF NOT EXISTS embedding_proximo vector;
+ALTER TABLE ideias ADD COLUMN IF NOT EXISTS embedding_proximo_modelo VARCHAR(100);
+
+CREATE TABLE IF NOT EXISTS embedding_migracoes (
+    modelo VARCHAR(100) PRIMARY KEY,
+    status VARCHAR(20) NOT NULL DEFAULT 'pendente',
+    passada INTEGER NOT NULL DEFAULT 1,
+    ultimo_id BIGINT NOT NULL DEFAULT 0,
+    processadas BIGINT NOT NULL DEFAULT 0,
+    falhas BIGINT NOT NULL DEFAULT 0,
+    erro TEXT,
+    iniciado_em TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    atualizado_em TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    concluido_em TIMESTAMPTZ
+);
+
+COMMIT;
@@ -0,0 +1,26 @@
+-- Vizinhos pre-calculados do painel "ideias relacionadas" e fila de recalculo.
+-- O backend tambem cria as tabelas no startup; para popular as ideias existentes:
+--   python related_ideas.py backfill
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS ideias_relacionadas (
+    ideia_id BIGINT PRIMARY KEY REFERENCES ideias(id) ON DELETE CASCADE,
+    usuario_id BIGINT NOT NULL,
+    vizinhos BIGINT[] NOT NULL DEFAULT '{}',
+    similaridades REAL[] NOT NULL DEFAULT '{}',
+    atualizado_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_ideias_relacionadas_vizinhos
+    ON ideias_relacionadas USING GIN (vizinhos);
+
+CREATE TABLE IF NOT EXISTS ideias_relacionadas_pendentes (
+    ideia_id BIGINT PRIMARY KEY,
+    usuario_id BIGINT NOT NULL,
+    marcado_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_ideias_relacionadas_pendentes_marcado
+    ON ideias_relacionadas_pendentes (marcado_em);
+
+COMMIT;
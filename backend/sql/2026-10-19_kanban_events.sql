@@ -0,0 +1,23 @@
+BEGIN;
+
+-- Log append-only de ideias e cards do Kanban (sem FK para sobreviver a exclusoes).
+-- item_tipo: 1 = ideia, 2 = card
+-- evento: 1 = criado, 2 = movido, 3 = checklist, 4 = excluido
+-- de_status/para_status: 1 = novo, 2 = verificando, 3 = em_producao, 4 = teste, 5 = fechado
+CREATE TABLE IF NOT EXISTS kanban_events (
+    id BIGSERIAL PRIMARY KEY,
+    kanban_id BIGINT NOT NULL,
+    usuario_id BIGINT NOT NULL,
+    item_tipo SMALLINT NOT NULL,
+    item_id BIGINT NOT NULL,
+    evento SMALLINT NOT NULL,
+    de_status SMALLINT,
+    para_status SMALLINT,
+    dados JSONB,
+    ocorrido_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_kanban_events_kanban_tempo
+ON kanban_events (kanban_id, ocorrido_em, id);
+
+COMMIT;
@@ -0,0 +1,21 @@
+BEGIN;
+
+ALTER TABLE ideias_kanban_historico
+ADD COLUMN IF NOT EXISTS kanban_id BIGINT;
+
+CREATE TABLE IF NOT EXISTS kanban_fluxo_diario (
+    kanban_id BIGINT NOT NULL REFERENCES kanbans(id) ON DELETE CASCADE,
+    kanban_status VARCHAR(30) NOT NULL,
+    dia DATE NOT NULL,
+    entradas INTEGER NOT NULL DEFAULT 0,
+    saidas INTEGER NOT NULL DEFAULT 0,
+    lead_time_segundos DOUBLE PRECISION NOT NULL DEFAULT 0,
+    cycle_time_segundos DOUBLE PRECISION NOT NULL DEFAULT 0,
+    concluidos_com_cycle INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (kanban_id, kanban_status, dia)
+);
+
+COMMIT;
+
+-- Depois da migracao, preencha os rollups com o historico existente:
+--   python backend/kanban_analytics.py backfill
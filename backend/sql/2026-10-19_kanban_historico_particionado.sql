@@ -0,0 +1,66 @@
+-- Converte ideias_kanban_historico em tabela particionada por mes (moved_at, UTC).
+-- Depois desta migracao o backend cria as particoes futuras sozinho e aplica a
+-- retencao configurada em KANBAN_HISTORICO_RETENCAO_MESES.
+BEGIN;
+
+LOCK TABLE ideias_kanban_historico IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE ideias_kanban_historico
+ADD COLUMN IF NOT EXISTS kanban_id BIGINT;
+
+ALTER TABLE ideias_kanban_historico RENAME TO ideias_kanban_historico_legado;
+ALTER INDEX IF EXISTS ideias_kanban_historico_pkey RENAME TO ideias_kanban_historico_legado_pkey;
+DROP INDEX IF EXISTS idx_ideias_kanban_historico_ideia_data;
+DROP INDEX IF EXISTS idx_ideias_kanban_historico_usuario_data;
+ALTER SEQUENCE ideias_kanban_historico_id_seq OWNED BY NONE;
+
+CREATE TABLE ideias_kanban_historico (
+    id BIGINT NOT NULL DEFAULT nextval('ideias_kanban_historico_id_seq'),
+    ideia_id BIGINT NOT NULL REFERENCES ideias(id) ON DELETE CASCADE,
+    usuario_id BIGINT NOT NULL,
+    kanban_id BIGINT,
+    de_status VARCHAR(30),
+    para_status VARCHAR(30) NOT NULL,
+    observacao TEXT,
+    moved_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, moved_at)
+) PARTITION BY RANGE (moved_at);
+
+ALTER SEQUENCE ideias_kanban_historico_id_seq OWNED BY ideias_kanban_historico.id;
+
+DO $$
+DECLARE
+    mes TIMESTAMP;
+BEGIN
+    FOR mes IN
+        SELECT generate_series(
+            date_trunc('month', COALESCE((SELECT MIN(moved_at) FROM ideias_kanban_historico_legado), NOW()) AT TIME ZONE 'UTC'),
+            date_trunc('month', NOW() AT TIME ZONE 'UTC') + INTERVAL '3 months',
+            INTERVAL '1 month'
+        )
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF ideias_kanban_historico FOR VALUES FROM (%L) TO (%L)',
+            'ideias_kanban_historico_' || to_char(mes, 'YYYY_MM'),
+            mes AT TIME ZONE 'UTC',
+            (mes + INTERVAL '1 month') AT TIME ZONE 'UTC'
+        );
+    END LOOP;
+END $$;
+
+CREATE TABLE IF NOT EXISTS ideias_kanban_historico_padrao
+PARTITION OF ideias_kanban_historico DEFAULT;
+
+INSERT INTO ideias_kanban_historico (id, ideia_id, usuario_id, kanban_id, de_status, para_status, observacao, moved_at)
+SELECT id, ideia_id, usuario_id, kanban_id, de_status, para_status, observacao, moved_at
+FROM ideias_kanban_historico_legado;
+
+DROP TABLE ideias_kanban_historico_legado;
+
+CREATE INDEX IF NOT EXISTS idx_ideias_kanban_historico_ideia_keyset
+ON ideias_kanban_historico (ideia_id, moved_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_ideias_kanban_historico_usuario_data
+ON ideias_kanban_historico (usuario_id, moved_at, id);
+
+COMMIT;
@@ -0,0 +1,61 @@
+BEGIN;
+
+ALTER TABLE ideias
+ADD COLUMN IF NOT EXISTS kanban_posicao TEXT COLLATE "C";
+
+ALTER TABLE kanban_cards
+ADD COLUMN IF NOT EXISTS kanban_posicao TEXT COLLATE "C";
+
+DROP INDEX IF EXISTS idx_ideias_kanban_board;
+DROP INDEX IF EXISTS idx_kanban_cards_board;
+
+CREATE INDEX IF NOT EXISTS idx_ideias_kanban_posicao
+ON ideias (kanban_id, kanban_status, (COALESCE(kanban_posicao, '~')), id)
+WHERE kanban_ativo IS TRUE;
+
+CREATE INDEX IF NOT EXISTS idx_kanban_cards_posicao
+ON kanban_cards (kanban_id, kanban_status, (COALESCE(kanban_posicao, '~')), id);
+
+-- Ranks iniciais preservam a ordem antiga (mais recentes no topo) de cada coluna.
+WITH itens AS (
+    SELECT
+        'ideia' AS item_tipo,
+        i.id,
+        i.kanban_id,
+        CASE
+            WHEN i.kanban_status IN ('novo', 'verificando', 'em_producao', 'teste', 'fechado') THEN i.kanban_status
+            ELSE 'novo'
+        END AS status,
+        COALESCE(i.kanban_updated_at, i.updated_at) AS ordem_em
+    FROM ideias i
+    WHERE i.kanban_ativo IS TRUE
+      AND i.kanban_id IS NOT NULL
+      AND i.kanban_posicao IS NULL
+    UNION ALL
+    SELECT 'card', kc.id, kc.kanban_id, kc.kanban_status, kc.updated_at
+    FROM kanban_cards kc
+    WHERE kc.kanban_posicao IS NULL
+),
+numerados AS (
+    SELECT
+        item_tipo,
+        id,
+        'U' || lpad(to_hex(row_number() OVER (
+            PARTITION BY kanban_id, status
+            ORDER BY ordem_em DESC, item_tipo, id
+        )), 8, '0') || 'V' AS posicao
+    FROM itens
+),
+ideias_atualizadas AS (
+    UPDATE ideias i
+    SET kanban_posicao = n.posicao
+    FROM numerados n
+    WHERE n.item_tipo = 'ideia' AND i.id = n.id
+    RETURNING i.id
+)
+UPDATE kanban_cards kc
+SET kanban_posicao = n.posicao
+FROM numerados n
+WHERE n.item_tipo = 'card' AND kc.id = n.id;
+
+COMMIT;
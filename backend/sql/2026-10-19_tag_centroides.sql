@@ -0,0 +1,29 @@
+-- Centroides de embedding por tag (soma + contagem) para sugerir tags a rascunhos.
+-- O backend cria e popula a tabela no startup; para recalcular depois:
+--   python tag_suggestions.py recalcular
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS tag_centroides (
+    usuario_id BIGINT NOT NULL,
+    tag_normalizada TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    soma vector NOT NULL,
+    contagem INTEGER NOT NULL,
+    atualizado_em TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (usuario_id, tag_normalizada)
+);
+
+INSERT INTO tag_centroides (usuario_id, tag_normalizada, tag, soma, contagem)
+SELECT i.usuario_id,
+       LOWER(BTRIM(i.tag)),
+       MAX(BTRIM(i.tag)),
+       SUM(i.embedding),
+       COUNT(*)
+FROM ideias i
+WHERE i.usuario_id IS NOT NULL
+  AND i.embedding IS NOT NULL
+  AND NULLIF(BTRIM(i.tag), '') IS NOT NULL
+GROUP BY 1, 2
+ON CONFLICT (usuario_id, tag_normalizada) DO NOTHING;
+
+COMMIT;
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Sugestao de tags por centroides de embedding.
+
+`tag_centroides` guarda, por usuario e tag normalizada (minusculas, sem espacos
+nas pontas), a soma dos embeddings das ideias com aquela tag e quantas sao. As
+escritas em `ideias` mantem as somas de forma incremental: `remover` antes de
+alterar/apagar as ideias e `adicionar` depois de grava-las, na mesma transacao.
+Como a direcao da soma e a do centroide, sugerir tags para um rascunho e um
+produto matriz-vetor sobre as somas normalizadas, mantidas em memoria por usuario.
+Cada centroide pertence a um modelo de embedding (`modelo`); so ideias desse
+modelo entram na soma e so consultas desse modelo sao comparadas com ele.
+
+Recalcular todos os centroides a partir das ideias:
+    python tag_suggestions.py recalcular
+"""
+
+import os
+import sys
+import threading
+from collections import Counter
+from typing import Iterable, List, Optional
+
+import numpy as np
+import psycopg2
+from cachetools import LRUCache
+from dotenv import load_dotenv
+
+from db_config import build_db_config
+from embedding_providers import DIMENSOES_PADRAO, modelo_do_provedor
+
+
+TAG_NORMALIZADA_SQL = "LOWER(BTRIM(i.tag))"
+
+
+def ensure_schema(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS tag_centroides (
+            usuario_id BIGINT NOT NULL,
+            tag_normalizada TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            soma vector NOT NULL,
+            contagem INTEGER NOT NULL,
+            modelo VARCHAR(100),
+            atualizado_em TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (usuario_id, tag_normalizada)
+        )
+        """
+    )
+    cur.execute("ALTER TABLE tag_centroides ADD COLUMN IF NOT EXISTS modelo VARCHAR(100)")
+
+
+def _ids(ideia_ids: Iterable[int]) -> List[int]:
+    return sorted({int(ideia_id) for ideia_id in ideia_ids if ideia_id is not None})
+
+
+def remover(cur, usuario_id: int, ideia_ids: Iterable[int]):
+    """Tira as ideias (no estado atual) das somas; chamar antes de alterar ou apagar."""
+    ids = _ids(ideia_ids)
+    if not ids:
+        return
+    cur.execute(
+        f"""
+        WITH saida AS (
+            SELECT {TAG_NORMALIZADA_SQL} AS tag_normalizada,
+                   i.embedding_modelo AS modelo,
+                   SUM(i.embedding) AS soma,
+                   COUNT(*) AS contagem
+            FROM ideias i
+            WHERE i.usuario_id = %s
+              AND i.id = ANY(%s)
+              AND i.embedding IS NOT NULL
+              AND NULLIF(BTRIM(i.tag), '') IS NOT NULL
+            GROUP BY 1, 2
+        )
+        UPDATE tag_centroides t
+        SET soma = t.soma - s.soma,
+            contagem = t.contagem - s.contagem,
+            atualizado_em = NOW()
+        FROM saida s
+        WHERE t.usuario_id = %s
+          AND t.tag_normalizada = s.tag_normalizada
+          AND t.modelo IS NOT DISTINCT FROM s.modelo
+          AND vector_dims(t.soma) = vector_dims(s.soma)
+        """,
+        (usuario_id, ids, usuario_id),
+    )
+    cur.execute(
+        "DELETE FROM tag_centroides WHERE usuario_id = %s AND contagem <= 0",
+        (usuario_id,),
+    )
+
+
+def adicionar(cur, usuario_id: int, ideia_ids: Iterable[int], modelo: str):
+    """Soma as ideias (no estado atual) do `modelo` aos centroides; chamar depois de gravar."""
+    ids = _ids(ideia_ids)
+    if not ids:
+        return
+    # Centroide de outro modelo (troca de modelo) recomeca com as ideias novas.
+    mesmo_modelo = (
+        "tag_centroides.modelo IS NOT DISTINCT FROM EXCLUDED.modelo "
+        "AND vector_dims(tag_centroides.soma) = vector_dims(EXCLUDED.soma)"
+    )
+    cur.execute(
+        f"""
+        INSERT INTO tag_centroides (usuario_id, tag_normalizada, tag, soma, contagem, modelo)
+        SELECT %s,
+               {TAG_NORMALIZADA_SQL},
+               MAX(BTRIM(i.tag)),
+               SUM(i.embedding),
+               COUNT(*),
+               %s
+        FROM ideias i
+        WHERE i.usuario_id = %s
+          AND i.id = ANY(%s)
+          AND i.embedding IS NOT NULL
+          AND i.embedding_modelo = %s
+          AND NULLIF(BTRIM(i.tag), '') IS NOT NULL
+        GROUP BY 2
+        ON CONFLICT (usuario_id, tag_normalizada) DO UPDATE
+        SET soma = CASE
+                WHEN {mesmo_modelo}
+                THEN tag_centroides.soma + EXCLUDED.soma
+                ELSE EXCLUDED.soma
+            END,
+            contagem = CASE
+                WHEN {mesmo_modelo}
+                THEN tag_centroides.contagem + EXCLUDED.contagem
+                ELSE EXCLUDED.contagem
+            END,
+            modelo = EXCLUDED.modelo,
+            atualizado_em = NOW()
+        """,
+        (usuario_id, modelo, usuario_id, ids, modelo),
+    )
+
+
+def recalcular(cur, modelo: str, usuario_id: Optional[int] = None) -> int:
+    """Reconstroi os centroides do `modelo` a partir de `ideias` (todos os usuarios se usuario_id for None)."""
+    if usuario_id is None:
+        filtro, params = "", ()
+        cur.execute("DELETE FROM tag_centroides")
+    else:
+        filtro, params = "AND i.usuario_id = %s", (usuario_id,)
+        cur.execute("DELETE FROM tag_centroides WHERE usuario_id = %s", params)
+    cur.execute(
+        f"""
+        INSERT INTO tag_centroides (usuario_id, tag_normalizada, tag, soma, contagem, modelo)
+        SELECT i.usuario_id,
+               {TAG_NORMALIZADA_SQL},
+               MAX(BTRIM(i.tag)),
+               SUM(i.embedding),
+               COUNT(*),
+               %s
+        FROM ideias i
+        WHERE i.usuario_id IS NOT NULL
+          AND i.embedding IS NOT NULL
+          AND i.embedding_modelo = %s
+          AND NULLIF(BTRIM(i.tag), '') IS NOT NULL
+          {filtro}
+        GROUP BY 1, 2
+        """,
+        (modelo, modelo, *params),
+    )
+    return cur.rowcount
+
+
+class _CentroidesUsuario:
+    __slots__ = ("tags", "contagens", "matriz", "modelo")
+
+    def __init__(self, tags: List[str], contagens: np.ndarray, matriz: np.ndarray, modelo: str):
+        self.tags = tags
+        self.contagens = contagens
+        self.matriz = matriz
+        self.modelo = modelo
+
+
+class TagCentroidIndex:
+    """LRU de usuario -> centroides normalizados das suas tags."""
+
+    def __init__(self, max_usuarios: int):
+        self._indices = LRUCache(maxsize=max(max_usuarios, 1))
+        self._geracoes = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.cargas = 0
+
+    def sugerir(
+        self,
+        cur,
+        usuario_id: int,
+        modelo: str,
+        embedding,
+        limite: int,
+        similaridade_minima: float = 0.0,
+    ) -> List[dict]:
+        indice = self._obter_ou_carregar(cur, usuario_id, modelo)
+        consulta = np.asarray(embedding, dtype=np.float32)
+        if not indice.tags or indice.matriz.shape[1] != consulta.shape[0]:
+            return []
+        norma = float(np.linalg.norm(consulta))
+        if norma:
+            consulta = consulta / norma
+
+        similaridades = indice.matriz @ consulta
+        ordem = np.argsort(-similaridades, kind="stable")[:limite]
+        return [
+            {
+                "tag": indice.tags[i],
+                "similarity": round(float(similaridades[i]), 4),
+                "ideias": int(indice.contagens[i]),
+            }
+            for i in ordem
+            if similaridades[i] >= similaridade_minima
+        ]
+
+    def invalidar(self, usuario_id: int):
+        with self._lock:
+            self._geracoes[usuario_id] = self._geracoes.get(usuario_id, 0) + 1
+            self._indices.pop(usuario_id, None)
+
+    def invalidar_todos(self):
+        with self._lock:
+            self._geracoes.clear()
+            self._indices.clear()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {
+                "usuarios_em_memoria": len(self._indices),
+                "max_usuarios": int(self._indices.maxsize),
+                "hits": self.hits,
+                "cargas": self.cargas,
+            }
+
+    def _obter_ou_carregar(self, cur, usuario_id: int, modelo: str) -> _CentroidesUsuario:
+        with self._lock:
+            indice = self._indices.get(usuario_id)
+            geracao = self._geracoes.get(usuario_id, 0)
+            if indice is not None and indice.modelo == modelo:
+                self.hits += 1
+                return indice
+
+        cur.execute(
+            """
+            SELECT tag, contagem, soma::text AS soma
+            FROM tag_centroides
+            WHERE usuario_id = %s AND modelo = %s AND contagem > 0
+            ORDER BY tag_normalizada
+            """,
+            (usuario_id, modelo),
+        )
+        rows = cur.fetchall()
+        vetores = [np.fromstring(row["soma"].strip("[]"), dtype=np.float32, sep=",") for row in rows]
+        if vetores:
+            # Dimensao das tags mais usadas; somas com dimensao divergente ficam de fora
+            dimensoes = Counter(v.shape[0] for v in vetores).most_common(1)[0][0]
+            manter = [i for i, v in enumerate(vetores) if v.shape[0] == dimensoes]
+            matriz = np.vstack([vetores[i] for i in manter])
+            normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+            normas[normas == 0] = 1.0
+            matriz /= normas
+            indice = _CentroidesUsuario(
+                [rows[i]["tag"] for i in manter],
+                np.array([rows[i]["contagem"] for i in manter], dtype=np.int64),
+                matriz,
+                modelo,
+            )
+        else:
+            indice = _CentroidesUsuario([], np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32), modelo)
+
+        with self._lock:
+            self.cargas += 1
+            if self._geracoes.get(usuario_id, 0) == geracao:
+                self._indices[usuario_id] = indice
+        return indice
+
+
+def _main(argv: List[str]) -> Optional[int]:
+    if len(argv) < 2 or argv[1] != "recalcular":
+        print("Uso: python tag_suggestions.py recalcular")
+        return 1
+
+    load_dotenv()
+    modelo = modelo_do_provedor(
+        os.getenv("EMBEDDING_PROVEDOR", "openai"),
+        dimensoes=int(os.getenv("EMBEDDING_PROVEDOR_DIMENSOES", str(DIMENSOES_PADRAO))),
+    )
+    db_config, _ = build_db_config(default_database="sacola_ideias")
+    conn = psycopg2.connect(**db_config)
+    try:
+        with conn.cursor() as cur:
+            ensure_schema(cur)
+            total = recalcular(cur, modelo)
+        conn.commit()
+        print(f"✅ {total} centroide(s) de tag recalculado(s).")
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Erro ao recalcular centroides: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv))
@@ -0,0 +1,163 @@
+"""
+Fixtures dos testes do backend (rodar de backend/: python -m pytest -q).
+
+Os testes de endpoint nao precisam de Postgres: `banco` troca get_db_connection
+por uma conexao falsa cujos cursores passam pelo mesmo mixin de medicao de
+query_metrics.ConexaoMedida, entao as consultas sao contadas como em producao.
+O app e importado com SQL_ORCAMENTO_ESTRITO=1: endpoint acima do orcamento
+declarado responde 500.
+"""
+
+import asyncio
+import os
+import re
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["SQL_ORCAMENTO_ESTRITO"] = "1"
+os.environ["EMBEDDING_PROVEDOR"] = "fake"
+os.environ["SQL_LENTA_LIMITE_MS"] = "0"
+os.environ.setdefault("JWT_SECRET", "segredo-de-teste")
+
+import httpx  # noqa: E402
+
+import query_metrics  # noqa: E402
+
+
+class CursorFalso:
+    """Cursor psycopg2 minimo: responde pelas regras do BancoFalso e registra o SQL."""
+
+    def __init__(self, banco, *args, **kwargs):
+        self.banco = banco
+        self.connection = banco
+        self.rowcount = -1
+        self._linhas = []
+
+    def execute(self, query, vars=None):
+        texto = query.decode("utf-8") if isinstance(query, bytes) else str(query)
+        self._linhas = [dict(linha) for linha in self.banco.responder(texto)]
+        self.rowcount = len(self._linhas)
+        self.banco.executadas.append(texto)
+        self.banco.parametros.append(vars)
+
+    def copy_expert(self, sql, arquivo):
+        self.banco.copiados.append(arquivo.read())
+        self.execute(sql)
+
+    def mogrify(self, template, args):
+        # execute_values monta o VALUES com mogrify
+        return repr(tuple(args)).encode("utf-8")
+
+    def fetchone(self):
+        return self._linhas.pop(0) if self._linhas else None
+
+    def fetchall(self):
+        linhas, self._linhas = self._linhas, []
+        return linhas
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class BancoFalso:
+    encoding = "UTF8"
+
+    def __init__(self):
+        self.regras = []
+        self.executadas = []
+        self.parametros = []
+        self.copiados = []
+
+    def quando(self, padrao: str, *linhas: dict):
+        self.regras.append((re.compile(padrao, re.IGNORECASE | re.DOTALL), linhas))
+
+    def responder(self, sql: str):
+        for padrao, linhas in self.regras:
+            if padrao.search(sql):
+                return linhas
+        return []
+
+    def cursor(self, *args, **kwargs):
+        return query_metrics._cursor_medido(CursorFalso)(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def linha_ideia(ideia_id: int = 7, **campos) -> dict:
+    agora = datetime(2026, 10, 19, tzinfo=timezone.utc)
+    linha = {
+        "id": ideia_id,
+        "titulo": "Ideia",
+        "tag": None,
+        "ideia": "Texto da ideia",
+        "projeto_id": None,
+        "usuario_id": 1,
+        "data": agora,
+        "created_at": agora,
+        "updated_at": agora,
+        "kanban_id": None,
+        "kanban_ativo": False,
+        "kanban_status": None,
+    }
+    linha.update(campos)
+    return linha
+
+
+@pytest.fixture(scope="session")
+def app_modulo():
+    import app
+
+    return app
+
+
+@pytest.fixture
+def banco(app_modulo, monkeypatch):
+    falso = BancoFalso()
+    falso.quando(r"FROM assinaturas", {"id": 1, "usuario_id": 1, "plano": "pro", "status": "ativa"})
+    monkeypatch.setattr(app_modulo, "get_db_connection", lambda: falso)
+    # Resultados de busca de um teste nao podem vazar para o proximo
+    app_modulo.search_result_cache.invalidar_todos()
+    return falso
+
+
+@pytest.fixture
+def token():
+    from auth import criar_token_jwt
+
+    return criar_token_jwt(1, "teste@example.com")
+
+
+@pytest.fixture
+def requisitar(app_modulo, token):
+    """requisitar(metodo, caminho, json=...) -> httpx.Response, sem lifespan (startup nao roda)."""
+
+    def fazer(metodo: str, caminho: str, **kwargs):
+        async def enviar():
+            transporte = httpx.ASGITransport(app=app_modulo.app)
+            async with httpx.AsyncClient(transport=transporte, base_url="http://teste") as cliente:
+                cabecalhos = {"Authorization": f"Bearer {token}", **kwargs.pop("headers", {})}
+                return await cliente.request(metodo, caminho, headers=cabecalhos, **kwargs)
+
+        return asyncio.run(enviar())
+
+    return fazer
@@ -0,0 +1,101 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+from conftest import BancoFalso
+
+import app as app_modulo
+
+
+def _linhas_busca(distancias):
+    agora = datetime(2026, 10, 19, tzinfo=timezone.utc)
+    return [
+        {"id": 100 + n, "titulo": f"Ideia {n}", "tag": None, "ideia": "texto", "data": agora,
+         "similarity": 1 - distancia, "distancia": distancia}
+        for n, distancia in enumerate(distancias)
+    ]
+
+
+def _consulta_semantica(banco: BancoFalso):
+    for sql, vars in zip(banco.executadas, banco.parametros):
+        if "WITH candidatos AS MATERIALIZED" in sql:
+            return sql, vars
+    raise AssertionError("busca semantica nao executada")
+
+
+def test_cursor_repete_o_corte_da_primeira_pagina(banco, requisitar):
+    banco.quando(r"WITH candidatos AS MATERIALIZED", *_linhas_busca([0.2, 0.5]))
+    primeira = requisitar("POST", "/api/ideias/buscar", json={"termo": "kanban", "limite": 2})
+    assert primeira.status_code == 200, primeira.text
+    assert [item["id"] for item in primeira.json()] == [100, 101]
+    sql, vars = _consulta_semantica(banco)
+    assert "<= %s" in sql and app_modulo.BUSCA_DISTANCIA_MAXIMA in vars
+    cursor = app_modulo._decode_cursor(primeira.headers["x-proximo-cursor"])
+    assert cursor["c"] == app_modulo.BUSCA_DISTANCIA_MAXIMA
+
+    banco.executadas.clear()
+    banco.parametros.clear()
+    segunda = requisitar(
+        "POST", "/api/ideias/buscar",
+        json={"termo": "kanban", "limite": 2, "cursor": primeira.headers["x-proximo-cursor"]},
+    )
+    assert segunda.status_code == 200, segunda.text
+    sql, vars = _consulta_semantica(banco)
+    # Continuacao com o mesmo corte e a partir da ultima linha da primeira pagina
+    assert "<= %s" in sql and app_modulo.BUSCA_DISTANCIA_MAXIMA in vars
+    assert 0.5 in vars and 101 in vars
+
+
+def test_cursor_da_segunda_passada_segue_sem_corte(banco, requisitar):
+    # Nada passa no corte: a segunda passada (sem corte) devolve a pagina
+    banco.quando(r"<= %s\s+ORDER BY")
+    banco.quando(r"WITH candidatos AS MATERIALIZED", *_linhas_busca([0.8, 0.9]))
+    primeira = requisitar("POST", "/api/ideias/buscar", json={"termo": "kanban", "limite": 2})
+    assert primeira.status_code == 200, primeira.text
+    assert [item["id"] for item in primeira.json()] == [100, 101]
+    assert app_modulo._decode_cursor(primeira.headers["x-proximo-cursor"])["c"] is None
+
+    banco.executadas.clear()
+    banco.parametros.clear()
+    segunda = requisitar(
+        "POST", "/api/ideias/buscar",
+        json={"termo": "kanban", "limite": 2, "cursor": primeira.headers["x-proximo-cursor"]},
+    )
+    assert segunda.status_code == 200, segunda.text
+    _, vars = _consulta_semantica(banco)
+    assert app_modulo.BUSCA_DISTANCIA_MAXIMA not in vars
+
+
+class _IndiceFalso:
+    def __init__(self, similaridades):
+        self.similaridades = similaridades
+
+    def buscar(self, cur, usuario_id, modelo, embedding, limite, ids_filtrados, apos):
+        ids = np.arange(100, 100 + len(self.similaridades), dtype=np.int64)
+        return ids, np.asarray(self.similaridades, dtype=np.float32)
+
+
+def _em_memoria(banco, monkeypatch, similaridades, apos=None, corte=None):
+    monkeypatch.setattr(app_modulo, "vector_index", _IndiceFalso(similaridades))
+    banco.quando(r"FROM ideias", *_linhas_busca([1 - s for s in similaridades]))
+    with banco.cursor() as cur:
+        return app_modulo._buscar_similares_em_memoria(
+            cur, 1, np.zeros(3, dtype=np.float32), len(similaridades), apos=apos, corte=corte
+        )
+
+
+def test_em_memoria_continuacao_aplica_o_corte(banco, monkeypatch):
+    primeira = _em_memoria(banco, monkeypatch, [0.9, 0.5])
+    assert [r["corte"] for r in primeira] == [app_modulo.BUSCA_DISTANCIA_MAXIMA] * 2
+
+    continuacao = _em_memoria(banco, monkeypatch, [0.4, 0.1], apos=(0.5, 101), corte=primeira[-1]["corte"])
+    assert [r["id"] for r in continuacao] == [100]
+
+
+def test_em_memoria_sem_relevantes_segue_sem_corte(banco, monkeypatch):
+    primeira = _em_memoria(banco, monkeypatch, [0.2, 0.1])
+    assert [r["id"] for r in primeira] == [100, 101]
+    assert primeira[-1]["corte"] is None
+
+    continuacao = _em_memoria(banco, monkeypatch, [0.05], apos=(0.9, 101), corte=None)
+    assert [r["id"] for r in continuacao] == [100]
@@ -0,0 +1,28 @@
+import pytest
+
+
+@pytest.fixture
+def provedor_fresco(app_modulo, monkeypatch):
+    monkeypatch.setattr(app_modulo, "EMBEDDING_PROVEDOR_RECUSADO", False)
+    monkeypatch.setattr(app_modulo, "embeddings_model", None)
+
+
+def _coluna_embedding(banco, dimensoes: int):
+    banco.quando(r"to_regclass\('public\.ideias'\)", {0: "ideias"})
+    banco.quando(r"FROM pg_attribute", {"atttypmod": dimensoes})
+
+
+def test_provedor_com_outra_dimensao_e_desativado(app_modulo, banco, provedor_fresco, monkeypatch, capsys):
+    monkeypatch.setattr(app_modulo, "EMBEDDING_PROVEDOR_DIMENSOES", 384)
+    _coluna_embedding(banco, 1536)
+    app_modulo.ensure_embedding_identity_schema()
+    assert "Provedor de embeddings desativado" in capsys.readouterr().out
+    assert app_modulo.get_embeddings_model() is None
+
+
+def test_provedor_com_a_dimensao_da_coluna_continua_ativo(app_modulo, banco, provedor_fresco, monkeypatch, capsys):
+    monkeypatch.setattr(app_modulo, "EMBEDDING_PROVEDOR_DIMENSOES", 1536)
+    _coluna_embedding(banco, 1536)
+    app_modulo.ensure_embedding_identity_schema()
+    assert "Embeddings via" in capsys.readouterr().out
+    assert app_modulo.get_embeddings_model() is not None
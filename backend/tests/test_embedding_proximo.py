@@ -0,0 +1,68 @@
+import pytest
+
+from conftest import linha_ideia
+from embedding_providers import FakeEmbeddingProvider
+
+
+class _ProximoRegistrado(FakeEmbeddingProvider):
+    """Provedor do proximo modelo que anota no banco falso quando foi chamado."""
+
+    def __init__(self, banco):
+        super().__init__(dimensoes=8)
+        self.modelo = "fake-proximo@8"
+        self.banco = banco
+
+    def embed_documents(self, textos):
+        self.banco.executadas.append("-- chamada ao proximo modelo")
+        self.banco.parametros.append(None)
+        return super().embed_documents(textos)
+
+
+@pytest.fixture
+def troca_em_curso(app_modulo, banco, monkeypatch):
+    provedor = _ProximoRegistrado(banco)
+    monkeypatch.setattr(app_modulo, "EMBEDDING_MODELO_PROXIMO", provedor.modelo)
+    monkeypatch.setattr(app_modulo, "embeddings_model_proximo", provedor)
+    return provedor
+
+
+def _posicao(banco, trecho: str) -> int:
+    return next(n for n, sql in enumerate(banco.executadas) if trecho in sql)
+
+
+def test_atualizar_gera_proximo_antes_de_escrever(banco, requisitar, troca_em_curso):
+    banco.quando(r"SELECT titulo, tag, ideia, projeto_id", linha_ideia(7))
+    banco.quando(r"UPDATE ideias\b.*RETURNING id", {"id": 7})
+    banco.quando(r"FROM ideias i\b", linha_ideia(7, titulo="Editada"))
+    resposta = requisitar("PUT", "/api/ideias/7", json={"titulo": "Editada", "ideia": "Texto novo"})
+    assert resposta.status_code == 200, resposta.text
+    assert troca_em_curso.chamadas == 1
+    chamada = _posicao(banco, "chamada ao proximo modelo")
+    assert chamada < _posicao(banco, "UPDATE ideias")
+    assert chamada < _posicao(banco, "embedding_proximo = v.embedding")
+
+
+def test_mesclar_gera_proximo_antes_do_for_update(banco, requisitar, troca_em_curso):
+    banco.quando(
+        r"FROM ideias\s+WHERE usuario_id = %s AND id = ANY",
+        linha_ideia(7, ideia="Texto A", agenda_data=None, agenda_observacao=None, kanban_updated_at=None,
+                    kanban_posicao=None),
+        linha_ideia(8, ideia="Texto B", agenda_data=None, agenda_observacao=None, kanban_updated_at=None,
+                    kanban_posicao=None),
+    )
+    banco.quando(r"FROM ideias i\b", linha_ideia(7, ideia="Texto A\n\nTexto B"))
+    resposta = requisitar("POST", "/api/ideias/7/mesclar", json={"duplicata_id": 8})
+    assert resposta.status_code == 200, resposta.text
+    assert troca_em_curso.chamadas == 1
+    assert _posicao(banco, "chamada ao proximo modelo") < _posicao(banco, "FOR UPDATE")
+    assert _posicao(banco, "FOR UPDATE") < _posicao(banco, "embedding_proximo = v.embedding")
+
+
+def test_falha_do_proximo_apaga_o_vetor_antigo(app_modulo, banco, troca_em_curso, monkeypatch):
+    monkeypatch.setattr(troca_em_curso, "embed_documents", lambda textos: (_ for _ in ()).throw(RuntimeError("fora")))
+    vetores = app_modulo.gerar_embeddings_proximos(["texto"])
+    assert vetores is None
+    with banco.cursor() as cur:
+        app_modulo.gravar_embeddings_proximos(cur, [7], vetores)
+    assert banco.executadas[-1].startswith("UPDATE ideias SET embedding_proximo = NULL")
+    assert banco.parametros[-1] == ([7],)
@@ -0,0 +1,49 @@
+import io
+
+import app as app_modulo
+
+
+def _job_concluido(banco) -> dict:
+    for sql, vars in zip(banco.executadas, banco.parametros):
+        if "UPDATE background_jobs" in sql and vars[0] == "concluido":
+            return vars[2].adapted
+    raise AssertionError("job nao concluido")
+
+
+def test_csv_reporta_linha_fisica_com_campo_multilinha():
+    arquivo = io.BytesIO(
+        'titulo,ideia\nPrimeira,"linha 1\nlinha 2"\nSegunda,texto\n'.encode("utf-8")
+    )
+    linhas = [(numero, registro["titulo"]) for numero, registro, _ in app_modulo._iter_import_rows(arquivo, "csv")]
+    assert linhas == [(3, "Primeira"), (4, "Segunda")]
+
+
+def test_projeto_de_outro_usuario_nao_conta_como_linha_valida(banco, monkeypatch):
+    monkeypatch.setattr(app_modulo, "get_embeddings_model", lambda: None)
+    banco.quando(r"FROM ideias_import_staging s\s+LEFT JOIN projetos p.*p\.id IS NULL", {"linha": 3, "projeto_id": 99})
+    banco.quando(r"INSERT INTO ideias\b", {"id": 1})
+    arquivo = io.BytesIO(
+        b'{"titulo": "A", "ideia": "a"}\n'
+        b'{"titulo": "", "ideia": "b"}\n'
+        b'{"titulo": "C", "ideia": "c", "projeto_id": 99}\n'
+    )
+    app_modulo._processar_importacao_ideias("job", 1, arquivo, "jsonl")
+
+    resultado = _job_concluido(banco)
+    assert resultado["linhas_lidas"] == 3
+    assert resultado["linhas_validas"] == 1
+    assert resultado["linhas_invalidas"] == 2
+    assert [erro["linha"] for erro in resultado["erros"]] == [2, 3]
+
+
+def test_endpoint_importa_em_background(banco, requisitar, monkeypatch):
+    monkeypatch.setattr(app_modulo, "get_embeddings_model", lambda: None)
+    banco.quando(r"INSERT INTO ideias\b", {"id": 1}, {"id": 2})
+    resposta = requisitar(
+        "POST", "/api/ideias/import?formato=csv",
+        content="titulo,ideia\nA,a\nB,b\n".encode("utf-8"),
+    )
+    assert resposta.status_code == 202, resposta.text
+    assert resposta.json()["status_url"] == f"/api/jobs/{resposta.json()['job_id']}"
+    assert b"2,A,,a,\r\n3,B,,b,\r\n" == banco.copiados[0].encode("utf-8")
+    assert _job_concluido(banco)["inseridas"] == 2
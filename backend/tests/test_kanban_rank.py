@@ -0,0 +1,94 @@
+import pytest
+
+from kanban_rank import ALFABETO, rank_between, ranks_espacados
+
+
+@pytest.mark.parametrize(
+    "anterior, proximo",
+    [(None, None), (None, "V"), ("V", None), ("A", "B"), ("A", "A1"), ("Az", "B"), ("0V", "1")],
+)
+def test_rank_between_fica_estritamente_entre(anterior, proximo):
+    rank = rank_between(anterior, proximo)
+    assert anterior is None or anterior < rank
+    assert proximo is None or rank < proximo
+    assert not rank.endswith(ALFABETO[0])
+
+
+def test_insercoes_repetidas_no_mesmo_ponto_continuam_ordenadas():
+    # Sempre logo depois de "A": cada novo rank entra antes do anterior
+    ranks = ["B"]
+    for _ in range(200):
+        ranks.append(rank_between("A", ranks[-1]))
+    assert ranks[::-1] == sorted(ranks)
+    assert all("A" < rank for rank in ranks)
+
+
+def test_insercoes_no_fim_crescem_devagar():
+    rank = None
+    for _ in range(100):
+        rank = rank_between(rank, None)
+    assert len(rank) <= 3
+
+
+@pytest.mark.parametrize("anterior, proximo", [("B", "A"), ("A", "A"), ("A", "A0")])
+def test_rank_between_rejeita_intervalo_vazio(anterior, proximo):
+    with pytest.raises(ValueError):
+        rank_between(anterior, proximo)
+
+
+def test_rank_between_rejeita_caractere_invalido():
+    with pytest.raises(ValueError):
+        rank_between(None, "-A")
+
+
+@pytest.mark.parametrize("quantidade", [1, 2, 30, 61, 500])
+def test_ranks_espacados_ordenados_e_unicos(quantidade):
+    ranks = ranks_espacados(quantidade)
+    assert len(ranks) == quantidade
+    assert ranks == sorted(ranks)
+    assert len(set(ranks)) == quantidade
+    assert rank_between(None, ranks[0]) < ranks[0]
+    assert rank_between(ranks[-1], None) > ranks[-1]
+
+
+def test_ranks_espacados_vazio():
+    assert ranks_espacados(0) == []
+    assert ranks_espacados(-3) == []
+
+
+def _banco_mover(banco, posicao_vizinho):
+    banco.quando(r"FROM kanbans k", {"id": 3, "projeto_id": 1, "nome": "Quadro"})
+    banco.quando(r"FROM kanban_cards\s+WHERE id", {"id": 1, "kanban_status": "novo", "kanban_posicao": "V"})
+    banco.quando(r"FROM ideias\s+WHERE id", {"id": 2, "kanban_status": "teste", "kanban_posicao": posicao_vizinho})
+
+
+def _mover_para_baixo_da_ideia(requisitar):
+    return requisitar(
+        "POST",
+        "/api/kanbans/3/mover",
+        json={"item_tipo": "card", "id": 1, "kanban_status": "teste", "anterior": {"item_tipo": "ideia", "id": 2}},
+    )
+
+
+def test_mover_grava_so_o_item_entre_os_vizinhos(banco, requisitar):
+    _banco_mover(banco, "a")
+    resposta = _mover_para_baixo_da_ideia(requisitar)
+    assert resposta.status_code == 200, resposta.text
+    assert resposta.json()["kanban_status"] == "teste"
+    assert resposta.json()["kanban_posicao"] > "a"
+    assert sum(sql.lstrip().startswith("UPDATE") for sql in banco.executadas) == 1
+
+
+def test_mover_sem_rank_no_vizinho_agenda_rebalanceamento(banco, requisitar, app_modulo, monkeypatch):
+    rebalanceadas = []
+    fechada = []
+    monkeypatch.setattr(banco, "close", lambda: fechada.append(True))
+    # Anota quantas conexoes ja tinham sido fechadas quando o rebalanceamento rodou
+    monkeypatch.setattr(app_modulo, "_rebalance_kanban_column", lambda *args: rebalanceadas.append((*args, len(fechada))))
+    _banco_mover(banco, None)
+    resposta = _mover_para_baixo_da_ideia(requisitar)
+    assert resposta.status_code == 409
+    assert resposta.json()["detail"] == "Coluna reordenada; tente novamente"
+    # Rodou como background task, depois da resposta, e nao dentro da requisicao
+    assert rebalanceadas == [(3, "teste", len(fechada))]
+    assert not any(sql.lstrip().startswith("UPDATE") for sql in banco.executadas)
@@ -0,0 +1,40 @@
+import json
+from types import SimpleNamespace
+
+from response_cache import CoalescingTTLCache
+
+
+class ModeloFalso:
+    """Chat que responde uma sugestao por linha, sem fim, e anota quando o stream fecha."""
+
+    def __init__(self, eventos):
+        self.eventos = eventos
+
+    async def astream(self, prompt):
+        try:
+            n = 0
+            while True:
+                n += 1
+                yield SimpleNamespace(content=f"Sugestao {n}\n")
+        finally:
+            self.eventos.append("stream fechado")
+
+
+def test_stream_fecha_openai_antes_de_liberar_a_vaga(requisitar, app_modulo, monkeypatch):
+    eventos = []
+    monkeypatch.setattr(app_modulo, "get_chat_model", lambda: ModeloFalso(eventos))
+    monkeypatch.setattr(app_modulo, "sugestoes_lembranca_cache", CoalescingTTLCache(10, 60))
+    limite = app_modulo.politica_chat.limite
+    liberar = limite.liberar
+
+    def liberar_anotando():
+        eventos.append("vaga liberada")
+        liberar()
+
+    monkeypatch.setattr(limite, "liberar", liberar_anotando)
+    resposta = requisitar("POST", "/api/lembrancas/sugerir/stream", json={"texto": "onde deixei a chave"})
+    assert resposta.status_code == 200
+
+    fim = [linha for linha in resposta.text.splitlines() if linha.startswith("data:")][-1]
+    assert len(json.loads(fim[len("data:"):])["sugestoes"]) == app_modulo.LEMBRANCAS_MAX_SUGESTOES
+    assert eventos == ["stream fechado", "vaga liberada"]
@@ -0,0 +1,41 @@
+from conftest import linha_ideia
+
+import app as app_modulo
+
+
+def _ideias_mescla(banco, principal: dict, duplicata: dict):
+    extras = {"agenda_data": None, "agenda_observacao": None, "kanban_updated_at": None, "kanban_posicao": "V"}
+    banco.quando(
+        r"FROM ideias\s+WHERE usuario_id = %s AND id = ANY",
+        linha_ideia(7, **{**extras, **principal}),
+        linha_ideia(8, **{**extras, **duplicata}),
+    )
+    banco.quando(r"FROM ideias i\b", linha_ideia(7))
+
+
+def _eventos(banco) -> str:
+    return "\n".join(sql for sql in banco.executadas if "INSERT INTO kanban_events" in sql)
+
+
+def test_principal_que_assume_o_quadro_gera_eventos_de_troca(banco, requisitar):
+    _ideias_mescla(
+        banco,
+        {"ideia": "Texto A"},
+        {"ideia": "Texto A", "kanban_id": 3, "kanban_ativo": True, "kanban_status": "teste"},
+    )
+    resposta = requisitar("POST", "/api/ideias/7/mesclar", json={"duplicata_id": 8})
+    assert resposta.status_code == 200, resposta.text
+    assert any("UPDATE ideias_kanban_historico SET ideia_id" in sql for sql in banco.executadas)
+    eventos = _eventos(banco)
+    teste = app_modulo.KANBAN_STATUS_CODIGOS["teste"]
+    excluido, criado = app_modulo.KANBAN_EVENTO_TIPOS["excluido"], app_modulo.KANBAN_EVENTO_TIPOS["criado"]
+    assert f"(3, 1, 1, 8, {excluido}, {teste}, None," in eventos
+    assert f"(3, 1, 1, 7, {criado}, None, {teste}," in eventos
+    assert not any("UPDATE kanban_events" in sql for sql in banco.executadas)
+
+
+def test_duplicata_fora_do_quadro_nao_gera_eventos(banco, requisitar):
+    _ideias_mescla(banco, {"ideia": "Texto A"}, {"ideia": "Texto A"})
+    resposta = requisitar("POST", "/api/ideias/7/mesclar", json={"duplicata_id": 8})
+    assert resposta.status_code == 200, resposta.text
+    assert _eventos(banco) == ""
@@ -0,0 +1,68 @@
+from conftest import linha_ideia
+
+
+def _consultas(resposta) -> int:
+    # sql;dur=1.23;desc="N consultas, R linhas", app;dur=...
+    desc = resposta.headers["server-timing"].split('desc="', 1)[1]
+    return int(desc.split(" ", 1)[0])
+
+
+def _banco_criar_ideia(banco):
+    banco.quando(r"INSERT INTO ideias\b.*RETURNING id", {"id": 7})
+    banco.quando(r"FROM ideias i\b", linha_ideia(7, titulo="Nova"))
+
+
+def _banco_atualizar_ideia(banco):
+    banco.quando(r"SELECT titulo, tag, ideia, projeto_id", linha_ideia(7))
+    banco.quando(r"UPDATE ideias\b.*RETURNING id", {"id": 7})
+    banco.quando(r"FROM ideias i\b", linha_ideia(7, titulo="Editada"))
+
+
+def test_criar_ideia_dentro_do_orcamento(banco, requisitar, app_modulo):
+    _banco_criar_ideia(banco)
+    resposta = requisitar("POST", "/api/ideias", json={"titulo": "Nova", "ideia": "Texto"})
+    assert resposta.status_code == 200, resposta.text
+    assert resposta.json()["id"] == 7
+    # Com o FakeEmbeddingProvider o caminho semantico (marcar relacionadas, centroides) roda
+    assert any("embedding" in sql for sql in banco.executadas)
+    assert 0 < _consultas(resposta) <= app_modulo.criar_ideia.orcamento_sql
+
+
+def test_criar_ideia_acima_do_orcamento_falha(banco, requisitar, app_modulo, monkeypatch):
+    _banco_criar_ideia(banco)
+    monkeypatch.setattr(app_modulo.criar_ideia, "orcamento_sql", 1)
+    resposta = requisitar("POST", "/api/ideias", json={"titulo": "Nova", "ideia": "Texto"})
+    assert resposta.status_code == 500
+    assert "Orcamento SQL excedido" in resposta.json()["detail"]
+    assert "POST /api/ideias" in resposta.json()["detail"]
+
+
+def test_atualizar_ideia_dentro_do_orcamento(banco, requisitar, app_modulo):
+    _banco_atualizar_ideia(banco)
+    resposta = requisitar("PUT", "/api/ideias/7", json={"titulo": "Editada", "ideia": "Texto novo"})
+    assert resposta.status_code == 200, resposta.text
+    assert 0 < _consultas(resposta) <= app_modulo.atualizar_ideia.orcamento_sql
+
+
+def test_atualizar_ideia_acima_do_orcamento_falha(banco, requisitar, app_modulo, monkeypatch):
+    _banco_atualizar_ideia(banco)
+    monkeypatch.setattr(app_modulo.atualizar_ideia, "orcamento_sql", 2)
+    resposta = requisitar("PUT", "/api/ideias/7", json={"titulo": "Editada", "ideia": "Texto novo"})
+    assert resposta.status_code == 500
+    assert "PUT /api/ideias/{ideia_id}" in resposta.json()["detail"]
+
+
+def test_dependencia_de_assinatura_limitada_a_uma_consulta(banco, requisitar, app_modulo, monkeypatch):
+    _banco_criar_ideia(banco)
+    original = app_modulo._get_assinatura_row
+
+    def assinatura_com_consulta_extra(usuario_id):
+        conn = app_modulo.get_db_connection()
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1 FROM usuarios WHERE id = %s", (usuario_id,))
+        return original(usuario_id)
+
+    monkeypatch.setattr(app_modulo, "_get_assinatura_row", assinatura_com_consulta_extra)
+    resposta = requisitar("POST", "/api/ideias", json={"titulo": "Nova", "ideia": "Texto"})
+    assert resposta.status_code == 500
+    assert "dependencia de assinatura fez 2 consultas (orcamento 1)" in resposta.json()["detail"]
@@ -0,0 +1,163 @@
+import pytest
+
+import outbound_calls
+from outbound_calls import ChamadaIndisponivel, CircuitBreaker, LimiteConcorrencia, PoliticaChamada
+
+
+class Relogio:
+    """Substitui o modulo time em outbound_calls: sleep so avanca o relogio."""
+
+    def __init__(self):
+        self.agora = 1000.0
+
+    def monotonic(self):
+        return self.agora
+
+    def sleep(self, segundos):
+        self.agora += segundos
+
+
+class ErroServidor(Exception):
+    status_code = 503
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    falso = Relogio()
+    monkeypatch.setattr(outbound_calls, "time", falso)
+    # Jitter no teto do backoff, para as esperas serem previsiveis
+    monkeypatch.setattr(outbound_calls.random, "uniform", lambda inicio, fim: fim)
+    return falso
+
+
+def _politica(**kwargs):
+    opcoes = {"tentativas": 1, "espera_vaga": 0, "limite_falhas": 2, "espera_disjuntor": 10}
+    opcoes.update(kwargs)
+    return PoliticaChamada("teste", LimiteConcorrencia(4), opcoes.pop("prazo", 5.0), **opcoes)
+
+
+def _falhar():
+    raise ErroServidor("503")
+
+
+def test_disjuntor_abre_depois_meio_aberto_com_um_teste_e_fecha(relogio):
+    disjuntor = CircuitBreaker(limite_falhas=2, espera_segundos=10)
+    disjuntor.registrar_falha()
+    assert disjuntor.estado == "fechado"
+    disjuntor.registrar_falha()
+    assert disjuntor.estado == "aberto"
+    assert not disjuntor.permitir()
+
+    relogio.sleep(10)
+    assert disjuntor.estado == "meio_aberto"
+    assert disjuntor.permitir()
+    # So uma chamada de teste por vez
+    assert not disjuntor.permitir()
+
+    disjuntor.registrar_sucesso()
+    assert disjuntor.estado == "fechado"
+    assert disjuntor.permitir() and disjuntor.permitir()
+    assert disjuntor.aberturas == 1
+
+
+def test_teste_que_falha_reabre_o_disjuntor(relogio):
+    disjuntor = CircuitBreaker(limite_falhas=1, espera_segundos=10)
+    disjuntor.registrar_falha()
+    relogio.sleep(10)
+    assert disjuntor.permitir()
+    disjuntor.registrar_falha()
+    assert disjuntor.estado == "aberto"
+    assert disjuntor.aberturas == 2
+    relogio.sleep(9)
+    assert not disjuntor.permitir()
+
+
+def test_teste_sem_veredito_libera_outro_teste(relogio):
+    disjuntor = CircuitBreaker(limite_falhas=1, espera_segundos=10)
+    disjuntor.registrar_falha()
+    relogio.sleep(10)
+    assert disjuntor.permitir()
+    disjuntor.liberar_teste()
+    assert disjuntor.estado == "meio_aberto"
+    assert disjuntor.permitir()
+
+
+def test_politica_falha_rapido_com_disjuntor_aberto_e_deixa_um_teste_passar(relogio):
+    politica = _politica()
+    for _ in range(2):
+        with pytest.raises(ErroServidor):
+            politica.executar(_falhar)
+    chamadas = []
+    with pytest.raises(ChamadaIndisponivel):
+        politica.executar(chamadas.append, "nao deveria rodar")
+    assert chamadas == []
+
+    relogio.sleep(10)
+
+    def teste():
+        # Enquanto o teste esta em andamento, outra chamada e recusada
+        with pytest.raises(ChamadaIndisponivel):
+            politica.executar(chamadas.append, "concorrente")
+        return "ok"
+
+    assert politica.executar(teste) == "ok"
+    assert chamadas == []
+    assert politica.disjuntor.estado == "fechado"
+    assert politica.contadores["rejeitadas_disjuntor"] == 2
+
+
+def test_novas_tentativas_so_para_erro_transitorio(relogio):
+    politica = _politica(tentativas=3, backoff_base=0.1)
+    respostas = [ErroServidor("503"), ErroServidor("503"), "ok"]
+
+    def instavel():
+        resposta = respostas.pop(0)
+        if isinstance(resposta, Exception):
+            raise resposta
+        return resposta
+
+    assert politica.executar(instavel) == "ok"
+    assert politica.contadores["novas_tentativas"] == 2
+    assert politica.disjuntor.estado == "fechado"
+
+    chamadas = []
+
+    def chave_invalida():
+        chamadas.append(1)
+        raise ValueError("401")
+
+    with pytest.raises(ValueError):
+        politica.executar(chave_invalida)
+    assert len(chamadas) == 1
+    # Erro 4xx nao conta para abrir o disjuntor
+    assert politica.disjuntor._falhas_seguidas == 0
+
+
+def test_novas_tentativas_limitadas_pelo_prazo_total(relogio):
+    politica = _politica(prazo=1.0, tentativas=5, backoff_base=0.4, limite_falhas=10)
+    chamadas = []
+
+    def lento():
+        chamadas.append(relogio.agora)
+        relogio.sleep(0.3)
+        raise ErroServidor("503")
+
+    inicio = relogio.agora
+    with pytest.raises(ErroServidor):
+        politica.executar(lento)
+    # 0.3 + espera 0.4 + 0.3 = 1.0: a proxima espera (0.8) ja nao cabe no prazo
+    assert len(chamadas) == 2
+    assert relogio.agora - inicio == pytest.approx(1.0)
+    assert politica.contadores["novas_tentativas"] == 1
+    assert politica.contadores["falhas"] == 1
+
+
+def test_sem_vaga_falha_na_hora(relogio):
+    politica = PoliticaChamada("teste", LimiteConcorrencia(1), 5.0, tentativas=1, espera_vaga=0)
+    assert politica.limite.tentar_adquirir()
+    with pytest.raises(ChamadaIndisponivel):
+        politica.executar(lambda: "ok")
+    politica.limite.liberar()
+    assert politica.contadores["rejeitadas_limite"] == 1
+    assert politica.executar(lambda: "ok") == "ok"
+    assert politica.limite.em_andamento == 0
@@ -0,0 +1,21 @@
+from embedding_providers import FakeEmbeddingProvider, LocalHashingEmbeddingProvider
+from outbound_calls import ProvedorProtegido
+
+
+def test_provedores_locais_ficam_fora_da_politica_do_openai(app_modulo):
+    fake = app_modulo._criar_provedor_embeddings("fake", "text-embedding-3-small", 8)
+    local = app_modulo._criar_provedor_embeddings("local", "text-embedding-3-small", 8)
+    assert type(fake) is FakeEmbeddingProvider
+    assert type(local) is LocalHashingEmbeddingProvider
+
+
+def test_openai_passa_pela_politica(app_modulo, monkeypatch):
+    monkeypatch.setattr(app_modulo, "OPENAI_API_KEY", "sk-teste")
+    provedor = app_modulo._criar_provedor_embeddings("openai", "text-embedding-3-small", 1536)
+    assert isinstance(provedor, ProvedorProtegido)
+    assert provedor.politica is app_modulo.politica_embeddings
+
+
+def test_openai_sem_chave_fica_indisponivel(app_modulo, monkeypatch):
+    monkeypatch.setattr(app_modulo, "OPENAI_API_KEY", None)
+    assert app_modulo._criar_provedor_embeddings("openai", "text-embedding-3-small", 1536) is None
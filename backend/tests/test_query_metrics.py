@@ -0,0 +1,96 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+import query_metrics
+from conftest import BancoFalso
+from query_metrics import EstatisticasSql, MedicaoSqlMiddleware, orcamento_sql, texto_sql, trecho_sql
+
+
+def _app(estrito: bool, estatisticas=None) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(MedicaoSqlMiddleware, estatisticas=estatisticas, estrito=estrito, limite_repeticoes=3)
+    banco = BancoFalso()
+    banco.quando(r"FROM ideias", {"id": 1}, {"id": 2})
+
+    def consultar(vezes: int):
+        with banco.cursor() as cur:
+            for _ in range(vezes):
+                cur.execute("SELECT id FROM ideias WHERE usuario_id = %s", (1,))
+
+    @app.get("/itens/{vezes}")
+    @orcamento_sql(2)
+    def itens(vezes: int):
+        consultar(vezes)
+        return {"ok": True}
+
+    @app.get("/trecho")
+    def trecho():
+        with trecho_sql("dependencia", 1):
+            consultar(2)
+        return {"ok": True}
+
+    return app
+
+
+def _get(app: FastAPI, caminho: str) -> httpx.Response:
+    async def enviar():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://teste") as cliente:
+            return await cliente.get(caminho)
+
+    return asyncio.run(enviar())
+
+
+def test_server_timing_conta_consultas_e_linhas():
+    resposta = _get(_app(estrito=True), "/itens/2")
+    assert resposta.status_code == 200
+    assert 'desc="2 consultas, 4 linhas"' in resposta.headers["server-timing"]
+    assert ", app;dur=" in resposta.headers["server-timing"]
+
+
+def test_estrito_troca_resposta_por_500_ao_estourar_orcamento():
+    resposta = _get(_app(estrito=True), "/itens/3")
+    assert resposta.status_code == 500
+    assert resposta.json() == {
+        "detail": "Orcamento SQL excedido: GET /itens/{vezes} fez 3 consultas (orcamento 2)"
+    }
+    assert 'desc="3 consultas' in resposta.headers["server-timing"]
+
+
+def test_fora_do_modo_estrito_estouro_so_vai_para_metricas():
+    estatisticas = EstatisticasSql()
+    resposta = _get(_app(estrito=False, estatisticas=estatisticas), "/itens/3")
+    assert resposta.status_code == 200
+    dados = estatisticas.estatisticas()
+    assert dados["estouros_orcamento"] == 1
+    rota = dados["rotas"]["GET /itens/{vezes}"]
+    assert rota["consultas_max"] == 3
+    assert rota["estouros"] == 1
+    # limite_repeticoes=3: a mesma instrucao tres vezes e suspeita de N+1
+    assert dados["suspeitas_n_mais_um"] == 1
+    assert rota["ultima_repetida"] == "SELECT id FROM ideias WHERE usuario_id = %s"
+
+
+def test_trecho_sql_estourado_falha_no_modo_estrito():
+    resposta = _get(_app(estrito=True), "/trecho")
+    assert resposta.status_code == 500
+    assert resposta.json()["detail"] == "Orcamento SQL excedido: dependencia fez 2 consultas (orcamento 1)"
+
+
+def test_cursor_fora_de_requisicao_so_chama_observador():
+    banco = BancoFalso()
+    banco.quando(r"FROM ideias", {"id": 1})
+    vistas = []
+    query_metrics.definir_observador(lambda query, vars, duracao_ms, linhas: vistas.append((query, vars, linhas)))
+    try:
+        with banco.cursor() as cur:
+            cur.execute("SELECT id FROM ideias WHERE id = %s", (1,))
+    finally:
+        query_metrics.definir_observador(None)
+    assert query_metrics.medicao_atual() is None
+    assert vistas == [("SELECT id FROM ideias WHERE id = %s", (1,), 1)]
+
+
+def test_texto_sql_colapsa_espacos():
+    assert texto_sql(b"SELECT  id\n\t FROM ideias ") == "SELECT id FROM ideias"
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from response_cache import CoalescingTTLCache
+
+
+class Modelo:
+    """Chamada falsa ao modelo: conta execucoes e so termina quando `liberar` e sinalizado."""
+
+    def __init__(self, resultados):
+        self.resultados = list(resultados)
+        self.chamadas = 0
+        self.liberar = asyncio.Event()
+
+    async def __call__(self):
+        self.chamadas += 1
+        resultado = self.resultados.pop(0)
+        await self.liberar.wait()
+        if isinstance(resultado, Exception):
+            raise resultado
+        return resultado
+
+
+def test_pedidos_simultaneos_compartilham_uma_chamada():
+    async def cenario():
+        cache = CoalescingTTLCache(10, 60)
+        modelo = Modelo([["a", "b"]])
+        pedidos = [asyncio.ensure_future(cache.obter_ou_calcular("chave", modelo)) for _ in range(3)]
+        await asyncio.sleep(0)
+        modelo.liberar.set()
+        resultados = await asyncio.gather(*pedidos)
+        # Depois de concluida, a resposta sai do cache sem nova chamada
+        repetido = await cache.obter_ou_calcular("chave", modelo)
+        return cache, modelo, resultados, repetido
+
+    cache, modelo, resultados, repetido = asyncio.run(cenario())
+    assert modelo.chamadas == 1
+    assert resultados == [["a", "b"]] * 3
+    assert repetido == ["a", "b"]
+    assert (cache.misses, cache.coalescidas, cache.hits) == (1, 2, 1)
+    assert cache.estatisticas()["em_andamento"] == 0
+
+
+def test_falha_chega_a_todos_e_nao_fica_em_cache():
+    async def cenario():
+        cache = CoalescingTTLCache(10, 60)
+        modelo = Modelo([RuntimeError("modelo fora"), ["ok"]])
+        pedidos = [asyncio.ensure_future(cache.obter_ou_calcular("chave", modelo)) for _ in range(2)]
+        await asyncio.sleep(0)
+        modelo.liberar.set()
+        erros = await asyncio.gather(*pedidos, return_exceptions=True)
+        return modelo, erros, await cache.obter_ou_calcular("chave", modelo)
+
+    modelo, erros, depois = asyncio.run(cenario())
+    assert [str(erro) for erro in erros] == ["modelo fora", "modelo fora"]
+    assert depois == ["ok"]
+    assert modelo.chamadas == 2
+
+
+def test_guardar_se_descarta_resposta_vazia():
+    async def cenario():
+        cache = CoalescingTTLCache(10, 60, guardar_se=bool)
+        modelo = Modelo([[], ["ok"]])
+        modelo.liberar.set()
+        return modelo, [await cache.obter_ou_calcular("chave", modelo) for _ in range(2)]
+
+    modelo, resultados = asyncio.run(cenario())
+    assert resultados == [[], ["ok"]]
+    assert modelo.chamadas == 2
+
+
+def test_cliente_que_desiste_nao_cancela_a_chamada_dos_outros():
+    async def cenario():
+        cache = CoalescingTTLCache(10, 60)
+        modelo = Modelo([["a"]])
+        primeiro = asyncio.ensure_future(cache.obter_ou_calcular("chave", modelo))
+        segundo = asyncio.ensure_future(cache.obter_ou_calcular("chave", modelo))
+        await asyncio.sleep(0)
+        primeiro.cancel()
+        modelo.liberar.set()
+        with pytest.raises(asyncio.CancelledError):
+            await primeiro
+        return modelo, await segundo, cache.obter("chave")
+
+    modelo, resultado, em_cache = asyncio.run(cenario())
+    assert resultado == ["a"]
+    assert em_cache == ["a"]
+    assert modelo.chamadas == 1
+
+
+def test_registrar_e_falhar_para_producao_em_stream():
+    async def cenario():
+        cache = CoalescingTTLCache(10, 60)
+        futuro = cache.registrar("chave")
+        esperando = cache.em_andamento("chave")
+        cache.falhar(futuro, RuntimeError("cliente desconectou"))
+        # concluir depois de falhar nao sobrescreve o resultado
+        cache.concluir(futuro, ["tarde"])
+        with pytest.raises(RuntimeError):
+            await esperando
+        return cache
+
+    cache = asyncio.run(cenario())
+    assert cache.obter("chave") is None
+    assert cache.em_andamento("chave") is None
@@ -0,0 +1,128 @@
+import threading
+
+from slow_queries import CapturaConsultasLentas, explicavel, formato_parametros, normalizar_sql
+
+
+def test_normalizar_sql_troca_literais_e_placeholders():
+    sql = "SELECT *  FROM ideias\n WHERE usuario_id = %s AND titulo = 'a''b' AND id > 42 AND t2.x = %(nome)s"
+    assert normalizar_sql(sql) == "SELECT * FROM ideias WHERE usuario_id = ? AND titulo = ? AND id > ? AND t2.x = ?"
+
+
+def test_normalizar_sql_preserva_identificadores_com_digitos():
+    assert normalizar_sql("SELECT col1, $1 FROM t2 LIMIT 10") == "SELECT col1, $1 FROM t2 LIMIT ?"
+
+
+def test_normalizar_sql_colapsa_values():
+    curto = normalizar_sql(b"INSERT INTO tags (a, b) VALUES (1, 'x'), (2, 'y')")
+    longo = normalizar_sql(b"INSERT INTO tags (a, b) VALUES (1, 'x'), (2, 'y'), (3, NULL), (4, 'w'::text)")
+    assert curto == longo == "INSERT INTO tags (a, b) VALUES (?...), ..."
+
+
+def test_normalizar_sql_mantem_lista_in():
+    assert normalizar_sql("SELECT id FROM ideias WHERE id IN (1, 2, 3)") == "SELECT id FROM ideias WHERE id IN (?...)"
+
+
+def test_formato_parametros_nunca_expoe_valores():
+    assert formato_parametros(None) is None
+    assert formato_parametros((1, "segredo", None, [1, 2])) == ["int", "str[7]", "None", "list[2]"]
+    assert formato_parametros({"email": "a@b.c"}) == {"email": "str[5]"}
+
+
+def test_explicavel_aceita_so_leitura_de_tabela():
+    assert explicavel(normalizar_sql("SELECT id FROM ideias WHERE usuario_id = %s"))
+    assert explicavel(normalizar_sql("WITH x AS (SELECT 1 FROM ideias) SELECT * FROM x"))
+    assert not explicavel(normalizar_sql("UPDATE ideias SET titulo = %s"))
+    assert not explicavel(normalizar_sql("SELECT 1"))
+    assert not explicavel(normalizar_sql("SELECT id FROM ideias WHERE id = %s FOR UPDATE"))
+    assert not explicavel(normalizar_sql("SELECT pg_advisory_xact_lock(%s) FROM ideias"))
+    assert not explicavel(normalizar_sql("SELECT set_config('ivfflat.probes', %s, true) FROM ideias"))
+    assert not explicavel(normalizar_sql("SELECT nextval('ideias_id_seq') FROM ideias"))
+
+
+class _CursorExplain:
+    def __init__(self, conexao):
+        self.conexao = conexao
+
+    def execute(self, query, vars=None):
+        self.conexao.executadas.append((query, vars))
+
+    def fetchall(self):
+        return [("Seq Scan on ideias",), ("Execution Time: 1.0 ms",)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _ConexaoExplain:
+    def __init__(self):
+        self.executadas = []
+        self.rollbacks = 0
+        self.fechada = False
+
+    def cursor(self):
+        return _CursorExplain(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.fechada = True
+
+
+def test_captura_ignora_consultas_rapidas():
+    captura = CapturaConsultasLentas(limite_ms=100, sorteio=lambda: 0.0)
+    captura.observar("SELECT id FROM ideias", None, 5.0, 1)
+    assert captura.capturadas == 0
+    assert not captura.ha_pendentes()
+
+
+def test_captura_agrega_e_explica_amostra():
+    captura = CapturaConsultasLentas(limite_ms=100, amostra_explain=0.5, sorteio=lambda: 0.0)
+    captura.observar("SELECT id FROM ideias WHERE usuario_id = %s", (1,), 150.0, 3)
+    captura.observar("SELECT id FROM ideias WHERE usuario_id = %s", (2,), 250.0, 1)
+    assert captura.capturadas == 2
+    # Intervalo por instrucao: so a primeira execucao vai para o EXPLAIN
+    assert len(captura._pendentes) == 1
+
+    conexao = _ConexaoExplain()
+    assert captura.explicar_pendentes(lambda: conexao, timeout_ms=1000) == 1
+    assert conexao.executadas[0][0] == "SET TRANSACTION READ ONLY"
+    assert conexao.executadas[1] == ("SET LOCAL statement_timeout = %s", (1000,))
+    assert conexao.executadas[2] == ("EXPLAIN (ANALYZE, BUFFERS) SELECT id FROM ideias WHERE usuario_id = %s", (1,))
+    assert conexao.rollbacks == 1 and conexao.fechada
+
+    relatorio = captura.relatorio()
+    instrucao = relatorio["por_instrucao"][0]
+    assert instrucao["sql"] == "SELECT id FROM ideias WHERE usuario_id = ?"
+    assert instrucao["ocorrencias"] == 2
+    assert instrucao["max_ms"] == 250.0
+    assert instrucao["ultimo_plano"].startswith("Seq Scan on ideias")
+    assert relatorio["recentes"][0]["parametros"] == ["int"]
+    assert relatorio["recentes"][1]["plano"].startswith("Seq Scan")
+
+
+def test_captura_nao_amostra_escrita_nem_advisory_lock():
+    captura = CapturaConsultasLentas(limite_ms=1, amostra_explain=1.0, sorteio=lambda: 0.0)
+    captura.observar("UPDATE ideias SET titulo = %s WHERE id = %s", ("x", 1), 50.0, 1)
+    captura.observar("SELECT pg_advisory_xact_lock(%s)", (7,), 50.0, 1)
+    assert captura.capturadas == 2
+    assert not captura.ha_pendentes()
+
+
+def test_captura_concorrente_nao_perde_registros():
+    captura = CapturaConsultasLentas(limite_ms=1, capacidade=1000, amostra_explain=0.0)
+
+    def observar_varias():
+        for _ in range(100):
+            captura.observar("SELECT id FROM ideias", None, 10.0, 1)
+
+    threads = [threading.Thread(target=observar_varias) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert captura.capturadas == 400
+    assert captura.relatorio()["por_instrucao"][0]["ocorrencias"] == 400
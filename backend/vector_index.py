@@ -0,0 +1,192 @@
+"""
+Indice vetorial em memoria para contas pequenas.
+
+Para usuarios com poucas ideias, um produto escalar exato em NumPy sobre uma
+matriz float32 contigua e mais rapido que a consulta ivfflat pela rede. Os
+indices ficam em um LRU limitado por bytes; contas acima do limite de ideias
+ficam marcadas como "grandes" e continuam usando o pgvector.
+"""
+
+import threading
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+from cachetools import LRUCache
+
+
+class _IndiceUsuario:
+    __slots__ = ("ids", "matriz", "modelo")
+
+    def __init__(self, ids: np.ndarray, matriz: np.ndarray, modelo: Optional[str] = None):
+        self.ids = ids
+        self.matriz = matriz
+        self.modelo = modelo
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.ids.nbytes + self.matriz.nbytes)
+
+
+# Marca contas acima do limite, para nao recontar as ideias a cada busca.
+_CONTA_GRANDE = _IndiceUsuario(np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32))
+
+
+def _normalizar_linhas(matriz: np.ndarray) -> np.ndarray:
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    matriz /= normas
+    return matriz
+
+
+def _parse_vector(texto: str) -> np.ndarray:
+    # Formato textual do pgvector: "[0.1,0.2,...]"
+    return np.fromstring(texto.strip("[]"), dtype=np.float32, sep=",")
+
+
+class UserVectorIndex:
+    """LRU de usuario -> (ids, matriz normalizada) com top-k exato por similaridade de cosseno."""
+
+    def __init__(self, max_bytes: int, max_ideias: int):
+        self._indices = LRUCache(maxsize=max(max_bytes, 1), getsizeof=lambda indice: max(indice.nbytes, 1))
+        self._geracoes = {}
+        self._lock = threading.Lock()
+        self.max_ideias = max_ideias
+        self.hits = 0
+        self.cargas = 0
+        self.contas_grandes = 0
+        self.invalidacoes = 0
+
+    def buscar(
+        self,
+        cur,
+        usuario_id: int,
+        modelo: str,
+        consulta: np.ndarray,
+        limite: int,
+        ids_permitidos: Optional[Callable[[], np.ndarray]] = None,
+        apos: Optional[Tuple[float, int]] = None,
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Retorna (ids, similaridades) em ordem de (distancia, id), ou None se a conta deve usar o pgvector.
+
+        So entram as ideias cujo embedding veio de `modelo` (o mesmo da consulta).
+        `ids_permitidos` (chamado so quando o indice esta disponivel) restringe a busca
+        aos ids que passaram nos filtros; `apos` = (distancia, id) continua uma paginacao.
+        Distancia e `1 - similaridade` em float32.
+        """
+        indice = self._obter_ou_carregar(cur, usuario_id, modelo)
+        if indice is None or indice is _CONTA_GRANDE:
+            return None
+        if indice.ids.size and indice.matriz.shape[1] != consulta.shape[0]:
+            return None
+
+        ids, matriz = indice.ids, indice.matriz
+        if ids_permitidos is not None and ids.size:
+            mascara = np.isin(ids, ids_permitidos(), assume_unique=True)
+            ids, matriz = ids[mascara], matriz[mascara]
+        if not ids.size:
+            return ids, np.empty(0, dtype=np.float32)
+
+        consulta = np.asarray(consulta, dtype=np.float32)
+        norma = float(np.linalg.norm(consulta))
+        if norma:
+            consulta = consulta / norma
+        similaridades = matriz @ consulta
+
+        if apos is not None:
+            distancias = np.float32(1) - similaridades
+            distancia_apos = np.float32(apos[0])
+            seguintes = (distancias > distancia_apos) | ((distancias == distancia_apos) & (ids > apos[1]))
+            ids, similaridades = ids[seguintes], similaridades[seguintes]
+            if not ids.size:
+                return ids, similaridades
+
+        k = min(limite, similaridades.shape[0])
+        if k < similaridades.shape[0]:
+            candidatos = np.argpartition(-similaridades, k - 1)[:k]
+        else:
+            candidatos = np.arange(similaridades.shape[0])
+        # Desempate por id, igual ao ORDER BY distancia, id do pgvector
+        ordem = candidatos[np.lexsort((ids[candidatos], -similaridades[candidatos]))]
+        return ids[ordem], similaridades[ordem]
+
+    def invalidar(self, usuario_id: int):
+        with self._lock:
+            self._geracoes[usuario_id] = self._geracoes.get(usuario_id, 0) + 1
+            self._indices.pop(usuario_id, None)
+            self.invalidacoes += 1
+
+    def invalidar_todos(self):
+        with self._lock:
+            self._geracoes.clear()
+            self._indices.clear()
+            self.invalidacoes += 1
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {
+                "usuarios_em_memoria": len(self._indices),
+                "bytes_em_memoria": int(self._indices.currsize),
+                "max_bytes": int(self._indices.maxsize),
+                "max_ideias": self.max_ideias,
+                "hits": self.hits,
+                "cargas": self.cargas,
+                "contas_grandes": self.contas_grandes,
+                "invalidacoes": self.invalidacoes,
+            }
+
+    def _obter_ou_carregar(self, cur, usuario_id: int, modelo: str) -> Optional[_IndiceUsuario]:
+        with self._lock:
+            indice = self._indices.get(usuario_id)
+            geracao = self._geracoes.get(usuario_id, 0)
+            if indice is not None and (indice is _CONTA_GRANDE or indice.modelo == modelo):
+                self.hits += 1
+                return indice
+
+        indice = self._carregar(cur, usuario_id, modelo)
+        with self._lock:
+            if indice is _CONTA_GRANDE:
+                self.contas_grandes += 1
+            else:
+                self.cargas += 1
+            # Uma escrita durante a carga invalida o que foi lido; usa o indice so nesta busca.
+            if self._geracoes.get(usuario_id, 0) == geracao and indice.nbytes <= self._indices.maxsize:
+                self._indices[usuario_id] = indice
+        return indice
+
+    def _carregar(self, cur, usuario_id: int, modelo: str) -> _IndiceUsuario:
+        cur.execute(
+            """
+            SELECT COUNT(*) AS total
+            FROM ideias
+            WHERE usuario_id = %s AND embedding_modelo = %s AND embedding IS NOT NULL
+            """,
+            (usuario_id, modelo),
+        )
+        row = cur.fetchone()
+        total = row["total"] if isinstance(row, dict) else row[0]
+        if total > self.max_ideias:
+            return _CONTA_GRANDE
+
+        cur.execute(
+            """
+            SELECT id, embedding::text AS embedding
+            FROM ideias
+            WHERE usuario_id = %s AND embedding_modelo = %s AND embedding IS NOT NULL
+            ORDER BY id
+            """,
+            (usuario_id, modelo),
+        )
+        rows = cur.fetchall()
+        if not rows:
+            return _IndiceUsuario(np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32), modelo)
+
+        ids = np.fromiter((r["id"] if isinstance(r, dict) else r[0] for r in rows), dtype=np.int64, count=len(rows))
+        vetores = [_parse_vector(r["embedding"] if isinstance(r, dict) else r[1]) for r in rows]
+        dimensoes = vetores[0].shape[0]
+        if any(v.shape[0] != dimensoes for v in vetores):
+            # Dimensoes misturadas (troca de modelo em andamento): deixa o pgvector responder.
+            return _CONTA_GRANDE
+        matriz = _normalizar_linhas(np.ascontiguousarray(np.vstack(vetores), dtype=np.float32))
+        ids.setflags(write=False)
+        matriz.setflags(write=False)
+        return _IndiceUsuario(ids, matriz, modelo)
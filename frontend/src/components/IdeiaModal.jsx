@@ -64,6 +64,7 @@ function IdeiaModal({
   const [salvando, setSalvando] = useState(false)
   const [showActionsMenu, setShowActionsMenu] = useState(false)
   const [acaoAtiva, setAcaoAtiva] = useState(null)
+  const [relacionadas, setRelacionadas] = useState([])
 
   useEffect(() => {
     if (!isOpen) {
@@ -97,6 +98,26 @@ function IdeiaModal({
     }
   }, [compactActions, ideia?.id, initialAction, isOpen])
 
+  useEffect(() => {
+    if (!isOpen || !ideia?.id || compactActions) {
+      setRelacionadas([])
+      return undefined
+    }
+
+    let cancelado = false
+    import('../services/dbService')
+      .then(({ buscarIdeiasRelacionadas }) => buscarIdeiasRelacionadas(ideia.id))
+      .then((itens) => {
+        if (!cancelado) {
+          setRelacionadas(itens)
+        }
+      })
+
+    return () => {
+      cancelado = true
+    }
+  }, [compactActions, ideia?.id, isOpen])
+
   const projetoSelecionado = useMemo(
     () => projectOptions.find((option) => String(option.id) === String(projetoId || '')) || null,
     [projectOptions, projetoId],
@@ -443,6 +464,37 @@ function IdeiaModal({
     )
   }
 
+  function renderRelacionadas() {
+    return (
+      <div className="mb-6 rounded-2xl border border-slate-200 bg-slate-50/80 p-4">
+        <div className="mb-3">
+          <h3 className="text-sm font-semibold text-slate-900">Ideias relacionadas</h3>
+          <p className="text-sm text-slate-500">
+            Ideias suas com conteudo parecido com esta.
+          </p>
+        </div>
+        <div className="space-y-2">
+          {relacionadas.map((item) => (
+            <div
+              key={item.id}
+              className="flex items-center justify-between gap-3 rounded-xl border border-white/70 bg-white/90 px-4 py-2 shadow-sm"
+            >
+              <div className="min-w-0">
+                <p className="truncate text-sm font-medium text-slate-900">{item.titulo}</p>
+                {item.tag ? (
+                  <p className="text-xs text-slate-500">{item.tag}</p>
+                ) : null}
+              </div>
+              <span className="shrink-0 text-xs font-medium text-slate-500">
+                {Math.round((item.similarity || 0) * 100)}%
+              </span>
+            </div>
+          ))}
+        </div>
+      </div>
+    )
+  }
+
   function renderHistory() {
     return (
       <div className="mb-6 rounded-2xl border border-emerald-100 bg-gradient-to-r from-emerald-50/80 to-teal-50/70 p-4">
@@ -707,6 +759,8 @@ function IdeiaModal({
 
         {!editando && showKanbanDetails && ideia.kanban_ativo && !compactActions ? renderHistory() : null}
 
+        {!editando && !compactActions && relacionadas.length > 0 ? renderRelacionadas() : null}
+
         <div className="flex flex-wrap justify-end gap-3">
           {!editando ? (
             <>
@@ -18,6 +18,7 @@ function LembrancaModal({ isOpen, onClose, onSugestaoSelecionada }) {
   const [ideiaSelecionada, setIdeiaSelecionada] = useState('')
   const timeoutRef = useRef(null)
   const inputRef = useRef(null)
+  const abortRef = useRef(null)
 
   useEffect(() => {
     if (isOpen && inputRef.current) {
@@ -59,11 +60,18 @@ function LembrancaModal({ isOpen, onClose, onSugestaoSelecionada }) {
   }, [texto, isOpen])
 
   const buscarSugestoesIA = async (termo) => {
+    // Cancela a busca anterior se o usuário continuou digitando
+    if (abortRef.current) {
+      abortRef.current.abort()
+    }
+    const controller = new AbortController()
+    abortRef.current = controller
+
     try {
       setErro(null)
       
       const token = localStorage.getItem('auth_token')
-      const url = `${API_URL}/lembrancas/sugerir`
+      const url = `${API_URL}/lembrancas/sugerir/stream`
       
       const response = await fetch(url, {
         method: 'POST',
@@ -73,30 +81,58 @@ function LembrancaModal({ isOpen, onClose, onSugestaoSelecionada }) {
         },
         body: JSON.stringify({
           texto: termo
-        })
+        }),
+        signal: controller.signal
       })
 
       if (!response.ok) {
-        const errorText = await response.text()
         const errorMsg = `Erro ${response.status}: ${response.statusText}. Verifique se o backend está rodando.`
         setErro(errorMsg)
         throw new Error(errorMsg)
       }
 
-      const data = await response.json()
+      // Server-Sent Events: cada evento `sugestao` aparece assim que chega
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      const recebidas = []
+      let buffer = ''
+      setSugestoes([])
+      setMostrarSugestoes(true)
+
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+        const eventos = buffer.split('\n\n')
+        buffer = eventos.pop()
+        for (const bloco of eventos) {
+          const evento = /^event: (.*)$/m.exec(bloco)?.[1]
+          const dados = /^data: (.*)$/m.exec(bloco)?.[1]
+          if (!evento || !dados) continue
+          const payload = JSON.parse(dados)
+          if (evento === 'sugestao') {
+            recebidas.push(payload.sugestao)
+            setSugestoes([...recebidas])
+            setCarregando(false)
+          } else if (evento === 'erro') {
+            throw new Error(payload.erro)
+          }
+        }
+      }
       
-      if (!data.sugestoes || data.sugestoes.length === 0) {
+      if (recebidas.length === 0) {
         setErro('Nenhuma sugestão foi gerada. Tente descrever com mais detalhes.')
       }
-      
-      setSugestoes(data.sugestoes || [])
-      setMostrarSugestoes(true)
     } catch (error) {
+      if (error.name === 'AbortError') return
       console.error('Erro ao buscar sugestões:', error)
       setSugestoes([])
       setErro(`Erro ao buscar sugestões: ${error.message}. Verifique se o backend está rodando na porta 8002.`)
     } finally {
-      setCarregando(false)
+      if (abortRef.current === controller) {
+        abortRef.current = null
+        setCarregando(false)
+      }
     }
   }
 
@@ -8,7 +8,7 @@ import IdeiaModal from '../components/IdeiaModal'
 import { atualizarAgendaIdeia } from '../services/agendaService'
 import { salvarIdeiaComEmbedding } from '../services/buscaService'
 import { buscarHistoricoKanban } from '../services/kanbanService'
-import { atualizarIdeia as atualizarIdeiaDB } from '../services/dbService'
+import { atualizarIdeia as atualizarIdeiaDB, sugerirTags } from '../services/dbService'
 import { useWorkspace } from '../context/WorkspaceContext'
 import { showDeleteConfirm, showError, showErrorToast, showSuccessToast } from '../utils/alerts'
 
@@ -29,6 +29,7 @@ function Cadastro() {
   const [salvando, setSalvando] = useState(false)
   const [titulosSugeridos, setTitulosSugeridos] = useState([])
   const [tagsSugeridas, setTagsSugeridas] = useState([])
+  const [tagsDoRascunho, setTagsDoRascunho] = useState([])
   const [editandoId, setEditandoId] = useState(null)
   const [imagemErro, setImagemErro] = useState(false)
   const [mostrarLembrancaModal, setMostrarLembrancaModal] = useState(false)
@@ -111,6 +112,32 @@ function Cadastro() {
     setProjetoId(selectedProjectId ? String(selectedProjectId) : '')
   }, [selectedProjectId])
 
+  // Tags do usuario mais parecidas com o rascunho (centroides no backend), depois de uma pausa na digitacao
+  useEffect(() => {
+    if (`${titulo} ${ideia}`.trim().length < 12) {
+      setTagsDoRascunho([])
+      return
+    }
+
+    let cancelado = false
+    const timer = setTimeout(async () => {
+      const sugeridas = await sugerirTags(titulo, ideia)
+      if (!cancelado) {
+        setTagsDoRascunho(sugeridas.map((item) => item.tag).filter(Boolean))
+      }
+    }, 600)
+
+    return () => {
+      cancelado = true
+      clearTimeout(timer)
+    }
+  }, [titulo, ideia])
+
+  const sugestoesDeTag = useMemo(
+    () => [...new Set([...tagsDoRascunho, ...tagsSugeridas])],
+    [tagsDoRascunho, tagsSugeridas],
+  )
+
   // Recarregar quando uma ideia for salva
   useEffect(() => {
     if (!mostrarSucesso) {
@@ -497,13 +524,28 @@ function Cadastro() {
                   value={tag}
                   onChange={setTag}
                   placeholder="trabalho, pessoal, projeto..."
-                  suggestions={tagsSugeridas}
+                  suggestions={sugestoesDeTag}
                   icon={
                     <svg className="w-4 h-4" fill="none" stroke="currentColor" viewBox="0 0 24 24">
                       <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M7 7h.01M7 3h5c.512 0 1.024.195 1.414.586l7 7a2 2 0 010 2.828l-7 7a2 2 0 01-2.828 0l-7-7A1.994 1.994 0 013 12V7a4 4 0 014-4z" />
                     </svg>
                   }
                 />
+                {!tag && tagsDoRascunho.length > 0 && (
+                  <div className="mt-2 flex flex-wrap items-center gap-2 text-xs">
+                    <span className="text-gray-400">{t('cadastro.tagsDoRascunho')}</span>
+                    {tagsDoRascunho.map((sugerida) => (
+                      <button
+                        key={sugerida}
+                        type="button"
+                        onClick={() => setTag(sugerida)}
+                        className="rounded-full bg-purple-50 px-2.5 py-1 font-medium text-purple-700 transition-colors hover:bg-purple-100"
+                      >
+                        {sugerida}
+                      </button>
+                    ))}
+                  </div>
+                )}
               </div>
 
               <div>
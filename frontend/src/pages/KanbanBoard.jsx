@@ -7,14 +7,14 @@ import KanbanItemMenu from '../components/KanbanItemMenu'
 import IdeiaModal from '../components/IdeiaModal'
 import { useWorkspace } from '../context/WorkspaceContext'
 import { atualizarAgendaIdeia } from '../services/agendaService'
-import { buscarTodasIdeias, deletarIdeia } from '../services/dbService'
+import { deletarIdeia } from '../services/dbService'
 import {
   atualizarCardKanban,
-  atualizarKanbanStatus,
-  buscarCardsKanban,
   buscarHistoricoKanban,
+  buscarQuadroKanban,
   criarCardKanban,
   deletarCardKanban,
+  moverItemKanban,
 } from '../services/kanbanService'
 import { showDeleteConfirm, showErrorToast, showSuccessToast } from '../utils/alerts'
 
@@ -26,6 +26,8 @@ const KANBAN_COLUMNS = [
   { id: 'fechado', label: 'Fechado', accent: 'from-emerald-500 to-teal-600' },
 ]
 
+const KANBAN_LIMITE_POR_COLUNA = 50
+
 function normalizeKanbanStatus(status) {
   return KANBAN_COLUMNS.some((column) => column.id === status) ? status : 'novo'
 }
@@ -50,8 +52,64 @@ function buildBoardCard(card) {
   }
 }
 
+// Itens de /kanbans/{id}/board voltam no formato das listas de ideias e de cards
+function ideiaDoQuadro(item, quadro) {
+  return {
+    id: item.id,
+    titulo: item.titulo,
+    ideia: item.conteudo,
+    tag: item.tag,
+    projeto_id: item.projeto_id,
+    kanban_id: item.kanban_id,
+    kanban_ativo: true,
+    kanban_status: normalizeKanbanStatus(item.kanban_status),
+    kanban_posicao: item.kanban_posicao,
+    kanban_nome: quadro.nome,
+    agenda_data: item.agenda_data,
+    agenda_observacao: item.agenda_observacao,
+    data: item.data,
+    created_at: item.created_at,
+    updated_at: item.updated_at,
+  }
+}
+
+function cardDoQuadro(item) {
+  return {
+    id: item.id,
+    kanban_id: item.kanban_id,
+    projeto_id: item.projeto_id,
+    titulo: item.titulo,
+    descricao: item.conteudo,
+    checklist: item.checklist || [],
+    prazo_entrega: item.prazo_entrega,
+    kanban_status: normalizeKanbanStatus(item.kanban_status),
+    kanban_posicao: item.kanban_posicao,
+    created_at: item.created_at,
+    updated_at: item.updated_at,
+  }
+}
+
+function separarItensDoQuadro(quadro) {
+  const itens = (quadro.colunas || []).flatMap((coluna) => coluna.itens || [])
+  return {
+    ideias: itens.filter((item) => item.item_tipo === 'ideia').map((item) => ideiaDoQuadro(item, quadro)),
+    cards: itens.filter((item) => item.item_tipo === 'card').map(cardDoQuadro),
+  }
+}
+
+function juntarPorId(estadoAtual, novos) {
+  const ids = new Set(estadoAtual.map((item) => item.id))
+  return [...estadoAtual, ...novos.filter((item) => !ids.has(item.id))]
+}
+
 function ordenarItensKanban(items) {
   return [...items].sort((a, b) => {
+    // kanban_posicao e comparado caractere a caractere, como no banco (COLLATE "C").
+    const posicaoA = a.kanban_posicao || '~'
+    const posicaoB = b.kanban_posicao || '~'
+    if (posicaoA !== posicaoB) {
+      return posicaoA < posicaoB ? -1 : 1
+    }
     const dataA = new Date(a.kanban_updated_at || a.updated_at || a.created_at || 0).getTime()
     const dataB = new Date(b.kanban_updated_at || b.updated_at || b.created_at || 0).getTime()
     return dataB - dataA
@@ -81,6 +139,8 @@ function KanbanBoard() {
   const [ideias, setIdeias] = useState([])
   const [cardsKanban, setCardsKanban] = useState([])
   const [carregando, setCarregando] = useState(true)
+  const [cursoresColuna, setCursoresColuna] = useState({})
+  const [carregandoMaisColuna, setCarregandoMaisColuna] = useState(null)
   const [draggedItemKey, setDraggedItemKey] = useState(null)
   const [dragOverColumn, setDragOverColumn] = useState(null)
   const [ideiaSelecionada, setIdeiaSelecionada] = useState(null)
@@ -157,32 +217,45 @@ function KanbanBoard() {
   async function carregarQuadro() {
     setCarregando(true)
     try {
-      const [resultadoIdeias, resultadoCards] = await Promise.all([
-        buscarTodasIdeias(),
-        buscarCardsKanban(kanbanId),
-      ])
-      setIdeias(
-        resultadoIdeias.map((ideia) => ({
-          ...ideia,
-          kanban_status: normalizeKanbanStatus(ideia.kanban_status),
-          kanban_ativo: Boolean(ideia.kanban_ativo),
-        })),
-      )
-      setCardsKanban(
-        resultadoCards.map((card) => ({
-          ...card,
-          kanban_status: normalizeKanbanStatus(card.kanban_status),
-        })),
+      const quadro = await buscarQuadroKanban(kanbanId, { limitePorColuna: KANBAN_LIMITE_POR_COLUNA })
+      const { ideias: ideiasDoQuadro, cards } = separarItensDoQuadro(quadro)
+      setIdeias(ideiasDoQuadro)
+      setCardsKanban(cards)
+      setCursoresColuna(
+        Object.fromEntries((quadro.colunas || []).map((coluna) => [coluna.kanban_status, coluna.proximo_cursor])),
       )
     } catch (error) {
       console.error('Erro ao carregar quadro do Kanban:', error)
       showErrorToast(error.message || 'Nao foi possivel carregar o quadro do kanban.')
+      setIdeias([])
       setCardsKanban([])
+      setCursoresColuna({})
     } finally {
       setCarregando(false)
     }
   }
 
+  async function carregarMaisColuna(columnId) {
+    const cursor = cursoresColuna[columnId]
+    if (!cursor) {
+      return
+    }
+
+    setCarregandoMaisColuna(columnId)
+    try {
+      const quadro = await buscarQuadroKanban(kanbanId, { limitePorColuna: KANBAN_LIMITE_POR_COLUNA, cursor })
+      const { ideias: ideiasDoQuadro, cards } = separarItensDoQuadro(quadro)
+      setIdeias((estadoAtual) => juntarPorId(estadoAtual, ideiasDoQuadro))
+      setCardsKanban((estadoAtual) => juntarPorId(estadoAtual, cards))
+      setCursoresColuna((atuais) => ({ ...atuais, [columnId]: quadro.colunas?.[0]?.proximo_cursor || null }))
+    } catch (error) {
+      console.error('Erro ao carregar mais itens da coluna:', error)
+      showErrorToast(error.message || 'Nao foi possivel carregar mais itens.')
+    } finally {
+      setCarregandoMaisColuna(null)
+    }
+  }
+
   async function carregarHistoricoKanban(ideiaId) {
     setLoadingKanbanHistory(true)
     try {
@@ -199,7 +272,11 @@ function KanbanBoard() {
   }
 
   function abrirIdeia(ideia, acaoInicial = null) {
-    setIdeiaSelecionada(ideia)
+    setIdeiaSelecionada({
+      projeto_nome: kanbanAtual?.projeto_nome,
+      espaco_nome: kanbanAtual?.espaco_nome,
+      ...ideia,
+    })
     setAcaoModalInicial(acaoInicial)
     setMostrarModal(true)
     setKanbanHistory([])
@@ -388,80 +465,62 @@ function KanbanBoard() {
     }
   }
 
-  async function moverItem(boardKey, novoStatus) {
+  function referenciaItem(item) {
+    return item ? { item_tipo: item.item_type, id: item.id } : null
+  }
+
+  function aplicarNoItem(item, campos) {
+    const atualizar = (estadoAtual) =>
+      estadoAtual.map((atual) => (atual.id === item.id ? { ...atual, ...campos } : atual))
+
+    if (item.item_type === 'card') {
+      setCardsKanban(atualizar)
+    } else {
+      setIdeias(atualizar)
+    }
+  }
+
+  async function moverItem(boardKey, novoStatus, antesDeKey = null) {
     const statusFinal = normalizeKanbanStatus(novoStatus)
     const itemOriginal = itensDoKanban.find((item) => item.board_key === boardKey)
 
-    if (!itemOriginal || itemOriginal.kanban_status === statusFinal) {
+    if (!itemOriginal || boardKey === antesDeKey) {
+      return
+    }
+
+    // Solto sobre um cartao, entra acima dele; solto na coluna, vai para o fim.
+    const destino = itensDaColuna(statusFinal).filter((item) => item.board_key !== boardKey)
+    const indiceAlvo = antesDeKey ? destino.findIndex((item) => item.board_key === antesDeKey) : -1
+    const posicao = indiceAlvo >= 0 ? indiceAlvo : destino.length
+    const mudouStatus = itemOriginal.kanban_status !== statusFinal
+
+    if (!mudouStatus && itensDaColuna(statusFinal).findIndex((item) => item.board_key === boardKey) === posicao) {
       return
     }
 
     const agora = new Date().toISOString()
+    const marcaTempo = itemOriginal.item_type === 'card' ? { updated_at: agora } : { kanban_updated_at: agora }
 
     try {
-      if (itemOriginal.item_type === 'card') {
-        setCardsKanban((estadoAtual) =>
-          estadoAtual.map((card) =>
-            card.id === itemOriginal.id
-              ? {
-                  ...card,
-                  kanban_status: statusFinal,
-                  updated_at: agora,
-                }
-              : card,
-          ),
-        )
-
-        const cardAtualizado = await atualizarCardKanban(itemOriginal.id, {
-          kanban_status: statusFinal,
-        })
-
-        setCardsKanban((estadoAtual) =>
-          estadoAtual.map((card) =>
-            card.id === itemOriginal.id
-              ? {
-                  ...card,
-                  ...cardAtualizado,
-                  kanban_status: normalizeKanbanStatus(cardAtualizado.kanban_status),
-                }
-              : card,
-          ),
-        )
-      } else {
-        const estadoAnterior = ideias
-        setIdeias((estadoAtual) =>
-          estadoAtual.map((ideia) =>
-            ideia.id === itemOriginal.id
-              ? {
-                  ...ideia,
-                  kanban_status: statusFinal,
-                  kanban_updated_at: agora,
-                }
-              : ideia,
-          ),
-        )
-
-        try {
-          const ideiaAtualizada = await atualizarKanbanStatus(itemOriginal.id, statusFinal)
-          setIdeias((estadoAtual) =>
-            estadoAtual.map((ideia) =>
-              ideia.id === itemOriginal.id
-                ? {
-                    ...ideia,
-                    ...ideiaAtualizada,
-                    kanban_ativo: Boolean(ideiaAtualizada.kanban_ativo ?? ideia.kanban_ativo),
-                    kanban_status: normalizeKanbanStatus(ideiaAtualizada.kanban_status),
-                  }
-                : ideia,
-            ),
-          )
-        } catch (error) {
-          setIdeias(estadoAnterior)
-          throw error
-        }
-      }
+      aplicarNoItem(itemOriginal, { kanban_status: statusFinal, ...(mudouStatus ? marcaTempo : {}) })
+
+      // So a linha movida e gravada: o backend calcula o rank entre os dois vizinhos
+      const movido = await moverItemKanban(Number(kanbanId), {
+        item_tipo: itemOriginal.item_type,
+        id: itemOriginal.id,
+        kanban_status: statusFinal,
+        anterior: referenciaItem(destino[posicao - 1]),
+        proximo: referenciaItem(destino[posicao]),
+      })
 
-      showSuccessToast(`Cartao movido para "${KANBAN_COLUMNS.find((item) => item.id === statusFinal)?.label}".`)
+      aplicarNoItem(itemOriginal, {
+        kanban_status: normalizeKanbanStatus(movido.kanban_status),
+        kanban_posicao: movido.kanban_posicao,
+      })
+
+      if (mudouStatus) {
+        showSuccessToast(`Cartao movido para "${KANBAN_COLUMNS.find((item) => item.id === statusFinal)?.label}".`)
+      }
     } catch (error) {
       console.error('Erro ao mover cartao:', error)
       await carregarQuadro()
@@ -478,12 +537,12 @@ function KanbanBoard() {
     setDragOverColumn(null)
   }
 
-  function handleDrop(columnId) {
+  function handleDrop(columnId, antesDeKey = null) {
     if (draggedItemKey == null) {
       return
     }
 
-    moverItem(draggedItemKey, columnId)
+    moverItem(draggedItemKey, columnId, antesDeKey)
     handleDragEnd()
   }
 
@@ -649,7 +708,7 @@ function KanbanBoard() {
                         <p className="text-xs text-white/80">Fluxo do kanban</p>
                       </div>
                       <span className="flex h-8 min-w-8 items-center justify-center rounded-full bg-white/20 px-2 text-sm font-semibold">
-                        {cards.length}
+                        {cards.length}{cursoresColuna[column.id] ? '+' : ''}
                       </span>
                     </div>
                   </header>
@@ -715,6 +774,10 @@ function KanbanBoard() {
                           draggable
                           onDragStart={() => handleDragStart(item.board_key)}
                           onDragEnd={handleDragEnd}
+                          onDrop={(event) => {
+                            event.stopPropagation()
+                            handleDrop(column.id, item.board_key)
+                          }}
                           onClick={() => {
                             if (item.item_type === 'ideia') {
                               abrirIdeia(item)
@@ -792,6 +855,17 @@ function KanbanBoard() {
                         </article>
                       ))
                     )}
+
+                    {cursoresColuna[column.id] ? (
+                      <button
+                        type="button"
+                        onClick={() => carregarMaisColuna(column.id)}
+                        disabled={carregandoMaisColuna === column.id}
+                        className="w-full rounded-xl border border-slate-200 bg-white px-3 py-2 text-sm font-medium text-slate-600 transition-colors hover:bg-slate-50 disabled:cursor-not-allowed disabled:opacity-50"
+                      >
+                        {carregandoMaisColuna === column.id ? 'Carregando...' : 'Carregar mais'}
+                      </button>
+                    ) : null}
                   </div>
                 </section>
               )
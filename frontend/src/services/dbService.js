@@ -309,15 +309,19 @@ export async function deletarIdeia(id) {
 }
 
 // Buscar por similaridade (backend gera embedding automaticamente)
+// `filtros` aceita espaco_id, projeto_id, kanban_id, kanban_status, tag,
+// data_inicio/data_fim e agenda_inicio/agenda_fim, aplicados no servidor.
 export async function buscarPorSimilaridade(termoBusca, options = {}) {
+  const { filtros, ...fetchOptions } = options
   try {
     // Backend gera embedding automaticamente, só enviar o termo
     return await fetchAPI('/ideias/buscar', {
       method: 'POST',
       body: JSON.stringify({
         termo: termoBusca,
+        ...(filtros || {}),
       }),
-      ...options,
+      ...fetchOptions,
     })
   } catch (error) {
     console.error('Erro na busca por similaridade:', error)
@@ -325,6 +329,33 @@ export async function buscarPorSimilaridade(termoBusca, options = {}) {
   }
 }
 
+// Ideias relacionadas (vizinhos pre-calculados no backend)
+export async function buscarIdeiasRelacionadas(id, limite = 5) {
+  try {
+    const data = await fetchAPI(`/ideias/${id}/relacionadas?limite=${limite}`, {
+      method: 'GET',
+    })
+    return Array.isArray(data) ? data : []
+  } catch (error) {
+    console.error('Erro ao buscar ideias relacionadas:', error)
+    return []
+  }
+}
+
+// Sugerir tags existentes do usuario para um rascunho de ideia
+export async function sugerirTags(titulo, ideia, limite = 5) {
+  try {
+    const data = await fetchAPI('/ideias/tags/sugestoes', {
+      method: 'POST',
+      body: JSON.stringify({ titulo: titulo || '', ideia: ideia || '', limite }),
+    })
+    return Array.isArray(data) ? data : []
+  } catch (error) {
+    console.error('Erro ao sugerir tags:', error)
+    return []
+  }
+}
+
 // Salvar ideia com embedding
 export async function salvarIdeiaComEmbeddingDB(ideia, embedding, apiKey) {
   try {
@@ -91,6 +91,52 @@ export async function buscarCardsKanban(kanbanId) {
   return Array.isArray(data) ? data : []
 }
 
+export async function buscarQuadroKanban(kanbanId, { limitePorColuna, cursor } = {}) {
+  const params = new URLSearchParams()
+  if (limitePorColuna) {
+    params.set('limite_por_coluna', String(limitePorColuna))
+  }
+  if (cursor) {
+    params.set('cursor', cursor)
+  }
+  const query = params.toString() ? `?${params.toString()}` : ''
+
+  const response = await fetch(`${API_BASE_URL}/kanbans/${kanbanId}/board${query}`, {
+    method: 'GET',
+    headers: buildAuthHeaders(),
+  })
+
+  const contentType = response.headers.get('content-type') || ''
+  const data = contentType.includes('application/json')
+    ? await response.json().catch(() => ({}))
+    : {}
+
+  if (!response.ok) {
+    throw new Error(data?.detail || `Erro ao buscar quadro do kanban (${response.status})`)
+  }
+
+  return data
+}
+
+export async function moverItemKanban(kanbanId, payload) {
+  const response = await fetch(`${API_BASE_URL}/kanbans/${kanbanId}/mover`, {
+    method: 'POST',
+    headers: buildAuthHeaders(),
+    body: JSON.stringify(payload),
+  })
+
+  const contentType = response.headers.get('content-type') || ''
+  const data = contentType.includes('application/json')
+    ? await response.json().catch(() => ({}))
+    : {}
+
+  if (!response.ok) {
+    throw new Error(data?.detail || `Erro ao mover item do kanban (${response.status})`)
+  }
+
+  return data
+}
+
 export async function criarCardKanban(kanbanId, payload) {
   const response = await fetch(`${API_BASE_URL}/kanbans/${kanbanId}/cards`, {
     method: 'POST',